@@ -1,27 +1,283 @@
-from fastapi import APIRouter, HTTPException, status, Query
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Path, Request, Response, status, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from tortoise.exceptions import DoesNotExist
+from pydantic import ValidationError
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
 
-from app.schemas.libro import Libro, LibroCreate, LibroUpdate
+from app.auth.auth import get_current_user, get_identidad
+from app.core.config import settings
+from app.core.bulk import detectar_formato, exportar_filas, leer_registros
+from app.core.catalogo import catalogos
+from app.core.pagination import CAMPOS_ORDENABLES, CursorInvalido, decode_cursor, encode_cursor, keyset_filter
+from app.core.response_cache import response_cache
+from app.core.serialization import PATRON_FORMATO, FastJSONResponse, acepta_msgpack, list_response
+from app.core.singleflight import SingleFlight
+from app.core.sugerencias import indices_sugerencias
+from app.core.trabajos import Progreso, cola_trabajos
+from app.routes.admin import encolar_trabajo, verificar_admin
+from app.schemas.libro import (
+    CAMPOS_LIBRO, ActualizacionLibros, ConsultaLibros, FiltroLibros, Libro, LibroCreate, LibroUpdate,
+    LibroUpsert, ErrorImportacion, Recomendado, ResultadoConsultaLibros, ResultadoImportacion, Sugerencia
+)
+from app.schemas.trabajo import TrabajoOut
+from app.schemas.usuario import Identidad
 from app.db.models.libro import Libro as LibroModel
+from app.db.models.usuario import Usuario
+from app.db.config import read_connection_name
+from app.db.fts import buscar_ids, construir_consulta
+from app.db.libros import actualizar_libro, upsert_libro
+from app.db.recomendaciones import leer_recomendaciones
 
 router = APIRouter()
 
-@router.get("/", response_model=List[Libro])
-async def get_libros():
+# Cantidad de libros que se insertan por transacción en las importaciones
+TAMANO_LOTE_IMPORTACION = 1000
+
+# Espacio de la caché de respuestas que se invalida al modificar libros
+CACHE_LIBROS = "libros"
+
+# Cantidad máxima de IDs más ISBN en una consulta por lotes
+MAX_LIBROS_BATCH = 200
+
+# Consultas por lotes idénticas que se están ejecutando
+consultas_batch = SingleFlight()
+
+# Tipo de trabajo de las actualizaciones masivas
+TRABAJO_ACTUALIZAR = "libros.actualizar"
+
+def _filtro_libros(filtro: FiltroLibros) -> Q:
+    # Mismos criterios que el listado de libros
+    condiciones = {}
+    if filtro.ids is not None:
+        condiciones["id__in"] = filtro.ids
+    if filtro.titulo:
+        condiciones["titulo__icontains"] = filtro.titulo
+    if filtro.autor:
+        condiciones["autor__icontains"] = filtro.autor
+    if filtro.categoria:
+        condiciones["categoria__icontains"] = filtro.categoria
+    if filtro.estado:
+        condiciones["estado"] = filtro.estado
+    return Q(**condiciones)
+
+async def actualizar_libros(parametros: ActualizacionLibros, progreso: Progreso) -> dict:
     """
-    Obtener todos los libros.
+    Trabajo que aplica los mismos cambios a todos los libros que cumplen el filtro.
+    
+    Recorre los libros por ID en lotes de `TRABAJOS_LOTE`, con un UPDATE por
+    lote, para no bloquear la base durante toda la operación. Repetirlo
+    desde el principio (si se interrumpe) deja el mismo resultado.
     
+    Args:
+        parametros: Filtro y cambios a aplicar
+        progreso: Avance del trabajo
+        
     Returns:
-        List[Libro]: Lista de todos los libros en la base de datos.
+        dict: Cantidad de libros actualizados
     """
-    return await Libro.from_queryset(LibroModel.all())
+    filtro = _filtro_libros(parametros.filtro)
+    cambios = parametros.cambios.model_dump(exclude_none=True)
+    await progreso.avanzar(0, total=await LibroModel.filter(filtro).count())
+    
+    actualizados, ultimo_id = 0, 0
+    while True:
+        ids = await LibroModel.filter(filtro, id__gt=ultimo_id).order_by("id").limit(
+            settings.TRABAJOS_LOTE
+        ).values_list("id", flat=True)
+        if not ids:
+            break
+        # En SQLite el conteo de update() incluye las filas que modifican los triggers
+        await LibroModel.filter(id__in=ids).update(**cambios)
+        actualizados += len(ids)
+        ultimo_id = ids[-1]
+        await response_cache.invalidar(CACHE_LIBROS)
+        await progreso.avanzar(len(ids))
+    
+    return {"actualizados": actualizados}
+
+cola_trabajos.registrar(TRABAJO_ACTUALIZAR, actualizar_libros, ActualizacionLibros, concurrencia=1)
+
+@router.get("/buscar", response_model=List[Libro])
+async def buscar_libros(
+    request: Request,
+    q: Optional[str] = None,
+    titulo: Optional[str] = None,
+    autor: Optional[str] = None,
+    categoria: Optional[str] = None,
+    pagina: int = Query(1, ge=1),
+    items_por_pagina: int = Query(10, ge=1, le=100),
+    formato: Optional[str] = Query(None, alias="format", pattern=PATRON_FORMATO)
+):
+    """
+    Buscar libros por texto usando el índice de texto completo.
+    
+    Cada palabra se busca como prefijo ("prog" encuentra "Programación") y
+    sin distinguir mayúsculas ni acentos. Los resultados se ordenan por
+    relevancia, dando más peso a las coincidencias en el título.
+    
+    Args:
+        q (str, optional): Texto a buscar en título, autor y categoría.
+        titulo (str, optional): Texto a buscar sólo en el título.
+        autor (str, optional): Texto a buscar sólo en el autor.
+        categoria (str, optional): Texto a buscar sólo en la categoría.
+        pagina (int): Número de página (inicia en 1).
+        items_por_pagina (int): Cantidad de items por página.
+        formato (str, optional): "rows" (por defecto) o "columns" (un arreglo por campo).
+        
+    Returns:
+        List[Libro]: Libros encontrados, del más relevante al menos relevante
+        (en MessagePack si se pide con `Accept: application/msgpack`).
+        
+    Raises:
+        HTTPException: Si no se indicó ningún término de búsqueda.
+    """
+    consulta = construir_consulta(q, titulo=titulo, autor=autor, categoria=categoria)
+    if not consulta:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe indicar al menos un término de búsqueda"
+        )
+    
+    ids = await buscar_ids(
+        consulta, items_por_pagina, (pagina - 1) * items_por_pagina, connection_name=read_connection_name()
+    )
+    libros = {fila["id"]: fila for fila in await LibroModel.filter(id__in=ids).values(*CAMPOS_LIBRO)}
+    
+    # Respetar el orden por relevancia devuelto por el índice
+    return list_response(
+        [libros[i] for i in ids if i in libros], CAMPOS_LIBRO, formato, binario=acepta_msgpack(request)
+    )
+
+@router.get("/sugerencias", response_model=List[Sugerencia])
+async def sugerir_libros(
+    q: str = Query(..., min_length=1, max_length=200),
+    limite: int = Query(10, ge=1, le=50)
+):
+    """
+    Sugerencias de títulos y autores para autocompletar mientras se escribe.
+    
+    Devuelve los títulos que empiezan con `q` y los autores con alguna
+    palabra del nombre que empieza con `q`, sin distinguir mayúsculas ni
+    acentos, de los más prestados a los menos prestados. Se responden desde
+    un índice en memoria, sin consultar la base en cada tecla. Para buscar
+    palabras en cualquier parte del título usar
+    `/libros/buscar`.
+    
+    Args:
+        q (str): Texto escrito hasta ahora.
+        limite (int): Cantidad máxima de sugerencias.
+        
+    Returns:
+        List[Sugerencia]: Títulos (con el ID del libro) y autores sugeridos.
+    """
+    return FastJSONResponse(await indices_sugerencias.actual().sugerir(q, limite))
+
+@router.get("/exportar")
+async def exportar_libros(formato: str = Query("ndjson", pattern="^(ndjson|csv)$")):
+    """
+    Exportar el catálogo completo.
+    
+    El archivo se genera a medida que se leen los libros de la base de datos,
+    por lo que el uso de memoria no depende del tamaño del catálogo.
+    
+    Args:
+        formato (str): "ndjson" (un objeto JSON por línea) o "csv".
+        
+    Returns:
+        StreamingResponse: Archivo con todos los libros ordenados por ID.
+    """
+    media_type = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        exportar_filas(LibroModel.all(), formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="libros.{formato}"'}
+    )
+
+@router.get("/cache")
+async def get_cache_stats(current_user: Usuario = Depends(get_current_user)):
+    """
+    Obtener las estadísticas de la caché de respuestas (solo para administradores).
+    
+    Returns:
+        dict: Aciertos, fallos, proporción de aciertos, respuestas 304 y bytes ahorrados.
+        
+    Raises:
+        HTTPException: Si el usuario no es administrador.
+    """
+    if current_user.rol != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para realizar esta acción"
+        )
+    return response_cache.stats()
+
+@router.post("/batch", response_model=ResultadoConsultaLibros)
+async def get_libros_batch(consulta: ConsultaLibros):
+    """
+    Obtener varios libros por ID o por ISBN con una sola consulta.
+    
+    Pensado para consultar a la vez la disponibilidad (`estado`) de muchos
+    libros. Los libros encontrados se devuelven en el orden pedido, sin
+    repetir, con los mismos campos que `GET /libros/{id}`; los IDs e ISBN que
+    no existen se informan en `faltantes`. Las consultas idénticas que llegan
+    mientras otra se está ejecutando comparten su resultado.
+    
+    Args:
+        consulta (ConsultaLibros): IDs y/o ISBN a buscar.
+        
+    Returns:
+        ResultadoConsultaLibros: Libros encontrados e identificadores faltantes.
+        
+    Raises:
+        HTTPException: Si no se indicó ningún ID ni ISBN, o si se indicaron demasiados.
+    """
+    ids = list(dict.fromkeys(consulta.ids))
+    isbns = list(dict.fromkeys(consulta.isbns))
+    if not ids and not isbns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe indicar al menos un ID o ISBN"
+        )
+    if len(ids) + len(isbns) > MAX_LIBROS_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Se pueden consultar como máximo {MAX_LIBROS_BATCH} libros a la vez"
+        )
+    
+    async def consultar():
+        filtro = Q(id__in=ids, isbn__in=isbns, join_type=Q.OR) if ids and isbns else (
+            Q(id__in=ids) if ids else Q(isbn__in=isbns)
+        )
+        return await LibroModel.filter(filtro).values(*CAMPOS_LIBRO)
+    
+    # La clave no depende del orden: la misma consulta en otro orden también se agrupa
+    filas = await consultas_batch.ejecutar((tuple(sorted(ids)), tuple(sorted(isbns))), consultar)
+    por_id = {fila["id"]: fila for fila in filas}
+    por_isbn = {fila["isbn"]: fila for fila in filas}
+    
+    encontrados, vistos = [], set()
+    faltantes = {"ids": [], "isbns": []}
+    for clave, indice, lista in [(i, por_id, "ids") for i in ids] + [(i, por_isbn, "isbns") for i in isbns]:
+        fila = indice.get(clave)
+        if fila is None:
+            faltantes[lista].append(clave)
+        elif fila["id"] not in vistos:
+            vistos.add(fila["id"])
+            encontrados.append(fila)
+    
+    return FastJSONResponse({"encontrados": encontrados, "faltantes": faltantes})
 
 @router.get("/{libro_id}", response_model=Libro)
-async def get_libro(libro_id: int):
+async def get_libro(request: Request, libro_id: int):
     """
     Obtener un libro por su ID.
     
+    La respuesta se guarda en la caché de respuestas e incluye un `ETag`;
+    si el cliente lo envía en `If-None-Match` y el libro no cambió, se
+    responde 304 sin cuerpo.
+    
     Args:
         libro_id (int): ID del libro a obtener.
         
@@ -31,14 +287,47 @@ async def get_libro(libro_id: int):
     Raises:
         HTTPException: Si el libro no existe.
     """
-    try:
-        libro = await LibroModel.get(id=libro_id)
-        return libro
-    except DoesNotExist:
+    async def generar():
+        libro = await LibroModel.filter(id=libro_id).first().values(*CAMPOS_LIBRO)
+        if libro is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Libro con ID {libro_id} no encontrado"
+            )
+        return FastJSONResponse(libro)
+    
+    return await response_cache.responder(request, CACHE_LIBROS, {"id": libro_id}, generar)
+
+@router.get("/{libro_id}/recomendados", response_model=List[Recomendado])
+async def get_recomendados(libro_id: int, limite: int = Query(10, ge=1, le=settings.RECOMENDACIONES_K)):
+    """
+    Libros que suelen retirar los mismos usuarios que retiraron este libro.
+    
+    Las recomendaciones las calcula periódicamente una tarea en segundo
+    plano a partir de los préstamos (ver `app.db.recomendaciones`) y se
+    leen de una tabla precalculada con una sola consulta por índice. Un
+    libro recién prestado puede tardar hasta `RECOMENDACIONES_INTERVALO`
+    segundos en tener recomendaciones.
+    
+    Args:
+        libro_id (int): ID del libro.
+        limite (int): Cantidad máxima de recomendaciones.
+        
+    Returns:
+        List[Recomendado]: Libros recomendados, del más parecido al menos
+        parecido, con su puntaje y la cantidad de usuarios que retiraron ambos.
+        
+    Raises:
+        HTTPException: Si el libro no existe.
+    """
+    recomendados = await leer_recomendaciones(libro_id, limite)
+    # Sin recomendaciones: sólo entonces hace falta distinguir un libro inexistente
+    if not recomendados and not await LibroModel.filter(id=libro_id).exists():
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Libro con ID {libro_id} no encontrado"
         )
+    return FastJSONResponse(recomendados)
 
 @router.post("/", response_model=Libro, status_code=status.HTTP_201_CREATED)
 async def create_libro(libro: LibroCreate):
@@ -54,16 +343,41 @@ async def create_libro(libro: LibroCreate):
     Raises:
         HTTPException: Si ya existe un libro con el mismo ISBN.
     """
-    # Verificar si ya existe un libro con el mismo ISBN
-    if await LibroModel.filter(isbn=libro.isbn).exists():
+    # El índice único de ISBN rechaza los duplicados, incluso entre peticiones simultáneas
+    try:
+        libro_obj = await LibroModel.create(**libro.dict())
+    except IntegrityError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Ya existe un libro con ISBN {libro.isbn}"
         )
-    
-    libro_obj = await LibroModel.create(**libro.dict())
+    await response_cache.invalidar(CACHE_LIBROS)
     return libro_obj
 
+@router.put("/isbn/{isbn}", response_model=Libro)
+async def upsert_libro_por_isbn(
+    libro: LibroUpsert,
+    response: Response,
+    isbn: str = Path(..., max_length=13)
+):
+    """
+    Crear o reemplazar un libro por su ISBN.
+    
+    Es una única sentencia (INSERT ... ON CONFLICT), así que dos peticiones
+    simultáneas con el mismo ISBN nunca crean dos libros.
+    
+    Args:
+        isbn (str): ISBN del libro.
+        libro (LibroUpsert): Datos del libro.
+        
+    Returns:
+        Libro: Libro creado (201) o reemplazado (200).
+    """
+    libro_dict, creado = await upsert_libro({"isbn": isbn, **libro.dict()})
+    await response_cache.invalidar(CACHE_LIBROS)
+    response.status_code = status.HTTP_201_CREATED if creado else status.HTTP_200_OK
+    return libro_dict
+
 @router.put("/{libro_id}", response_model=Libro)
 async def update_libro(libro_id: int, libro: LibroUpdate):
     """
@@ -77,33 +391,32 @@ async def update_libro(libro_id: int, libro: LibroUpdate):
         Libro: Libro actualizado.
         
     Raises:
-        HTTPException: Si el libro no existe.
+        HTTPException: Si el libro no existe o el ISBN ya pertenece a otro libro.
     """
+    # Filtrar solo los campos que no son None
+    update_data = {k: v for k, v in libro.dict().items() if v is not None}
+    
+    # Una sola sentencia: el índice único de ISBN rechaza los duplicados
     try:
-        libro_obj = await LibroModel.get(id=libro_id)
-    except DoesNotExist:
+        if update_data:
+            libro_dict = await actualizar_libro(libro_id, update_data)
+        else:
+            libro_dict = await LibroModel.get_or_none(id=libro_id).values(*CAMPOS_LIBRO)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ya existe otro libro con ISBN {update_data['isbn']}"
+        )
+    
+    if libro_dict is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Libro con ID {libro_id} no encontrado"
         )
     
-    # Filtrar solo los campos que no son None
-    update_data = {k: v for k, v in libro.dict().items() if v is not None}
-    
-    # Si se intenta actualizar el ISBN, verificar que no exista otro libro con ese ISBN
-    if "isbn" in update_data:
-        existe = await LibroModel.filter(isbn=update_data["isbn"]).exclude(id=libro_id).exists()
-        if existe:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Ya existe otro libro con ISBN {update_data['isbn']}"
-            )
-    
-    # Actualizar el libro
-    await libro_obj.update_from_dict(update_data)
-    await libro_obj.save()
-    
-    return libro_obj
+    if update_data:
+        await response_cache.invalidar(CACHE_LIBROS)
+    return FastJSONResponse(libro_dict)
 
 @router.delete("/{libro_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_libro(libro_id: int):
@@ -117,17 +430,54 @@ async def delete_libro(libro_id: int):
         None
         
     Raises:
-        HTTPException: Si el libro no existe.
+        HTTPException: Si el libro no existe o tiene préstamos registrados.
     """
-    deleted_count = await LibroModel.filter(id=libro_id).delete()
+    # Los préstamos no se borran en cascada: la base rechaza eliminar el libro
+    try:
+        deleted_count = await LibroModel.filter(id=libro_id).delete()
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"El libro con ID {libro_id} tiene préstamos registrados y no puede eliminarse"
+        )
     if not deleted_count:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Libro con ID {libro_id} no encontrado"
         )
+    await response_cache.invalidar(CACHE_LIBROS)
+
+@router.patch("/", response_model=TrabajoOut, status_code=status.HTTP_202_ACCEPTED)
+async def update_libros(
+    actualizacion: ActualizacionLibros,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: Identidad = Depends(get_identidad)
+):
+    """
+    Actualizar en masa los libros que cumplen un filtro (solo para administradores).
+    
+    La actualización se ejecuta en segundo plano: la respuesta es el trabajo
+    encolado y su estado se consulta en `GET /admin/jobs/{id}` (encabezado
+    `Location`). Reenviar la petición con el mismo `Idempotency-Key` no
+    vuelve a encolarla.
+    
+    Args:
+        actualizacion (ActualizacionLibros): Filtro (ids, titulo, autor, categoria, estado) y cambios (autor, categoria, estado).
+        idempotency_key (str, optional): Clave de idempotencia.
+        
+    Returns:
+        TrabajoOut: Trabajo encolado.
+        
+    Raises:
+        HTTPException: Si el usuario no es administrador.
+    """
+    verificar_admin(current_user)
+    return await encolar_trabajo(TRABAJO_ACTUALIZAR, actualizacion, idempotency_key, current_user, response)
 
 @router.get("/", response_model=List[Libro])
 async def get_libros(
+    request: Request,
     titulo: Optional[str] = None,
     autor: Optional[str] = None,
     categoria: Optional[str] = None,
@@ -135,11 +485,21 @@ async def get_libros(
     ordenar_por: Optional[str] = "id",
     orden: Optional[str] = "asc",
     pagina: int = Query(1, ge=1),
-    items_por_pagina: int = Query(10, ge=1, le=100)
+    items_por_pagina: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    formato: Optional[str] = Query(None, alias="format", pattern=PATRON_FORMATO)
 ):
     """
     Listar libros con opciones de filtrado, ordenamiento y paginación.
     
+    La paginación puede hacerse por número de página (`pagina`) o por cursor.
+    Cuando la página está completa, la respuesta incluye el encabezado
+    `X-Next-Cursor`; enviándolo como `cursor` se obtiene la página siguiente
+    sin que la base de datos tenga que recorrer las filas anteriores.
+    
+    Las respuestas se guardan en la caché de respuestas (por parámetros
+    normalizados) e incluyen un `ETag` para poder responder 304.
+    
     Args:
         titulo (str, optional): Filtrar por título.
         autor (str, optional): Filtrar por autor.
@@ -147,12 +507,25 @@ async def get_libros(
         estado (str, optional): Filtrar por estado.
         ordenar_por (str, optional): Campo por el cual ordenar.
         orden (str, optional): Dirección del ordenamiento (asc o desc).
-        pagina (int): Número de página (inicia en 1).
+        pagina (int): Número de página (inicia en 1). Se ignora si se envía `cursor`.
         items_por_pagina (int): Cantidad de items por página.
+        cursor (str, optional): Cursor devuelto en `X-Next-Cursor` por la página anterior.
+        formato (str, optional): "rows" (por defecto) o "columns" (un arreglo por campo).
         
     Returns:
-        List[Libro]: Lista de libros filtrados, ordenados y paginados.
+        List[Libro]: Lista de libros filtrados, ordenados y paginados (en
+        MessagePack si se pide con `Accept: application/msgpack`).
+        
+    Raises:
+        HTTPException: Si el campo de ordenamiento o el cursor no son válidos.
     """
+    orden = "desc" if orden.lower() == "desc" else "asc"
+    if ordenar_por not in CAMPOS_ORDENABLES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"No se puede ordenar por '{ordenar_por}'"
+        )
+    
     # Iniciar la consulta
     query = LibroModel.all()
     
@@ -166,15 +539,165 @@ async def get_libros(
     if estado:
         query = query.filter(estado=estado)
     
-    # Aplicar ordenamiento
-    if orden.lower() == "desc":
-        query = query.order_by(f"-{ordenar_por}")
+    # Aplicar ordenamiento, desempatando por id para que el orden sea estable
+    if orden == "desc":
+        query = query.order_by(f"-{ordenar_por}", "-id")
     else:
-        query = query.order_by(ordenar_por)
+        query = query.order_by(ordenar_por, "id")
     
     # Aplicar paginación
-    skip = (pagina - 1) * items_por_pagina
-    query = query.offset(skip).limit(items_por_pagina)
+    despues, skip = None, 0
+    if cursor:
+        try:
+            despues = decode_cursor(cursor, ordenar_por, orden)
+        except CursorInvalido as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        query = query.filter(keyset_filter(ordenar_por, orden, *despues))
+    else:
+        skip = (pagina - 1) * items_por_pagina
+        query = query.offset(skip)
+    query = query.limit(items_por_pagina)
+    
+    # El catálogo en memoria no resuelve las búsquedas por título o autor
+    en_memoria = settings.CATALOGO_EN_MEMORIA and not titulo and not autor
+    
+    async def generar():
+        if en_memoria:
+            catalogo = catalogos.actual()
+            await catalogo.sincronizar()
+            try:
+                libros = catalogo.consultar(
+                    categoria, estado, ordenar_por, orden, skip, items_por_pagina, despues
+                )
+            except CursorInvalido as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+        else:
+            # Ejecutar la consulta leyendo sólo los campos de la respuesta
+            libros = await query.values(*CAMPOS_LIBRO)
+        
+        headers = {}
+        if len(libros) == items_por_pagina:
+            ultimo = libros[-1]
+            headers["X-Next-Cursor"] = encode_cursor(
+                ordenar_por, orden, ultimo[ordenar_por], ultimo["id"]
+            )
+        
+        return list_response(libros, CAMPOS_LIBRO, formato, binario=binario, headers=headers)
+    
+    binario = acepta_msgpack(request)
+    parametros = {
+        "titulo": titulo,
+        "autor": autor,
+        "categoria": categoria,
+        "estado": estado,
+        "ordenar_por": ordenar_por,
+        "orden": orden,
+        "items_por_pagina": items_por_pagina,
+        "cursor": cursor,
+        # Con cursor el número de página no se usa
+        "pagina": None if cursor else pagina,
+        "formato": formato,
+        "binario": binario or None,
+    }
+    return await response_cache.responder(request, CACHE_LIBROS, parametros, generar)
+
+@router.post("/importar", response_model=ResultadoImportacion)
+async def importar_libros(
+    archivo: UploadFile = File(...),
+    formato: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    current_user: Identidad = Depends(get_identidad)
+):
+    """
+    Importar libros en forma masiva desde un archivo NDJSON o CSV (solo para administradores).
+    
+    Cada fila se valida como `LibroCreate`. Las filas inválidas o con un ISBN
+    repetido (dentro del archivo o ya existente en la base) se informan en
+    `errores` y no detienen la importación. Las filas válidas se insertan en
+    lotes, cada uno en su propia transacción.
+    
+    Args:
+        archivo (UploadFile): Archivo a importar. Los CSV deben tener encabezado.
+        formato (str, optional): "ndjson" o "csv". Si no se indica, se deduce
+            de la extensión del archivo.
+        
+    Returns:
+        ResultadoImportacion: Cantidad de filas procesadas e insertadas, y errores por fila.
+        
+    Raises:
+        HTTPException: Si el usuario no es administrador.
+    """
+    verificar_admin(current_user)
+    formato = detectar_formato(archivo.filename, formato)
+    resultado = ResultadoImportacion()
+    isbns_vistos = set()
+    lote = []
+    
+    async def guardar_lote():
+        isbns = [libro.isbn for _, libro in lote]
+        existentes = set(await LibroModel.filter(isbn__in=isbns).values_list("isbn", flat=True))
+        nuevos = []
+        for fila, libro in lote:
+            if libro.isbn in existentes:
+                resultado.errores.append(ErrorImportacion(
+                    fila=fila, isbn=libro.isbn, detalle=f"Ya existe un libro con ISBN {libro.isbn}"
+                ))
+            else:
+                nuevos.append((fila, libro))
+        try:
+            async with in_transaction("default") as conn:
+                await LibroModel.bulk_create([LibroModel(**libro.dict()) for _, libro in nuevos], using_db=conn)
+        except IntegrityError:
+            # Otro proceso insertó alguno de estos ISBN mientras tanto: el lote se
+            # revierte y se inserta fila por fila, así sólo fallan las repetidas
+            insertados = []
+            for fila, libro in nuevos:
+                try:
+                    await LibroModel.create(**libro.dict())
+                except IntegrityError:
+                    resultado.errores.append(ErrorImportacion(
+                        fila=fila, isbn=libro.isbn, detalle=f"Ya existe un libro con ISBN {libro.isbn}"
+                    ))
+                else:
+                    insertados.append((fila, libro))
+            nuevos = insertados
+        resultado.insertadas += len(nuevos)
+        if nuevos:
+            await response_cache.invalidar(CACHE_LIBROS)
+        lote.clear()
+    
+    for fila, registro in leer_registros(archivo.file, formato):
+        resultado.procesadas += 1
+        if isinstance(registro, ValueError):
+            resultado.errores.append(ErrorImportacion(fila=fila, detalle=str(registro)))
+            continue
+        
+        # En CSV las celdas vacías equivalen a no indicar el campo
+        datos = {k: v for k, v in registro.items() if k is not None and v not in ("", None)}
+        try:
+            libro = LibroCreate(**datos)
+        except ValidationError as e:
+            detalle = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            resultado.errores.append(ErrorImportacion(fila=fila, isbn=datos.get("isbn"), detalle=detalle))
+            continue
+        
+        if libro.isbn in isbns_vistos:
+            resultado.errores.append(ErrorImportacion(
+                fila=fila, isbn=libro.isbn, detalle=f"ISBN {libro.isbn} repetido en el archivo"
+            ))
+            continue
+        isbns_vistos.add(libro.isbn)
+        
+        lote.append((fila, libro))
+        if len(lote) >= TAMANO_LOTE_IMPORTACION:
+            await guardar_lote()
+    
+    if lote:
+        await guardar_lote()
     
-    # Ejecutar la consulta
-    return await query
\ No newline at end of file
+    return resultado
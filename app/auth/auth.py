@@ -1,27 +1,43 @@
+import copy
+import time
+import uuid
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from pydantic import ValidationError
 
-from ..models.usuario import Usuario
-from ..schemas.usuario import TokenData
+from ..core import security
+from ..core.cache import TTLCache
+from ..core.compartido import estado_compartido
+from ..core.config import settings
+from ..core.tenant import calificar, tenant_actual
+from ..db.models.usuario import Usuario
+from ..schemas.usuario import Identidad, TokenData
+from .revocacion import revocaciones
 
-# Configuración del token JWT
-# En una aplicación real, estos valores deberían estar en variables de entorno
-SECRET_KEY = "un_secreto_muy_seguro_que_deberia_estar_en_variables_de_entorno"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Configuración del token JWT: claves, algoritmo y expiración en `Settings`
+# (JWT_CLAVES / JWT_CLAVE_ACTUAL permiten rotar la clave sin invalidar los tokens emitidos)
+ALGORITHM = settings.JWT_ALGORITHM
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.JWT_EXPIRACION_MINUTOS
 
 # Configuración de OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Cachés de autenticación: token -> claims ya validados, y username -> usuario
+_token_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+_user_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Crea un token JWT con los datos proporcionados y una fecha de expiración.
     
+    El token se firma con la clave `JWT_CLAVE_ACTUAL`, cuyo identificador va
+    en el encabezado (`kid`), e incluye un identificador propio (`jti`) y la
+    fecha de emisión (`iat`) para poder revocarlo. En modo multi-tenant lleva
+    además el tenant que lo emitió (claim `TENANTS_CLAIM`).
+    
     Args:
         data: Datos a incluir en el token
         expires_delta: Tiempo de expiración (opcional)
@@ -36,47 +52,110 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.update({"exp": expire, "iat": time.time(), "jti": uuid.uuid4().hex})
+    if tenant_actual.get() is not None:
+        to_encode[settings.TENANTS_CLAIM] = tenant_actual.get()
+    kid = settings.JWT_CLAVE_ACTUAL
+    from jose import jwt
+    encoded_jwt = jwt.encode(to_encode, settings.JWT_CLAVES[kid], algorithm=ALGORITHM, headers={"kid": kid})
     
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> Usuario:
+def create_user_token(user: Usuario) -> str:
     """
-    Obtiene el usuario actual a partir del token JWT.
+    Crea un token para el usuario con su id, rol y estado como claims.
+    
+    Con esos claims, `get_identidad` autoriza sin consultar la base. Si el rol
+    o el estado del usuario cambian, sus tokens anteriores deben revocarse
+    (`revocaciones.revocar_usuario`).
     
     Args:
-        token: Token JWT de autenticación
+        user: Usuario autenticado
         
     Returns:
-        Usuario: Objeto de usuario autenticado
-        
-    Raises:
-        HTTPException: Si el token es inválido o el usuario no existe
+        str: Token JWT generado
     """
-    credentials_exception = HTTPException(
+    return create_access_token({"sub": user.username, "uid": user.id, "rol": user.rol, "activo": user.activo})
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode(token: str) -> dict:
+    from jose import JWTError, jwt
     
     try:
-        # Decodificar el token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
+        kid = jwt.get_unverified_header(token).get("kid")
+        # Los tokens sin `kid` (anteriores a la rotación de claves) usan la clave actual
+        clave = settings.JWT_CLAVES.get(kid or settings.JWT_CLAVE_ACTUAL)
+        if clave is None:
+            raise _credentials_exception()
+        payload = jwt.decode(token, clave, algorithms=[ALGORITHM])
+        TokenData(username=payload.get("sub"))
+    except (JWTError, ValidationError):
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+async def verify_token(token: str) -> dict:
+    """
+    Valida un token y devuelve sus claims.
+    
+    La firma se verifica una sola vez por token: los claims quedan en caché
+    hasta que el token expira. En cada llamada sí se comprueba que el token
+    no haya sido revocado (en memoria; ver `app.auth.revocacion`) y que
+    pertenezca al tenant de la petición: un token de una biblioteca no sirve
+    en otra.
+    
+    Args:
+        token: Token JWT
         
-        if username is None:
-            raise credentials_exception
+    Returns:
+        dict: Claims del token
         
-        token_data = TokenData(username=username)
-    except (JWTError, ValidationError):
-        raise credentials_exception
+    Raises:
+        HTTPException: 401 si el token es inválido, venció, fue revocado o es de otro tenant
+    """
+    payload = _token_cache.get(token)
+    if payload is None:
+        payload = _decode(token)
+        _token_cache.set(token, payload, ttl=payload.get("exp", 0) - time.time())
+    if payload.get(settings.TENANTS_CLAIM) != tenant_actual.get():
+        raise _credentials_exception()
+    if await revocaciones.esta_revocado(payload):
+        raise _credentials_exception()
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Usuario:
+    """
+    Obtiene el usuario actual a partir del token JWT.
     
-    # Buscar el usuario en la base de datos
-    user = await Usuario.get_or_none(username=token_data.username)
+    Args:
+        token: Token JWT de autenticación
+        
+    Returns:
+        Usuario: Objeto de usuario autenticado
+        
+    Raises:
+        HTTPException: Si el token es inválido o el usuario no existe
+    """
+    username = (await verify_token(token))["sub"]
     
+    # Buscar el usuario en la caché o en la base de datos (la clave lleva el tenant)
+    clave = calificar(username)
+    user = _user_cache.get(clave)
     if user is None:
-        raise credentials_exception
+        generacion = _user_cache.generation
+        user = await Usuario.get_or_none(username=username)
+        
+        if user is None:
+            raise _credentials_exception()
+        
+        _user_cache.set(clave, user, generation=generacion)
     
     if not user.activo:
         raise HTTPException(
@@ -84,7 +163,74 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> Usuario:
             detail="Usuario inactivo"
         )
     
-    return user
+    # Copia para que las modificaciones del handler no alteren la caché
+    return copy.copy(user)
+
+async def get_identidad(token: str = Depends(oauth2_scheme)) -> Identidad:
+    """
+    Obtiene la identidad del usuario actual (id, username, rol) sólo a partir del token.
+    
+    Para las rutas que únicamente necesitan autorizar por rol. Si el token no
+    trae los claims `uid` y `rol` (tokens anteriores) se lee el usuario de la
+    base como en `get_current_user`.
+    
+    Args:
+        token: Token JWT de autenticación
+        
+    Returns:
+        Identidad: Usuario autenticado
+        
+    Raises:
+        HTTPException: Si el token es inválido o el usuario está inactivo
+    """
+    payload = await verify_token(token)
+    if "uid" not in payload or "rol" not in payload:
+        user = await get_current_user(token)
+        return Identidad(id=user.id, username=user.username, rol=user.rol, activo=user.activo)
+    
+    if not payload.get("activo", True):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuario inactivo"
+        )
+    return Identidad(id=payload["uid"], username=payload["sub"], rol=payload["rol"])
+
+async def revoke_token(token: str) -> None:
+    """
+    Revoca un token (por ejemplo, al cerrar sesión).
+    
+    Args:
+        token: Token JWT ya validado
+    """
+    payload = await verify_token(token)
+    if "jti" in payload:
+        await revocaciones.revocar_token(payload["jti"], payload["exp"])
+
+async def invalidate_user_cache(username: str) -> None:
+    """
+    Descarta el usuario de la caché de autenticación, en este y en los demás workers.
+    
+    Debe llamarse cada vez que se modifica o elimina un usuario, para que
+    los cambios (por ejemplo, una desactivación) se apliquen de inmediato.
+    
+    Args:
+        username: Nombre de usuario modificado
+    """
+    clave = calificar(username)
+    _user_cache.invalidate(clave)
+    await estado_compartido.publicar("usuarios", clave)
+
+# Usuarios modificados en otros workers
+estado_compartido.suscribir("usuarios", _user_cache.invalidate)
+
+def auth_cache_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Devuelve los contadores de las cachés de autenticación.
+    
+    Returns:
+        Dict[str, Dict[str, int]]: Estadísticas de las cachés de tokens y de usuarios
+    """
+    return {"tokens": _token_cache.stats(), "usuarios": _user_cache.stats()}
 
 def get_password_hash(password: str) -> str:
     """
@@ -111,4 +257,48 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         bool: True si la contraseña es correcta, False en caso contrario
     """
     from passlib.hash import bcrypt
-    return bcrypt.verify(plain_password, hashed_password)
\ No newline at end of file
+    return bcrypt.verify(plain_password, hashed_password)
+
+def _servicio_saturado() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="El servidor está procesando demasiadas autenticaciones, intente nuevamente",
+        headers={"Retry-After": "1"},
+    )
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    Obtiene el hash de una contraseña sin bloquear el event loop.
+    
+    Args:
+        password: Contraseña en texto plano
+        
+    Returns:
+        str: Hash de la contraseña
+        
+    Raises:
+        HTTPException: 503 si el pool de hashing está saturado
+    """
+    try:
+        return await security.hash_password_async(password)
+    except security.PasswordPoolSaturado:
+        raise _servicio_saturado()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifica una contraseña contra su hash sin bloquear el event loop.
+    
+    Args:
+        plain_password: Contraseña en texto plano
+        hashed_password: Hash de la contraseña
+        
+    Returns:
+        bool: True si la contraseña es correcta, False en caso contrario
+        
+    Raises:
+        HTTPException: 503 si el pool de hashing está saturado
+    """
+    try:
+        return await security.verify_password_async(plain_password, hashed_password)
+    except security.PasswordPoolSaturado:
+        raise _servicio_saturado()
@@ -0,0 +1,237 @@
+"""
+Revocación de tokens JWT antes de su expiración.
+
+Un token firmado es válido hasta que vence; para poder invalidarlo antes
+(logout, desactivación o cambio de rol de un usuario) las revocaciones se
+guardan en la tabla `revocaciones` y cada proceso mantiene en memoria:
+
+- un filtro de Bloom con los `jti` de los tokens revocados: si el `jti` de
+  un token no está en el filtro (el caso normal) no hace falta consultar la
+  base; si está, se confirma con una consulta, porque puede ser un falso
+  positivo;
+- el momento de revocación de cada usuario: se rechazan sus tokens emitidos
+  antes (`iat`).
+
+Las revocaciones hechas en otro worker llegan por el canal "revocaciones"
+del estado compartido. Las filas vencidas se eliminan periódicamente (en
+el líder) y cada worker reconstruye su copia en memoria cada
+`JWT_REVOCACION_RECARGAR` segundos, así el filtro no acumula los tokens
+vencidos.
+
+En modo multi-tenant las revocaciones de cada tenant se cargan al abrir su
+base, y los usuarios se guardan calificados con el tenant (los `jti` son
+únicos en todos).
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+from tortoise import timezone
+
+from app.core.bloom import FiltroBloom
+from app.core.cache import TTLCache
+from app.core.compartido import estado_compartido
+from app.core.config import settings
+from app.core.tenant import calificar
+from app.db.models.revocacion import Revocacion
+from app.db.tenants import gestor_tenants
+
+logger = logging.getLogger(__name__)
+
+Fila = Tuple[str, str, float]
+
+
+class ListaRevocacion:
+    """
+    Tokens y usuarios revocados, con una copia compacta en memoria.
+
+    Atributos:
+        consultas: Positivos del filtro de Bloom que se confirmaron contra la base
+        falsos_positivos: Consultas en las que el token no estaba revocado
+    """
+
+    def __init__(self, bits: int):
+        self._filtro = FiltroBloom(bits)
+        self._usuarios: Dict[str, float] = {}
+        # Resultado de las confirmaciones recientes, para no repetir la consulta en cada petición
+        self._confirmados = TTLCache(maxsize=4096, ttl=300)
+        # Revocaciones aplicadas mientras se reconstruye la copia (None: no se está reconstruyendo)
+        self._pendientes: Optional[List[Fila]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.consultas = 0
+        self.falsos_positivos = 0
+
+    def _aplicar(self, tipo: str, valor: str, desde: float):
+        if self._pendientes is not None:
+            self._pendientes.append((tipo, valor, desde))
+        if tipo == "token":
+            self._filtro.agregar(valor)
+            self._confirmados.invalidate(valor)
+        else:
+            self._usuarios[valor] = max(desde, self._usuarios.get(valor, 0))
+
+    async def cargar(self, limpiar: bool = True):
+        """
+        Carga en memoria las revocaciones vigentes de la base.
+
+        Args:
+            limpiar: Descartar antes lo cargado (False: agregar las de otro tenant)
+        """
+        if limpiar:
+            await self._reconstruir(self._vigentes)
+            return
+        for fila in await self._vigentes():
+            self._aplicar(*fila)
+
+    async def _vigentes(self) -> List[Fila]:
+        return [
+            (fila["tipo"], fila["valor"] if fila["tipo"] == "token" else calificar(fila["valor"]), fila["desde"])
+            for fila in await Revocacion.filter(expira__gt=timezone.now()).values("tipo", "valor", "desde")
+        ]
+
+    async def _reconstruir(self, leer: Callable[[], Awaitable[List[Fila]]]):
+        # Mientras se lee la base la copia anterior sigue en uso; las
+        # revocaciones que llegan en ese momento se vuelven a aplicar después
+        # de limpiarla
+        self._pendientes = []
+        try:
+            filas = await leer()
+        finally:
+            pendientes, self._pendientes = self._pendientes, None
+        self._filtro.limpiar()
+        self._usuarios.clear()
+        self._confirmados.clear()
+        for fila in filas + pendientes:
+            self._aplicar(*fila)
+
+    async def recargar(self):
+        """
+        Reconstruye la copia en memoria con las revocaciones vigentes, sin las vencidas.
+
+        En modo multi-tenant se leen las de los tenants abiertos en este
+        proceso; las de los demás se cargan cuando se vuelva a abrir su base.
+        """
+        if not settings.TENANTS_ENABLED:
+            await self._reconstruir(self._vigentes)
+            return
+
+        async def vigentes_por_tenant() -> List[Fila]:
+            filas: List[Fila] = []
+            for nombre in gestor_tenants.abiertos():
+                async with gestor_tenants.usar(nombre):
+                    filas.extend(await self._vigentes())
+            return filas
+
+        await self._reconstruir(vigentes_por_tenant)
+
+    async def revocar_token(self, jti: str, exp: float):
+        """
+        Revoca un token.
+
+        Args:
+            jti: Identificador del token
+            exp: Expiración del token (segundos desde la época)
+        """
+        desde = time.time()
+        await Revocacion.create(
+            tipo="token", valor=jti, desde=desde, expira=timezone.now() + timedelta(seconds=max(exp - desde, 0))
+        )
+        self._aplicar("token", jti, desde)
+        await estado_compartido.publicar("revocaciones", f"token:{desde}:{jti}")
+
+    async def revocar_usuario(self, username: str):
+        """
+        Revoca todos los tokens del usuario emitidos hasta ahora.
+
+        Args:
+            username: Nombre de usuario
+        """
+        desde = time.time()
+        await Revocacion.create(
+            tipo="usuario", valor=username, desde=desde,
+            expira=timezone.now() + timedelta(minutes=settings.JWT_EXPIRACION_MINUTOS),
+        )
+        self._aplicar("usuario", calificar(username), desde)
+        await estado_compartido.publicar("revocaciones", f"usuario:{desde}:{calificar(username)}")
+
+    def _recibir(self, clave: str):
+        tipo, desde, valor = clave.split(":", 2)
+        self._aplicar(tipo, valor, float(desde))
+
+    async def esta_revocado(self, claims: Mapping[str, Any]) -> bool:
+        """
+        Indica si un token (ya validado) fue revocado.
+
+        Args:
+            claims: Contenido del token
+
+        Returns:
+            bool: True si el token o los tokens de su usuario fueron revocados
+        """
+        desde = self._usuarios.get(calificar(claims.get("sub", "")))
+        if desde is not None and claims.get("iat", 0) <= desde:
+            return True
+        jti = claims.get("jti")
+        if not jti or jti not in self._filtro:
+            return False
+        revocado = self._confirmados.get(jti)
+        if revocado is None:
+            self.consultas += 1
+            revocado = await Revocacion.filter(tipo="token", valor=jti).exists()
+            if not revocado:
+                self.falsos_positivos += 1
+            self._confirmados.set(jti, revocado)
+        return revocado
+
+    async def purgar(self) -> int:
+        """
+        Elimina de la base las revocaciones cuyos tokens ya vencieron.
+
+        Returns:
+            int: Filas eliminadas
+        """
+        return await Revocacion.filter(expira__lte=timezone.now()).delete()
+
+    async def _loop(self, intervalo: float):
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                await self.recargar()
+            except Exception:
+                logger.exception("Error al reconstruir las revocaciones en memoria")
+
+    def iniciar(self, intervalo: float):
+        """
+        Empieza a reconstruir periódicamente la copia en memoria (en cada worker).
+
+        Args:
+            intervalo: Segundos entre reconstrucciones
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(intervalo), name="revocaciones")
+
+    async def cerrar(self):
+        """Detiene la reconstrucción periódica."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tokens": self._filtro.elementos,
+            "usuarios": len(self._usuarios),
+            "consultas": self.consultas,
+            "falsos_positivos": self.falsos_positivos,
+        }
+
+
+revocaciones = ListaRevocacion(settings.JWT_REVOCACION_BITS)
+
+# Revocaciones hechas en otros workers
+estado_compartido.suscribir("revocaciones", revocaciones._recibir)
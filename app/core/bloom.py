@@ -0,0 +1,45 @@
+import hashlib
+from typing import Iterable
+
+
+class FiltroBloom:
+    """
+    Conjunto aproximado de cadenas en un arreglo de bits de tamaño fijo.
+
+    `in` nunca da falsos negativos: si devuelve False el elemento seguro no
+    se agregó. Puede dar falsos positivos (con `bits` = 2^20 y `hashes` = 7,
+    alrededor de 1% con 100.000 elementos), por eso un positivo debe
+    confirmarse contra la fuente de verdad.
+
+    No es thread-safe: está pensado para usarse desde el event loop.
+
+    Atributos:
+        bits: Tamaño del arreglo de bits
+        hashes: Posiciones que se marcan por elemento
+        elementos: Cantidad de elementos agregados
+    """
+
+    def __init__(self, bits: int = 1 << 20, hashes: int = 7):
+        self.bits = bits
+        self.hashes = hashes
+        self.elementos = 0
+        self._arreglo = bytearray((bits + 7) // 8)
+
+    def _posiciones(self, valor: str) -> Iterable[int]:
+        # Doble hashing: h1 + i * h2 a partir de un único digest
+        digest = hashlib.blake2b(valor.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def agregar(self, valor: str) -> None:
+        for posicion in self._posiciones(valor):
+            self._arreglo[posicion >> 3] |= 1 << (posicion & 7)
+        self.elementos += 1
+
+    def __contains__(self, valor: str) -> bool:
+        return all(self._arreglo[p >> 3] & (1 << (p & 7)) for p in self._posiciones(valor))
+
+    def limpiar(self) -> None:
+        self._arreglo = bytearray(len(self._arreglo))
+        self.elementos = 0
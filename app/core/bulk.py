@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, IO, Iterator, List, Tuple
+
+from tortoise.queryset import QuerySet
+
+# Columnas que se exportan, en orden
+CAMPOS_EXPORTACION = ("id", "titulo", "autor", "isbn", "categoria", "estado", "fecha_creacion")
+
+FORMATOS = ("ndjson", "csv")
+
+
+def detectar_formato(nombre_archivo: str = None, formato: str = None) -> str:
+    """
+    Determina el formato de un archivo de importación.
+
+    Args:
+        nombre_archivo: Nombre del archivo subido
+        formato: Formato indicado explícitamente (tiene prioridad)
+
+    Returns:
+        str: "csv" o "ndjson"
+
+    Raises:
+        ValueError: Si el formato indicado no es soportado
+    """
+    if formato:
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato no soportado: {formato}")
+        return formato
+    if nombre_archivo and nombre_archivo.lower().endswith(".csv"):
+        return "csv"
+    return "ndjson"
+
+
+def leer_registros(archivo: IO[bytes], formato: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Recorre un archivo de importación fila por fila sin cargarlo entero en memoria.
+
+    Args:
+        archivo: Archivo binario (por ejemplo, `UploadFile.file`)
+        formato: "csv" o "ndjson"
+
+    Yields:
+        Tuple[int, Any]: Número de fila (desde 1) y el registro leído como dict,
+        o una instancia de `ValueError` si la fila no se pudo interpretar
+    """
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    try:
+        if formato == "csv":
+            lector = csv.DictReader(texto)
+            for registro in lector:
+                # La fila 1 es el encabezado
+                yield lector.line_num, registro
+        else:
+            for numero, linea in enumerate(texto, start=1):
+                if not linea.strip():
+                    continue
+                try:
+                    registro = json.loads(linea)
+                except json.JSONDecodeError as e:
+                    yield numero, ValueError(f"JSON inválido: {e.msg}")
+                    continue
+                if not isinstance(registro, dict):
+                    yield numero, ValueError("Cada línea debe ser un objeto JSON")
+                    continue
+                yield numero, registro
+    finally:
+        # No cerrar el archivo subyacente: lo gestiona quien lo abrió
+        texto.detach()
+
+
+def _fila_csv(valores: List[Any]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(valores)
+    return buffer.getvalue()
+
+
+async def exportar_filas(query: QuerySet, formato: str, tamano_lote: int = 1000) -> AsyncIterator[str]:
+    """
+    Genera el contenido de una exportación a medida que se leen los libros.
+
+    Los libros se leen por lotes ordenados por `id` (paginación por cursor),
+    así nunca se mantiene en memoria más de un lote.
+
+    Args:
+        query: Consulta base de libros
+        formato: "csv" o "ndjson"
+        tamano_lote: Cantidad de filas por consulta
+
+    Yields:
+        str: Fragmentos del archivo exportado
+    """
+    if formato == "csv":
+        yield _fila_csv(CAMPOS_EXPORTACION)
+
+    ultimo_id = 0
+    while True:
+        filas: List[Dict[str, Any]] = await (
+            query.filter(id__gt=ultimo_id).order_by("id").limit(tamano_lote).values(*CAMPOS_EXPORTACION)
+        )
+        if not filas:
+            break
+        partes = []
+        for fila in filas:
+            fila["fecha_creacion"] = fila["fecha_creacion"].isoformat()
+            if formato == "csv":
+                partes.append(_fila_csv([fila[campo] for campo in CAMPOS_EXPORTACION]))
+            else:
+                partes.append(json.dumps(fila, ensure_ascii=False) + "\n")
+        yield "".join(partes)
+        ultimo_id = filas[-1]["id"]
@@ -0,0 +1,102 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Caché en memoria con capacidad máxima (LRU) y vencimiento por tiempo.
+
+    No es thread-safe: está pensada para usarse desde el event loop.
+
+    Atributos:
+        maxsize: Cantidad máxima de entradas; al superarla se descarta la menos usada
+        ttl: Segundos de vida por defecto de cada entrada
+        hits: Lecturas que encontraron un valor vigente
+        misses: Lecturas sin valor o con valor vencido
+        evictions: Entradas descartadas por falta de espacio
+        generation: Se incrementa con cada invalidación (ver `set`)
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Obtiene un valor vigente y lo marca como usado recientemente.
+
+        Args:
+            key: Clave a buscar
+            default: Valor a devolver si no hay entrada vigente
+
+        Returns:
+            Any: El valor almacenado o `default`
+        """
+        entrada = self._data.get(key)
+        if entrada is None or entrada[1] <= time.monotonic():
+            if entrada is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entrada[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+            generation: Optional[int] = None) -> None:
+        """
+        Guarda un valor.
+
+        Para evitar guardar datos leídos antes de una invalidación, se puede
+        tomar `generation` antes de consultar la base de datos y pasarla aquí:
+        si hubo una invalidación en el medio, el valor se descarta.
+
+        Args:
+            key: Clave
+            value: Valor a guardar
+            ttl: Segundos de vida (por defecto `self.ttl`)
+            generation: Generación observada antes de obtener el valor
+        """
+        if generation is not None and generation != self.generation:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Elimina una entrada, si existe."""
+        self.generation += 1
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Elimina todas las entradas."""
+        self.generation += 1
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Devuelve los contadores de uso de la caché.
+
+        Returns:
+            Dict[str, int]: hits, misses, evictions y tamaño actual
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+        }
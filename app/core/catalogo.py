@@ -0,0 +1,379 @@
+"""
+Catálogo de libros en memoria, en columnas, para el listado de libros.
+
+Con `CATALOGO_EN_MEMORIA` activado, `GET /libros` responde los filtros por
+categoría y estado, el ordenamiento y la paginación (por página o por
+cursor) sin consultar la base. Los filtros por título o autor siguen yendo a
+SQLite.
+
+Cada proceso guarda los libros como columnas compactas: arreglos (`array`)
+para los IDs, las fechas y los códigos de autor, categoría y estado (cada
+valor distinto se guarda una sola vez), listas para títulos e ISBN, y para cada campo
+de `CAMPOS_ORDENABLES` una permutación de las posiciones ordenada por
+(valor, id), el mismo orden que usa la consulta SQL.
+
+Se mantiene al día con el registro de cambios (`app.db.cambios`): aplica
+sólo los libros modificados desde la última secuencia leída. Lo lee antes de
+responder cuando:
+
+- este proceso escribió libros (cada `response_cache.invalidar("libros")`);
+- otro worker escribió libros (lo avisa por el canal "catalogo" del estado
+  compartido);
+- pasaron `CATALOGO_REVISION` segundos desde la última lectura, por si la
+  base se modificó por fuera de la aplicación.
+
+Si el registro ya se compactó más allá de la secuencia leída, se vuelve a
+cargar completo.
+
+En modo multi-tenant hay un catálogo por tenant (`catalogos`), que se carga
+con la primera consulta y se descarta al cerrarse la base del tenant.
+"""
+import asyncio
+import bisect
+import logging
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.compartido import estado_compartido
+from app.core.config import settings
+from app.core.pagination import CAMPOS_ORDENABLES, CursorInvalido
+from app.core.response_cache import response_cache
+from app.core.tenant import PorTenant, calificar
+from app.core.serialization import iter_values
+from app.db.cambios import SecuenciaCompactada, estado_compactacion, leer_cambios
+from app.db.models.cambio import Cambio
+from app.db.models.libro import Libro
+from app.schemas.libro import CAMPOS_LIBRO
+
+logger = logging.getLogger(__name__)
+
+CANAL = "catalogo"
+
+# SQLite compara sin distinguir mayúsculas sólo en letras ASCII (UPPER y LIKE)
+_MAYUSCULAS_ASCII = str.maketrans("abcdefghijklmnopqrstuvwxyz", "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+_MICROSEGUNDO = timedelta(microseconds=1)
+
+
+def contiene(texto: str, fragmento: str) -> bool:
+    """Equivalente a `campo__icontains` en SQLite."""
+    return fragmento.translate(_MAYUSCULAS_ASCII) in texto.translate(_MAYUSCULAS_ASCII)
+
+
+class _Diccionario:
+    """Códigos de los valores distintos de una columna."""
+
+    def __init__(self):
+        self.valores: List[str] = []
+        self.codigos: Dict[str, int] = {}
+
+    def codigo(self, valor: str) -> int:
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = self.codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+
+class _Columnas:
+    """Libros en columnas, con una permutación ordenada por cada campo ordenable."""
+
+    def __init__(self):
+        self.ids = array("q")
+        self.titulos: List[str] = []
+        self.isbns: List[str] = []
+        self.autores = array("I")
+        self.categorias = array("I")
+        self.estados = array("I")
+        self.fechas = array("q")  # Microsegundos desde la época
+        self.dic_autores = _Diccionario()
+        self.dic_categorias = _Diccionario()
+        self.dic_estados = _Diccionario()
+        self.posiciones: Dict[int, int] = {}  # id -> posición en las columnas
+        self.libres: List[int] = []  # Posiciones de libros eliminados, para reutilizar
+        self.orden: Dict[str, array] = {campo: array("I") for campo in CAMPOS_ORDENABLES}
+        self.tz = timezone.utc
+        self.claves: Dict[str, Callable[[int], Tuple]] = {
+            "id": lambda p: (self.ids[p],),
+            "titulo": lambda p: (self.titulos[p], self.ids[p]),
+            "autor": lambda p: (self.dic_autores.valores[self.autores[p]], self.ids[p]),
+            "isbn": lambda p: (self.isbns[p], self.ids[p]),
+            "categoria": lambda p: (self.dic_categorias.valores[self.categorias[p]], self.ids[p]),
+            "estado": lambda p: (self.dic_estados.valores[self.estados[p]], self.ids[p]),
+            "fecha_creacion": lambda p: (self.fechas[p], self.ids[p]),
+        }
+        self.lectores: Dict[str, Callable[[int], Any]] = {
+            "id": lambda p: self.ids[p],
+            "titulo": lambda p: self.titulos[p],
+            "autor": lambda p: self.dic_autores.valores[self.autores[p]],
+            "isbn": lambda p: self.isbns[p],
+            "categoria": lambda p: self.dic_categorias.valores[self.categorias[p]],
+            "estado": lambda p: self.dic_estados.valores[self.estados[p]],
+            "fecha_creacion": lambda p: self._epoca() + self.fechas[p] * _MICROSEGUNDO,
+        }
+
+    def __len__(self) -> int:
+        return len(self.posiciones)
+
+    def _epoca(self) -> datetime:
+        return datetime(1970, 1, 1, tzinfo=self.tz)
+
+    def _micro(self, fecha: datetime) -> int:
+        if fecha.tzinfo is None and self.tz is not None:
+            fecha = fecha.replace(tzinfo=timezone.utc)
+        return (fecha - self._epoca()) // _MICROSEGUNDO
+
+    def _escribir(self, p: int, fila: Dict[str, Any]):
+        self.titulos[p] = fila["titulo"]
+        self.autores[p] = self.dic_autores.codigo(fila["autor"])
+        self.isbns[p] = fila["isbn"]
+        self.categorias[p] = self.dic_categorias.codigo(fila["categoria"])
+        self.estados[p] = self.dic_estados.codigo(fila["estado"])
+
+    def agregar(self, fila: Dict[str, Any]):
+        """Agrega un libro al final de las columnas, sin ordenarlo (ver `ordenar`)."""
+        if not self.posiciones:
+            self.tz = fila["fecha_creacion"].tzinfo
+        p = len(self.ids)
+        self.ids.append(fila["id"])
+        self.fechas.append(self._micro(fila["fecha_creacion"]))
+        self.titulos.append("")
+        self.autores.append(0)
+        self.isbns.append("")
+        self.categorias.append(0)
+        self.estados.append(0)
+        self._escribir(p, fila)
+        self.posiciones[fila["id"]] = p
+
+    def ordenar(self):
+        """Genera las permutaciones ordenadas de todos los libros."""
+        posiciones = sorted(self.posiciones.values())
+        for campo, clave in self.claves.items():
+            self.orden[campo] = array("I", sorted(posiciones, key=clave))
+
+    def _quitar_del_orden(self, campo: str, p: int):
+        orden, clave = self.orden[campo], self.claves[campo]
+        i = bisect.bisect_left(orden, clave(p), key=clave)
+        del orden[i]
+
+    def _insertar_en_orden(self, campo: str, p: int):
+        bisect.insort(self.orden[campo], p, key=self.claves[campo])
+
+    def guardar(self, fila: Dict[str, Any]):
+        """Agrega o reemplaza un libro manteniendo las permutaciones ordenadas."""
+        p = self.posiciones.get(fila["id"])
+        if p is None:
+            if self.libres:
+                p = self.libres.pop()
+                self.ids[p] = fila["id"]
+                self.fechas[p] = self._micro(fila["fecha_creacion"])
+                self._escribir(p, fila)
+                self.posiciones[fila["id"]] = p
+            else:
+                self.agregar(fila)
+                p = self.posiciones[fila["id"]]
+            for campo in self.orden:
+                self._insertar_en_orden(campo, p)
+            return
+
+        cambiados = [
+            campo for campo in ("titulo", "autor", "isbn", "categoria", "estado")
+            if self.lectores[campo](p) != fila[campo]
+        ]
+        for campo in cambiados:
+            self._quitar_del_orden(campo, p)
+        self._escribir(p, fila)
+        for campo in cambiados:
+            self._insertar_en_orden(campo, p)
+
+    def eliminar(self, libro_id: int):
+        """Quita un libro (si está) y deja su posición libre."""
+        p = self.posiciones.get(libro_id)
+        if p is None:
+            return
+        for campo in self.orden:
+            self._quitar_del_orden(campo, p)
+        del self.posiciones[libro_id]
+        self.titulos[p] = self.isbns[p] = ""
+        self.libres.append(p)
+
+    def fila(self, p: int) -> Dict[str, Any]:
+        return {campo: self.lectores[campo](p) for campo in CAMPOS_LIBRO}
+
+    def consultar(self, categoria: Optional[str], estado: Optional[str], ordenar_por: str, orden: str,
+                  offset: int, limite: int, despues: Optional[Tuple[Any, int]]) -> List[Dict[str, Any]]:
+        """Ver `CatalogoEnMemoria.consultar`."""
+        categorias = None
+        if categoria:
+            categorias = {
+                codigo for codigo, valor in enumerate(self.dic_categorias.valores) if contiene(valor, categoria)
+            }
+            if not categorias:
+                return []
+        codigo_estado = None
+        if estado:
+            codigo_estado = self.dic_estados.codigos.get(estado)
+            if codigo_estado is None:
+                return []
+
+        permutacion, clave = self.orden[ordenar_por], self.claves[ordenar_por]
+        if despues is not None:
+            valor, ultimo_id = despues
+            if ordenar_por == "fecha_creacion":
+                valor = self._micro(valor)
+            elif ordenar_por != "id" and not isinstance(valor, str):
+                raise CursorInvalido("Cursor inválido")
+            cota = (ultimo_id,) if ordenar_por == "id" else (valor, ultimo_id)
+        if orden == "desc":
+            fin = bisect.bisect_left(permutacion, cota, key=clave) if despues is not None else len(permutacion)
+            indices = range(fin - 1, -1, -1)
+        else:
+            inicio = bisect.bisect_right(permutacion, cota, key=clave) if despues is not None else 0
+            indices = range(inicio, len(permutacion))
+        if categorias is None and codigo_estado is None:
+            # Sin filtros, el offset es un salto en la permutación
+            indices, offset = indices[offset:offset + limite], 0
+
+        filas = []
+        for i in indices:
+            p = permutacion[i]
+            if codigo_estado is not None and self.estados[p] != codigo_estado:
+                continue
+            if categorias is not None and self.categorias[p] not in categorias:
+                continue
+            if offset:
+                offset -= 1
+                continue
+            filas.append(self.fila(p))
+            if len(filas) == limite:
+                break
+        return filas
+
+
+class CatalogoEnMemoria:
+    """
+    Copia en memoria del catálogo que responde el listado de libros (ver la
+    documentación del módulo).
+
+    Atributos:
+        revision: Segundos máximos entre lecturas del registro de cambios
+        consultas: Consultas respondidas
+        sincronizaciones: Lecturas del registro de cambios
+        recargas: Cargas completas del catálogo
+    """
+
+    def __init__(self, revision: float):
+        self.revision = revision
+        self._columnas = _Columnas()
+        self._cargado = False
+        self._sucio = False
+        self._ultima_revision = 0.0
+        self._seq = 0
+        self._generacion: Optional[int] = None
+        self._lock = asyncio.Lock()
+        self.consultas = 0
+        self.sincronizaciones = 0
+        self.recargas = 0
+
+    def _al_dia(self) -> bool:
+        return self._cargado and not self._sucio and time.monotonic() - self._ultima_revision < self.revision
+
+    def marcar_desactualizado(self, *_):
+        """Hace que la próxima consulta lea antes el registro de cambios."""
+        self._sucio = True
+
+    async def _escritura_local(self):
+        self.marcar_desactualizado()
+        await estado_compartido.publicar(CANAL, calificar("libros"))
+
+    async def _cargar(self):
+        # La secuencia se lee antes que los libros: los cambios que ocurran
+        # mientras tanto se vuelven a aplicar después, sin efecto
+        seq = await Cambio.filter(entidad="libro").order_by("-seq").first().values_list("seq", flat=True)
+        _, generacion = await estado_compactacion()
+        columnas = _Columnas()
+        async for lote in iter_values(Libro.all(), CAMPOS_LIBRO, tamano_lote=5000):
+            for fila in lote:
+                columnas.agregar(fila)
+        columnas.ordenar()
+        self._columnas, self._seq, self._generacion = columnas, seq or 0, generacion
+        self._cargado = True
+        self.recargas += 1
+        logger.info("Catálogo en memoria cargado: %d libros", len(columnas))
+
+    async def sincronizar(self):
+        """Carga el catálogo o aplica los cambios pendientes, si hace falta."""
+        if self._al_dia():
+            return
+        async with self._lock:
+            if self._al_dia():
+                return
+            # Antes de leer: una escritura que ocurra durante la lectura vuelve a marcarlo
+            self._sucio = False
+            self._ultima_revision = time.monotonic()
+            if not self._cargado:
+                await self._cargar()
+                return
+            self.sincronizaciones += 1
+            try:
+                mas = True
+                while mas:
+                    lote = await leer_cambios("libro", self._seq, 5000, self._generacion)
+                    for libro_id in lote["bajas"]:
+                        self._columnas.eliminar(libro_id)
+                    for fila in lote["cambios"]:
+                        self._columnas.guardar(fila)
+                    self._seq, self._generacion, mas = lote["hasta"], lote["generacion"], lote["mas"]
+            except SecuenciaCompactada:
+                await self._cargar()
+
+    def consultar(self, categoria: Optional[str], estado: Optional[str], ordenar_por: str, orden: str,
+                  offset: int, limite: int, despues: Optional[Tuple[Any, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Filtra, ordena y pagina los libros como la consulta SQL de `GET /libros`.
+
+        Llamar antes a `sincronizar`.
+
+        Args:
+            categoria: Filtrar por categoría (contiene, sin distinguir mayúsculas)
+            estado: Filtrar por estado (igualdad)
+            ordenar_por: Campo de `CAMPOS_ORDENABLES`
+            orden: "asc" o "desc" (los empates se ordenan por id)
+            offset: Libros a saltear
+            limite: Cantidad máxima de libros
+            despues: Valor de `ordenar_por` e id del último libro de la página
+                anterior (paginación por cursor)
+
+        Returns:
+            List[Dict[str, Any]]: Libros con los campos de `CAMPOS_LIBRO`
+
+        Raises:
+            CursorInvalido: Si el valor del cursor no corresponde al campo
+        """
+        self.consultas += 1
+        return self._columnas.consultar(categoria, estado, ordenar_por, orden, offset, limite, despues)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "libros": len(self._columnas),
+            "consultas": self.consultas,
+            "sincronizaciones": self.sincronizaciones,
+            "recargas": self.recargas,
+        }
+
+
+catalogos = PorTenant(lambda: CatalogoEnMemoria(settings.CATALOGO_REVISION))
+
+
+def _escritura_remota(clave: str):
+    # "libros", o "<tenant>/libros" en modo multi-tenant
+    catalogo = catalogos.existente(clave.rpartition("/")[0] or None)
+    if catalogo is not None:
+        catalogo.marcar_desactualizado()
+
+
+if settings.CATALOGO_EN_MEMORIA:
+    response_cache.al_invalidar("libros", lambda: catalogos.actual()._escritura_local())
+    estado_compartido.suscribir(CANAL, _escritura_remota)
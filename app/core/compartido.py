@@ -0,0 +1,335 @@
+"""
+Estado compartido entre los procesos (workers) de la aplicación.
+
+Con varios workers cada proceso tiene sus propias cachés en memoria y sus
+propios contadores. Este módulo guarda lo que tiene que ser común a todos en
+un archivo SQLite aparte (`COMPARTIDO_DB`, por defecto junto a la base
+principal), abierto por cada proceso con su propia conexión:
+
+- Contadores por ventana de tiempo (límites de intentos): cada incremento es
+  un único `INSERT ... ON CONFLICT DO UPDATE ... RETURNING`, atómico aunque
+  varios procesos escriban a la vez.
+- Un canal de invalidaciones: `publicar` agrega una fila a `invalidaciones` y
+  cada proceso consulta periódicamente las filas nuevas de los demás y llama a
+  las funciones registradas con `suscribir` para ese canal.
+- La elección del proceso líder (`Lider`), el único que ejecuta las tareas en
+  segundo plano, mediante un lock de archivo.
+
+El archivo es independiente de la base principal para que estas escrituras,
+muy frecuentes y pequeñas, no compitan con el único escritor de SQLite.
+"""
+import asyncio
+import inspect
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from tortoise.backends.base.config_generator import expand_db_url
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Suscriptor = Callable[[str], Union[None, Awaitable[None]]]
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS contadores (
+    clave TEXT PRIMARY KEY,
+    ventana INTEGER NOT NULL,
+    conteo INTEGER NOT NULL,
+    expira REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS invalidaciones (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    canal TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    origen INTEGER NOT NULL,
+    fecha REAL NOT NULL
+);
+"""
+
+
+def ruta_compartida(db_url: str = None) -> str:
+    """
+    Devuelve el archivo del estado compartido.
+
+    Si `COMPARTIDO_DB` no está configurado se usa el archivo de la base
+    principal con el sufijo `-compartido`. Con una base en memoria el estado
+    también queda en memoria (un solo proceso).
+
+    Args:
+        db_url: URL de la base principal (por defecto `DB_URL`)
+
+    Returns:
+        str: Ruta del archivo, o ":memory:"
+    """
+    if settings.COMPARTIDO_DB:
+        return settings.COMPARTIDO_DB
+    credenciales = expand_db_url(db_url or settings.DB_URL)["credentials"]
+    ruta = credenciales.get("file_path") or ":memory:"
+    return ruta if ruta == ":memory:" else f"{ruta}-compartido"
+
+
+class EstadoCompartido:
+    """
+    Contadores y canal de invalidaciones sobre un archivo SQLite compartido.
+
+    La conexión se abre con la primera operación. `iniciar` arranca la tarea
+    que recibe las invalidaciones de los demás procesos.
+
+    Atributos:
+        ruta: Archivo SQLite (por defecto `ruta_compartida()`)
+        intervalo: Segundos entre consultas de invalidaciones nuevas
+        publicadas: Invalidaciones enviadas por este proceso
+        recibidas: Invalidaciones de otros procesos aplicadas en este
+    """
+
+    def __init__(self, ruta: Optional[str], intervalo: float):
+        self._ruta = ruta
+        self.intervalo = intervalo
+        self.origen = os.getpid()
+        self.publicadas = 0
+        self.recibidas = 0
+        self._db = None
+        self._abriendo = asyncio.Lock()
+        self._ultimo_seq = 0
+        self._suscriptores: Dict[str, List[Suscriptor]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ruta(self) -> str:
+        # Se resuelve al usarse, cuando la configuración ya es la definitiva
+        if self._ruta is None:
+            self._ruta = ruta_compartida()
+        return self._ruta
+
+    async def _conexion(self):
+        if self._db is None:
+            async with self._abriendo:
+                if self._db is None:
+                    await self._abrir()
+        return self._db
+
+    async def _abrir(self):
+        import aiosqlite
+
+        if self.ruta != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.ruta)), exist_ok=True)
+        # Cada worker es un proceso distinto: el pid identifica quién publica
+        self.origen = os.getpid()
+        db = aiosqlite.connect(self.ruta, isolation_level=None)
+        # El hilo de la conexión no impide que termine un proceso que no llamó a `cerrar`
+        db.daemon = True
+        db = await db
+        await db.execute(f"PRAGMA busy_timeout = {settings.DB_BUSY_TIMEOUT}")
+        await db.execute("PRAGMA journal_mode = WAL")
+        await db.execute("PRAGMA synchronous = NORMAL")
+        await db.executescript(_ESQUEMA)
+        # Sólo interesan las invalidaciones posteriores al arranque del proceso
+        async with db.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidaciones") as cursor:
+            self._ultimo_seq = (await cursor.fetchone())[0]
+        self._db = db
+
+    async def contar(self, clave: str, ventana: float) -> Tuple[int, float]:
+        """
+        Incrementa el contador de `clave` en la ventana de tiempo actual.
+
+        Las ventanas son fijas (`ventana` segundos desde la época): al empezar
+        una nueva el contador vuelve a 1.
+
+        Args:
+            clave: Identificador del contador
+            ventana: Duración de la ventana en segundos
+
+        Returns:
+            Tuple[int, float]: Conteo en la ventana actual y segundos hasta que termine
+        """
+        db = await self._conexion()
+        ahora = time.time()
+        actual = int(ahora // ventana)
+        fin = (actual + 1) * ventana
+        async with db.execute(
+            "INSERT INTO contadores (clave, ventana, conteo, expira) VALUES (?, ?, 1, ?) "
+            "ON CONFLICT(clave) DO UPDATE SET "
+            "conteo = CASE WHEN ventana = excluded.ventana THEN conteo + 1 ELSE 1 END, "
+            "ventana = excluded.ventana, expira = excluded.expira "
+            "RETURNING conteo",
+            (clave, actual, fin),
+        ) as cursor:
+            conteo = (await cursor.fetchone())[0]
+        return conteo, fin - ahora
+
+    async def restablecer(self, clave: str):
+        """
+        Pone en cero el contador de `clave`.
+
+        Args:
+            clave: Identificador del contador
+        """
+        db = await self._conexion()
+        await db.execute("DELETE FROM contadores WHERE clave = ?", (clave,))
+
+    def suscribir(self, canal: str, funcion: Suscriptor):
+        """
+        Registra una función que se llama con la clave de cada invalidación
+        publicada por otro proceso en `canal`.
+
+        Args:
+            canal: Nombre del canal (por ejemplo "usuarios")
+            funcion: Función (o corrutina) que recibe la clave invalidada
+        """
+        self._suscriptores.setdefault(canal, []).append(funcion)
+
+    async def publicar(self, canal: str, clave: str):
+        """
+        Avisa a los demás procesos que `clave` cambió.
+
+        El proceso que publica no recibe su propia invalidación: debe aplicarla
+        localmente antes de publicar.
+
+        Args:
+            canal: Nombre del canal
+            clave: Clave invalidada
+        """
+        db = await self._conexion()
+        await db.execute(
+            "INSERT INTO invalidaciones (canal, clave, origen, fecha) VALUES (?, ?, ?, ?)",
+            (canal, clave, self.origen, time.time()),
+        )
+        self.publicadas += 1
+
+    async def recibir(self) -> int:
+        """
+        Aplica las invalidaciones publicadas por otros procesos desde la última consulta.
+
+        Returns:
+            int: Cantidad de invalidaciones aplicadas
+        """
+        db = await self._conexion()
+        async with db.execute(
+            "SELECT seq, canal, clave FROM invalidaciones WHERE seq > ? AND origen != ? ORDER BY seq",
+            (self._ultimo_seq, self.origen),
+        ) as cursor:
+            filas = await cursor.fetchall()
+        for seq, canal, clave in filas:
+            for funcion in self._suscriptores.get(canal, ()):
+                try:
+                    resultado = funcion(clave)
+                    if inspect.isawaitable(resultado):
+                        await resultado
+                except Exception:
+                    logger.exception("Error al aplicar la invalidación %s:%s", canal, clave)
+            self._ultimo_seq = seq
+        self.recibidas += len(filas)
+        return len(filas)
+
+    async def purgar(self, antiguedad: float = 3600) -> int:
+        """
+        Elimina invalidaciones y contadores viejos.
+
+        Args:
+            antiguedad: Segundos que se conservan las invalidaciones
+
+        Returns:
+            int: Filas eliminadas
+        """
+        db = await self._conexion()
+        ahora = time.time()
+        cursor = await db.execute("DELETE FROM invalidaciones WHERE fecha < ?", (ahora - antiguedad,))
+        eliminadas = cursor.rowcount
+        # Un contador de una ventana ya terminada no vuelve a leerse
+        cursor = await db.execute("DELETE FROM contadores WHERE expira < ?", (ahora,))
+        return eliminadas + cursor.rowcount
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.recibir()
+            except Exception:
+                logger.exception("Error al consultar las invalidaciones compartidas")
+            await asyncio.sleep(self.intervalo)
+
+    async def iniciar(self):
+        """Abre la conexión y empieza a recibir invalidaciones."""
+        await self._conexion()
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="invalidaciones")
+
+    async def cerrar(self):
+        """Detiene la recepción de invalidaciones y cierra la conexión."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, int]:
+        return {"publicadas": self.publicadas, "recibidas": self.recibidas}
+
+
+class Lider:
+    """
+    Elige un único proceso líder entre los workers con un lock de archivo.
+
+    El primer proceso que toma el lock (`fcntl.flock`, no bloqueante) es el
+    líder hasta que termina; el sistema operativo libera el lock aunque el
+    proceso muera. El archivo del lock está junto al del estado compartido.
+    Donde no existe `fcntl` (Windows), o con una base en memoria, todos los
+    procesos se consideran líderes.
+    """
+
+    def __init__(self, estado: EstadoCompartido):
+        self.estado = estado
+        self.es_lider = False
+        self._archivo = None
+
+    def intentar(self) -> bool:
+        """
+        Intenta tomar el lock sin esperar.
+
+        Returns:
+            bool: True si este proceso es (o ya era) el líder
+        """
+        if self.es_lider:
+            return True
+        try:
+            import fcntl
+        except ImportError:
+            fcntl = None
+        if fcntl is None or self.estado.ruta == ":memory:":
+            self.es_lider = True
+            return True
+        archivo = open(f"{self.estado.ruta}.lider", "a")
+        try:
+            fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            archivo.close()
+            return False
+        self._archivo = archivo
+        self.es_lider = True
+        return True
+
+    async def esperar(self, al_asumir: Callable[[], None], intervalo: float):
+        """
+        Reintenta tomar el lock cada `intervalo` segundos y llama a `al_asumir`
+        cuando lo consigue (por ejemplo, si el líder anterior terminó).
+        """
+        while not self.intentar():
+            await asyncio.sleep(intervalo)
+        al_asumir()
+
+    def liberar(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+        self.es_lider = False
+
+
+estado_compartido = EstadoCompartido(None, settings.COMPARTIDO_INTERVALO)
+lider = Lider(estado_compartido)
@@ -0,0 +1,152 @@
+"""
+Compresión de respuestas según `Accept-Encoding`.
+
+Las respuestas de tipos compresibles (JSON, NDJSON, CSV, MessagePack) se
+comprimen con brotli si el cliente lo acepta y el paquete `brotli` está
+instalado, o con gzip. Las respuestas completas sólo se comprimen a partir
+de `COMPRESION_MIN_BYTES`; las respuestas por streaming (listados y
+exportaciones) se comprimen siempre, fragmento por fragmento, sin esperar
+al final del cuerpo.
+
+Al comprimir, el ETag pasa a ser débil: el cuerpo enviado ya no es el que
+se usó para calcularlo, pero `If-None-Match` lo sigue reconociendo.
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.core.config import settings
+from app.core.profiling import medir
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+TIPOS_COMPRESIBLES = (
+    "application/json", "application/x-ndjson", "application/msgpack", "text/csv", "text/plain",
+)
+
+
+def elegir_codificacion(accept_encoding: str) -> Optional[str]:
+    """
+    Elige la codificación a usar según el encabezado `Accept-Encoding`.
+
+    Args:
+        accept_encoding: Valor del encabezado
+
+    Returns:
+        Optional[str]: "br", "gzip" o None si el cliente no acepta ninguna
+    """
+    aceptadas = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                calidad = float(parametros.strip()[2:])
+            except ValueError:
+                calidad = 0.0
+        aceptadas[nombre.strip().lower()] = calidad
+    comodin = aceptadas.get("*", 0)
+    if brotli is not None and aceptadas.get("br", comodin) > 0:
+        return "br"
+    if aceptadas.get("gzip", comodin) > 0:
+        return "gzip"
+    return None
+
+
+class _Compresor:
+    """Compresor incremental con la misma interfaz para gzip y brotli."""
+
+    def __init__(self, codificacion: str, nivel_gzip: int, nivel_brotli: int):
+        if codificacion == "br":
+            self._br = brotli.Compressor(quality=nivel_brotli)
+            self._zlib = None
+        else:
+            self._br = None
+            self._zlib = zlib.compressobj(nivel_gzip, zlib.DEFLATED, 31)  # 31: formato gzip
+
+    def fragmento(self, datos: bytes) -> bytes:
+        # Vaciar el compresor en cada fragmento para que el cliente reciba datos de inmediato
+        with medir("compresion"):
+            if self._br is not None:
+                return self._br.process(datos) + self._br.flush()
+            return self._zlib.compress(datos) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def fin(self, datos: bytes = b"") -> bytes:
+        with medir("compresion"):
+            if self._br is not None:
+                return self._br.process(datos) + self._br.finish()
+            return self._zlib.compress(datos) + self._zlib.flush()
+
+
+class CompresionMiddleware:
+    """Middleware ASGI que comprime las respuestas (ver la documentación del módulo)."""
+
+    def __init__(self, app, minimo: int = None, nivel_gzip: int = None, nivel_brotli: int = None):
+        self.app = app
+        self.minimo = settings.COMPRESION_MIN_BYTES if minimo is None else minimo
+        self.nivel_gzip = nivel_gzip or settings.COMPRESION_NIVEL_GZIP
+        self.nivel_brotli = nivel_brotli or settings.COMPRESION_NIVEL_BROTLI
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        compresor: Optional[_Compresor] = None
+        directo = False
+
+        async def enviar(mensaje):
+            nonlocal inicio, compresor, directo
+            if mensaje["type"] == "http.response.start":
+                inicio = mensaje
+                return
+            if mensaje["type"] != "http.response.body" or directo:
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get("body", b"")
+            mas = mensaje.get("more_body", False)
+            if compresor is None:
+                encabezados = MutableHeaders(scope=inicio)
+                tipo = encabezados.get("content-type", "").split(";")[0].strip()
+                if (tipo not in TIPOS_COMPRESIBLES or "content-encoding" in encabezados
+                        or inicio["status"] in (204, 304)):
+                    directo = True
+                    await send(inicio)
+                    await send(mensaje)
+                    return
+                encabezados.add_vary_header("Accept-Encoding")
+                if not mas and len(cuerpo) < self.minimo:
+                    directo = True
+                    await send(inicio)
+                    await send(mensaje)
+                    return
+
+                compresor = _Compresor(codificacion, self.nivel_gzip, self.nivel_brotli)
+                encabezados["Content-Encoding"] = codificacion
+                etag = encabezados.get("etag")
+                if etag and not etag.startswith("W/"):
+                    encabezados["ETag"] = "W/" + etag
+                if mas:
+                    del encabezados["Content-Length"]
+                else:
+                    cuerpo = compresor.fin(cuerpo)
+                    encabezados["Content-Length"] = str(len(cuerpo))
+                    await send(inicio)
+                    await send({"type": "http.response.body", "body": cuerpo})
+                    return
+                await send(inicio)
+
+            datos = compresor.fragmento(cuerpo) if mas else compresor.fin(cuerpo)
+            await send({"type": "http.response.body", "body": datos, "more_body": mas})
+
+        await self.app(scope, receive, enviar)
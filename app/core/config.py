@@ -1,3 +1,5 @@
+from typing import Dict, Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,8 +9,116 @@ class Settings(BaseSettings):
     
     # Configuración de la base de datos
     DB_URL: str = "sqlite://./biblioteca.db"
+    DB_JOURNAL_MODE: str = "WAL"
+    DB_SYNCHRONOUS: str = "NORMAL"  # Con WAL, NORMAL no arriesga la integridad de la base
+    DB_CACHE_SIZE: int = -64000  # Negativo: tamaño en KiB (64 MB)
+    DB_MMAP_SIZE: int = 268435456  # 256 MB
+    DB_BUSY_TIMEOUT: int = 5000  # Milisegundos de espera si la base está bloqueada
+    DB_READ_CONNECTION: bool = True  # Conexión separada para lecturas
+    DB_MIGRAR_AL_INICIAR: bool = True  # Aplicar las migraciones pendientes al arrancar
+
+    # Multi-tenant: una base SQLite por biblioteca escolar (ver app.db.tenants)
+    TENANTS_ENABLED: bool = False
+    TENANTS_DIR: str = "tenants"  # Directorio con un archivo <tenant>.db por biblioteca
+    TENANTS_HEADER: str = "X-Tenant"  # Encabezado que indica el tenant
+    TENANTS_DOMINIO: Optional[str] = None  # p. ej. "biblioteca.example.com": el subdominio es el tenant
+    TENANTS_CLAIM: str = "tenant"  # Claim del token JWT con el tenant
+    TENANTS_CREAR: bool = False  # Crear la base de un tenant desconocido (False: 404)
+    TENANTS_MAX_ABIERTOS: int = 64  # Bases abiertas a la vez en cada worker (se cierran las menos usadas)
+    TENANTS_INACTIVIDAD: float = 300  # Segundos sin uso tras los que se cierra la base de un tenant
+
+    # Documento OpenAPI guardado entre reinicios (None: se genera en cada proceso)
+    OPENAPI_CACHE: Optional[str] = ".cache/openapi.json"
+    
+    # Tokens JWT. Para rotar la clave: agregar una nueva a JWT_CLAVES y elegirla en
+    # JWT_CLAVE_ACTUAL; quitar la anterior cuando vencieron los tokens firmados con ella
+    JWT_ALGORITHM: str = "HS256"
+    JWT_CLAVES: Dict[str, str] = {"principal": "un_secreto_muy_seguro_que_deberia_estar_en_variables_de_entorno"}
+    JWT_CLAVE_ACTUAL: str = "principal"  # Clave con la que se firman los tokens nuevos
+    JWT_EXPIRACION_MINUTOS: int = 30
+    JWT_REVOCACION_BITS: int = 1 << 20  # Tamaño del filtro de Bloom de tokens revocados
+    JWT_REVOCACION_RECARGAR: int = 600  # Segundos entre reconstrucciones del filtro en cada worker
+    
+    # Hashing de contraseñas (bcrypt) fuera del event loop
+    PASSWORD_WORKERS: int = 4  # Hilos dedicados a bcrypt
+    PASSWORD_QUEUE_SIZE: int = 32  # Operaciones que pueden esperar un hilo libre
+    
+    # Caché de usuarios autenticados
+    AUTH_CACHE_SIZE: int = 1024  # Entradas máximas por caché
+    AUTH_CACHE_TTL: int = 60  # Segundos
+    
+    # Caché de respuestas de libros (ETag / 304)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_BACKEND: str = "memory"  # "memory" o "redis" (compartida entre procesos)
+    RESPONSE_CACHE_URL: Optional[str] = None  # URL de Redis, p. ej. redis://localhost:6379/0
+    RESPONSE_CACHE_SIZE: int = 2048  # Entradas máximas (backend en memoria)
+    RESPONSE_CACHE_TTL: int = 30  # Segundos
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 262144  # Las respuestas más grandes no se guardan
+
+    # Catálogo en memoria para GET /libros (False: cada listado consulta SQLite)
+    CATALOGO_EN_MEMORIA: bool = False
+    CATALOGO_REVISION: float = 5  # Segundos máximos sin leer el registro de cambios
+
+    # Sugerencias de títulos y autores (GET /libros/sugerencias)
+    SUGERENCIAS_REVISION: float = 5  # Segundos máximos sin leer el registro de cambios
+    SUGERENCIAS_RECONSTRUIR: float = 3600  # Segundos entre armados del índice (actualiza la popularidad)
+    SUGERENCIAS_MAX_PENDIENTES: int = 5000  # Cambios aplicados que provocan un nuevo armado
+
+    # Compresión de respuestas (gzip, o brotli si está instalado el paquete `brotli`)
+    COMPRESION_ENABLED: bool = True
+    COMPRESION_MIN_BYTES: int = 1024  # Las respuestas más chicas se envían sin comprimir
+    COMPRESION_NIVEL_GZIP: int = 6
+    COMPRESION_NIVEL_BROTLI: int = 4
+
+    # Estado compartido entre workers (contadores e invalidaciones de cachés)
+    COMPARTIDO_DB: Optional[str] = None  # None: archivo de DB_URL con el sufijo "-compartido"
+    COMPARTIDO_INTERVALO: float = 0.5  # Segundos entre consultas de invalidaciones de otros workers
+    COMPARTIDO_LIDER_INTERVALO: float = 30  # Segundos entre intentos de asumir las tareas en segundo plano
+
+    # Límite de intentos en /auth/login y /auth/register
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_VENTANA: float = 60  # Segundos
+    RATE_LIMIT_IP: int = 20  # Intentos por IP en cada ventana
+    RATE_LIMIT_USUARIO: int = 5  # Intentos por usuario en cada ventana (un login correcto los reinicia)
+
+    # Perfilado por petición (Server-Timing, /metrics, N+1, perfiles de peticiones lentas)
+    PROFILING_ENABLED: bool = False
+    PROFILING_N1_UMBRAL: int = 10  # Repeticiones de una misma consulta para considerarla N+1
+    PROFILING_LENTO_MS: float = 0  # Guardar el perfil de las peticiones más lentas (0: desactivado)
+    PROFILING_MUESTREO_MS: float = 5  # Intervalo del muestreador de pila
+    PROFILING_DIR: str = "perfiles"  # Directorio de los perfiles guardados
+
+    # Préstamos vencidos y notificaciones
+    NOTIFICACIONES_INTERVALO: float = 60  # Segundos entre ejecuciones
+    NOTIFICACIONES_MAX_POR_TICK: int = 500  # Elementos procesados como máximo por ejecución
+    NOTIFICACIONES_LOTE: int = 100  # Elementos por transacción
+    NOTIFICACIONES_MAX_INTENTOS: int = 5
+    NOTIFICACIONES_BACKOFF: float = 30  # Segundos de espera tras el primer fallo (se duplica en cada intento)
+    NOTIFICACIONES_SENDER: str = "app.core.notificaciones.LogSender"
+    NOTIFICACIONES_ARCHIVO: Optional[str] = None  # Archivo para LogSender (None: al log)
+
+    # Reportes: recálculo periódico de las tablas de resumen
+    REPORTES_RECONCILIAR_INTERVALO: float = 3600  # Segundos
+
+    # Cola de trabajos en segundo plano (los ejecuta el worker líder)
+    TRABAJOS_INTERVALO: float = 1  # Segundos entre búsquedas de trabajos pendientes
+    TRABAJOS_CONCURRENCIA: int = 4  # Trabajos en ejecución a la vez, de todos los tipos
+    TRABAJOS_LOTE: int = 500  # Elementos por transacción en los trabajos por lotes
+    TRABAJOS_RETENCION_DIAS: int = 7  # Días que se conservan los trabajos terminados
+
+    # Registro de cambios para la sincronización incremental (/cambios)
+    CAMBIOS_COMPACTAR_INTERVALO: float = 3600  # Segundos entre compactaciones
+    CAMBIOS_RETENCION_BAJAS_DIAS: int = 30  # Días que se conservan las bajas (tombstones)
+    CAMBIOS_LIMITE: int = 1000  # Entradas del registro por respuesta (por defecto)
+
+    # Libros recomendados por préstamos compartidos (GET /libros/{id}/recomendados)
+    RECOMENDACIONES_INTERVALO: float = 600  # Segundos entre actualizaciones incrementales
+    RECOMENDACIONES_RECALCULAR: float = 86400  # Segundos entre recálculos de todos los libros
+    RECOMENDACIONES_K: int = 20  # Recomendaciones guardadas por libro
+    RECOMENDACIONES_MIN_COPRESTAMOS: int = 2  # Usuarios que retiraron ambos libros, como mínimo
+    RECOMENDACIONES_LOTE: int = 500  # Libros cuyas recomendaciones se reemplazan por transacción
     
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
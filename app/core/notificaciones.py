@@ -0,0 +1,193 @@
+"""
+Detección de préstamos vencidos y envío de notificaciones.
+
+- `marcar_vencidos` pasa a "vencido" los préstamos activos cuya fecha límite
+  ya pasó, con UPDATE por lotes, y registra una notificación por cada uno en
+  la tabla `notificaciones` (outbox) dentro de la misma transacción.
+- `despachar_notificaciones` envía las notificaciones pendientes por lotes
+  usando un `NotificationSender` y reintenta las fallidas con espera
+  exponencial.
+
+Ambas se ejecutan como tareas periódicas (ver `registrar_tareas`).
+"""
+import functools
+import importlib
+import json
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from tortoise import timezone
+from tortoise.transactions import in_transaction
+
+from app.core.config import settings
+from app.core.scheduler import PeriodicTask, Scheduler
+from app.db.models.notificacion import Notificacion
+from app.db.models.prestamo import Prestamo
+from app.db.tenants import por_tenant
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationSender:
+    """Interfaz de los medios de envío de notificaciones (email, SMS, etc.)."""
+
+    async def enviar(self, notificacion: Notificacion) -> None:
+        """
+        Envía una notificación.
+
+        Raises:
+            Exception: Cualquier error se considera un envío fallido y se reintenta
+        """
+        raise NotImplementedError
+
+
+class LogSender(NotificationSender):
+    """
+    Envía las notificaciones a un archivo (una línea JSON por notificación)
+    o, si no se indica archivo, al log de la aplicación. Útil en desarrollo y pruebas.
+    """
+
+    def __init__(self, archivo: Optional[str] = None):
+        self.archivo = archivo
+
+    async def enviar(self, notificacion: Notificacion) -> None:
+        datos = {
+            "id": notificacion.id,
+            "usuario_id": notificacion.usuario_id,
+            "tipo": notificacion.tipo,
+            "mensaje": notificacion.mensaje,
+        }
+        if self.archivo:
+            with open(self.archivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(datos, ensure_ascii=False) + "\n")
+        else:
+            logger.info("Notificación: %s", datos)
+
+
+def crear_sender() -> NotificationSender:
+    """
+    Instancia el medio de envío configurado en `NOTIFICACIONES_SENDER`.
+
+    Returns:
+        NotificationSender: Medio de envío
+    """
+    modulo, _, nombre = settings.NOTIFICACIONES_SENDER.rpartition(".")
+    clase = getattr(importlib.import_module(modulo), nombre)
+    if clase is LogSender:
+        return LogSender(settings.NOTIFICACIONES_ARCHIVO)
+    return clase()
+
+
+async def marcar_vencidos(max_por_tick: int = None, lote: int = None) -> int:
+    """
+    Marca como vencidos los préstamos activos cuya fecha límite pasó.
+
+    Args:
+        max_por_tick: Máximo de préstamos a procesar en esta ejecución
+        lote: Préstamos por transacción
+
+    Returns:
+        int: Cantidad de préstamos marcados
+    """
+    max_por_tick = max_por_tick or settings.NOTIFICACIONES_MAX_POR_TICK
+    lote = lote or settings.NOTIFICACIONES_LOTE
+    marcados = 0
+    while marcados < max_por_tick:
+        ahora = timezone.now()
+        async with in_transaction("default") as conn:
+            vencidos = await Prestamo.filter(estado="activo", fecha_devolucion__lt=ahora).order_by(
+                "fecha_devolucion"
+            ).limit(min(lote, max_por_tick - marcados)).using_db(conn).values(
+                "id", "usuario_id", "fecha_devolucion", "libro__titulo"
+            )
+            if not vencidos:
+                break
+
+            await Prestamo.filter(id__in=[p["id"] for p in vencidos], estado="activo").using_db(conn).update(
+                estado="vencido"
+            )
+            await Notificacion.bulk_create([
+                Notificacion(
+                    usuario_id=p["usuario_id"],
+                    prestamo_id=p["id"],
+                    tipo="vencimiento",
+                    mensaje=(
+                        f"El préstamo del libro '{p['libro__titulo']}' venció el "
+                        f"{p['fecha_devolucion']:%d/%m/%Y}. Por favor, devuélvalo a la biblioteca."
+                    ),
+                    proximo_intento=ahora,
+                )
+                for p in vencidos
+            ], ignore_conflicts=True, using_db=conn)
+
+        marcados += len(vencidos)
+    return marcados
+
+
+async def despachar_notificaciones(sender: NotificationSender, max_por_tick: int = None,
+                                   lote: int = None) -> int:
+    """
+    Envía las notificaciones pendientes cuyo próximo intento ya llegó.
+
+    Las que fallan se reintentan con espera exponencial
+    (`NOTIFICACIONES_BACKOFF` * 2^(intentos - 1)) hasta `NOTIFICACIONES_MAX_INTENTOS`;
+    después quedan en estado "fallida".
+
+    Args:
+        sender: Medio de envío
+        max_por_tick: Máximo de notificaciones a procesar en esta ejecución
+        lote: Notificaciones leídas por consulta
+
+    Returns:
+        int: Cantidad de notificaciones enviadas
+    """
+    max_por_tick = max_por_tick or settings.NOTIFICACIONES_MAX_POR_TICK
+    lote = lote or settings.NOTIFICACIONES_LOTE
+    procesadas = enviadas = 0
+    ultimo_id = 0
+    while procesadas < max_por_tick:
+        ahora = timezone.now()
+        pendientes = await Notificacion.filter(
+            estado="pendiente", proximo_intento__lte=ahora, id__gt=ultimo_id
+        ).order_by("id").limit(min(lote, max_por_tick - procesadas))
+        if not pendientes:
+            break
+
+        ok = []
+        for notificacion in pendientes:
+            try:
+                await sender.enviar(notificacion)
+                ok.append(notificacion.id)
+            except Exception as e:
+                notificacion.intentos += 1
+                notificacion.ultimo_error = str(e)[:500]
+                if notificacion.intentos >= settings.NOTIFICACIONES_MAX_INTENTOS:
+                    notificacion.estado = "fallida"
+                else:
+                    espera = settings.NOTIFICACIONES_BACKOFF * 2 ** (notificacion.intentos - 1)
+                    notificacion.proximo_intento = ahora + timedelta(seconds=espera)
+                await notificacion.save(update_fields=["intentos", "ultimo_error", "estado", "proximo_intento"])
+
+        if ok:
+            await Notificacion.filter(id__in=ok).update(estado="enviada", fecha_envio=timezone.now())
+        enviadas += len(ok)
+        procesadas += len(pendientes)
+        ultimo_id = pendientes[-1].id
+    return enviadas
+
+
+def registrar_tareas(scheduler: Scheduler, sender: NotificationSender = None):
+    """
+    Agrega al scheduler el barrido de vencidos y el despacho de notificaciones.
+
+    Args:
+        scheduler: Scheduler de la aplicación
+        sender: Medio de envío (por defecto, el configurado)
+    """
+    sender = sender or crear_sender()
+    intervalo = settings.NOTIFICACIONES_INTERVALO
+    scheduler.add(PeriodicTask("prestamos_vencidos", por_tenant(marcar_vencidos), intervalo))
+    scheduler.add(PeriodicTask(
+        "notificaciones", por_tenant(functools.partial(despachar_notificaciones, sender)), intervalo
+    ))
@@ -0,0 +1,100 @@
+"""
+Documento OpenAPI guardado en disco.
+
+FastAPI genera el esquema OpenAPI (recorriendo todas las rutas y modelos de
+Pydantic) la primera vez que se pide `/openapi.json` o `/docs` en cada
+proceso. Con varios procesos o reinicios frecuentes ese costo se repite.
+`usar_openapi_cacheado` guarda el documento en `OPENAPI_CACHE` junto con una
+huella de las rutas y del código; los procesos siguientes lo leen del
+archivo mientras la huella coincida.
+
+Para generarlo de antemano (por ejemplo, al construir la imagen):
+    python -m app.core.openapi
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI
+
+logger = logging.getLogger(__name__)
+
+_DIRECTORIO_APP = Path(__file__).resolve().parent.parent
+
+
+def huella(app: FastAPI) -> str:
+    """
+    Calcula una huella de la aplicación: versión, rutas y fecha del código.
+
+    Args:
+        app: Aplicación
+
+    Returns:
+        str: Hash que cambia si cambian las rutas o algún módulo de `app`
+    """
+    rutas = sorted(
+        (getattr(r, "path", ""), ",".join(sorted(getattr(r, "methods", None) or ())), getattr(r, "name", ""))
+        for r in app.routes
+    )
+    modificado = max((p.stat().st_mtime_ns for p in _DIRECTORIO_APP.rglob("*.py")), default=0)
+    datos = json.dumps([app.version, app.openapi_version, rutas, modificado])
+    return hashlib.sha256(datos.encode()).hexdigest()
+
+
+def _leer(ruta: str, esperada: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            guardado = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if guardado.get("huella") != esperada:
+        return None
+    return guardado.get("openapi")
+
+
+def _guardar(ruta: str, valor: str, documento: Dict[str, Any]):
+    try:
+        os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"huella": valor, "openapi": documento}, f, ensure_ascii=False)
+        # Reemplazo atómico: otro proceso nunca lee un archivo a medio escribir
+        os.replace(temporal, ruta)
+    except OSError:
+        logger.warning("No se pudo guardar el documento OpenAPI en %s", ruta, exc_info=True)
+
+
+def usar_openapi_cacheado(app: FastAPI, ruta: str):
+    """
+    Hace que `app.openapi()` lea el documento de `ruta` o, si no está al día, lo genere y lo guarde.
+
+    Args:
+        app: Aplicación
+        ruta: Archivo donde se guarda el documento
+    """
+    generar = app.openapi
+
+    def openapi() -> Dict[str, Any]:
+        if app.openapi_schema is None:
+            valor = huella(app)
+            documento = _leer(ruta, valor)
+            if documento is None:
+                documento = generar()
+                _guardar(ruta, valor, documento)
+            app.openapi_schema = documento
+        return app.openapi_schema
+
+    app.openapi = openapi
+
+
+if __name__ == "__main__":
+    from app.core.config import settings
+    from app.main import app
+
+    if not settings.OPENAPI_CACHE:
+        raise SystemExit("OPENAPI_CACHE no está configurado")
+    app.openapi()
+    print(f"Documento OpenAPI guardado en {settings.OPENAPI_CACHE}")
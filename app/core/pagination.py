@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+from tortoise.expressions import Q
+
+# Campos por los que se puede ordenar el listado de libros
+CAMPOS_ORDENABLES = ("id", "titulo", "autor", "isbn", "categoria", "estado", "fecha_creacion")
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no se pudo decodificar o no corresponde a la consulta."""
+
+
+def encode_cursor(ordenar_por: str, orden: str, valor: Any, ultimo_id: int) -> str:
+    """
+    Genera un cursor opaco a partir del último registro de una página.
+
+    Args:
+        ordenar_por: Campo por el cual se ordena
+        orden: Dirección del ordenamiento (asc o desc)
+        valor: Valor de `ordenar_por` en el último registro
+        ultimo_id: ID del último registro
+
+    Returns:
+        str: Cursor codificado en base64 apto para URLs
+    """
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    datos = json.dumps([ordenar_por, orden, valor, ultimo_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, ordenar_por: str, orden: str) -> Tuple[Any, int]:
+    """
+    Decodifica un cursor y verifica que corresponda al ordenamiento pedido.
+
+    Args:
+        cursor: Cursor generado por `encode_cursor`
+        ordenar_por: Campo por el cual se ordena la consulta actual
+        orden: Dirección del ordenamiento de la consulta actual
+
+    Returns:
+        Tuple[Any, int]: Valor del campo y ID del último registro visto
+
+    Raises:
+        CursorInvalido: Si el cursor está mal formado o fue generado con otro ordenamiento
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        campo, direccion, valor, ultimo_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if campo == "fecha_creacion":
+            valor = datetime.fromisoformat(valor)
+        ultimo_id = int(ultimo_id)
+    except (ValueError, TypeError):
+        raise CursorInvalido("Cursor inválido")
+
+    if campo != ordenar_por or direccion != orden:
+        raise CursorInvalido("El cursor no corresponde al ordenamiento solicitado")
+
+    return valor, ultimo_id
+
+
+def keyset_filter(ordenar_por: str, orden: str, valor: Any, ultimo_id: int) -> Q:
+    """
+    Construye la condición que selecciona los registros posteriores al cursor.
+
+    El desempate por `id` hace que el orden sea total, de modo que ningún
+    registro se repite ni se pierde entre páginas.
+
+    Args:
+        ordenar_por: Campo por el cual se ordena
+        orden: Dirección del ordenamiento (asc o desc)
+        valor: Valor de `ordenar_por` en el último registro visto
+        ultimo_id: ID del último registro visto
+
+    Returns:
+        Q: Condición para aplicar con `filter`
+    """
+    op = "lt" if orden == "desc" else "gt"
+    if ordenar_por == "id":
+        return Q(**{f"id__{op}": ultimo_id})
+    # La cota no estricta sobre el campo permite que SQLite recorra el índice
+    # por rango; el resto de la condición descarta los empates ya vistos.
+    return Q(**{f"{ordenar_por}__{op}e": valor}) & (
+        Q(**{f"{ordenar_por}__{op}": valor}) | Q(**{f"id__{op}": ultimo_id})
+    )
@@ -0,0 +1,354 @@
+"""
+Perfilado por petición (opcional, se activa con `PROFILING_ENABLED`).
+
+`ProfilingMiddleware` mide en cada petición HTTP:
+
+- tiempo total;
+- consultas SQL: cantidad, tiempo y texto (ver `instrumentar`);
+- serialización: `serialize_response` de FastAPI (Pydantic) y `json_dumps`;
+- bcrypt: tiempo esperando el pool de hashing.
+
+Con eso agrega el encabezado `Server-Timing`, acumula métricas en formato
+Prometheus para `/metrics` y avisa en el log cuando una misma consulta se
+repite muchas veces en una petición (patrón N+1). Si se configura
+`PROFILING_LENTO_MS`, un hilo toma muestras de la pila del event loop y las
+peticiones más lentas que el umbral guardan sus muestras y consultas en
+`PROFILING_DIR`, en formato de pilas colapsadas (flamegraph.pl, speedscope).
+
+Las mediciones dependen de una variable de contexto: fuera de una petición
+perfilada, `medir` no registra nada.
+"""
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Límites de los buckets del histograma de duración, en segundos
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Literales que se quitan de una consulta para reconocer repeticiones
+_LITERALES = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+class PerfilPeticion:
+    """Mediciones de una petición en curso."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.inicio_monotonic = time.monotonic()
+        self.tiempos: Dict[str, float] = defaultdict(float)
+        self.consultas: List[Tuple[str, float]] = []
+
+    def transcurrido(self) -> float:
+        return time.perf_counter() - self.inicio
+
+    def consultas_repetidas(self, umbral: int) -> List[Tuple[str, int]]:
+        """
+        Devuelve las consultas que se ejecutaron al menos `umbral` veces (ignorando literales).
+
+        Returns:
+            List[Tuple[str, int]]: Consulta normalizada y cantidad de ejecuciones
+        """
+        conteo = Counter(_LITERALES.sub("?", sql) for sql, _ in self.consultas)
+        return [(sql, n) for sql, n in conteo.most_common() if n >= umbral]
+
+    def server_timing(self) -> str:
+        partes = [f"db;dur={self.tiempos['db'] * 1000:.2f};desc=\"{len(self.consultas)} consultas\""]
+        for categoria in ("serializacion", "bcrypt"):
+            if categoria in self.tiempos:
+                partes.append(f"{categoria};dur={self.tiempos[categoria] * 1000:.2f}")
+        partes.append(f"total;dur={self.transcurrido() * 1000:.2f}")
+        return ", ".join(partes)
+
+
+_perfil: contextvars.ContextVar[Optional[PerfilPeticion]] = contextvars.ContextVar("perfil", default=None)
+
+
+def perfil_actual() -> Optional[PerfilPeticion]:
+    """Devuelve el perfil de la petición en curso, o None si no se está perfilando."""
+    return _perfil.get()
+
+
+def iniciar_perfil() -> PerfilPeticion:
+    """
+    Empieza a perfilar el contexto actual (lo usa el middleware y los benchmarks).
+
+    Returns:
+        PerfilPeticion: Perfil donde se acumulan las mediciones
+    """
+    perfil = PerfilPeticion()
+    _perfil.set(perfil)
+    return perfil
+
+
+@contextlib.contextmanager
+def medir(categoria: str) -> Iterator[None]:
+    """
+    Suma el tiempo del bloque a `categoria` en el perfil de la petición en curso.
+
+    Args:
+        categoria: Nombre de la medición (por ejemplo "bcrypt")
+    """
+    perfil = _perfil.get()
+    if perfil is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        perfil.tiempos[categoria] += time.perf_counter() - inicio
+
+
+def _medir_consulta(metodo: Callable) -> Callable:
+    @functools.wraps(metodo)
+    async def envoltura(self, query, *args, **kwargs):
+        perfil = _perfil.get()
+        if perfil is None:
+            return await metodo(self, query, *args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return await metodo(self, query, *args, **kwargs)
+        finally:
+            duracion = time.perf_counter() - inicio
+            perfil.tiempos["db"] += duracion
+            perfil.consultas.append((query, duracion))
+    envoltura.__perfilado__ = True
+    return envoltura
+
+
+def _medir_serializacion(funcion: Callable) -> Callable:
+    @functools.wraps(funcion)
+    async def envoltura(*args, **kwargs):
+        with medir("serializacion"):
+            return await funcion(*args, **kwargs)
+    envoltura.__perfilado__ = True
+    return envoltura
+
+
+def instrumentar():
+    """
+    Instala los ganchos de medición en Tortoise y FastAPI. Es idempotente.
+
+    Se envuelven los métodos `execute_*` del cliente SQLite de Tortoise (y de
+    su variante transaccional) y `fastapi.routing.serialize_response`.
+    """
+    import fastapi.routing
+    from tortoise.backends.sqlite.client import SqliteClient, SqliteTransactionWrapper
+
+    for clase in (SqliteClient, SqliteTransactionWrapper):
+        for nombre in ("execute_insert", "execute_many", "execute_query", "execute_query_dict", "execute_script"):
+            metodo = vars(clase).get(nombre)
+            if metodo is not None and not getattr(metodo, "__perfilado__", False):
+                setattr(clase, nombre, _medir_consulta(metodo))
+    if not getattr(fastapi.routing.serialize_response, "__perfilado__", False):
+        fastapi.routing.serialize_response = _medir_serializacion(fastapi.routing.serialize_response)
+
+
+class Metricas:
+    """Métricas acumuladas por ruta, expuestas en formato de texto de Prometheus."""
+
+    def __init__(self):
+        self.peticiones: Dict[Tuple[str, str, int], int] = defaultdict(int)
+        self.duracion_buckets: Dict[str, List[int]] = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+        self.duracion_suma: Dict[str, float] = defaultdict(float)
+        self.consultas: Dict[str, int] = defaultdict(int)
+        self.tiempos: Dict[Tuple[str, str], float] = defaultdict(float)
+        self.n_mas_uno: Dict[str, int] = defaultdict(int)
+        self.colectores: List[Callable[[], List[Tuple[str, str, str, Dict[str, str], float]]]] = []
+
+    def registrar(self, metodo: str, ruta: str, estado: int, perfil: PerfilPeticion, duracion: float,
+                  n_mas_uno: bool):
+        self.peticiones[(metodo, ruta, estado)] += 1
+        buckets = self.duracion_buckets[ruta]
+        for i, limite in enumerate(BUCKETS):
+            if duracion <= limite:
+                buckets[i] += 1
+        buckets[-1] += 1
+        self.duracion_suma[ruta] += duracion
+        self.consultas[ruta] += len(perfil.consultas)
+        for categoria, segundos in perfil.tiempos.items():
+            self.tiempos[(ruta, categoria)] += segundos
+        if n_mas_uno:
+            self.n_mas_uno[ruta] += 1
+
+    def agregar_colector(self, colector: Callable[[], List[Tuple[str, str, str, Dict[str, str], float]]]):
+        """
+        Agrega una función que aporta métricas propias al generar `/metrics`.
+
+        El colector devuelve tuplas (nombre, tipo, ayuda, etiquetas, valor).
+        """
+        self.colectores.append(colector)
+
+    def render(self) -> str:
+        """
+        Genera las métricas en formato de texto de Prometheus.
+
+        Returns:
+            str: Documento para `/metrics`
+        """
+        lineas = []
+
+        def encabezado(nombre, tipo, ayuda):
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+
+        encabezado("http_requests_total", "counter", "Peticiones HTTP atendidas")
+        for (metodo, ruta, estado), n in sorted(self.peticiones.items()):
+            lineas.append(f'http_requests_total{{method="{metodo}",route="{ruta}",status="{estado}"}} {n}')
+
+        encabezado("http_request_duration_seconds", "histogram", "Duración de las peticiones HTTP")
+        for ruta, buckets in sorted(self.duracion_buckets.items()):
+            for limite, n in zip(BUCKETS + ("+Inf",), buckets):
+                lineas.append(f'http_request_duration_seconds_bucket{{route="{ruta}",le="{limite}"}} {n}')
+            lineas.append(f'http_request_duration_seconds_sum{{route="{ruta}"}} {self.duracion_suma[ruta]:.6f}')
+            lineas.append(f'http_request_duration_seconds_count{{route="{ruta}"}} {buckets[-1]}')
+
+        encabezado("db_queries_total", "counter", "Consultas SQL ejecutadas por ruta")
+        for ruta, n in sorted(self.consultas.items()):
+            lineas.append(f'db_queries_total{{route="{ruta}"}} {n}')
+
+        encabezado("request_phase_seconds_total", "counter", "Tiempo por fase (db, serializacion, bcrypt)")
+        for (ruta, categoria), segundos in sorted(self.tiempos.items()):
+            lineas.append(f'request_phase_seconds_total{{route="{ruta}",phase="{categoria}"}} {segundos:.6f}')
+
+        encabezado("n_plus_one_requests_total", "counter", "Peticiones con una consulta repetida (N+1)")
+        for ruta, n in sorted(self.n_mas_uno.items()):
+            lineas.append(f'n_plus_one_requests_total{{route="{ruta}"}} {n}')
+
+        vistos = set()
+        for colector in self.colectores:
+            for nombre, tipo, ayuda, etiquetas, valor in colector():
+                if nombre not in vistos:
+                    encabezado(nombre, tipo, ayuda)
+                    vistos.add(nombre)
+                texto = ",".join(f'{k}="{v}"' for k, v in etiquetas.items())
+                lineas.append(f"{nombre}{{{texto}}} {valor}" if texto else f"{nombre} {valor}")
+        return "\n".join(lineas) + "\n"
+
+
+class MuestreadorPila(threading.Thread):
+    """
+    Toma muestras periódicas de la pila de un hilo (el del event loop).
+
+    Las muestras de una petición lenta incluyen las de otras peticiones
+    concurrentes: sirven para ver dónde se va el tiempo del proceso mientras
+    esa petición estaba en curso.
+    """
+
+    def __init__(self, hilo: int, intervalo: float, capacidad: int = 20000):
+        super().__init__(name="muestreador-pila", daemon=True)
+        self.hilo = hilo
+        self.intervalo = intervalo
+        self.muestras: deque = deque(maxlen=capacidad)
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo)
+            if frame is None:
+                continue
+            pila = []
+            while frame is not None:
+                codigo = frame.f_code
+                pila.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                frame = frame.f_back
+            self.muestras.append((time.monotonic(), ";".join(reversed(pila))))
+
+    def detener(self):
+        self._detener.set()
+
+    def entre(self, desde: float, hasta: float) -> Counter:
+        return Counter(pila for instante, pila in list(self.muestras) if desde <= instante <= hasta)
+
+
+metricas = Metricas()
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que perfila cada petición HTTP.
+
+    El encabezado `Server-Timing` se calcula al enviar los encabezados de la
+    respuesta: en las respuestas por streaming no incluye lo que ocurre después.
+    """
+
+    def __init__(self, app, metricas: Metricas = metricas, umbral_n_mas_uno: int = None,
+                 lento_ms: float = None, directorio: str = None, muestreo_ms: float = None):
+        self.app = app
+        self.metricas = metricas
+        self.umbral_n_mas_uno = umbral_n_mas_uno or settings.PROFILING_N1_UMBRAL
+        self.lento_ms = settings.PROFILING_LENTO_MS if lento_ms is None else lento_ms
+        self.directorio = directorio or settings.PROFILING_DIR
+        self.muestreo = (muestreo_ms or settings.PROFILING_MUESTREO_MS) / 1000
+        self.muestreador: Optional[MuestreadorPila] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.lento_ms and self.muestreador is None:
+            self.muestreador = MuestreadorPila(threading.get_ident(), self.muestreo)
+            self.muestreador.start()
+
+        perfil = PerfilPeticion()
+        token = _perfil.set(perfil)
+        estado = 500
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                MutableHeaders(scope=mensaje).append("Server-Timing", perfil.server_timing())
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _perfil.reset(token)
+            self._finalizar(scope, perfil, estado)
+
+    def _finalizar(self, scope, perfil: PerfilPeticion, estado: int):
+        duracion = perfil.transcurrido()
+        route = scope.get("route")
+        ruta = getattr(route, "path", None) or "(sin ruta)"
+
+        repetidas = perfil.consultas_repetidas(self.umbral_n_mas_uno)
+        for sql, n in repetidas:
+            logger.warning("Posible N+1 en %s %s: %d ejecuciones de %s", scope["method"], ruta, n, sql)
+        self.metricas.registrar(scope["method"], ruta, estado, perfil, duracion, bool(repetidas))
+
+        if self.lento_ms and duracion * 1000 >= self.lento_ms:
+            self._guardar_perfil_lento(scope, ruta, perfil, duracion)
+
+    def _guardar_perfil_lento(self, scope, ruta: str, perfil: PerfilPeticion, duracion: float):
+        muestras = self.muestreador.entre(perfil.inicio_monotonic, perfil.inicio_monotonic + duracion)
+        nombre = re.sub(r"[^\w.-]+", "_", f"{scope['method']}{ruta}").strip("_")
+        archivo = os.path.join(
+            self.directorio, f"{time.strftime('%Y%m%d-%H%M%S')}-{nombre}-{int(duracion * 1000)}ms.txt"
+        )
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            with open(archivo, "w", encoding="utf-8") as f:
+                f.write(f"# {scope['method']} {scope['path']} {duracion * 1000:.1f} ms\n")
+                for sql, segundos in perfil.consultas:
+                    f.write(f"# SQL {segundos * 1000:.2f} ms: {sql}\n")
+                for pila, n in muestras.most_common():
+                    f.write(f"{pila} {n}\n")
+        except OSError:
+            logger.exception("No se pudo guardar el perfil de %s", archivo)
+        else:
+            logger.info("Petición lenta (%.1f ms), perfil guardado en %s", duracion * 1000, archivo)
@@ -0,0 +1,102 @@
+"""
+Límite de intentos de autenticación por IP y por usuario.
+
+Los contadores viven en el estado compartido (`app.core.compartido`), así el
+límite es el mismo con uno o con varios workers: un cliente no obtiene más
+intentos porque sus peticiones caigan en procesos distintos.
+
+Cada intento incrementa, con una sola operación atómica, un contador por IP
+y otro por usuario, así el límite se respeta exactamente aunque lleguen
+muchos intentos a la vez. Un login correcto pone en cero el contador del
+usuario: quien conoce su contraseña no queda bloqueado, pero adivinar la de
+una cuenta está limitado aunque se use una IP distinta en cada intento.
+
+Detrás de un proxy, la IP del cliente es la que informa uvicorn a partir de
+`X-Forwarded-For` cuando el proxy está en `FORWARDED_ALLOW_IPS`.
+
+En modo multi-tenant el contador por usuario es de cada tenant (el mismo
+email puede existir en dos bibliotecas); el de la IP es común a todos.
+"""
+import math
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+
+from app.core.compartido import EstadoCompartido, estado_compartido
+from app.core.config import settings
+from app.core.tenant import calificar
+
+
+def _demasiados_intentos(espera: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Demasiados intentos, intente nuevamente más tarde",
+        headers={"Retry-After": str(max(1, math.ceil(espera)))},
+    )
+
+
+class RateLimiter:
+    """
+    Límites de intentos por ventana fija de tiempo.
+
+    Atributos:
+        ventana: Segundos de cada ventana
+        max_ip: Intentos permitidos por IP en una ventana
+        max_usuario: Intentos permitidos por usuario en una ventana
+        habilitado: Si es False no se limita nada
+        rechazados: Peticiones respondidas con 429 por este proceso
+    """
+
+    def __init__(self, estado: EstadoCompartido, ventana: float, max_ip: int, max_usuario: int,
+                 habilitado: bool = True):
+        self.estado = estado
+        self.ventana = ventana
+        self.max_ip = max_ip
+        self.max_usuario = max_usuario
+        self.habilitado = habilitado
+        self.rechazados = 0
+
+    async def verificar(self, accion: str, request: Request, usuario: Optional[str] = None):
+        """
+        Cuenta un intento de la IP del cliente y del usuario y comprueba los límites.
+
+        Args:
+            accion: Operación limitada (por ejemplo "login")
+            request: Request actual (para obtener la IP)
+            usuario: Usuario o email del intento, si se conoce
+
+        Raises:
+            HTTPException: 429 con `Retry-After` si se superó algún límite
+        """
+        if not self.habilitado:
+            return
+        ip = request.client.host if request.client else "desconocida"
+        conteo, espera = await self.estado.contar(f"{accion}:ip:{ip}", self.ventana)
+        if conteo > self.max_ip:
+            self.rechazados += 1
+            raise _demasiados_intentos(espera)
+        if usuario:
+            conteo, espera = await self.estado.contar(calificar(f"{accion}:usuario:{usuario.lower()}"), self.ventana)
+            if conteo > self.max_usuario:
+                self.rechazados += 1
+                raise _demasiados_intentos(espera)
+
+    async def restablecer(self, accion: str, usuario: str):
+        """
+        Pone en cero los intentos del usuario (por ejemplo, tras un login correcto).
+
+        Args:
+            accion: Operación limitada
+            usuario: Usuario o email del intento
+        """
+        if self.habilitado:
+            await self.estado.restablecer(calificar(f"{accion}:usuario:{usuario.lower()}"))
+
+
+rate_limiter = RateLimiter(
+    estado_compartido,
+    ventana=settings.RATE_LIMIT_VENTANA,
+    max_ip=settings.RATE_LIMIT_IP,
+    max_usuario=settings.RATE_LIMIT_USUARIO,
+    habilitado=settings.RATE_LIMIT_ENABLED,
+)
@@ -0,0 +1,270 @@
+"""
+Cálculo de los libros recomendados a partir de los préstamos compartidos.
+
+Los préstamos forman una matriz dispersa X usuario × libro (1 si el usuario
+retiró el libro alguna vez). Su producto XᵀX es la matriz de coprestamos:
+la entrada (a, b) es la cantidad de usuarios que retiraron ambos libros y
+la diagonal (a, a) la de usuarios que retiraron `a`, sus lectores. Dos
+libros se parecen si los retiraron los mismos usuarios: la similitud es el
+coseno entre sus columnas,
+
+    coprestamos(a, b) / sqrt(lectores(a) * lectores(b))
+
+De cada libro se guardan los `k` más parecidos con al menos `minimo`
+coprestamos (los empates se ordenan por coprestamos y luego por ID, así el
+resultado es determinista).
+
+Las entradas no nulas de XᵀX se manejan como tres listas (libro, otro
+libro, usuarios): `coprestamos` las calcula a partir de los préstamos,
+`diferencia` calcula cuánto cambian cuando algunos usuarios retiran libros
+nuevos (sólo con los préstamos de esos usuarios), `sumar` las acumula y
+`recomendar` elige los más parecidos de cada libro.
+
+Con numpy, el producto se arma con operaciones vectorizadas: cada préstamo
+(usuario, libro) se expande con los libros del mismo usuario y los pares
+repetidos se cuentan con `np.unique`, en tandas de a lo sumo `_MAX_PARES`
+pares para acotar la memoria. Sin numpy (que es una dependencia de la
+aplicación, así que sólo queda como respaldo) se usa la misma cuenta con
+diccionarios, mucho más lenta pero con el mismo resultado.
+
+Todo es CPU: quien lo llame desde el event loop debe hacerlo en otro hilo.
+"""
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depende del entorno
+    np = None
+
+# Pares (libro, libro) expandidos como máximo por tanda
+_MAX_PARES = 1 << 22
+
+# Entradas no nulas de XᵀX: libros, otros libros y usuarios que retiraron ambos
+Coprestamos = Tuple[List[int], List[int], List[int]]
+
+# Fila de la tabla de recomendaciones: libro, posición, recomendado, puntaje, coprestamos
+Fila = Tuple[int, int, int, float, int]
+
+
+def _vectorizado(vectorizado: Optional[bool]) -> bool:
+    return np is not None if vectorizado is None else vectorizado
+
+
+def coprestamos(pares: Sequence[int], vectorizado: Optional[bool] = None) -> Coprestamos:
+    """
+    Calcula la matriz de coprestamos XᵀX.
+
+    Args:
+        pares: Secuencia plana `usuario, libro, usuario, libro, ...` con
+            los préstamos (los repetidos cuentan una sola vez)
+        vectorizado: Usar numpy (None: si está instalado)
+
+    Returns:
+        Coprestamos: Entradas no nulas, incluida la diagonal (lectores)
+    """
+    if _vectorizado(vectorizado):
+        return _coprestamos_numpy(pares)
+    return _coprestamos_python(pares)
+
+
+def sumar(*entradas: Coprestamos, vectorizado: Optional[bool] = None) -> Coprestamos:
+    """
+    Suma entradas de XᵀX: las repetidas se acumulan y las que dan 0 se descartan.
+
+    Args:
+        *entradas: Entradas a sumar
+        vectorizado: Usar numpy (None: si está instalado)
+
+    Returns:
+        Coprestamos: Entradas resultantes
+    """
+    if _vectorizado(vectorizado):
+        return _sumar_numpy(entradas)
+    return _sumar_python(entradas)
+
+
+def diferencia(antes: Sequence[int], despues: Sequence[int], vectorizado: Optional[bool] = None) -> Coprestamos:
+    """
+    Calcula cuánto cambia XᵀX cuando algunos usuarios retiran libros nuevos.
+
+    Cada usuario suma 1 a todos los pares de libros que retiró, así que
+    alcanzan los préstamos de los usuarios que cambiaron, antes y después.
+
+    Args:
+        antes: Préstamos previos de esos usuarios (como en `coprestamos`)
+        despues: Todos sus préstamos, incluidos los nuevos
+        vectorizado: Usar numpy (None: si está instalado)
+
+    Returns:
+        Coprestamos: Entradas que cambian y cuánto cambian
+    """
+    libros, otros, usuarios = coprestamos(antes, vectorizado)
+    return sumar(coprestamos(despues, vectorizado), (libros, otros, [-n for n in usuarios]), vectorizado=vectorizado)
+
+
+def recomendar(entradas: Coprestamos, k: int, minimo: int = 1, lectores: Optional[Mapping[int, int]] = None,
+               vectorizado: Optional[bool] = None) -> Dict[int, List[Fila]]:
+    """
+    Calcula los libros recomendados de los libros que tienen entradas.
+
+    Args:
+        entradas: Filas completas de XᵀX de los libros a calcular
+        k: Recomendaciones por libro
+        minimo: Coprestamos mínimos para recomendar un libro
+        lectores: Usuarios que retiraron cada libro de `entradas` (None: se
+            toman de la diagonal de `entradas`)
+        vectorizado: Usar numpy (None: si está instalado)
+
+    Returns:
+        Dict[int, List[Fila]]: Filas de cada libro calculado, ordenadas por
+        posición (lista vacía si no tiene recomendaciones)
+    """
+    if _vectorizado(vectorizado):
+        return _recomendar_numpy(entradas, k, minimo, lectores)
+    return _recomendar_python(entradas, k, minimo, lectores)
+
+
+def calcular(pares: Sequence[int], k: int, minimo: int = 1,
+             vectorizado: Optional[bool] = None) -> Dict[int, List[Fila]]:
+    """Calcula los libros recomendados de todos los libros prestados (`coprestamos` y `recomendar`)."""
+    return recomendar(coprestamos(pares, vectorizado), k, minimo, vectorizado=vectorizado)
+
+
+def _coprestamos_python(pares: Sequence[int]) -> Coprestamos:
+    libros_de = defaultdict(set)
+    for i in range(0, len(pares), 2):
+        libros_de[pares[i]].add(pares[i + 1])
+    conteo = Counter()
+    for libros in libros_de.values():
+        conteo.update((a, b) for a in libros for b in libros)
+    return _listas(conteo)
+
+
+def _sumar_python(entradas: Sequence[Coprestamos]) -> Coprestamos:
+    conteo = Counter()
+    for libros, otros, usuarios in entradas:
+        for a, b, n in zip(libros, otros, usuarios):
+            conteo[a, b] += n
+    return _listas(conteo)
+
+
+def _listas(conteo: Counter) -> Coprestamos:
+    no_nulas = [(a, b, n) for (a, b), n in conteo.items() if n]
+    if not no_nulas:
+        return [], [], []
+    libros, otros, usuarios = zip(*no_nulas)
+    return list(libros), list(otros), list(usuarios)
+
+
+def _recomendar_python(entradas: Coprestamos, k: int, minimo: int,
+                       lectores: Optional[Mapping[int, int]]) -> Dict[int, List[Fila]]:
+    filas = defaultdict(list)
+    for a, b, n in zip(*entradas):
+        filas[a].append((b, n))
+    if lectores is None:
+        lectores = {a: n for a, b, n in zip(*entradas) if a == b}
+
+    resultado = {}
+    for libro, otros in filas.items():
+        candidatos = [
+            (c / math.sqrt(lectores[libro] * lectores[otro]), c, otro)
+            for otro, c in otros if otro != libro and c >= minimo
+        ]
+        candidatos.sort(key=lambda x: (-x[0], -x[1], x[2]))
+        resultado[libro] = [
+            (libro, posicion, otro, puntaje, c) for posicion, (puntaje, c, otro) in enumerate(candidatos[:k])
+        ]
+    return resultado
+
+
+def _rangos(inicios, largos):
+    # Concatena range(inicio, inicio + largo) de cada elemento, sin recorrerlos en Python
+    total = int(largos.sum())
+    desplazamientos = np.repeat(inicios - np.cumsum(largos) + largos, largos)
+    return np.arange(total, dtype=np.int64) + desplazamientos
+
+
+def _coprestamos_numpy(pares: Sequence[int]) -> Coprestamos:
+    if len(pares) == 0:
+        return [], [], []
+    matriz = np.asarray(pares, dtype=np.int64).reshape(-1, 2)
+    _, usuarios = np.unique(matriz[:, 0], return_inverse=True)
+    ids_libro, libros = np.unique(matriz[:, 1], return_inverse=True)
+    n_libros = len(ids_libro)
+
+    # Matriz dispersa sin repetidos, ordenada por usuario
+    claves = np.unique(usuarios.astype(np.int64) * n_libros + libros)
+    usuario, libro = claves // n_libros, claves % n_libros
+    libros_por_usuario = np.bincount(usuario)
+    inicio = np.cumsum(libros_por_usuario) - libros_por_usuario
+
+    # Cada préstamo (usuario, a) aporta los pares (a, b) con los libros b del mismo usuario
+    largos = libros_por_usuario[usuario]
+    acumulado = np.cumsum(largos)
+    parejas, cuentas = [], []
+    desde = 0
+    while desde < len(largos):
+        # Al menos un préstamo por tanda, aunque solo supere el máximo
+        hasta = max(int(np.searchsorted(acumulado, (acumulado[desde - 1] if desde else 0) + _MAX_PARES,
+                                        side="right")), desde + 1)
+        a = np.repeat(libro[desde:hasta], largos[desde:hasta])
+        b = libro[_rangos(inicio[usuario[desde:hasta]], largos[desde:hasta])]
+        unicas, veces = np.unique(a * n_libros + b, return_counts=True)
+        parejas.append(unicas)
+        cuentas.append(veces)
+        desde = hasta
+
+    if len(parejas) > 1:
+        unicas, posiciones = np.unique(np.concatenate(parejas), return_inverse=True)
+        veces = np.bincount(posiciones, weights=np.concatenate(cuentas)).astype(np.int64)
+    return ids_libro[unicas // n_libros].tolist(), ids_libro[unicas % n_libros].tolist(), veces.tolist()
+
+
+def _sumar_numpy(entradas: Sequence[Coprestamos]) -> Coprestamos:
+    a, b, n = (np.concatenate([np.asarray(e[i], dtype=np.int64) for e in entradas]) for i in range(3))
+    if len(a) == 0:
+        return [], [], []
+    ids = np.unique(np.concatenate([a, b]))
+    unicas, posiciones = np.unique(np.searchsorted(ids, a) * len(ids) + np.searchsorted(ids, b),
+                                   return_inverse=True)
+    suma = np.zeros(len(unicas), dtype=np.int64)
+    np.add.at(suma, posiciones, n)
+    no_nulas = suma != 0
+    unicas = unicas[no_nulas]
+    return ids[unicas // len(ids)].tolist(), ids[unicas % len(ids)].tolist(), suma[no_nulas].tolist()
+
+
+def _recomendar_numpy(entradas: Coprestamos, k: int, minimo: int,
+                      lectores: Optional[Mapping[int, int]]) -> Dict[int, List[Fila]]:
+    a, b, coprestamos = (np.asarray(columna, dtype=np.int64) for columna in entradas)
+    resultado: Dict[int, List[Fila]] = {libro: [] for libro in np.unique(a).tolist()}
+    if len(a) == 0:
+        return resultado
+
+    ids = np.unique(np.concatenate([a, b]))
+    a, b = np.searchsorted(ids, a), np.searchsorted(ids, b)
+    if lectores is None:
+        totales = np.zeros(len(ids), dtype=np.int64)
+        diagonal = a == b
+        totales[a[diagonal]] = coprestamos[diagonal]
+    else:
+        totales = np.fromiter((lectores[libro] for libro in ids.tolist()), dtype=np.int64, count=len(ids))
+
+    candidatos = (a != b) & (coprestamos >= minimo)
+    a, b, coprestamos = a[candidatos], b[candidatos], coprestamos[candidatos]
+    puntajes = coprestamos / np.sqrt((totales[a] * totales[b]).astype(np.float64))
+
+    # Por libro: mayor puntaje, más coprestamos, menor ID; se quedan las k primeras
+    orden = np.lexsort((ids[b], -coprestamos, -puntajes, a))
+    a, b, puntajes, coprestamos = a[orden], b[orden], puntajes[orden], coprestamos[orden]
+    primeras = np.flatnonzero(np.r_[True, a[1:] != a[:-1]]) if len(a) else np.zeros(0, dtype=np.int64)
+    posiciones = np.arange(len(a)) - np.repeat(primeras, np.diff(np.r_[primeras, len(a)]))
+    conservar = posiciones < k
+    for libro, posicion, recomendado, puntaje, c in zip(
+        ids[a[conservar]].tolist(), posiciones[conservar].tolist(), ids[b[conservar]].tolist(),
+        puntajes[conservar].tolist(), coprestamos[conservar].tolist(),
+    ):
+        resultado[libro].append((libro, posicion, recomendado, puntaje, c))
+    return resultado
@@ -0,0 +1,315 @@
+"""
+Caché de respuestas HTTP con ETag para lecturas repetidas.
+
+Las respuestas se guardan ya serializadas, bajo una clave formada por un
+espacio de nombres (por ejemplo "libros"), su versión actual y los parámetros
+normalizados de la consulta. Invalidar un espacio incrementa su versión: las
+entradas anteriores dejan de ser alcanzables y se descartan por LRU o TTL.
+Como la versión se lee antes de consultar la base, una respuesta generada
+mientras ocurría una escritura queda guardada bajo la versión vieja y nunca
+se sirve.
+
+Cada respuesta lleva un ETag fuerte (hash del cuerpo). Si el cliente envía
+`If-None-Match` con ese valor se responde `304 Not Modified` sin cuerpo.
+
+El almacenamiento es intercambiable (`CacheBackend`): en memoria por defecto,
+o Redis (`RESPONSE_CACHE_BACKEND=redis`) para compartirlo entre procesos.
+Con el backend en memoria y varios workers, cada invalidación se publica en
+el canal "respuestas" del estado compartido para que los demás procesos
+incrementen también su versión.
+
+En modo multi-tenant cada tenant tiene sus propios espacios: el nombre del
+espacio se califica con el tenant de la petición (ver `app.core.tenant`).
+"""
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+from fastapi import Request, Response, status
+
+from app.core.cache import TTLCache
+from app.core.compartido import estado_compartido
+from app.core.config import settings
+from app.core.tenant import calificar
+
+logger = logging.getLogger(__name__)
+
+# Cuerpo, ETag, media type y encabezados adicionales de una respuesta guardada
+Entrada = Tuple[bytes, str, str, Dict[str, str]]
+
+# Encabezados que Starlette calcula a partir del cuerpo y no se guardan
+_ENCABEZADOS_CALCULADOS = {"content-length", "content-type"}
+
+
+class CacheBackend:
+    """
+    Interfaz de los almacenamientos de la caché de respuestas.
+
+    `compartido` indica si todos los procesos ven el mismo almacenamiento
+    (y por lo tanto las mismas versiones).
+    """
+
+    compartido = False
+
+    async def get(self, clave: str) -> Optional[Entrada]:
+        raise NotImplementedError
+
+    async def set(self, clave: str, entrada: Entrada, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def version(self, espacio: str) -> int:
+        """Devuelve la versión actual de un espacio de nombres."""
+        raise NotImplementedError
+
+    async def invalidar(self, espacio: str) -> None:
+        """Incrementa la versión de un espacio de nombres."""
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Almacenamiento en el proceso, con cantidad máxima de entradas (LRU) y TTL."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versiones: Dict[str, int] = {}
+
+    async def get(self, clave: str) -> Optional[Entrada]:
+        return self._cache.get(clave)
+
+    async def set(self, clave: str, entrada: Entrada, ttl: float) -> None:
+        self._cache.set(clave, entrada, ttl=ttl)
+
+    async def version(self, espacio: str) -> int:
+        return self._versiones.get(espacio, 0)
+
+    async def invalidar(self, espacio: str) -> None:
+        self._versiones[espacio] = self._versiones.get(espacio, 0) + 1
+
+
+class RedisBackend(CacheBackend):
+    """
+    Almacenamiento en Redis, compartido por todos los procesos de la aplicación.
+
+    Requiere el paquete `redis`. Las versiones se guardan como contadores, así
+    una invalidación en un proceso afecta a todos.
+    """
+
+    compartido = True
+
+    def __init__(self, url: str, prefijo: str = "biblioteca:respuestas:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis requiere el paquete 'redis'") from e
+        self._redis = redis.from_url(url)
+        self._prefijo = prefijo
+
+    async def get(self, clave: str) -> Optional[Entrada]:
+        valor = await self._redis.get(self._prefijo + clave)
+        if valor is None:
+            return None
+        meta, _, cuerpo = valor.partition(b"\n")
+        etag, media_type, encabezados = json.loads(meta)
+        return cuerpo, etag, media_type, encabezados
+
+    async def set(self, clave: str, entrada: Entrada, ttl: float) -> None:
+        cuerpo, etag, media_type, encabezados = entrada
+        meta = json.dumps([etag, media_type, encabezados]).encode()
+        await self._redis.set(self._prefijo + clave, meta + b"\n" + cuerpo, px=int(ttl * 1000))
+
+    async def version(self, espacio: str) -> int:
+        return int(await self._redis.get(f"{self._prefijo}{espacio}:version") or 0)
+
+    async def invalidar(self, espacio: str) -> None:
+        await self._redis.incr(f"{self._prefijo}{espacio}:version")
+
+
+def calcular_etag(cuerpo: bytes) -> str:
+    """
+    Calcula un ETag fuerte a partir del cuerpo de la respuesta.
+
+    Args:
+        cuerpo: Cuerpo serializado
+
+    Returns:
+        str: ETag entre comillas
+    """
+    return '"' + hashlib.blake2b(cuerpo, digest_size=16).hexdigest() + '"'
+
+
+def etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Indica si el encabezado `If-None-Match` incluye el ETag.
+
+    Usa la comparación débil que exige el RFC 9110 para `If-None-Match`.
+    """
+    if not if_none_match:
+        return False
+    for valor in if_none_match.split(","):
+        valor = valor.strip()
+        if valor == "*" or valor.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def normalizar_parametros(parametros: Mapping[str, Any]) -> str:
+    """
+    Convierte los parámetros de una consulta en una clave estable.
+
+    Los parámetros sin valor se omiten y el resto se ordena por nombre, así
+    `?a=1&b=` y `?b=&a=1` comparten la misma entrada.
+    """
+    valores = sorted((k, v) for k, v in parametros.items() if v is not None and v != "")
+    return json.dumps(valores, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+class ResponseCache:
+    """
+    Caché de respuestas con ETag sobre un `CacheBackend`.
+
+    Atributos:
+        hits: Respuestas servidas desde la caché
+        misses: Respuestas que hubo que generar
+        not_modified: Respuestas 304 enviadas
+        bytes_saved: Bytes de cuerpo que no se enviaron gracias a un 304
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, max_bytes: int, habilitada: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.habilitada = habilitada
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.bytes_saved = 0
+        self.demasiado_grandes = 0
+        self._oyentes: Dict[str, List[Callable[[], Awaitable[None]]]] = {}
+
+    async def responder(self, request: Request, espacio: str, parametros: Mapping[str, Any],
+                        generar: Callable[[], Awaitable[Response]]) -> Response:
+        """
+        Devuelve la respuesta guardada o la genera y la guarda.
+
+        Sólo se guardan las respuestas 200. Las excepciones de `generar`
+        (por ejemplo un 404) se propagan sin guardarse.
+
+        Args:
+            request: Request actual (para leer `If-None-Match`)
+            espacio: Espacio de nombres a invalidar cuando cambien los datos
+            parametros: Parámetros que determinan el contenido de la respuesta
+            generar: Función que produce la respuesta si no está en la caché
+
+        Returns:
+            Response: Respuesta completa, o 304 si el cliente ya la tiene
+        """
+        entrada = None
+        if self.habilitada:
+            espacio = calificar(espacio)
+            version = await self.backend.version(espacio)
+            clave = f"{espacio}:{version}:{normalizar_parametros(parametros)}"
+            entrada = await self.backend.get(clave)
+
+        estado_cache = "HIT"
+        if entrada is None:
+            estado_cache = "MISS"
+            respuesta = await generar()
+            if respuesta.status_code != status.HTTP_200_OK:
+                return respuesta
+            cuerpo = bytes(respuesta.body)
+            encabezados = {
+                k: v for k, v in respuesta.headers.items() if k.lower() not in _ENCABEZADOS_CALCULADOS
+            }
+            entrada = (cuerpo, calcular_etag(cuerpo), respuesta.media_type, encabezados)
+            if self.habilitada:
+                self.misses += 1
+                if len(cuerpo) <= self.max_bytes:
+                    await self.backend.set(clave, entrada, self.ttl)
+                else:
+                    self.demasiado_grandes += 1
+        else:
+            self.hits += 1
+
+        cuerpo, etag, media_type, encabezados = entrada
+        encabezados = dict(encabezados, ETag=etag)
+        # Los clientes pueden guardar la respuesta pero deben revalidarla siempre
+        encabezados["Cache-Control"] = "no-cache"
+        if self.habilitada:
+            encabezados["X-Cache"] = estado_cache
+
+        if etag_coincide(request.headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            self.bytes_saved += len(cuerpo)
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=encabezados)
+        return Response(content=cuerpo, media_type=media_type, headers=encabezados)
+
+    async def invalidar(self, espacio: str, propagar: bool = True) -> None:
+        """
+        Invalida todas las respuestas de un espacio de nombres (del tenant actual).
+
+        Args:
+            espacio: Espacio de nombres (por ejemplo "libros"; las invalidaciones
+                recibidas de otros workers ya vienen calificadas con el tenant)
+            propagar: Avisar a los demás workers si el backend no es compartido
+        """
+        await self.backend.invalidar(calificar(espacio))
+        if propagar:
+            for funcion in self._oyentes.get(espacio, ()):
+                await funcion()
+            if not self.backend.compartido:
+                await estado_compartido.publicar("respuestas", calificar(espacio))
+
+    def al_invalidar(self, espacio: str, funcion: Callable[[], Awaitable[None]]) -> None:
+        """
+        Registra una corrutina que se llama cada vez que este proceso invalida
+        `espacio` (no con las invalidaciones recibidas de otros workers).
+
+        Args:
+            espacio: Espacio de nombres (por ejemplo "libros")
+            funcion: Corrutina sin argumentos
+        """
+        self._oyentes.setdefault(espacio, []).append(funcion)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Devuelve los contadores de uso de la caché.
+
+        Returns:
+            Dict[str, Any]: hits, misses, hit_ratio, not_modified, bytes_saved y respuestas no guardadas por tamaño
+        """
+        consultas = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / consultas, 4) if consultas else 0.0,
+            "not_modified": self.not_modified,
+            "bytes_saved": self.bytes_saved,
+            "demasiado_grandes": self.demasiado_grandes,
+        }
+
+
+def crear_response_cache() -> ResponseCache:
+    """
+    Crea la caché de respuestas según `Settings`.
+
+    Returns:
+        ResponseCache: Caché con el almacenamiento configurado
+    """
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        backend = RedisBackend(settings.RESPONSE_CACHE_URL)
+    else:
+        backend = MemoryBackend(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL)
+    return ResponseCache(
+        backend,
+        ttl=settings.RESPONSE_CACHE_TTL,
+        max_bytes=settings.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+        habilitada=settings.RESPONSE_CACHE_ENABLED,
+    )
+
+
+response_cache = crear_response_cache()
+
+# Invalidaciones hechas en otros workers
+estado_compartido.suscribir("respuestas", lambda espacio: response_cache.invalidar(espacio, propagar=False))
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Tarea que se ejecuta periódicamente en el event loop.
+
+    La función no recibe argumentos y devuelve la cantidad de elementos
+    procesados en esa ejecución (o None), que se acumula en las métricas.
+
+    Atributos:
+        nombre: Nombre de la tarea (para logs y métricas)
+        intervalo: Segundos de espera entre el fin de una ejecución y el inicio de la siguiente
+    """
+
+    def __init__(self, nombre: str, funcion: Callable[[], Awaitable[Optional[int]]], intervalo: float):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.intervalo = intervalo
+        self.ejecuciones = 0
+        self.errores = 0
+        self.procesados = 0
+        self.ultima_duracion_ms = 0.0
+        self.max_duracion_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> Optional[int]:
+        """
+        Ejecuta la tarea una vez y registra su duración.
+
+        Returns:
+            Optional[int]: Cantidad de elementos procesados, o None si falló
+        """
+        inicio = time.perf_counter()
+        try:
+            resultado = await self.funcion()
+        except Exception:
+            self.errores += 1
+            logger.exception("Error en la tarea periódica %s", self.nombre)
+            resultado = None
+        finally:
+            duracion = (time.perf_counter() - inicio) * 1000
+            self.ejecuciones += 1
+            self.ultima_duracion_ms = duracion
+            self.max_duracion_ms = max(self.max_duracion_ms, duracion)
+        if resultado:
+            self.procesados += resultado
+        return resultado
+
+    async def _loop(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.intervalo)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name=self.nombre)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metricas(self) -> Dict[str, Any]:
+        return {
+            "intervalo": self.intervalo,
+            "ejecuciones": self.ejecuciones,
+            "errores": self.errores,
+            "procesados": self.procesados,
+            "ultima_duracion_ms": round(self.ultima_duracion_ms, 3),
+            "max_duracion_ms": round(self.max_duracion_ms, 3),
+        }
+
+
+class Scheduler:
+    """Conjunto de tareas periódicas que se inician y detienen juntas."""
+
+    def __init__(self):
+        self.tareas: List[PeriodicTask] = []
+
+    def add(self, tarea: PeriodicTask) -> PeriodicTask:
+        self.tareas.append(tarea)
+        return tarea
+
+    def start(self):
+        for tarea in self.tareas:
+            tarea.start()
+
+    async def stop(self):
+        for tarea in self.tareas:
+            await tarea.stop()
+
+    def metricas(self) -> Dict[str, Dict[str, Any]]:
+        return {tarea.nombre: tarea.metricas() for tarea in self.tareas}
+
+
+scheduler = Scheduler()
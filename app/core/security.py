@@ -1,9 +1,82 @@
-from passlib.context import CryptContext
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.config import settings
+from app.core.profiling import medir
+
+# passlib tarda en importarse: el contexto se crea con el primer hash
+_pwd_context = None
+
+def _get_pwd_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _get_pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _get_pwd_context().verify(plain_password, hashed_password)
+
+
+# bcrypt libera el GIL mientras calcula el hash, así que un pool de hilos
+# alcanza para sacarlo del event loop sin bloquear al resto de las peticiones.
+_executor = None
+_en_curso = 0
+
+
+class PasswordPoolSaturado(Exception):
+    """No hay lugar en la cola del pool de hashing; conviene reintentar más tarde."""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_WORKERS,
+            thread_name_prefix="bcrypt"
+        )
+    return _executor
+
+
+async def _run_in_pool(func, *args):
+    global _en_curso
+    # Sólo se accede desde el event loop, por lo que el contador no necesita lock
+    if _en_curso >= settings.PASSWORD_WORKERS + settings.PASSWORD_QUEUE_SIZE:
+        raise PasswordPoolSaturado()
+    _en_curso += 1
+    try:
+        with medir("bcrypt"):
+            return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+    finally:
+        _en_curso -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Calcula el hash de una contraseña en el pool de hashing.
+
+    Raises:
+        PasswordPoolSaturado: Si el pool y su cola están llenos
+    """
+    return await _run_in_pool(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verifica una contraseña contra su hash en el pool de hashing.
+
+    Raises:
+        PasswordPoolSaturado: Si el pool y su cola están llenos
+    """
+    return await _run_in_pool(verify_password, plain_password, hashed_password)
+
+
+def shutdown_password_pool():
+    """Libera los hilos del pool de hashing (por ejemplo, al apagar la aplicación)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
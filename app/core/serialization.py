@@ -0,0 +1,222 @@
+"""
+Serialización liviana para respuestas de listados.
+
+En lugar de construir un modelo de Tortoise y otro de Pydantic por cada fila,
+los listados leen diccionarios con `.values()` y los codifican directamente a
+JSON. Si `orjson` está instalado se usa como codificador; si no, se recurre a
+la biblioteca estándar con el mismo formato de salida.
+
+Los listados también pueden responder:
+- en columnas (`?format=columns`): un objeto con un arreglo de valores por
+  campo, así los nombres de los campos se envían una sola vez;
+- en MessagePack, si el cliente lo pide con `Accept: application/msgpack`
+  y el paquete `msgpack` está instalado.
+"""
+import json
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Sequence
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from tortoise.queryset import QuerySet
+
+from app.core.profiling import medir
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - depende del entorno
+    msgpack = None
+
+MEDIA_TYPE_MSGPACK = "application/msgpack"
+
+# Valores de `?format=` en los listados
+FORMATO_FILAS = "rows"
+FORMATO_COLUMNAS = "columns"
+PATRON_FORMATO = f"^({FORMATO_FILAS}|{FORMATO_COLUMNAS})$"
+
+
+def _default(valor: Any) -> Any:
+    if isinstance(valor, (datetime, date)):
+        # Mismo formato que Pydantic para fechas en UTC
+        return valor.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def json_dumps(valor: Any) -> bytes:
+    """
+    Codifica un valor a JSON (UTF-8).
+
+    Args:
+        valor: Valor a codificar (dicts, listas, fechas, etc.)
+
+    Returns:
+        bytes: Documento JSON
+    """
+    with medir("serializacion"):
+        if orjson is not None:
+            return orjson.dumps(valor, option=orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC)
+        return json.dumps(valor, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def msgpack_dumps(valor: Any) -> bytes:
+    """
+    Codifica un valor a MessagePack (requiere el paquete `msgpack`).
+
+    Las fechas se codifican como texto ISO 8601, igual que en JSON.
+
+    Args:
+        valor: Valor a codificar
+
+    Returns:
+        bytes: Documento MessagePack
+    """
+    with medir("serializacion"):
+        return msgpack.packb(valor, default=_default, use_bin_type=True)
+
+
+def en_columnas(filas: Sequence[Mapping[str, Any]], campos: Sequence[str]) -> Dict[str, List[Any]]:
+    """
+    Convierte una lista de filas en un arreglo de valores por campo.
+
+    Args:
+        filas: Filas como diccionarios
+        campos: Campos a incluir, en orden
+
+    Returns:
+        Dict[str, List[Any]]: Valores de cada campo, en el orden de las filas
+    """
+    return {campo: [fila[campo] for fila in filas] for campo in campos}
+
+
+def acepta_msgpack(request: Request) -> bool:
+    """
+    Indica si el cliente pidió MessagePack en `Accept` y se puede generar.
+
+    Args:
+        request: Request actual
+
+    Returns:
+        bool: True si hay que responder en MessagePack
+    """
+    if msgpack is None:
+        return False
+    for parte in request.headers.get("accept", "").split(","):
+        tipo, _, parametros = parte.strip().partition(";")
+        if tipo.strip() not in (MEDIA_TYPE_MSGPACK, "application/x-msgpack"):
+            continue
+        parametros = parametros.replace(" ", "")
+        # `q=0` significa "no aceptable"
+        try:
+            return not parametros.startswith("q=") or float(parametros[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def list_response(filas: List[Dict[str, Any]], campos: Sequence[str], formato: Optional[str] = None,
+                  binario: bool = False, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Crea la respuesta de un listado en el formato pedido.
+
+    Args:
+        filas: Filas como diccionarios
+        campos: Campos de cada fila (para el formato en columnas)
+        formato: `FORMATO_FILAS` (por defecto) o `FORMATO_COLUMNAS`
+        binario: Codificar en MessagePack en lugar de JSON (ver `acepta_msgpack`)
+        headers: Encabezados adicionales
+
+    Returns:
+        Response: Respuesta con el listado
+    """
+    contenido = en_columnas(filas, campos) if formato == FORMATO_COLUMNAS else filas
+    headers = dict(headers or {}, Vary="Accept")
+    if binario:
+        return Response(msgpack_dumps(contenido), media_type=MEDIA_TYPE_MSGPACK, headers=headers)
+    return FastJSONResponse(contenido, headers=headers)
+
+
+class FastJSONResponse(Response):
+    """Respuesta JSON para contenido ya compuesto por tipos simples (sin validar con Pydantic)."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+async def iter_values(query: QuerySet, campos: Sequence[str], tamano_lote: int = 1000,
+                      offset: int = 0, limite: int = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Recorre una consulta por lotes ordenados por `id`, como diccionarios.
+
+    Sólo el primer lote usa `offset`; los siguientes continúan desde el último
+    `id` leído, así la base nunca vuelve a recorrer filas ya enviadas.
+
+    Args:
+        query: Consulta base
+        campos: Campos a leer (debe incluir "id")
+        tamano_lote: Cantidad de filas por consulta
+        offset: Filas a omitir al comienzo
+        limite: Cantidad máxima total de filas (None para todas)
+
+    Yields:
+        List[Dict[str, Any]]: Lotes de filas
+    """
+    ultimo_id = None
+    restantes = limite
+    while restantes is None or restantes > 0:
+        cantidad = tamano_lote if restantes is None else min(tamano_lote, restantes)
+        lote_query = query.order_by("id").limit(cantidad)
+        if ultimo_id is None:
+            lote_query = lote_query.offset(offset)
+        else:
+            lote_query = lote_query.filter(id__gt=ultimo_id)
+        filas = await lote_query.values(*campos)
+        if not filas:
+            break
+        yield filas
+        if restantes is not None:
+            restantes -= len(filas)
+        if len(filas) < cantidad:
+            break
+        ultimo_id = filas[-1]["id"]
+
+
+async def stream_json_array(lotes: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """
+    Codifica lotes de filas como un único arreglo JSON, un fragmento por lote.
+
+    Args:
+        lotes: Lotes de filas (por ejemplo, de `iter_values`)
+
+    Yields:
+        bytes: Fragmentos del arreglo JSON
+    """
+    primero = True
+    async for filas in lotes:
+        if not filas:
+            continue
+        # Codificar el lote como arreglo y quitarle los corchetes
+        cuerpo = json_dumps(filas)[1:-1]
+        yield (b"[" if primero else b",") + cuerpo
+        primero = False
+    yield b"[]" if primero else b"]"
+
+
+def streaming_json_response(lotes: AsyncIterator[List[Dict[str, Any]]], **kwargs) -> StreamingResponse:
+    """
+    Crea una respuesta que envía un arreglo JSON a medida que se leen los lotes.
+
+    Args:
+        lotes: Lotes de filas (por ejemplo, de `iter_values`)
+        **kwargs: Argumentos adicionales para `StreamingResponse`
+
+    Returns:
+        StreamingResponse: Respuesta con media type application/json
+    """
+    return StreamingResponse(stream_json_array(lotes), media_type="application/json", **kwargs)
@@ -0,0 +1,61 @@
+"""
+Agrupación de operaciones idénticas concurrentes ("single-flight").
+
+Si llegan varias peticiones que necesitan exactamente la misma consulta
+mientras la primera todavía se está ejecutando, las siguientes esperan el
+resultado de esa en lugar de lanzar otra. Un pico de lecturas del mismo dato
+se convierte así en una sola consulta a la base.
+
+No es una caché: cuando la operación termina, la siguiente petición vuelve a
+ejecutarla.
+
+La operación se ejecuta con la base del tenant de quien la inicia, así que
+en modo multi-tenant sólo se comparte entre peticiones del mismo tenant.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app.core.tenant import tenant_actual
+
+
+class SingleFlight:
+    """
+    Ejecuta una sola vez cada operación concurrente con la misma clave.
+
+    La operación corre en su propia tarea: si se cancela la petición que la
+    inició, las demás que la esperan reciben igualmente el resultado.
+
+    Atributos:
+        ejecutadas: Operaciones que se ejecutaron
+        compartidas: Llamadas que reutilizaron una operación en curso
+    """
+
+    def __init__(self):
+        self.ejecutadas = 0
+        self.compartidas = 0
+        self._en_curso: Dict[Hashable, asyncio.Task] = {}
+
+    async def ejecutar(self, clave: Hashable, funcion: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Devuelve el resultado de `funcion`, compartiéndolo con las llamadas concurrentes con la misma clave.
+
+        Args:
+            clave: Identifica la operación (por ejemplo, los parámetros de la consulta)
+            funcion: Corrutina a ejecutar si no hay una en curso con esa clave
+
+        Returns:
+            Any: Resultado de la operación (las excepciones también se comparten)
+        """
+        clave = (tenant_actual.get(), clave)
+        tarea = self._en_curso.get(clave)
+        if tarea is None:
+            tarea = asyncio.ensure_future(funcion())
+            self._en_curso[clave] = tarea
+            tarea.add_done_callback(lambda _: self._en_curso.pop(clave, None))
+            self.ejecutadas += 1
+        else:
+            self.compartidas += 1
+        return await asyncio.shield(tarea)
+
+    def stats(self) -> Dict[str, int]:
+        return {"ejecutadas": self.ejecutadas, "compartidas": self.compartidas, "en_curso": len(self._en_curso)}
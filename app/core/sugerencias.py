@@ -0,0 +1,389 @@
+"""
+Índice de sugerencias (autocompletado) para `GET /libros/sugerencias`.
+
+Sugiere títulos de libros que empiezan con el texto escrito y autores con
+alguna palabra del nombre que empieza con él ("garcia m" encuentra "Gabriel
+García Márquez"), sin distinguir mayúsculas ni acentos, del más popular al
+menos popular: un título por los préstamos del libro y un autor por los
+préstamos de todos sus libros (`resumen_prestamos_libro`).
+
+Cada proceso arma el índice la primera vez que se pide una sugerencia:
+
+- un arreglo de claves normalizadas ordenado, donde `bisect` encuentra el
+  rango de claves con el prefijo;
+- un árbol de segmentos que guarda en cada nodo la posición más popular de
+  su rango, así las `limite` más populares de un rango de cualquier tamaño
+  se obtienen en O(limite · log n) sin recorrerlo.
+
+Las escrituras de libros se aplican desde el registro de cambios
+(`app.db.cambios`) sin rearmar el índice: los títulos modificados o
+eliminados se marcan como quitados y los nuevos van a una lista ordenada
+aparte, donde también se busca el rango del prefijo. Se lee el registro cuando este proceso escribió
+libros o pasaron `SUGERENCIAS_REVISION` segundos. Cuando hay
+`SUGERENCIAS_MAX_PENDIENTES` cambios aplicados, o pasaron
+`SUGERENCIAS_RECONSTRUIR` segundos (para actualizar la popularidad), el
+índice se vuelve a armar en segundo plano mientras se sigue respondiendo con
+el anterior.
+
+En modo multi-tenant hay un índice por tenant (`indices_sugerencias`).
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+import time
+import unicodedata
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.response_cache import response_cache
+from app.core.serialization import iter_values
+from app.core.tenant import PorTenant
+from app.db.cambios import SecuenciaCompactada, estado_compactacion, leer_cambios
+from app.db.models.cambio import Cambio
+from app.db.models.libro import Libro
+from app.db.models.resumen import ResumenPrestamosLibro
+from app.db.tenants import gestor_tenants
+
+logger = logging.getLogger(__name__)
+
+# Mayor que cualquier carácter: límite superior del rango de un prefijo
+_FIN = chr(0x10FFFF)
+
+
+def normalizar(texto: str) -> str:
+    """Pasa a minúsculas, quita los acentos y colapsa los espacios."""
+    if not texto.isascii():
+        texto = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    return " ".join(texto.casefold().split())
+
+
+async def _prestamos(ids: Optional[List[int]] = None) -> Dict[int, int]:
+    query = ResumenPrestamosLibro.filter(prestamos__gt=0)
+    if ids is not None:
+        query = query.filter(libro_id__in=ids)
+    return dict(await query.values_list("libro_id", "prestamos"))
+
+
+class _Indice:
+    """Entradas ordenadas por clave, con el árbol de segmentos de la popularidad."""
+
+    def __init__(self, entradas: List[Tuple[str, str, int, int]]):
+        # (clave, texto, libro_id o -1 - código de autor, popularidad)
+        entradas.sort()
+        self.claves = [e[0] for e in entradas]
+        self.textos = [e[1] for e in entradas]
+        self.ids = array("q", (e[2] for e in entradas))
+        self.popularidad = array("q", (e[3] for e in entradas))
+
+        # Árbol completo: las hojas son las posiciones, cada nodo guarda la
+        # más popular de sus hijos (ante un empate, la de menor clave)
+        n = len(entradas)
+        self.hojas = 1
+        while self.hojas < n:
+            self.hojas *= 2
+        arbol = array("i", [-1]) * (2 * self.hojas)
+        arbol[self.hojas:self.hojas + n] = array("i", range(n))
+        popularidad = self.popularidad
+        for nodo in range(self.hojas - 1, 0, -1):
+            a, b = arbol[2 * nodo], arbol[2 * nodo + 1]
+            arbol[nodo] = a if b < 0 or popularidad[a] >= popularidad[b] else b
+        self.arbol = arbol
+
+    def __len__(self) -> int:
+        return len(self.claves)
+
+    def mas_populares(self, prefijo: str) -> Iterator[int]:
+        """Genera las posiciones cuya clave empieza con `prefijo`, de la más popular a la menos popular."""
+        arbol, popularidad = self.arbol, self.popularidad
+        pendientes = []
+
+        def agregar(nodo: int):
+            p = arbol[nodo]
+            if p >= 0:
+                heapq.heappush(pendientes, (-popularidad[p], p, nodo))
+
+        # Nodos que cubren exactamente el rango [inicio, fin)
+        inicio = bisect.bisect_left(self.claves, prefijo) + self.hojas
+        fin = bisect.bisect_left(self.claves, prefijo + _FIN) + self.hojas
+        while inicio < fin:
+            if inicio & 1:
+                agregar(inicio)
+                inicio += 1
+            if fin & 1:
+                fin -= 1
+                agregar(fin)
+            inicio >>= 1
+            fin >>= 1
+
+        while pendientes:
+            _, p, nodo = heapq.heappop(pendientes)
+            if nodo >= self.hojas:
+                yield p
+            else:
+                agregar(2 * nodo)
+                agregar(2 * nodo + 1)
+
+
+class _Sugerencias:
+    """Un índice armado más los cambios aplicados después."""
+
+    def __init__(self):
+        self.indice = _Indice([])
+        # Autor de cada libro (código, -1 si no existe) y, por autor
+        # normalizado: [nombre, libros, popularidad al armar el índice]
+        self.autor_por_libro = array("i")
+        self.codigos: Dict[str, int] = {}
+        self.claves_autor: List[str] = []
+        self.autores: Dict[str, List[Any]] = {}
+        # Cambios posteriores al armado del índice
+        self.quitados: Set[int] = set()  # Libros cuyo título en el índice ya no vale
+        self.nuevos: Dict[int, Tuple[str, str, int]] = {}  # libro_id -> (clave, título, popularidad)
+        self.orden_nuevos: List[Tuple[str, int]] = []  # (clave, libro_id) de `nuevos`, ordenadas
+        self.autores_nuevos: Set[str] = set()  # Autores que no están en el índice
+        self.pendientes = 0
+
+    def _autor(self, libro_id: int, autor: Optional[str], popularidad: int = 0):
+        # Quita el libro de su autor anterior y lo suma al nuevo (None: baja).
+        # La popularidad de los autores sólo se calcula al armar el índice
+        if libro_id < len(self.autor_por_libro) and self.autor_por_libro[libro_id] >= 0:
+            self.autores[self.claves_autor[self.autor_por_libro[libro_id]]][1] -= 1
+        if libro_id >= len(self.autor_por_libro):
+            self.autor_por_libro.extend([-1] * (libro_id + 1 - len(self.autor_por_libro)))
+        if autor is None:
+            self.autor_por_libro[libro_id] = -1
+            return
+        clave = normalizar(autor)
+        codigo = self.codigos.get(clave)
+        if codigo is None:
+            codigo = self.codigos[clave] = len(self.claves_autor)
+            self.claves_autor.append(clave)
+            self.autores[clave] = [autor, 0, 0]
+        self.autor_por_libro[libro_id] = codigo
+        datos = self.autores[clave]
+        datos[1] += 1
+        datos[2] += popularidad
+
+    def armar(self, libros: List[Tuple[int, str, str]], prestamos: Dict[int, int]):
+        """Arma el índice (puede tardar: llamar fuera del event loop)."""
+        entradas = []
+        for libro_id, titulo, autor in libros:
+            popularidad = prestamos.get(libro_id, 0)
+            entradas.append((normalizar(titulo), titulo, libro_id, popularidad))
+            self._autor(libro_id, autor, popularidad)
+        # Cada autor también desde cada palabra de su nombre
+        for codigo, clave in enumerate(self.claves_autor):
+            nombre, _, popularidad = self.autores[clave]
+            palabras = clave.split(" ")
+            entradas.extend((" ".join(palabras[i:]), nombre, -1 - codigo, popularidad) for i in range(len(palabras)))
+        self.indice = _Indice(entradas)
+
+    def guardar(self, libro_id: int, titulo: str, autor: str, popularidad: int):
+        """Aplica el alta o la modificación de un libro."""
+        clave = normalizar(autor)
+        if clave not in self.autores:
+            self.autores_nuevos.add(clave)
+        self._autor(libro_id, autor)
+        self.quitados.add(libro_id)
+        self._quitar_nuevo(libro_id)
+        self.nuevos[libro_id] = (normalizar(titulo), titulo, popularidad)
+        bisect.insort(self.orden_nuevos, (self.nuevos[libro_id][0], libro_id))
+        self.pendientes += 1
+
+    def _quitar_nuevo(self, libro_id: int):
+        anterior = self.nuevos.pop(libro_id, None)
+        if anterior is not None:
+            del self.orden_nuevos[bisect.bisect_left(self.orden_nuevos, (anterior[0], libro_id))]
+
+    def eliminar(self, libro_id: int):
+        """Aplica la baja de un libro."""
+        self._quitar_nuevo(libro_id)
+        self._autor(libro_id, None)
+        self.quitados.add(libro_id)
+        self.pendientes += 1
+
+    def sugerir(self, prefijo: str, limite: int) -> List[Dict[str, Any]]:
+        """Ver `IndiceSugerencias.sugerir`."""
+        indice = self.indice
+        candidatas = []
+        vistas = set()
+        for p in indice.mas_populares(prefijo):
+            libro_id = indice.ids[p]
+            if libro_id > 0:
+                if libro_id in self.quitados:
+                    continue
+                sugerencia = ("titulo", indice.textos[p], libro_id)
+            else:
+                clave = self.claves_autor[-1 - libro_id]
+                if not self.autores[clave][1]:
+                    continue
+                sugerencia = ("autor", indice.textos[p], None)
+            # Varios libros con el mismo título se sugieren una vez
+            if sugerencia[:2] in vistas:
+                continue
+            vistas.add(sugerencia[:2])
+            candidatas.append((-indice.popularidad[p], indice.claves[p] if libro_id > 0 else clave, sugerencia))
+            if len(candidatas) == limite:
+                break
+
+        # Los títulos cambiados después de armar el índice, por su rango de
+        # claves; los autores nuevos son pocos y se recorren completos
+        i = bisect.bisect_left(self.orden_nuevos, (prefijo,))
+        while i < len(self.orden_nuevos) and self.orden_nuevos[i][0].startswith(prefijo):
+            clave, titulo, popularidad = self.nuevos[self.orden_nuevos[i][1]]
+            candidatas.append((-popularidad, clave, ("titulo", titulo, self.orden_nuevos[i][1])))
+            i += 1
+        for clave in self.autores_nuevos:
+            datos = self.autores[clave]
+            if datos[1] and (clave.startswith(prefijo) or " " + prefijo in clave):
+                candidatas.append((-datos[2], clave, ("autor", datos[0], None)))
+
+        candidatas.sort(key=lambda c: c[:2])
+        sugerencias = []
+        vistas = set()
+        for popularidad, _, (tipo, texto, libro_id) in candidatas:
+            if (tipo, texto) in vistas:
+                continue
+            vistas.add((tipo, texto))
+            sugerencias.append({"texto": texto, "tipo": tipo, "libro_id": libro_id, "prestamos": -popularidad})
+            if len(sugerencias) == limite:
+                break
+        return sugerencias
+
+
+class IndiceSugerencias:
+    """
+    Índice de sugerencias de títulos y autores (ver la documentación del módulo).
+
+    Atributos:
+        revision: Segundos máximos entre lecturas del registro de cambios
+        reconstruir: Segundos entre armados completos del índice
+        max_pendientes: Cambios aplicados que provocan un nuevo armado
+        consultas: Sugerencias respondidas
+        armados: Veces que se armó el índice
+    """
+
+    def __init__(self, revision: float, reconstruir: float, max_pendientes: int):
+        self.revision = revision
+        self.reconstruir = reconstruir
+        self.max_pendientes = max_pendientes
+        self._sugerencias: Optional[_Sugerencias] = None
+        self._seq = 0
+        self._generacion: Optional[int] = None
+        self._sucio = False
+        self._ultima_revision = 0.0
+        self._armado = 0.0
+        self._lock = asyncio.Lock()
+        self._armando: Optional[asyncio.Task] = None
+        self.consultas = 0
+        self.armados = 0
+
+    def marcar_desactualizado(self, *_):
+        """Hace que la próxima consulta lea antes el registro de cambios."""
+        self._sucio = True
+
+    async def _escritura_local(self):
+        self.marcar_desactualizado()
+
+    async def _armar(self) -> Tuple[_Sugerencias, int, Optional[int]]:
+        # La secuencia se lee antes que los libros: los cambios que ocurran
+        # mientras tanto se vuelven a aplicar después, sin efecto
+        seq = await Cambio.filter(entidad="libro").order_by("-seq").first().values_list("seq", flat=True)
+        _, generacion = await estado_compactacion()
+        prestamos = await _prestamos()
+        libros = []
+        async for lote in iter_values(Libro.all(), ("id", "titulo", "autor"), tamano_lote=5000):
+            libros.extend((fila["id"], fila["titulo"], fila["autor"]) for fila in lote)
+        sugerencias = _Sugerencias()
+        await asyncio.to_thread(sugerencias.armar, libros, prestamos)
+        self.armados += 1
+        logger.info("Índice de sugerencias armado: %d entradas", len(sugerencias.indice))
+        return sugerencias, seq or 0, generacion
+
+    async def _reemplazar(self):
+        # Arma un índice nuevo y lo reemplaza; mientras tanto se responde con el actual
+        try:
+            async with gestor_tenants.retener():
+                sugerencias, seq, generacion = await self._armar()
+            async with self._lock:
+                self._sugerencias, self._seq, self._generacion = sugerencias, seq, generacion
+                self._armado = time.monotonic()
+                self._sucio = True
+        except Exception:
+            logger.exception("Error al armar el índice de sugerencias")
+        finally:
+            self._armando = None
+
+    async def sincronizar(self):
+        """Arma el índice la primera vez o aplica los cambios pendientes, si hace falta."""
+        ahora = time.monotonic()
+        if self._sugerencias is not None and self._armando is None and (
+            self._sugerencias.pendientes >= self.max_pendientes or ahora - self._armado >= self.reconstruir
+        ):
+            self._armando = asyncio.create_task(self._reemplazar())
+        if self._sugerencias is not None and not self._sucio and ahora - self._ultima_revision < self.revision:
+            return
+
+        async with self._lock:
+            if self._sugerencias is None:
+                self._sugerencias, self._seq, self._generacion = await self._armar()
+                self._armado = self._ultima_revision = time.monotonic()
+                self._sucio = False
+                return
+            if not self._sucio and time.monotonic() - self._ultima_revision < self.revision:
+                return
+            # Antes de leer: una escritura que ocurra durante la lectura vuelve a marcarlo
+            self._sucio = False
+            self._ultima_revision = time.monotonic()
+            try:
+                mas = True
+                while mas:
+                    lote = await leer_cambios("libro", self._seq, 5000, self._generacion)
+                    prestamos = await _prestamos([fila["id"] for fila in lote["cambios"]])
+                    for libro_id in lote["bajas"]:
+                        self._sugerencias.eliminar(libro_id)
+                    for fila in lote["cambios"]:
+                        self._sugerencias.guardar(
+                            fila["id"], fila["titulo"], fila["autor"], prestamos.get(fila["id"], 0)
+                        )
+                    self._seq, self._generacion, mas = lote["hasta"], lote["generacion"], lote["mas"]
+            except SecuenciaCompactada:
+                self._sugerencias, self._seq, self._generacion = await self._armar()
+                self._armado = time.monotonic()
+
+    async def sugerir(self, texto: str, limite: int = 10) -> List[Dict[str, Any]]:
+        """
+        Títulos y autores que empiezan con `texto`, de los más prestados a los menos prestados.
+
+        Args:
+            texto: Lo escrito hasta ahora (un espacio al final exige que la
+                palabra esté completa)
+            limite: Cantidad máxima de sugerencias
+
+        Returns:
+            List[Dict[str, Any]]: `texto`, `tipo` ("titulo" o "autor"),
+            `libro_id` (sólo títulos) y `prestamos`
+        """
+        prefijo = normalizar(texto)
+        if not prefijo:
+            return []
+        if texto[-1].isspace():
+            prefijo += " "
+        await self.sincronizar()
+        self.consultas += 1
+        return self._sugerencias.sugerir(prefijo, limite)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entradas": len(self._sugerencias.indice) if self._sugerencias else 0,
+            "pendientes": self._sugerencias.pendientes if self._sugerencias else 0,
+            "consultas": self.consultas,
+            "armados": self.armados,
+        }
+
+
+indices_sugerencias = PorTenant(lambda: IndiceSugerencias(
+    settings.SUGERENCIAS_REVISION, settings.SUGERENCIAS_RECONSTRUIR, settings.SUGERENCIAS_MAX_PENDIENTES
+))
+response_cache.al_invalidar("libros", lambda: indices_sugerencias.actual()._escritura_local())
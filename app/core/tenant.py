@@ -0,0 +1,153 @@
+"""
+Tenant (biblioteca escolar) de la petición actual, para el modo multi-tenant.
+
+Con `TENANTS_ENABLED`, cada escuela tiene su propia base SQLite (ver
+`app.db.tenants`). `TenantMiddleware` elige el tenant de cada petición, por
+orden:
+
+1. el encabezado `TENANTS_HEADER` (por defecto `X-Tenant`);
+2. el subdominio del host, si está configurado `TENANTS_DOMINIO`
+   (`escuela1.biblioteca.example.com` -> `escuela1`);
+3. el claim `TENANTS_CLAIM` del token JWT (sin verificar aquí: la firma y
+   que el tenant del token coincida con el de la petición los comprueba
+   `verify_token`).
+
+Mientras se atiende la petición, `tenant_actual` tiene el nombre del tenant
+y las conexiones "default" y "lectura" de Tortoise apuntan a su base, así
+los modelos, las transacciones y el SQL directo no cambian.
+
+Lo que se guarda en memoria en cada proceso tiene que separar los tenants:
+las claves de las cachés compartidas se califican con `calificar`, y los
+objetos con datos de una base (catálogo en memoria, índice de sugerencias)
+se crean uno por tenant con `PorTenant`.
+"""
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+
+# Nombre del tenant de la petición (None fuera de una petición o sin multi-tenant)
+tenant_actual: ContextVar[Optional[str]] = ContextVar("tenant_actual", default=None)
+
+_por_tenant: List["PorTenant"] = []
+
+
+def calificar(clave: str) -> str:
+    """Antepone el tenant actual a una clave de caché o de estado compartido."""
+    tenant = tenant_actual.get()
+    return f"{tenant}/{clave}" if tenant else clave
+
+
+class PorTenant:
+    """
+    Una instancia de un objeto en memoria por tenant (una sola sin multi-tenant).
+
+    Las instancias de un tenant se descartan cuando se cierra su base.
+    """
+
+    def __init__(self, fabrica: Callable[[], Any]):
+        self._fabrica = fabrica
+        self._instancias: Dict[Optional[str], Any] = {}
+        _por_tenant.append(self)
+
+    def actual(self) -> Any:
+        """Devuelve (o crea) la instancia del tenant actual."""
+        tenant = tenant_actual.get()
+        instancia = self._instancias.get(tenant)
+        if instancia is None:
+            instancia = self._instancias[tenant] = self._fabrica()
+        return instancia
+
+    def existente(self, tenant: Optional[str]) -> Any:
+        """Devuelve la instancia de un tenant si ya existe, sin crearla."""
+        return self._instancias.get(tenant)
+
+    def descartar(self, tenant: Optional[str]):
+        self._instancias.pop(tenant, None)
+
+    def sumar_stats(self) -> Dict[str, int]:
+        """Suma los `stats()` de las instancias de todos los tenants."""
+        totales: Dict[str, int] = {}
+        for instancia in list(self._instancias.values()):
+            for nombre, valor in instancia.stats().items():
+                totales[nombre] = totales.get(nombre, 0) + valor
+        return totales
+
+
+def descartar_tenant(tenant: str):
+    """Descarta los objetos en memoria de un tenant (al cerrar su base)."""
+    for por_tenant in _por_tenant:
+        por_tenant.descartar(tenant)
+
+
+def _subdominio(host: str) -> Optional[str]:
+    host = host.split(":", 1)[0].lower()
+    dominio = settings.TENANTS_DOMINIO.lower()
+    if host.endswith("." + dominio):
+        return host[:-len(dominio) - 1]
+    return None
+
+
+def _claim(autorizacion: str) -> Optional[str]:
+    esquema, _, token = autorizacion.partition(" ")
+    if esquema.lower() != "bearer" or not token:
+        return None
+    from jose import JWTError, jwt
+    try:
+        return jwt.get_unverified_claims(token).get(settings.TENANTS_CLAIM)
+    except JWTError:
+        return None
+
+
+class TenantMiddleware:
+    """
+    Atiende cada petición con la base de su tenant (ver la documentación del módulo).
+
+    Las rutas de `libres` (documentación, métricas) no necesitan tenant. Sin
+    tenant se responde 400, y con un tenant inexistente o un nombre inválido,
+    404.
+    """
+
+    def __init__(self, app, gestor, libres=("/", "/docs", "/redoc", "/openapi.json", "/metrics")):
+        self.app = app
+        self.gestor = gestor
+        self.libres = frozenset(libres)
+
+    def resolver(self, scope) -> Optional[str]:
+        """Nombre del tenant de una petición (None si no indica ninguno)."""
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", ())}
+        tenant = headers.get(settings.TENANTS_HEADER.lower())
+        if not tenant and settings.TENANTS_DOMINIO and "host" in headers:
+            tenant = _subdominio(headers["host"])
+        if not tenant and "authorization" in headers:
+            tenant = _claim(headers["authorization"])
+        return tenant or None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tenant = self.resolver(scope)
+        if tenant is None:
+            if scope["path"] in self.libres:
+                await self.app(scope, receive, send)
+                return
+            respuesta = JSONResponse({"detail": "Falta indicar la biblioteca (tenant)"}, status_code=400)
+            await respuesta(scope, receive, send)
+            return
+
+        from app.db.tenants import TenantDesconocido, TenantInvalido
+        contexto = self.gestor.usar(tenant)
+        try:
+            await contexto.__aenter__()
+        except (TenantDesconocido, TenantInvalido):
+            respuesta = JSONResponse({"detail": f"No existe la biblioteca '{tenant}'"}, status_code=404)
+            await respuesta(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            await contexto.__aexit__(None, None, None)
@@ -0,0 +1,326 @@
+"""
+Cola de trabajos persistente para las operaciones costosas.
+
+Las operaciones que procesan muchas filas (por ejemplo, actualizar libros en
+masa) no se ejecutan dentro del handler: la ruta encola un trabajo en la
+tabla `trabajos` y responde de inmediato con su ID; el avance se consulta en
+`GET /admin/jobs/{id}`.
+
+- Cada tipo de trabajo se registra con `cola_trabajos.registrar`, indicando
+  la función que lo ejecuta, el esquema de sus parámetros y cuántos trabajos
+  de ese tipo pueden ejecutarse a la vez.
+- `despachar` toma los trabajos pendientes que entran en los límites de
+  concurrencia y los ejecuta como tareas del event loop. Se registra como
+  tarea periódica, así que con varios workers sólo despacha el líder y los
+  límites valen para toda la aplicación.
+- Los trabajos que estaban en curso cuando el proceso terminó vuelven a
+  quedar pendientes y se ejecutan de nuevo desde el principio: las funciones
+  de trabajo deben poder repetirse sin efectos indeseados.
+- Con una clave de idempotencia, encolar dos veces el mismo trabajo devuelve
+  el trabajo existente.
+- En modo multi-tenant cada tenant tiene su tabla `trabajos` y los límites de
+  concurrencia son comunes a todos. El líder sólo revisa los tenants que
+  pueden tener trabajos pendientes: todos al iniciar, y después los que
+  encolaron uno (lo avisan por el canal "trabajos" del estado compartido).
+"""
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel
+from tortoise import timezone
+from tortoise.exceptions import IntegrityError
+from tortoise.expressions import F
+
+from app.core.compartido import estado_compartido
+from app.core.config import settings
+from app.core.tenant import tenant_actual
+from app.db.models.trabajo import Trabajo
+from app.db.tenants import gestor_tenants
+
+logger = logging.getLogger(__name__)
+
+
+class TipoTrabajoDesconocido(Exception):
+    """No hay ningún tipo de trabajo registrado con ese nombre."""
+
+
+class ConflictoIdempotencia(Exception):
+    """La clave de idempotencia ya se usó para un trabajo con otros parámetros."""
+
+
+class Progreso:
+    """
+    Avance de un trabajo en ejecución, que se guarda en la tabla `trabajos`.
+
+    Atributos:
+        trabajo_id: ID del trabajo
+        procesados: Elementos procesados hasta el momento
+        total: Elementos a procesar (None mientras no se conozca)
+    """
+
+    def __init__(self, trabajo_id: int):
+        self.trabajo_id = trabajo_id
+        self.procesados = 0
+        self.total: Optional[int] = None
+
+    async def avanzar(self, procesados: int, total: Optional[int] = None):
+        """
+        Suma elementos procesados y guarda el avance.
+
+        Args:
+            procesados: Elementos procesados desde la llamada anterior
+            total: Total de elementos, si se acaba de conocer
+        """
+        self.procesados += procesados
+        if total is not None:
+            self.total = total
+        await Trabajo.filter(id=self.trabajo_id).update(progreso=self.procesados, total=self.total)
+
+
+# Recibe los parámetros (validados con el esquema del tipo) y el progreso;
+# devuelve el resultado que se guarda en el trabajo
+FuncionTrabajo = Callable[[Any, Progreso], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class TipoTrabajo:
+    """
+    Tipo de trabajo registrado en la cola.
+
+    Atributos:
+        nombre: Nombre del tipo (por ejemplo, "libros.actualizar")
+        funcion: Función que ejecuta el trabajo
+        esquema: Modelo de pydantic de los parámetros
+        concurrencia: Trabajos de este tipo que pueden ejecutarse a la vez
+    """
+
+    def __init__(self, nombre: str, funcion: FuncionTrabajo, esquema: Type[BaseModel], concurrencia: int):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.esquema = esquema
+        self.concurrencia = concurrencia
+
+
+class ColaTrabajos:
+    """
+    Cola de trabajos respaldada por la tabla `trabajos`.
+
+    Atributos:
+        concurrencia: Trabajos en ejecución a la vez, de todos los tipos
+        tipos: Tipos de trabajo registrados
+        completados: Trabajos terminados con éxito por este proceso
+        fallidos: Trabajos terminados con error por este proceso
+    """
+
+    def __init__(self, concurrencia: int):
+        self.concurrencia = concurrencia
+        self.tipos: Dict[str, TipoTrabajo] = {}
+        self.completados = 0
+        self.fallidos = 0
+        # Claves (tenant, id del trabajo); el tenant es None sin multi-tenant
+        self._en_curso: Dict[Tuple[Optional[str], int], asyncio.Task] = {}
+        self._por_tipo: Dict[str, int] = {}
+        self._recuperados: Set[Optional[str]] = set()
+        # Tenants que pueden tener trabajos pendientes (None: todavía no se revisó ninguno)
+        self._con_pendientes: Optional[Set[str]] = None
+
+    def registrar(self, nombre: str, funcion: FuncionTrabajo, esquema: Type[BaseModel], concurrencia: int = 1):
+        """
+        Registra un tipo de trabajo.
+
+        Args:
+            nombre: Nombre del tipo
+            funcion: Función que ejecuta el trabajo
+            esquema: Modelo de pydantic de los parámetros
+            concurrencia: Trabajos de este tipo que pueden ejecutarse a la vez
+        """
+        self.tipos[nombre] = TipoTrabajo(nombre, funcion, esquema, concurrencia)
+
+    def validar(self, tipo: str, parametros: Dict[str, Any]) -> BaseModel:
+        """
+        Valida los parámetros de un trabajo según su tipo.
+
+        Args:
+            tipo: Nombre del tipo de trabajo
+            parametros: Parámetros recibidos
+
+        Returns:
+            BaseModel: Parámetros validados
+
+        Raises:
+            TipoTrabajoDesconocido: Si el tipo no está registrado
+            pydantic.ValidationError: Si los parámetros no son válidos
+        """
+        if tipo not in self.tipos:
+            raise TipoTrabajoDesconocido(tipo)
+        return self.tipos[tipo].esquema.model_validate(parametros)
+
+    async def encolar(
+        self, tipo: str, parametros: BaseModel, clave: Optional[str] = None, usuario_id: Optional[int] = None
+    ) -> Tuple[Trabajo, bool]:
+        """
+        Encola un trabajo.
+
+        Args:
+            tipo: Nombre del tipo de trabajo
+            parametros: Parámetros ya validados (ver `validar`)
+            clave: Clave de idempotencia (opcional)
+            usuario_id: Usuario que encola el trabajo
+
+        Returns:
+            Tuple[Trabajo, bool]: El trabajo y si se creó (False si ya existía uno con la misma clave)
+
+        Raises:
+            ConflictoIdempotencia: Si la clave ya se usó con otro tipo u otros parámetros
+        """
+        datos = parametros.model_dump(mode="json")
+        try:
+            trabajo = await Trabajo.create(tipo=tipo, parametros=datos, clave=clave, usuario_id=usuario_id)
+        except IntegrityError:
+            if clave is None:
+                raise
+        else:
+            tenant = tenant_actual.get()
+            if tenant is not None:
+                self._avisar(tenant)
+                await estado_compartido.publicar("trabajos", tenant)
+            return trabajo, True
+        # La restricción única de `clave` resuelve los reintentos simultáneos
+        existente = await Trabajo.get(clave=clave)
+        if existente.tipo != tipo or existente.parametros != datos:
+            raise ConflictoIdempotencia(clave)
+        return existente, False
+
+    async def _recuperar(self):
+        # Trabajos que quedaron en curso al terminar el proceso que los ejecutaba
+        recuperados = await Trabajo.filter(estado="en_curso").update(estado="pendiente")
+        if recuperados:
+            logger.warning("Se retoman %d trabajos interrumpidos", recuperados)
+        self._recuperados.add(tenant_actual.get())
+
+    def _avisar(self, tenant: str):
+        # Un tenant encoló un trabajo (en este u otro worker)
+        if self._con_pendientes is not None:
+            self._con_pendientes.add(tenant)
+
+    async def despachar(self) -> int:
+        """
+        Inicia los trabajos pendientes que entran en los límites de concurrencia.
+
+        En modo multi-tenant recorre los tenants que pueden tener trabajos
+        pendientes.
+
+        Returns:
+            int: Trabajos iniciados
+        """
+        if not settings.TENANTS_ENABLED:
+            return await self._despachar()
+        if self._con_pendientes is None:
+            self._con_pendientes = set(gestor_tenants.listar())
+        iniciados = 0
+        for tenant in sorted(self._con_pendientes):
+            if len(self._en_curso) >= self.concurrencia:
+                break
+            # Se quita antes de revisarlo: un aviso que llegue mientras tanto lo vuelve a agregar
+            self._con_pendientes.discard(tenant)
+            try:
+                async with gestor_tenants.usar(tenant):
+                    iniciados += await self._despachar()
+            except Exception:
+                logger.exception("Error al despachar los trabajos del tenant %s", tenant)
+        return iniciados
+
+    async def _despachar(self) -> int:
+        tenant = tenant_actual.get()
+        if tenant not in self._recuperados:
+            await self._recuperar()
+        iniciados = 0
+        while True:
+            disponibles = [
+                nombre for nombre, tipo in self.tipos.items() if self._por_tipo.get(nombre, 0) < tipo.concurrencia
+            ]
+            if len(self._en_curso) >= self.concurrencia or not disponibles:
+                # Puede quedar trabajo pendiente para cuando haya lugar
+                if tenant is not None:
+                    self._avisar(tenant)
+                break
+            fila = await Trabajo.filter(estado="pendiente", tipo__in=disponibles).order_by("id").first().values(
+                "id", "tipo", "parametros"
+            )
+            if fila is None:
+                # Los trabajos de los tipos sin lugar no se buscaron
+                if tenant is not None and len(disponibles) < len(self.tipos) and (
+                    await Trabajo.filter(estado="pendiente").exists()
+                ):
+                    self._avisar(tenant)
+                break
+            # Tomar el trabajo sólo si sigue pendiente
+            tomado = await Trabajo.filter(id=fila["id"], estado="pendiente").update(
+                estado="en_curso", fecha_inicio=timezone.now(), progreso=0, intentos=F("intentos") + 1
+            )
+            if not tomado:
+                continue
+            tipo = self.tipos[fila["tipo"]]
+            self._por_tipo[tipo.nombre] = self._por_tipo.get(tipo.nombre, 0) + 1
+            self._en_curso[(tenant, fila["id"])] = asyncio.create_task(
+                self._ejecutar(fila["id"], tipo, fila["parametros"]), name=f"trabajo-{fila['id']}"
+            )
+            iniciados += 1
+        return iniciados
+
+    async def _ejecutar(self, trabajo_id: int, tipo: TipoTrabajo, parametros: Dict[str, Any]):
+        clave = (tenant_actual.get(), trabajo_id)
+        try:
+            # La base del tenant queda abierta mientras dura el trabajo
+            async with gestor_tenants.retener():
+                await self._ejecutar_en_base(trabajo_id, tipo, parametros)
+        finally:
+            self._en_curso.pop(clave, None)
+            self._por_tipo[tipo.nombre] -= 1
+
+    async def _ejecutar_en_base(self, trabajo_id: int, tipo: TipoTrabajo, parametros: Dict[str, Any]):
+        try:
+            resultado = await tipo.funcion(tipo.esquema.model_validate(parametros), Progreso(trabajo_id))
+        except asyncio.CancelledError:
+            # Proceso deteniéndose: el trabajo sigue "en_curso" y se retoma al volver a despachar
+            raise
+        except Exception as e:
+            self.fallidos += 1
+            logger.exception("Error en el trabajo %d (%s)", trabajo_id, tipo.nombre)
+            await Trabajo.filter(id=trabajo_id).update(
+                estado="fallido", error=str(e) or type(e).__name__, fecha_fin=timezone.now()
+            )
+        else:
+            self.completados += 1
+            await Trabajo.filter(id=trabajo_id).update(
+                estado="completado", resultado=resultado, fecha_fin=timezone.now()
+            )
+
+    async def detener(self):
+        """Cancela los trabajos en ejecución; quedan para retomarse más adelante."""
+        tareas = list(self._en_curso.values())
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        self._recuperados.clear()
+        self._con_pendientes = None
+
+    async def purgar(self) -> int:
+        """
+        Elimina los trabajos terminados hace más de `TRABAJOS_RETENCION_DIAS`.
+
+        Returns:
+            int: Trabajos eliminados
+        """
+        limite = timezone.now() - timedelta(days=settings.TRABAJOS_RETENCION_DIAS)
+        return await Trabajo.filter(estado__in=("completado", "fallido"), fecha_fin__lt=limite).delete()
+
+    def stats(self) -> Dict[str, int]:
+        return {"en_curso": len(self._en_curso), "completados": self.completados, "fallidos": self.fallidos}
+
+
+cola_trabajos = ColaTrabajos(settings.TRABAJOS_CONCURRENCIA)
+
+# Trabajos encolados en otros workers (sólo en modo multi-tenant)
+estado_compartido.suscribir("trabajos", cola_trabajos._avisar)
@@ -1,8 +1,9 @@
 from tortoise import Tortoise
 
+from app.db.config import tortoise_config, verificar_configuracion
+from app.db.migraciones import migrar
+
 async def init_db():
-    await Tortoise.init(
-        db_url='sqlite://biblioteca.db',
-        modules={'models': ['app.models']}
-    )
-    await Tortoise.generate_schemas()
+    await Tortoise.init(config=tortoise_config())
+    await migrar()
+    await verificar_configuracion()
\ No newline at end of file
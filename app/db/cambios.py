@@ -0,0 +1,219 @@
+"""
+Registro de cambios (change data capture) de libros y usuarios.
+
+Cada alta, modificación o baja de un libro o un usuario agrega una fila a
+`cambios` con un número de secuencia creciente. Igual que el índice de texto
+completo y las tablas de resumen, la escriben triggers de SQLite, así quedan
+registrados todos los caminos de escritura (rutas, importaciones, trabajos
+masivos, upserts) en la misma transacción que el cambio. Las bajas dejan una
+fila con `baja = 1` (tombstone).
+
+Los clientes se sincronizan pidiendo los cambios posteriores a la última
+secuencia que recibieron (`leer_cambios`): por cada entidad modificada
+reciben su estado actual, y por cada entidad eliminada sólo su ID. Como
+SQLite admite un solo escritor, las secuencias se confirman en orden y un
+lector nunca ve la secuencia N+1 sin la N.
+
+El registro se compacta periódicamente (`compactar_cambios`):
+
+- de cada entidad se conserva sólo la última entrada, porque el cliente
+  recibe igual el estado actual;
+- los tombstones más antiguos que la retención se eliminan, la mayor
+  secuencia eliminada queda como `seq_minimo` y aumenta la generación.
+
+Cada respuesta incluye la generación vigente, y el cliente la devuelve junto
+con su secuencia. Si su secuencia es anterior a `seq_minimo` y la recibió en
+una generación anterior, puede haberse perdido bajas y debe volver a
+sincronizar desde 0. Si la recibió en la generación vigente no perdió nada:
+la compactación ya había quitado también las entradas de las entidades que
+esos tombstones eliminaron.
+
+Al crear el registro se agrega una entrada por cada libro y usuario
+existente, así la sincronización desde 0 trae el contenido completo.
+"""
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+
+from app.core.config import settings
+from app.db.config import read_connection_name
+from app.db.models.cambio import Cambio
+from app.db.models.libro import Libro
+from app.db.models.usuario import Usuario
+from app.schemas.libro import CAMPOS_LIBRO
+from app.schemas.usuario import CAMPOS_USUARIO
+
+logger = logging.getLogger(__name__)
+
+# Segundos desde la época con fracción (unixepoch() de SQLite es entero)
+_AHORA = "(julianday('now') - 2440587.5) * 86400.0"
+
+# Modelo y campos que se envían de cada entidad
+ENTIDADES = {
+    "libro": (Libro, CAMPOS_LIBRO),
+    "usuario": (Usuario, CAMPOS_USUARIO),
+}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS cambios_compactacion (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    seq_minimo INTEGER NOT NULL,
+    generacion INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS cambios_libros_ai AFTER INSERT ON libros BEGIN
+    INSERT INTO cambios (entidad, entidad_id, baja, momento) VALUES ('libro', new.id, 0, {_AHORA});
+END;
+CREATE TRIGGER IF NOT EXISTS cambios_libros_au AFTER UPDATE ON libros
+WHEN old.titulo IS NOT new.titulo OR old.autor IS NOT new.autor OR old.isbn IS NOT new.isbn
+    OR old.categoria IS NOT new.categoria OR old.estado IS NOT new.estado BEGIN
+    INSERT INTO cambios (entidad, entidad_id, baja, momento) VALUES ('libro', new.id, 0, {_AHORA});
+END;
+CREATE TRIGGER IF NOT EXISTS cambios_libros_ad AFTER DELETE ON libros BEGIN
+    INSERT INTO cambios (entidad, entidad_id, baja, momento) VALUES ('libro', old.id, 1, {_AHORA});
+END;
+CREATE TRIGGER IF NOT EXISTS cambios_usuarios_ai AFTER INSERT ON usuarios BEGIN
+    INSERT INTO cambios (entidad, entidad_id, baja, momento) VALUES ('usuario', new.id, 0, {_AHORA});
+END;
+CREATE TRIGGER IF NOT EXISTS cambios_usuarios_au AFTER UPDATE OF username, email, nombre, rol, activo ON usuarios
+WHEN old.username IS NOT new.username OR old.email IS NOT new.email OR old.nombre IS NOT new.nombre
+    OR old.rol IS NOT new.rol OR old.activo IS NOT new.activo BEGIN
+    INSERT INTO cambios (entidad, entidad_id, baja, momento) VALUES ('usuario', new.id, 0, {_AHORA});
+END;
+CREATE TRIGGER IF NOT EXISTS cambios_usuarios_ad AFTER DELETE ON usuarios BEGIN
+    INSERT INTO cambios (entidad, entidad_id, baja, momento) VALUES ('usuario', old.id, 1, {_AHORA});
+END;
+"""
+
+_REGISTRAR_EXISTENTES = (
+    f"INSERT INTO cambios (entidad, entidad_id, baja, momento) SELECT 'libro', id, 0, {_AHORA} FROM libros ORDER BY id",
+    f"INSERT INTO cambios (entidad, entidad_id, baja, momento) SELECT 'usuario', id, 0, {_AHORA} FROM usuarios ORDER BY id",
+)
+
+# Entradas reemplazadas por una posterior de la misma entidad
+_COMPACTAR = (
+    "DELETE FROM cambios WHERE seq NOT IN (SELECT MAX(seq) FROM cambios GROUP BY entidad, entidad_id)"
+)
+
+
+class SecuenciaCompactada(Exception):
+    """La secuencia pedida es anterior a tombstones ya eliminados por la compactación."""
+
+    def __init__(self, seq_minimo: int):
+        super().__init__(f"Los cambios anteriores a la secuencia {seq_minimo} ya se compactaron")
+        self.seq_minimo = seq_minimo
+
+
+async def crear_registro(conn: BaseDBAsyncClient):
+    """
+    Crea los triggers del registro de cambios y registra las filas existentes.
+
+    Args:
+        conn: Conexión (o transacción) de Tortoise
+    """
+    await conn.execute_script(SCHEMA)
+    for consulta in _REGISTRAR_EXISTENTES:
+        await conn.execute_query(consulta)
+
+
+async def estado_compactacion(connection_name: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Devuelve la secuencia mínima y la generación de la última eliminación de tombstones.
+
+    Args:
+        connection_name: Nombre de la conexión de Tortoise a utilizar (por
+            defecto, la de lectura)
+
+    Returns:
+        Tuple[int, int]: `seq_minimo` y generación (0, 0 si nunca se eliminaron)
+    """
+    conn = connections.get(connection_name or read_connection_name())
+    _, filas = await conn.execute_query("SELECT seq_minimo, generacion FROM cambios_compactacion WHERE id = 1")
+    return tuple(filas[0]) if filas else (0, 0)
+
+
+async def leer_cambios(entidad: str, desde: int, limite: int, generacion: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Lee los cambios de una entidad posteriores a una secuencia.
+
+    Si una entidad cambió varias veces en el lote, se envía una sola vez.
+
+    Args:
+        entidad: "libro" o "usuario"
+        desde: Última secuencia recibida por el cliente (0 para sincronizar todo)
+        limite: Cantidad máxima de entradas del registro a leer
+        generacion: Generación recibida junto con `desde`
+
+    Returns:
+        Dict[str, Any]: `cambios` (estado actual de las entidades creadas o
+        modificadas), `bajas` (IDs eliminados), `hasta` (secuencia hasta la
+        que se leyó), `mas` (si quedan más cambios) y `generacion`
+
+    Raises:
+        SecuenciaCompactada: Si se eliminaron tombstones posteriores a `desde`
+            después de que el cliente la recibiera
+    """
+    entradas = await Cambio.filter(entidad=entidad, seq__gt=desde).order_by("seq").limit(limite + 1).values_list(
+        "seq", "entidad_id", "baja"
+    )
+    # Después de leer el registro: la compactación elimina los tombstones y
+    # actualiza seq_minimo en la misma transacción
+    minimo, actual = await estado_compactacion()
+    if 0 < desde < minimo and generacion != actual:
+        raise SecuenciaCompactada(minimo)
+    mas = len(entradas) > limite
+    entradas = entradas[:limite]
+    ultimas = {entidad_id: baja for _, entidad_id, baja in entradas}
+
+    modelo, campos = ENTIDADES[entidad]
+    ids = [entidad_id for entidad_id, baja in ultimas.items() if not baja]
+    filas = await modelo.filter(id__in=ids).order_by("id").values(*campos) if ids else []
+    # Las que ya no existen se eliminaron después de leer el registro: su tombstone llegará igual
+    encontrados = {fila["id"] for fila in filas}
+    return {
+        "desde": desde,
+        "hasta": entradas[-1][0] if entradas else desde,
+        "mas": mas,
+        "generacion": actual,
+        "cambios": filas,
+        "bajas": sorted(entidad_id for entidad_id, baja in ultimas.items() if baja or entidad_id not in encontrados),
+    }
+
+
+async def compactar_cambios(retencion_bajas: float = None, connection_name: str = "default") -> int:
+    """
+    Compacta el registro de cambios (ver la documentación del módulo).
+
+    Args:
+        retencion_bajas: Segundos que se conservan los tombstones (por
+            defecto, `CAMBIOS_RETENCION_BAJAS_DIAS`)
+        connection_name: Nombre de la conexión de Tortoise a utilizar
+
+    Returns:
+        int: Entradas eliminadas (reemplazadas y tombstones)
+    """
+    if retencion_bajas is None:
+        retencion_bajas = settings.CAMBIOS_RETENCION_BAJAS_DIAS * 86400
+
+    async with in_transaction(connection_name) as conn:
+        reemplazadas, _ = await conn.execute_query(_COMPACTAR)
+        _, filas = await conn.execute_query(
+            "SELECT MAX(seq) FROM cambios WHERE baja = 1 AND momento < ?", [time.time() - retencion_bajas]
+        )
+        corte = filas[0][0]
+        bajas = 0
+        if corte is not None:
+            bajas, _ = await conn.execute_query("DELETE FROM cambios WHERE baja = 1 AND seq <= ?", [corte])
+            await conn.execute_query(
+                "INSERT INTO cambios_compactacion (id, seq_minimo, generacion) VALUES (1, ?, 1) "
+                "ON CONFLICT (id) DO UPDATE SET seq_minimo = MAX(seq_minimo, excluded.seq_minimo), "
+                "generacion = generacion + 1",
+                [corte],
+            )
+
+    if reemplazadas or bajas:
+        logger.info("Registro de cambios compactado: %d entradas reemplazadas, %d tombstones", reemplazadas, bajas)
+    return reemplazadas + bajas
@@ -0,0 +1,139 @@
+"""
+Configuración de Tortoise ORM a partir de `Settings`.
+
+SQLite admite un único escritor a la vez y Tortoise usa una sola conexión por
+nombre, protegida por un lock: una lectura tiene que esperar a que termine
+cualquier transacción de escritura. Por eso, cuando la base es un archivo, se
+definen dos conexiones al mismo archivo:
+
+- "default": conexión de escritura (y la que usan las transacciones).
+- "lectura": conexión de sólo lectura. Con journal_mode=WAL las lecturas ven
+  el último commit sin bloquear ni ser bloqueadas por el escritor.
+
+`ReadWriteRouter` dirige las consultas sin `using_db` a una u otra. Dentro de
+una transacción hay que pasar `using_db(conn)` para leer lo escrito en ella.
+"""
+import logging
+from typing import Any, Dict
+
+from tortoise import connections
+from tortoise.backends.base.config_generator import expand_db_url
+from tortoise.exceptions import ConfigurationError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+WRITE_CONNECTION = "default"
+READ_CONNECTION = "lectura"
+
+# PRAGMAs configurables y el atributo de `Settings` del que salen
+PRAGMAS = {
+    "journal_mode": "DB_JOURNAL_MODE",
+    "synchronous": "DB_SYNCHRONOUS",
+    "cache_size": "DB_CACHE_SIZE",
+    "mmap_size": "DB_MMAP_SIZE",
+    "busy_timeout": "DB_BUSY_TIMEOUT",
+}
+
+MODEL_MODULES = ["app.db.models"]
+
+
+class ReadWriteRouter:
+    """Envía las lecturas a la conexión de lectura y las escrituras a la de escritura."""
+
+    def db_for_read(self, model):
+        return READ_CONNECTION
+
+    def db_for_write(self, model):
+        return WRITE_CONNECTION
+
+
+def _usa_conexion_de_lectura(credenciales: Dict[str, Any]) -> bool:
+    # Una base en memoria es distinta para cada conexión
+    return settings.DB_READ_CONNECTION and credenciales.get("file_path") not in (None, ":memory:")
+
+
+def tortoise_config(db_url: str = None) -> Dict[str, Any]:
+    """
+    Genera la configuración de Tortoise con los PRAGMAs y conexiones de `Settings`.
+
+    Args:
+        db_url: URL de la base (por defecto `settings.DB_URL`)
+
+    Returns:
+        Dict[str, Any]: Configuración para `Tortoise.init(config=...)` o `register_tortoise`
+    """
+    escritura = expand_db_url(db_url or settings.DB_URL)
+    config: Dict[str, Any] = {
+        "connections": {WRITE_CONNECTION: escritura},
+        "apps": {
+            "models": {"models": MODEL_MODULES, "default_connection": WRITE_CONNECTION},
+        },
+    }
+    if escritura["engine"] != "tortoise.backends.sqlite":
+        return config
+
+    for pragma, campo in PRAGMAS.items():
+        escritura["credentials"][pragma] = getattr(settings, campo)
+
+    if _usa_conexion_de_lectura(escritura["credentials"]):
+        lectura = {
+            "engine": escritura["engine"],
+            "credentials": dict(escritura["credentials"], query_only="ON"),
+        }
+        config["connections"][READ_CONNECTION] = lectura
+        config["routers"] = ["app.db.config.ReadWriteRouter"]
+    return config
+
+
+def read_connection_name() -> str:
+    """
+    Devuelve el nombre de la conexión a usar para lecturas con SQL directo.
+
+    Returns:
+        str: "lectura" si está configurada, si no "default"
+    """
+    try:
+        connections.get(READ_CONNECTION)
+        return READ_CONNECTION
+    except ConfigurationError:
+        return WRITE_CONNECTION
+
+
+async def verificar_configuracion() -> Dict[str, Dict[str, Any]]:
+    """
+    Lee los valores efectivos de los PRAGMAs en cada conexión y los informa en el log.
+
+    SQLite ignora en silencio algunos valores (por ejemplo, WAL en una base en
+    memoria), así que se advierte cuando el valor efectivo difiere del pedido.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Valores efectivos por conexión
+    """
+    efectivos = {}
+    for nombre in (WRITE_CONNECTION, READ_CONNECTION):
+        try:
+            conn = connections.get(nombre)
+        except ConfigurationError:
+            continue
+        if getattr(conn, "capabilities", None) is None or conn.capabilities.dialect != "sqlite":
+            continue
+        valores = {}
+        for pragma, campo in PRAGMAS.items():
+            _, filas = await conn.execute_query(f"PRAGMA {pragma}")
+            valores[pragma] = filas[0][0] if filas else None
+            pedido = getattr(settings, campo)
+            if str(valores[pragma]).lower() != str(pedido).lower() and not (
+                pragma == "synchronous" and _synchronous_equivalente(valores[pragma], pedido)
+            ):
+                logger.warning("SQLite (%s): %s=%s (configurado: %s)", nombre, pragma, valores[pragma], pedido)
+        logger.info("SQLite (%s): %s", nombre, " ".join(f"{k}={v}" for k, v in valores.items()))
+        efectivos[nombre] = valores
+    return efectivos
+
+
+def _synchronous_equivalente(efectivo: Any, pedido: Any) -> bool:
+    # PRAGMA synchronous devuelve un número aunque se configure por nombre
+    niveles = {"off": 0, "normal": 1, "full": 2, "extra": 3}
+    return str(efectivo) == str(niveles.get(str(pedido).lower(), pedido))
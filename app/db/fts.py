@@ -0,0 +1,111 @@
+"""
+Índice de texto completo (SQLite FTS5) sobre título, autor y categoría de los libros.
+
+FTS5 no tiene representación en el ORM, por eso el índice se crea y se
+consulta con SQL directo. La tabla virtual `libros_fts` usa a `libros` como
+contenido externo y se mantiene sincronizada mediante triggers, de modo que
+cualquier alta, modificación o baja (incluso las masivas con
+`filter().update()` / `filter().delete()`) queda reflejada en el índice.
+La tabla y los triggers los crean las migraciones (ver `app.db.migraciones`).
+
+Para reconstruir el índice de una base existente:
+    python -m app.db.fts [db_url]
+"""
+import re
+from typing import List
+
+from tortoise import connections
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS libros_fts USING fts5(
+    titulo, autor, categoria,
+    content='libros', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS libros_fts_ai AFTER INSERT ON libros BEGIN
+    INSERT INTO libros_fts(rowid, titulo, autor, categoria)
+    VALUES (new.id, new.titulo, new.autor, new.categoria);
+END;
+CREATE TRIGGER IF NOT EXISTS libros_fts_ad AFTER DELETE ON libros BEGIN
+    INSERT INTO libros_fts(libros_fts, rowid, titulo, autor, categoria)
+    VALUES ('delete', old.id, old.titulo, old.autor, old.categoria);
+END;
+CREATE TRIGGER IF NOT EXISTS libros_fts_au AFTER UPDATE OF titulo, autor, categoria ON libros BEGIN
+    INSERT INTO libros_fts(libros_fts, rowid, titulo, autor, categoria)
+    VALUES ('delete', old.id, old.titulo, old.autor, old.categoria);
+    INSERT INTO libros_fts(rowid, titulo, autor, categoria)
+    VALUES (new.id, new.titulo, new.autor, new.categoria);
+END;
+"""
+
+COLUMNAS = ("titulo", "autor", "categoria")
+
+_TERMINO = re.compile(r"\w+", re.UNICODE)
+
+
+async def reconstruir_indice_fts(connection_name: str = "default"):
+    """
+    Vuelve a generar el índice completo a partir de la tabla `libros`.
+
+    Args:
+        connection_name: Nombre de la conexión de Tortoise a utilizar
+    """
+    conn = connections.get(connection_name)
+    await conn.execute_script(FTS_SCHEMA)
+    await conn.execute_script("INSERT INTO libros_fts(libros_fts) VALUES ('rebuild');")
+
+
+def construir_consulta(q: str = None, **columnas: str) -> str:
+    """
+    Arma una expresión MATCH de FTS5 a partir del texto ingresado.
+
+    Cada palabra se busca como prefijo y todas deben aparecer. Las palabras
+    pasadas por columna sólo se buscan en esa columna.
+
+    Args:
+        q: Texto libre a buscar en todas las columnas
+        **columnas: Texto a buscar en una columna puntual (titulo, autor, categoria)
+
+    Returns:
+        str: Expresión MATCH, vacía si no hay ningún término
+    """
+    partes = [f'"{t}"*' for t in _TERMINO.findall(q or "")]
+    for columna in COLUMNAS:
+        partes += [f'{columna} : "{t}"*' for t in _TERMINO.findall(columnas.get(columna) or "")]
+    return " AND ".join(partes)
+
+
+async def buscar_ids(consulta: str, limite: int, desplazamiento: int = 0,
+                     connection_name: str = "default") -> List[int]:
+    """
+    Devuelve los IDs de los libros que coinciden, ordenados por relevancia (BM25).
+
+    Args:
+        consulta: Expresión MATCH generada por `construir_consulta`
+        limite: Cantidad máxima de resultados
+        desplazamiento: Cantidad de resultados a omitir
+        connection_name: Nombre de la conexión de Tortoise a utilizar
+
+    Returns:
+        List[int]: IDs de libros, del más relevante al menos relevante
+    """
+    _, filas = await connections.get(connection_name).execute_query(
+        "SELECT rowid FROM libros_fts WHERE libros_fts MATCH ? "
+        "ORDER BY bm25(libros_fts, 10.0, 5.0, 1.0) LIMIT ? OFFSET ?",
+        [consulta, limite, desplazamiento],
+    )
+    return [fila[0] for fila in filas]
+
+
+if __name__ == "__main__":
+    import sys
+    from tortoise import Tortoise, run_async
+
+    from app.db.config import tortoise_config
+
+    async def _main(db_url: str = None):
+        await Tortoise.init(config=tortoise_config(db_url))
+        await reconstruir_indice_fts()
+        print("Índice de búsqueda reconstruido")
+
+    run_async(_main(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,81 @@
+"""
+Escrituras de libros en una sola sentencia.
+
+La unicidad del ISBN la garantiza el índice único de `libros.isbn`: en lugar
+de consultar antes si el ISBN existe (dos viajes a la base, y dos peticiones
+simultáneas pueden pasar la comprobación), cada escritura es una única
+sentencia y un ISBN repetido produce `IntegrityError`.
+
+- `actualizar_libro`: UPDATE ... RETURNING.
+- `upsert_libro`: INSERT ... ON CONFLICT (isbn) DO UPDATE ... RETURNING,
+  para crear o reemplazar un libro por su ISBN.
+
+Los triggers del índice de texto completo y de las tablas de resumen se
+disparan igual que con el ORM.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+from tortoise import connections, timezone
+
+from app.db.models.libro import Libro
+from app.schemas.libro import CAMPOS_LIBRO
+
+_RETURNING = "RETURNING " + ", ".join(CAMPOS_LIBRO)
+
+# Campos que reemplaza un upsert (todos salvo el ISBN, que identifica al libro)
+_CAMPOS_UPSERT = ("titulo", "autor", "categoria", "estado")
+
+_UPSERT = (
+    f"INSERT INTO libros (isbn, {', '.join(_CAMPOS_UPSERT)}, fecha_creacion) "
+    f"VALUES (?, {', '.join('?' for _ in _CAMPOS_UPSERT)}, ?) "
+    f"ON CONFLICT (isbn) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in _CAMPOS_UPSERT)} "
+    f"{_RETURNING}"
+)
+
+
+def _a_python(fila: Dict[str, Any]) -> Dict[str, Any]:
+    fila["fecha_creacion"] = Libro._meta.fields_map["fecha_creacion"].to_python_value(fila["fecha_creacion"])
+    return fila
+
+
+async def actualizar_libro(libro_id: int, datos: Dict[str, Any],
+                           connection_name: str = "default") -> Optional[Dict[str, Any]]:
+    """
+    Actualiza un libro y devuelve la fila resultante.
+
+    Args:
+        libro_id: ID del libro
+        datos: Campos a modificar (no vacío)
+        connection_name: Nombre de la conexión de Tortoise a utilizar
+
+    Returns:
+        Optional[Dict[str, Any]]: Libro actualizado, o None si no existe
+
+    Raises:
+        IntegrityError: Si el nuevo ISBN ya pertenece a otro libro
+    """
+    asignaciones = ", ".join(f"{campo} = ?" for campo in datos)
+    filas = await connections.get(connection_name).execute_query_dict(
+        f"UPDATE libros SET {asignaciones} WHERE id = ? {_RETURNING}", [*datos.values(), libro_id]
+    )
+    return _a_python(filas[0]) if filas else None
+
+
+async def upsert_libro(datos: Dict[str, Any], connection_name: str = "default") -> Tuple[Dict[str, Any], bool]:
+    """
+    Crea el libro con ese ISBN o, si ya existe, reemplaza sus datos.
+
+    Args:
+        datos: ISBN y campos del libro (`titulo`, `autor`, `categoria`, `estado`)
+        connection_name: Nombre de la conexión de Tortoise a utilizar
+
+    Returns:
+        Tuple[Dict[str, Any], bool]: Libro resultante y si se creó
+    """
+    ahora = timezone.now()
+    filas = await connections.get(connection_name).execute_query_dict(
+        _UPSERT, [datos["isbn"], *(datos[c] for c in _CAMPOS_UPSERT), ahora]
+    )
+    libro = _a_python(filas[0])
+    # El UPDATE del conflicto no toca fecha_creacion: si es la que se envió, la fila es nueva
+    return libro, libro["fecha_creacion"] == ahora
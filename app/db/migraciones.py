@@ -0,0 +1,170 @@
+"""
+Migraciones versionadas del esquema de la base de datos.
+
+En lugar de generar el esquema en cada arranque, cada cambio se registra
+como una migración numerada y la tabla `esquema_migraciones` guarda las ya
+aplicadas. Al iniciar sólo se consulta la última versión aplicada; si está
+al día, no se ejecuta nada más.
+
+Las migraciones deben ser idempotentes (`IF NOT EXISTS`, creación segura de
+tablas), porque varios procesos pueden arrancar a la vez sobre la misma base.
+Para agregar una, sumar una entrada al final de `MIGRACIONES`.
+
+Para aplicar las migraciones pendientes sin iniciar la aplicación:
+    python -m app.db.migraciones [db_url]
+"""
+import contextlib
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Tuple
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.utils import generate_schema_for_client
+
+from app.db.cambios import crear_registro
+from app.db.fts import FTS_SCHEMA
+from app.db.recomendaciones import crear_tablas as crear_tablas_recomendaciones
+from app.db.resumenes import crear_triggers, recalcular_resumenes
+
+logger = logging.getLogger(__name__)
+
+TABLA_MIGRACIONES = "esquema_migraciones"
+
+
+async def _crear_tablas(conn: BaseDBAsyncClient):
+    # Crea las tablas e índices de los modelos que todavía no existen
+    await generate_schema_for_client(conn, safe=True)
+
+
+async def _crear_indice_fts(conn: BaseDBAsyncClient):
+    # En una base existente el índice se llena con los libros ya cargados
+    await conn.execute_script(FTS_SCHEMA)
+    await conn.execute_script("INSERT INTO libros_fts(libros_fts) VALUES ('rebuild');")
+
+
+async def _crear_resumenes(conn: BaseDBAsyncClient):
+    # Tablas de resumen de los reportes, sus triggers y el contenido inicial
+    await generate_schema_for_client(conn, safe=True)
+    await crear_triggers(conn)
+    await recalcular_resumenes(conn)
+
+
+async def _crear_registro_cambios(conn: BaseDBAsyncClient):
+    # Tabla del registro de cambios, sus triggers y una entrada por cada fila existente
+    await generate_schema_for_client(conn, safe=True)
+    await crear_registro(conn)
+
+
+async def _crear_coprestamos(conn: BaseDBAsyncClient):
+    # La tabla se llena en la próxima actualización de recomendaciones, que
+    # tiene que ser completa
+    await crear_tablas_recomendaciones(conn)
+    await conn.execute_query("DELETE FROM recomendaciones_estado")
+
+
+async def _restringir_borrado_prestamos(conn: BaseDBAsyncClient):
+    # SQLite no permite cambiar una clave foránea: se reconstruye `prestamos`
+    # (mismo contenido, índices, triggers y secuencia de IDs) con ON DELETE
+    # RESTRICT. Las claves foráneas se desactivan durante la copia, fuera de
+    # la transacción, porque el PRAGMA no tiene efecto dentro de ella
+    _, filas = await conn.execute_query("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'prestamos'")
+    if not filas or "ON DELETE CASCADE" not in filas[0][0]:
+        return
+    tabla = filas[0][0].replace('"prestamos"', '"prestamos_nueva"', 1).replace("ON DELETE CASCADE", "ON DELETE RESTRICT")
+    _, objetos = await conn.execute_query(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'prestamos' AND type IN ('index', 'trigger') "
+        "AND sql IS NOT NULL ORDER BY type"
+    )
+    _, filas = await conn.execute_query("SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'prestamos'")
+    secuencia = int(filas[0][0])
+
+    script = [
+        "PRAGMA foreign_keys = OFF",
+        "BEGIN IMMEDIATE",
+        tabla,
+        "INSERT INTO prestamos_nueva SELECT * FROM prestamos",
+        "DROP TABLE prestamos",
+        "ALTER TABLE prestamos_nueva RENAME TO prestamos",
+        *(fila[0] for fila in objetos),
+        f"UPDATE sqlite_sequence SET seq = MAX(seq, {secuencia}) WHERE name = 'prestamos'",
+        "COMMIT",
+        "PRAGMA foreign_keys = ON",
+    ]
+    try:
+        await conn.execute_script(";\n".join(script) + ";")
+    except Exception:
+        # Si falló dentro de la transacción, la tabla queda como estaba
+        with contextlib.suppress(Exception):
+            await conn.execute_query("ROLLBACK")
+        await conn.execute_script("PRAGMA foreign_keys = ON;")
+        raise
+
+
+MIGRACIONES: List[Tuple[int, str, Callable[[BaseDBAsyncClient], Awaitable[None]]]] = [
+    (1, "Tablas de los modelos", _crear_tablas),
+    (2, "Índice de texto completo de libros", _crear_indice_fts),
+    (3, "Tablas de resumen para reportes", _crear_resumenes),
+    (4, "Revocación de tokens", _crear_tablas),
+    (5, "Cola de trabajos", _crear_tablas),
+    (6, "Registro de cambios", _crear_registro_cambios),
+    (7, "Recomendaciones por préstamos compartidos", crear_tablas_recomendaciones),
+    (8, "Coprestamos para actualizar recomendaciones", _crear_coprestamos),
+    (9, "Préstamos sin borrado en cascada", _restringir_borrado_prestamos),
+]
+
+
+async def version_actual(connection_name: str = "default") -> int:
+    """
+    Devuelve la última migración aplicada (0 si no hay ninguna).
+
+    Args:
+        connection_name: Nombre de la conexión de Tortoise a utilizar
+    """
+    conn = connections.get(connection_name)
+    await conn.execute_script(
+        f"CREATE TABLE IF NOT EXISTS {TABLA_MIGRACIONES} ("
+        "version INTEGER PRIMARY KEY, descripcion TEXT NOT NULL, fecha TEXT NOT NULL)"
+    )
+    _, filas = await conn.execute_query(f"SELECT COALESCE(MAX(version), 0) FROM {TABLA_MIGRACIONES}")
+    return filas[0][0]
+
+
+async def migrar(connection_name: str = "default") -> List[int]:
+    """
+    Aplica, en orden, las migraciones que todavía no se aplicaron.
+
+    Args:
+        connection_name: Nombre de la conexión de Tortoise a utilizar
+
+    Returns:
+        List[int]: Versiones aplicadas en esta llamada
+    """
+    conn = connections.get(connection_name)
+    actual = await version_actual(connection_name)
+    aplicadas = []
+    for version, descripcion, funcion in MIGRACIONES:
+        if version <= actual:
+            continue
+        await funcion(conn)
+        await conn.execute_insert(
+            f"INSERT OR IGNORE INTO {TABLA_MIGRACIONES} (version, descripcion, fecha) VALUES (?, ?, ?)",
+            [version, descripcion, datetime.now(timezone.utc).isoformat()],
+        )
+        logger.info("Migración %d aplicada: %s", version, descripcion)
+        aplicadas.append(version)
+    return aplicadas
+
+
+if __name__ == "__main__":
+    import sys
+    from tortoise import Tortoise, run_async
+
+    from app.db.config import tortoise_config
+
+    async def _main(db_url: str = None):
+        await Tortoise.init(config=tortoise_config(db_url))
+        aplicadas = await migrar()
+        print(f"Migraciones aplicadas: {aplicadas}" if aplicadas else "La base ya estaba al día")
+
+    run_async(_main(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -1,3 +1,14 @@
 from app.db.models.libro import Libro
+from app.db.models.usuario import Usuario
+from app.db.models.prestamo import Prestamo
+from app.db.models.notificacion import Notificacion
+from app.db.models.resumen import ResumenLibros, ResumenPrestamosLibro, ResumenPrestamosUsuario
+from app.db.models.revocacion import Revocacion
+from app.db.models.trabajo import Trabajo
+from app.db.models.cambio import Cambio
 
-__all__ = ["Libro"]
\ No newline at end of file
+__all__ = [
+    "Libro", "Usuario", "Prestamo", "Notificacion",
+    "ResumenLibros", "ResumenPrestamosLibro", "ResumenPrestamosUsuario", "Revocacion", "Trabajo",
+    "Cambio",
+]
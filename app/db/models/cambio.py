@@ -0,0 +1,29 @@
+from tortoise import fields
+from tortoise.models import Model
+
+class Cambio(Model):
+    """
+    Entrada del registro de cambios de libros y usuarios.
+
+    La escriben triggers sobre `libros` y `usuarios` (ver `app.db.cambios`);
+    no se escribe desde la aplicación.
+
+    Atributos:
+        seq: Número de secuencia, creciente y nunca reutilizado
+        entidad: Tabla modificada ("libro" o "usuario")
+        entidad_id: ID del libro o usuario
+        baja: Indica si se eliminó (tombstone)
+        momento: Momento del cambio (segundos desde la época)
+    """
+    seq = fields.IntField(pk=True)
+    entidad = fields.CharField(max_length=20)  # libro, usuario
+    entidad_id = fields.IntField()
+    baja = fields.BooleanField(default=False)
+    momento = fields.FloatField()
+
+    class Meta:
+        table = "cambios"
+        indexes = (("entidad", "seq"), ("entidad", "entidad_id"))
+
+    def __str__(self):
+        return f"Cambio {self.seq} ({self.entidad} {self.entidad_id})"
@@ -3,10 +3,15 @@ from tortoise.models import Model
 
 class Libro(Model):
     id = fields.IntField(pk=True)
-    titulo = fields.CharField(max_length=255)
-    autor = fields.CharField(max_length=255)
-    anio_publicacion = fields.IntField()
+    titulo = fields.CharField(max_length=255, index=True)
+    autor = fields.CharField(max_length=255, index=True)
     isbn = fields.CharField(max_length=13, unique=True)
+    categoria = fields.CharField(max_length=100, index=True)
+    estado = fields.CharField(max_length=50, default="disponible", index=True)  # disponible, prestado, etc.
+    fecha_creacion = fields.DatetimeField(auto_now_add=True, index=True)
+
+    class Meta:
+        table = "libros"
 
     def __str__(self):
         return self.titulo
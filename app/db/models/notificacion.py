@@ -0,0 +1,44 @@
+from tortoise import fields
+from tortoise.models import Model
+
+class Notificacion(Model):
+    """
+    Notificación pendiente de envío (outbox).
+    
+    Las notificaciones se registran en la misma transacción que el cambio que
+    las origina y un proceso en segundo plano las envía después, reintentando
+    las que fallan.
+    
+    Atributos:
+        id: Identificador único de la notificación
+        usuario: Destinatario
+        prestamo: Préstamo que originó la notificación (opcional)
+        tipo: Tipo de notificación (vencimiento, etc.)
+        mensaje: Texto a enviar
+        estado: Estado del envío (pendiente, enviada, fallida)
+        intentos: Cantidad de intentos de envío fallidos
+        proximo_intento: Momento a partir del cual se puede (re)intentar el envío
+        ultimo_error: Último error de envío
+        fecha_creacion: Fecha de creación
+        fecha_envio: Fecha en que se envió
+    """
+    id = fields.IntField(pk=True)
+    usuario = fields.ForeignKeyField("models.Usuario", related_name="notificaciones")
+    prestamo = fields.ForeignKeyField("models.Prestamo", related_name="notificaciones", null=True)
+    tipo = fields.CharField(max_length=50)
+    mensaje = fields.TextField()
+    estado = fields.CharField(max_length=20, default="pendiente")  # pendiente, enviada, fallida
+    intentos = fields.IntField(default=0)
+    proximo_intento = fields.DatetimeField(auto_now_add=True)
+    ultimo_error = fields.TextField(null=True)
+    fecha_creacion = fields.DatetimeField(auto_now_add=True)
+    fecha_envio = fields.DatetimeField(null=True)
+    
+    class Meta:
+        table = "notificaciones"
+        # Una sola notificación de cada tipo por préstamo
+        unique_together = (("prestamo", "tipo"),)
+        indexes = (("estado", "proximo_intento"), ("usuario_id", "fecha_creacion"))
+    
+    def __str__(self):
+        return f"Notificación {self.id} ({self.tipo}, {self.estado})"
@@ -0,0 +1,33 @@
+from tortoise import fields
+from tortoise.models import Model
+
+class Prestamo(Model):
+    """
+    Modelo de Préstamo de un libro a un usuario.
+    
+    Atributos:
+        id: Identificador único del préstamo
+        libro: Libro prestado
+        usuario: Usuario que retiró el libro
+        fecha_prestamo: Fecha en que se retiró el libro
+        fecha_devolucion: Fecha límite para devolver el libro
+        fecha_devuelto: Fecha en que efectivamente se devolvió (nula mientras no se devuelva)
+        estado: Estado del préstamo (activo, devuelto, vencido)
+    """
+    id = fields.IntField(pk=True)
+    # El historial de préstamos no se borra con el libro o el usuario: mientras
+    # tengan préstamos, la base rechaza eliminarlos
+    libro = fields.ForeignKeyField("models.Libro", related_name="prestamos", on_delete=fields.RESTRICT)
+    usuario = fields.ForeignKeyField("models.Usuario", related_name="prestamos", on_delete=fields.RESTRICT)
+    fecha_prestamo = fields.DatetimeField(auto_now_add=True)
+    fecha_devolucion = fields.DatetimeField()
+    fecha_devuelto = fields.DatetimeField(null=True)
+    estado = fields.CharField(max_length=50, default="activo")  # activo, devuelto, vencido
+    
+    class Meta:
+        table = "prestamos"
+        # Listados de activos/vencidos por fecha límite e historial por usuario
+        indexes = (("estado", "fecha_devolucion"), ("usuario_id", "fecha_prestamo"))
+    
+    def __str__(self):
+        return f"Préstamo {self.id} ({self.estado})"
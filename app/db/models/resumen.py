@@ -0,0 +1,55 @@
+from tortoise import fields
+from tortoise.models import Model
+
+class ResumenLibros(Model):
+    """
+    Cantidad de libros por categoría y estado.
+
+    La mantienen triggers sobre `libros` (ver `app.db.resumenes`); no se
+    escribe desde la aplicación.
+
+    Atributos:
+        categoria: Categoría de los libros
+        estado: Estado de los libros
+        cantidad: Libros con esa categoría y estado
+    """
+    id = fields.IntField(pk=True)
+    categoria = fields.CharField(max_length=100)
+    estado = fields.CharField(max_length=50)
+    cantidad = fields.IntField(default=0)
+
+    class Meta:
+        table = "resumen_libros"
+        unique_together = (("categoria", "estado"),)
+
+class ResumenPrestamosLibro(Model):
+    """
+    Cantidad histórica de préstamos de cada libro.
+
+    Atributos:
+        libro_id: Libro prestado
+        prestamos: Veces que se prestó
+    """
+    libro_id = fields.IntField(pk=True, generated=False)
+    prestamos = fields.IntField(default=0, index=True)
+
+    class Meta:
+        table = "resumen_prestamos_libro"
+
+class ResumenPrestamosUsuario(Model):
+    """
+    Préstamos de cada usuario.
+
+    Atributos:
+        usuario_id: Usuario
+        activos: Préstamos en estado "activo"
+        vencidos: Préstamos en estado "vencido" (todavía no devueltos)
+        prestamos: Préstamos totales, incluidos los devueltos
+    """
+    usuario_id = fields.IntField(pk=True, generated=False)
+    activos = fields.IntField(default=0, index=True)
+    vencidos = fields.IntField(default=0)
+    prestamos = fields.IntField(default=0)
+
+    class Meta:
+        table = "resumen_prestamos_usuario"
@@ -0,0 +1,28 @@
+from tortoise import fields
+from tortoise.models import Model
+
+class Revocacion(Model):
+    """
+    Token o conjunto de tokens revocados antes de su expiración.
+
+    Atributos:
+        id: Identificador único
+        tipo: "token" (un token, por su `jti`) o "usuario" (todos los tokens
+            del usuario emitidos antes de `desde`)
+        valor: `jti` del token o nombre de usuario
+        desde: Momento de la revocación (segundos desde la época)
+        expira: A partir de cuándo la revocación ya no hace falta, porque
+            todos los tokens afectados vencieron
+    """
+    id = fields.IntField(pk=True)
+    tipo = fields.CharField(max_length=20)  # token, usuario
+    valor = fields.CharField(max_length=255)
+    desde = fields.FloatField()
+    expira = fields.DatetimeField(index=True)
+
+    class Meta:
+        table = "revocaciones"
+        indexes = (("tipo", "valor"),)
+
+    def __str__(self):
+        return f"Revocación de {self.tipo} {self.valor}"
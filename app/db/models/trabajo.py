@@ -0,0 +1,46 @@
+from tortoise import fields
+from tortoise.models import Model
+
+class Trabajo(Model):
+    """
+    Operación costosa que se ejecuta en segundo plano (cola de trabajos).
+
+    Atributos:
+        id: Identificador único del trabajo
+        tipo: Tipo de trabajo (por ejemplo, "libros.actualizar")
+        estado: Estado del trabajo (pendiente, en_curso, completado, fallido)
+        parametros: Parámetros del trabajo, según su tipo
+        clave: Clave de idempotencia enviada por el cliente (opcional)
+        usuario: Usuario que encoló el trabajo
+        progreso: Elementos procesados hasta el momento
+        total: Elementos a procesar (nulo mientras no se conozca)
+        resultado: Resultado del trabajo completado
+        error: Error del trabajo fallido
+        intentos: Veces que se comenzó a ejecutar
+        fecha_creacion: Fecha en que se encoló
+        fecha_inicio: Fecha en que comenzó la última ejecución
+        fecha_fin: Fecha en que terminó
+    """
+    id = fields.IntField(pk=True)
+    tipo = fields.CharField(max_length=100)
+    estado = fields.CharField(max_length=20, default="pendiente")  # pendiente, en_curso, completado, fallido
+    parametros = fields.JSONField(default=dict)
+    clave = fields.CharField(max_length=255, unique=True, null=True)
+    usuario = fields.ForeignKeyField(
+        "models.Usuario", related_name="trabajos", null=True, on_delete=fields.SET_NULL
+    )
+    progreso = fields.IntField(default=0)
+    total = fields.IntField(null=True)
+    resultado = fields.JSONField(null=True)
+    error = fields.TextField(null=True)
+    intentos = fields.IntField(default=0)
+    fecha_creacion = fields.DatetimeField(auto_now_add=True)
+    fecha_inicio = fields.DatetimeField(null=True)
+    fecha_fin = fields.DatetimeField(null=True, index=True)
+
+    class Meta:
+        table = "trabajos"
+        indexes = (("estado", "tipo"),)
+
+    def __str__(self):
+        return f"Trabajo {self.id} ({self.tipo}, {self.estado})"
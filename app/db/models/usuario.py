@@ -1,5 +1,5 @@
 from tortoise import fields, models
-from passlib.hash import bcrypt
+from app.core.security import hash_password_async, verify_password, verify_password_async
 
 class Usuario(models.Model):
     """
@@ -40,7 +40,23 @@ class Usuario(models.Model):
         Returns:
             bool: True si la contraseña es correcta, False en caso contrario
         """
-        return bcrypt.verify(password, self.hashed_password)
+        return verify_password(password, self.hashed_password)
+    
+    async def verify_password_async(self, password: str) -> bool:
+        """
+        Igual que `verify_password`, pero calcula bcrypt en el pool de hashing
+        para no bloquear el event loop.
+        
+        Args:
+            password: Contraseña a verificar
+            
+        Returns:
+            bool: True si la contraseña es correcta, False en caso contrario
+            
+        Raises:
+            PasswordPoolSaturado: Si el pool de hashing está saturado
+        """
+        return await verify_password_async(password, self.hashed_password)
     
     @classmethod
     async def create_user(cls, username: str, email: str, password: str, nombre: str = None, rol: str = "usuario"):
@@ -56,9 +72,12 @@ class Usuario(models.Model):
             
         Returns:
             Usuario: El objeto usuario creado
+            
+        Raises:
+            PasswordPoolSaturado: Si el pool de hashing está saturado
         """
-        # Encriptar la contraseña
-        hashed_password = bcrypt.hash(password)
+        # Encriptar la contraseña (en el pool de hashing, fuera del event loop)
+        hashed_password = await hash_password_async(password)
         
         # Crear el usuario
         return await cls.create(
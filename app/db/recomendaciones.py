@@ -0,0 +1,282 @@
+"""
+Tabla precalculada de libros recomendados ("quienes retiraron este libro
+también retiraron...").
+
+`actualizar_recomendaciones` es una tarea periódica por lotes: calcula los
+libros más parecidos a cada título con `app.core.recomendaciones` (en otro
+hilo) y guarda los `RECOMENDACIONES_K` primeros en `recomendaciones`. La
+tabla es `WITHOUT ROWID` con clave (libro_id, posicion), así las
+recomendaciones de un libro quedan juntas y `leer_recomendaciones` es un
+único recorrido de la clave primaria, unido con `libros` por ID.
+
+La tarea también guarda la matriz de coprestamos en `coprestamos` (clave
+(libro_id, otro_id), con los lectores de cada libro en la diagonal) y en
+`recomendaciones_estado` el último préstamo procesado. Así la actualización
+es incremental: lee sólo los préstamos de los usuarios con préstamos nuevos,
+calcula cuánto cambian sus coprestamos y recalcula los libros afectados a
+partir de sus filas guardadas, con un costo que depende de los préstamos
+nuevos y no de todo el historial. Los coprestamos, las recomendaciones de
+los libros afectados y el último préstamo se guardan en una sola
+transacción, así una ejecución interrumpida no deja la matriz a medias.
+
+El puntaje de los demás libros también depende de la cantidad de lectores
+de sus recomendados, que puede haber crecido: para que esa diferencia no se
+acumule, cada `RECOMENDACIONES_RECALCULAR` segundos se recalcula todo a
+partir de los préstamos. También se recalcula todo la primera vez y si
+desaparecieron préstamos ya procesados. En ese caso la matriz se escribe en
+una tabla nueva que reemplaza a la anterior al final, y las recomendaciones
+se reemplazan de a `RECOMENDACIONES_LOTE` libros por transacción para no
+bloquear las escrituras; si la tarea se interrumpe, la próxima ejecución
+vuelve a empezar desde el mismo préstamo.
+
+Para recalcular todo sin iniciar la aplicación:
+    python -m app.db.recomendaciones [db_url]
+"""
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+
+from app.core.config import settings
+from app.core.recomendaciones import Coprestamos, Fila, coprestamos, diferencia, recomendar, sumar
+from app.db.config import read_connection_name
+from app.db.libros import _a_python
+from app.schemas.libro import CAMPOS_LIBRO
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recomendaciones (
+    libro_id INTEGER NOT NULL,
+    posicion INTEGER NOT NULL,
+    recomendado_id INTEGER NOT NULL,
+    puntaje REAL NOT NULL,
+    coprestamos INTEGER NOT NULL,
+    PRIMARY KEY (libro_id, posicion)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS recomendaciones_estado (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    ultimo_prestamo INTEGER NOT NULL,
+    completo REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS coprestamos (
+    libro_id INTEGER NOT NULL,
+    otro_id INTEGER NOT NULL,
+    usuarios INTEGER NOT NULL,
+    PRIMARY KEY (libro_id, otro_id)
+) WITHOUT ROWID;
+"""
+
+# Tabla donde se escribe la matriz al recalcular todo, antes de reemplazar a `coprestamos`
+_COPRESTAMOS_NUEVA = """
+DROP TABLE IF EXISTS coprestamos_nueva;
+CREATE TABLE coprestamos_nueva (
+    libro_id INTEGER NOT NULL,
+    otro_id INTEGER NOT NULL,
+    usuarios INTEGER NOT NULL,
+    PRIMARY KEY (libro_id, otro_id)
+) WITHOUT ROWID;
+"""
+
+# Entradas de la matriz por transacción al recalcular todo
+_LOTE_COPRESTAMOS = 50000
+
+_LEER = (
+    f"SELECT {', '.join(f'l.{campo}' for campo in CAMPOS_LIBRO)}, r.puntaje, r.coprestamos "
+    "FROM recomendaciones r JOIN libros l ON l.id = r.recomendado_id "
+    "WHERE r.libro_id = ? ORDER BY r.posicion LIMIT ?"
+)
+
+# Libros de los usuarios con préstamos en el rango (desde, hasta], con su primer préstamo
+_HISTORIAL = (
+    "SELECT usuario_id, libro_id, MIN(id) FROM prestamos WHERE id <= ? AND usuario_id IN "
+    "(SELECT usuario_id FROM prestamos WHERE id > ? AND id <= ?) GROUP BY usuario_id, libro_id"
+)
+
+# Filas guardadas de una lista (JSON) de libros
+_FILAS = (
+    "SELECT libro_id, otro_id, usuarios FROM coprestamos WHERE libro_id IN (SELECT value FROM json_each(?))"
+)
+
+# Lectores guardados (la diagonal) de una lista (JSON) de libros
+_LECTORES = (
+    "SELECT c.libro_id, c.usuarios FROM json_each(?) j "
+    "JOIN coprestamos c ON c.libro_id = j.value AND c.otro_id = j.value"
+)
+
+_SUMAR = (
+    "INSERT INTO coprestamos (libro_id, otro_id, usuarios) VALUES (?, ?, ?) "
+    "ON CONFLICT (libro_id, otro_id) DO UPDATE SET usuarios = usuarios + excluded.usuarios"
+)
+
+
+async def crear_tablas(conn: BaseDBAsyncClient):
+    """
+    Crea las tablas de recomendaciones (vacías: las llena la tarea periódica).
+
+    Args:
+        conn: Conexión (o transacción) de Tortoise
+    """
+    await conn.execute_script(SCHEMA)
+
+
+async def leer_recomendaciones(libro_id: int, limite: int,
+                               connection_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Lee los libros recomendados de un libro, del más parecido al menos parecido.
+
+    Args:
+        libro_id: ID del libro
+        limite: Cantidad máxima de recomendaciones
+        connection_name: Nombre de la conexión de Tortoise a utilizar (por
+            defecto, la de lectura)
+
+    Returns:
+        List[Dict[str, Any]]: Campos de cada libro recomendado más `puntaje`
+        y `coprestamos` (vacía si no tiene recomendaciones o no existe)
+    """
+    conn = connections.get(connection_name or read_connection_name())
+    return [_a_python(fila) for fila in await conn.execute_query_dict(_LEER, [libro_id, limite])]
+
+
+async def actualizar_recomendaciones(completo: bool = False, connection_name: str = "default") -> int:
+    """
+    Recalcula las recomendaciones de los libros con préstamos nuevos (ver la
+    documentación del módulo).
+
+    Args:
+        completo: Recalcular todos los libros aunque no corresponda
+        connection_name: Nombre de la conexión de Tortoise a utilizar para escribir
+
+    Returns:
+        int: Libros recalculados
+    """
+    lectura = connections.get(read_connection_name())
+    _, filas = await lectura.execute_query(
+        "SELECT ultimo_prestamo, completo FROM recomendaciones_estado WHERE id = 1"
+    )
+    ultimo, ultimo_completo = tuple(filas[0]) if filas else (0, None)
+    _, filas = await lectura.execute_query("SELECT COALESCE(MAX(id), 0) FROM prestamos")
+    hasta = filas[0][0]
+
+    completo = (
+        completo or ultimo_completo is None or hasta < ultimo
+        or time.time() - ultimo_completo >= settings.RECOMENDACIONES_RECALCULAR
+    )
+    if not completo and hasta == ultimo:
+        return 0
+
+    inicio = time.perf_counter()
+    if completo:
+        libros, pares = await _recalcular(hasta, connection_name)
+    else:
+        libros, pares = await _actualizar(ultimo, hasta, ultimo_completo, connection_name)
+    logger.info(
+        "Recomendaciones %s: %d libros (%d pares usuario-libro, %.2fs)",
+        "recalculadas" if completo else "actualizadas", libros, pares, time.perf_counter() - inicio,
+    )
+    return libros
+
+
+async def _recalcular(hasta: int, connection_name: str):
+    # Todo a partir de los préstamos; devuelve los libros y los pares usuario-libro leídos
+    _, filas = await connections.get(read_connection_name()).execute_query(
+        "SELECT DISTINCT usuario_id, libro_id FROM prestamos WHERE id <= ?", [hasta]
+    )
+    pares = list(itertools.chain.from_iterable(filas))
+
+    def calcular():
+        matriz = coprestamos(pares)
+        return matriz, recomendar(matriz, settings.RECOMENDACIONES_K, settings.RECOMENDACIONES_MIN_COPRESTAMOS)
+
+    matriz, resultado = await asyncio.to_thread(calcular)
+
+    await connections.get(connection_name).execute_script(_COPRESTAMOS_NUEVA)
+    entradas = list(zip(*matriz))
+    for desde in range(0, len(entradas), _LOTE_COPRESTAMOS):
+        async with in_transaction(connection_name) as conn:
+            await conn.execute_many(
+                "INSERT INTO coprestamos_nueva (libro_id, otro_id, usuarios) VALUES (?, ?, ?)",
+                entradas[desde:desde + _LOTE_COPRESTAMOS],
+            )
+
+    libros = list(resultado)
+    for desde in range(0, len(libros), settings.RECOMENDACIONES_LOTE):
+        async with in_transaction(connection_name) as conn:
+            await _guardar(conn, resultado, libros[desde:desde + settings.RECOMENDACIONES_LOTE])
+
+    async with in_transaction(connection_name) as conn:
+        await conn.execute_query("DROP TABLE coprestamos")
+        await conn.execute_query("ALTER TABLE coprestamos_nueva RENAME TO coprestamos")
+        # Filas de libros que ya no existen
+        await conn.execute_query("DELETE FROM recomendaciones WHERE libro_id NOT IN (SELECT id FROM libros)")
+        await _guardar_estado(conn, hasta, time.time())
+    return len(libros), len(pares) // 2
+
+
+async def _actualizar(ultimo: int, hasta: int, ultimo_completo: float, connection_name: str):
+    # Sólo los libros afectados por los préstamos en (ultimo, hasta]
+    lectura = connections.get(read_connection_name())
+    _, filas = await lectura.execute_query(_HISTORIAL, [hasta, ultimo, hasta])
+    antes = [x for usuario, libro, primero in filas if primero <= ultimo for x in (usuario, libro)]
+    despues = [x for usuario, libro, _ in filas for x in (usuario, libro)]
+    cambios = await asyncio.to_thread(diferencia, antes, despues)
+
+    # Filas de los libros afectados y lectores de los libros que aparecen en ellas, con los cambios
+    afectados = sorted(set(cambios[0]))
+    _, filas = await lectura.execute_query(_FILAS, [json.dumps(afectados)])
+    guardadas: Coprestamos = tuple(map(list, zip(*filas))) if filas else ([], [], [])
+    _, filas = await lectura.execute_query(_LECTORES, [json.dumps(sorted(set(guardadas[1]) | set(cambios[1])))])
+    lectores = dict(filas)
+    for libro, otro, usuarios in zip(*cambios):
+        if libro == otro:
+            lectores[libro] = lectores.get(libro, 0) + usuarios
+
+    resultado = await asyncio.to_thread(
+        lambda: recomendar(sumar(guardadas, cambios), settings.RECOMENDACIONES_K,
+                           settings.RECOMENDACIONES_MIN_COPRESTAMOS, lectores)
+    )
+    async with in_transaction(connection_name) as conn:
+        await conn.execute_many(_SUMAR, list(zip(*cambios)))
+        await _guardar(conn, resultado, afectados)
+        await _guardar_estado(conn, hasta, ultimo_completo)
+    return len(afectados), len(despues) // 2
+
+
+async def _guardar(conn: BaseDBAsyncClient, resultado: Dict[int, List[Fila]], libros: List[int]):
+    await conn.execute_many("DELETE FROM recomendaciones WHERE libro_id = ?", [[libro] for libro in libros])
+    await conn.execute_many(
+        "INSERT INTO recomendaciones (libro_id, posicion, recomendado_id, puntaje, coprestamos) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [list(fila) for libro in libros for fila in resultado[libro]],
+    )
+
+
+async def _guardar_estado(conn: BaseDBAsyncClient, ultimo: int, completo: float):
+    await conn.execute_query(
+        "INSERT INTO recomendaciones_estado (id, ultimo_prestamo, completo) VALUES (1, ?, ?) "
+        "ON CONFLICT (id) DO UPDATE SET ultimo_prestamo = excluded.ultimo_prestamo, "
+        "completo = excluded.completo",
+        [ultimo, completo],
+    )
+
+
+if __name__ == "__main__":
+    import sys
+    from tortoise import Tortoise, run_async
+
+    from app.db.config import tortoise_config
+
+    async def _main(db_url: str = None):
+        await Tortoise.init(config=tortoise_config(db_url))
+        await crear_tablas(connections.get("default"))
+        libros = await actualizar_recomendaciones(completo=True)
+        print(f"Recomendaciones recalculadas ({libros} libros)")
+
+    run_async(_main(sys.argv[1] if len(sys.argv) > 1 else None))
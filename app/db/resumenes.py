@@ -0,0 +1,168 @@
+"""
+Tablas de resumen para los reportes.
+
+Los reportes (libros por categoría y estado, libros más prestados, préstamos
+abiertos por usuario) no recorren `libros` ni `prestamos`: leen tablas de
+resumen con una fila por categoría y estado, por libro prestado o por
+usuario. Igual que el índice de texto completo, las mantienen triggers de
+SQLite, así cualquier alta, modificación o baja, incluidas las masivas con
+`filter().update()` o `bulk_create`, las actualiza en la misma transacción.
+
+`reconciliar_resumenes` las recalcula desde cero con `GROUP BY` y corrige
+cualquier diferencia (por ejemplo, cambios hechos con los triggers todavía
+sin crear). Se ejecuta como tarea periódica.
+
+Para recalcularlas a mano:
+    python -m app.db.resumenes [db_url]
+"""
+import logging
+from typing import Dict, Tuple
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+
+logger = logging.getLogger(__name__)
+
+TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS resumen_libros_ai AFTER INSERT ON libros BEGIN
+    INSERT INTO resumen_libros (categoria, estado, cantidad) VALUES (new.categoria, new.estado, 1)
+    ON CONFLICT (categoria, estado) DO UPDATE SET cantidad = cantidad + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS resumen_libros_ad AFTER DELETE ON libros BEGIN
+    UPDATE resumen_libros SET cantidad = cantidad - 1
+    WHERE categoria = old.categoria AND estado = old.estado;
+    DELETE FROM resumen_prestamos_libro WHERE libro_id = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS resumen_libros_au AFTER UPDATE OF categoria, estado ON libros
+WHEN old.categoria IS NOT new.categoria OR old.estado IS NOT new.estado BEGIN
+    UPDATE resumen_libros SET cantidad = cantidad - 1
+    WHERE categoria = old.categoria AND estado = old.estado;
+    INSERT INTO resumen_libros (categoria, estado, cantidad) VALUES (new.categoria, new.estado, 1)
+    ON CONFLICT (categoria, estado) DO UPDATE SET cantidad = cantidad + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS resumen_prestamos_ai AFTER INSERT ON prestamos BEGIN
+    INSERT INTO resumen_prestamos_libro (libro_id, prestamos) VALUES (new.libro_id, 1)
+    ON CONFLICT (libro_id) DO UPDATE SET prestamos = prestamos + 1;
+    INSERT INTO resumen_prestamos_usuario (usuario_id, activos, vencidos, prestamos)
+    VALUES (new.usuario_id, new.estado = 'activo', new.estado = 'vencido', 1)
+    ON CONFLICT (usuario_id) DO UPDATE SET
+        activos = activos + excluded.activos,
+        vencidos = vencidos + excluded.vencidos,
+        prestamos = prestamos + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS resumen_prestamos_au AFTER UPDATE OF estado ON prestamos
+WHEN old.estado IS NOT new.estado BEGIN
+    UPDATE resumen_prestamos_usuario SET
+        activos = activos + (new.estado = 'activo') - (old.estado = 'activo'),
+        vencidos = vencidos + (new.estado = 'vencido') - (old.estado = 'vencido')
+    WHERE usuario_id = new.usuario_id;
+END;
+CREATE TRIGGER IF NOT EXISTS resumen_prestamos_ad AFTER DELETE ON prestamos BEGIN
+    UPDATE resumen_prestamos_libro SET prestamos = prestamos - 1 WHERE libro_id = old.libro_id;
+    UPDATE resumen_prestamos_usuario SET
+        activos = activos - (old.estado = 'activo'),
+        vencidos = vencidos - (old.estado = 'vencido'),
+        prestamos = prestamos - 1
+    WHERE usuario_id = old.usuario_id;
+END;
+CREATE TRIGGER IF NOT EXISTS resumen_usuarios_ad AFTER DELETE ON usuarios BEGIN
+    DELETE FROM resumen_prestamos_usuario WHERE usuario_id = old.id;
+END;
+"""
+
+# Consultas que recalculan cada tabla de resumen desde cero
+_RECALCULAR = (
+    "DELETE FROM resumen_libros",
+    "INSERT INTO resumen_libros (categoria, estado, cantidad) "
+    "SELECT categoria, estado, COUNT(*) FROM libros GROUP BY categoria, estado",
+    "DELETE FROM resumen_prestamos_libro",
+    "INSERT INTO resumen_prestamos_libro (libro_id, prestamos) "
+    "SELECT libro_id, COUNT(*) FROM prestamos GROUP BY libro_id",
+    "DELETE FROM resumen_prestamos_usuario",
+    "INSERT INTO resumen_prestamos_usuario (usuario_id, activos, vencidos, prestamos) "
+    "SELECT usuario_id, SUM(estado = 'activo'), SUM(estado = 'vencido'), COUNT(*) FROM prestamos GROUP BY usuario_id",
+)
+
+# Contenido de cada tabla de resumen: clave -> valores
+_LEER = {
+    "resumen_libros": "SELECT categoria, estado, cantidad FROM resumen_libros WHERE cantidad != 0",
+    "resumen_prestamos_libro": "SELECT libro_id, prestamos FROM resumen_prestamos_libro WHERE prestamos != 0",
+    "resumen_prestamos_usuario": (
+        "SELECT usuario_id, activos, vencidos, prestamos FROM resumen_prestamos_usuario WHERE prestamos != 0"
+    ),
+}
+_COLUMNAS_CLAVE = {"resumen_libros": 2, "resumen_prestamos_libro": 1, "resumen_prestamos_usuario": 1}
+
+
+async def crear_triggers(conn: BaseDBAsyncClient):
+    """
+    Crea los triggers que mantienen las tablas de resumen, si no existen.
+
+    Args:
+        conn: Conexión (o transacción) de Tortoise
+    """
+    await conn.execute_script(TRIGGERS)
+
+
+async def recalcular_resumenes(conn: BaseDBAsyncClient):
+    """
+    Vuelve a llenar las tablas de resumen a partir de `libros` y `prestamos`.
+
+    Args:
+        conn: Conexión (o transacción) de Tortoise
+    """
+    # Una consulta por vez: execute_script haría commit en medio de una transacción
+    for consulta in _RECALCULAR:
+        await conn.execute_query(consulta)
+
+
+async def _leer(conn: BaseDBAsyncClient) -> Dict[str, Dict[Tuple, Tuple]]:
+    contenido = {}
+    for tabla, consulta in _LEER.items():
+        _, filas = await conn.execute_query(consulta)
+        n = _COLUMNAS_CLAVE[tabla]
+        contenido[tabla] = {tuple(fila)[:n]: tuple(fila)[n:] for fila in filas}
+    return contenido
+
+
+async def reconciliar_resumenes(connection_name: str = "default") -> int:
+    """
+    Recalcula las tablas de resumen y corrige las diferencias.
+
+    Todo ocurre en una transacción de escritura: mientras tanto nadie más
+    modifica `libros` ni `prestamos`, así el resultado es consistente.
+
+    Args:
+        connection_name: Nombre de la conexión de Tortoise a utilizar
+
+    Returns:
+        int: Filas de resumen que no coincidían con el recálculo
+    """
+    async with in_transaction(connection_name) as conn:
+        antes = await _leer(conn)
+        await recalcular_resumenes(conn)
+        despues = await _leer(conn)
+
+    diferencias = 0
+    for tabla, filas in despues.items():
+        previas = antes[tabla]
+        diferencias += sum(1 for clave in filas.keys() | previas.keys() if filas.get(clave) != previas.get(clave))
+    if diferencias:
+        logger.warning("Tablas de resumen corregidas: %d filas no coincidían", diferencias)
+    return diferencias
+
+
+if __name__ == "__main__":
+    import sys
+    from tortoise import Tortoise, run_async
+
+    from app.db.config import tortoise_config
+
+    async def _main(db_url: str = None):
+        await Tortoise.init(config=tortoise_config(db_url))
+        await crear_triggers(connections.get("default"))
+        diferencias = await reconciliar_resumenes()
+        print(f"Tablas de resumen recalculadas ({diferencias} filas corregidas)")
+
+    run_async(_main(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,379 @@
+"""
+Una base SQLite por biblioteca escolar (modo multi-tenant).
+
+Con `TENANTS_ENABLED`, cada tenant tiene su archivo `<TENANTS_DIR>/<tenant>.db`
+con el esquema completo. `GestorTenants` abre las bases a demanda y, mientras
+se atiende una petición (`usar`), reemplaza en el contexto las conexiones
+"default" y "lectura" de Tortoise por las del tenant: los modelos, el
+`ReadWriteRouter`, `in_transaction()` y el SQL directo (`connections.get`)
+usan su base sin cambios en el código de las rutas. Como cada base tiene su
+propio escritor, las escrituras de una escuela nunca esperan a las de otra.
+
+- La primera vez que un worker abre un tenant aplica sus migraciones
+  pendientes (si está al día, es una sola consulta) y las funciones
+  registradas con `al_abrir`.
+- Cada worker tiene como máximo `TENANTS_MAX_ABIERTOS` bases abiertas: al
+  superarlo se cierran las usadas hace más tiempo que no estén atendiendo
+  ninguna petición. Las que pasan `TENANTS_INACTIVIDAD` segundos sin uso se
+  cierran aunque no se haya llegado al máximo.
+- Las tareas periódicas que trabajan sobre la base se envuelven con
+  `por_tenant`, que las ejecuta en cada tenant.
+
+Para administrar los tenants sin iniciar la aplicación:
+    python -m app.db.tenants listar
+    python -m app.db.tenants crear <tenant> [<tenant> ...]
+    python -m app.db.tenants migrar [<tenant> ...]
+"""
+import asyncio
+import functools
+import importlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from app.core.config import settings
+from app.core.tenant import descartar_tenant, tenant_actual
+from app.db.config import tortoise_config
+from app.db.migraciones import migrar
+
+logger = logging.getLogger(__name__)
+
+# Nombres válidos: sirven como subdominio y como nombre de archivo
+_NOMBRE_TENANT = re.compile(r"^[a-z0-9][a-z0-9-]{0,62}$")
+
+
+class TenantInvalido(ValueError):
+    """El nombre no es un nombre de tenant válido."""
+
+
+class TenantDesconocido(LookupError):
+    """No existe la base del tenant (y no se crean automáticamente)."""
+
+    def __init__(self, tenant: str):
+        super().__init__(f"No existe la biblioteca '{tenant}'")
+        self.tenant = tenant
+
+
+class _Tenant:
+    """Base abierta de un tenant: sus conexiones y cuántas peticiones la usan."""
+
+    __slots__ = ("nombre", "conexiones", "en_uso", "ultimo_uso")
+
+    def __init__(self, nombre: str, conexiones: Dict[str, BaseDBAsyncClient]):
+        self.nombre = nombre
+        self.conexiones = conexiones
+        self.en_uso = 0
+        self.ultimo_uso = time.monotonic()
+
+
+class GestorTenants:
+    """
+    Abre, reutiliza y cierra las bases de los tenants (ver la documentación del módulo).
+
+    Atributos:
+        directorio: Directorio con un archivo `<tenant>.db` por tenant
+        max_abiertos: Bases abiertas a la vez como máximo
+        inactividad: Segundos sin uso tras los que se cierra una base
+        crear: Crear la base de un tenant que no existe
+        aperturas: Bases abiertas (incluye las reaperturas)
+        reutilizadas: Peticiones que encontraron la base ya abierta
+        cierres: Bases cerradas por el máximo o por inactividad
+    """
+
+    def __init__(self, directorio: str, max_abiertos: int, inactividad: float, crear: bool = False):
+        self.directorio = directorio
+        self.max_abiertos = max_abiertos
+        self.inactividad = inactividad
+        self.crear = crear
+        self.aperturas = 0
+        self.reutilizadas = 0
+        self.cierres = 0
+        self._abiertos: "OrderedDict[str, _Tenant]" = OrderedDict()
+        self._abriendo: Dict[str, asyncio.Lock] = {}
+        self._al_abrir: List[Callable[[], Awaitable[Any]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def ruta(self, nombre: str) -> str:
+        """
+        Devuelve el archivo de la base de un tenant.
+
+        Raises:
+            TenantInvalido: Si el nombre no es válido
+        """
+        if not _NOMBRE_TENANT.match(nombre):
+            raise TenantInvalido(nombre)
+        return os.path.join(self.directorio, f"{nombre}.db")
+
+    def listar(self) -> List[str]:
+        """Nombres de los tenants con base en el directorio, en orden alfabético."""
+        if not os.path.isdir(self.directorio):
+            return []
+        return sorted(
+            archivo[:-3] for archivo in os.listdir(self.directorio)
+            if archivo.endswith(".db") and _NOMBRE_TENANT.match(archivo[:-3])
+        )
+
+    def abiertos(self) -> List[str]:
+        """Tenants con la base abierta en este proceso, del menos al más recientemente usado."""
+        return list(self._abiertos)
+
+    def al_abrir(self, funcion: Callable[[], Awaitable[Any]]):
+        """
+        Registra una corrutina que se ejecuta, con la base del tenant, cada vez que se abre una.
+
+        Args:
+            funcion: Corrutina sin argumentos (por ejemplo, cargar datos en memoria)
+        """
+        self._al_abrir.append(funcion)
+
+    def _clientes(self, ruta: str) -> Dict[str, BaseDBAsyncClient]:
+        # Mismas conexiones (nombres, PRAGMAs) que la base principal. Los
+        # clientes llevan el nombre de la conexión que reemplazan porque las
+        # transacciones se registran con ese nombre
+        config = tortoise_config(f"sqlite://{ruta}")
+        clientes = {}
+        for alias, info in config["connections"].items():
+            if alias not in connections.db_config:
+                continue
+            modulo = importlib.import_module(info["engine"])
+            clientes[alias] = modulo.client_class(connection_name=alias, **info["credentials"])
+        return clientes
+
+    def _activar(self, tenant: _Tenant) -> list:
+        tokens = [(connections, connections.set(alias, cliente)) for alias, cliente in tenant.conexiones.items()]
+        tokens.append((tenant_actual, tenant_actual.set(tenant.nombre)))
+        return tokens
+
+    @staticmethod
+    def _desactivar(tokens: list):
+        for variable, token in reversed(tokens):
+            variable.reset(token)
+
+    async def _abrir(self, nombre: str) -> _Tenant:
+        ruta = self.ruta(nombre)
+        if not os.path.exists(ruta):
+            if not self.crear:
+                raise TenantDesconocido(nombre)
+            os.makedirs(self.directorio, exist_ok=True)
+        tenant = _Tenant(nombre, self._clientes(ruta))
+        tokens = self._activar(tenant)
+        try:
+            aplicadas = await migrar()
+            if aplicadas:
+                logger.info("Tenant %s: migraciones aplicadas %s", nombre, aplicadas)
+            for funcion in self._al_abrir:
+                await funcion()
+        except BaseException:
+            await self._cerrar_conexiones(tenant)
+            raise
+        finally:
+            self._desactivar(tokens)
+        self.aperturas += 1
+        return tenant
+
+    async def _adquirir(self, nombre: str) -> _Tenant:
+        tenant = self._abiertos.get(nombre)
+        if tenant is not None:
+            self.reutilizadas += 1
+        else:
+            # Un solo proceso de apertura por tenant: las demás peticiones lo esperan
+            lock = self._abriendo.setdefault(nombre, asyncio.Lock())
+            try:
+                async with lock:
+                    tenant = self._abiertos.get(nombre)
+                    if tenant is None:
+                        tenant = self._abiertos[nombre] = await self._abrir(nombre)
+            finally:
+                if self._abriendo.get(nombre) is lock and not lock.locked():
+                    del self._abriendo[nombre]
+        tenant.en_uso += 1
+        self._abiertos.move_to_end(nombre)
+        await self._liberar_exceso()
+        return tenant
+
+    def _soltar(self, tenant: _Tenant):
+        tenant.en_uso -= 1
+        tenant.ultimo_uso = time.monotonic()
+
+    @asynccontextmanager
+    async def usar(self, nombre: str):
+        """
+        Ejecuta el bloque con la base de un tenant (abriéndola si hace falta).
+
+        Args:
+            nombre: Nombre del tenant
+
+        Raises:
+            TenantInvalido: Si el nombre no es válido
+            TenantDesconocido: Si no existe la base y `crear` es False
+        """
+        tenant = await self._adquirir(nombre)
+        tokens = self._activar(tenant)
+        try:
+            yield
+        finally:
+            self._desactivar(tokens)
+            self._soltar(tenant)
+            # Las que quedaron de más mientras todas estaban en uso
+            await self._liberar_exceso()
+
+    def retener(self):
+        """
+        Mantiene abierta la base del tenant actual durante el bloque.
+
+        Para las tareas en segundo plano que inicia una petición y que pueden
+        seguir después de que termine (sin multi-tenant no hace nada).
+        """
+        tenant = tenant_actual.get()
+        return self.usar(tenant) if tenant is not None else nullcontext()
+
+    async def _cerrar_conexiones(self, tenant: _Tenant):
+        for cliente in tenant.conexiones.values():
+            try:
+                await cliente.close()
+            except Exception:
+                logger.exception("Error al cerrar la base del tenant %s", tenant.nombre)
+
+    async def _cerrar(self, tenant: _Tenant):
+        if self._abiertos.get(tenant.nombre) is tenant:
+            del self._abiertos[tenant.nombre]
+        descartar_tenant(tenant.nombre)
+        self.cierres += 1
+        await self._cerrar_conexiones(tenant)
+
+    async def _liberar_exceso(self):
+        # De la menos a la más recientemente usada, sólo las que no están en uso
+        exceso = len(self._abiertos) - self.max_abiertos
+        if exceso <= 0:
+            return
+        libres = [tenant for tenant in self._abiertos.values() if tenant.en_uso == 0][:exceso]
+        for tenant in libres:
+            await self._cerrar(tenant)
+
+    async def cerrar_inactivos(self) -> int:
+        """
+        Cierra las bases sin uso desde hace `inactividad` segundos.
+
+        Returns:
+            int: Bases cerradas
+        """
+        limite = time.monotonic() - self.inactividad
+        inactivos = [
+            tenant for tenant in self._abiertos.values() if tenant.en_uso == 0 and tenant.ultimo_uso < limite
+        ]
+        for tenant in inactivos:
+            await self._cerrar(tenant)
+        return len(inactivos)
+
+    async def crear_tenant(self, nombre: str) -> List[int]:
+        """
+        Crea la base de un tenant (o aplica sus migraciones pendientes si ya existe).
+
+        Returns:
+            List[int]: Migraciones aplicadas
+        """
+        ruta = self.ruta(nombre)
+        os.makedirs(self.directorio, exist_ok=True)
+        tenant = _Tenant(nombre, self._clientes(ruta))
+        tokens = self._activar(tenant)
+        try:
+            return await migrar()
+        finally:
+            self._desactivar(tokens)
+            await self._cerrar_conexiones(tenant)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(max(self.inactividad / 4, 1))
+            try:
+                await self.cerrar_inactivos()
+            except Exception:
+                logger.exception("Error al cerrar las bases de tenants inactivos")
+
+    def iniciar(self):
+        """Empieza a cerrar periódicamente las bases inactivas."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name="tenants")
+
+    async def cerrar(self):
+        """Detiene el cierre periódico y cierra todas las bases abiertas."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for tenant in list(self._abiertos.values()):
+            await self._cerrar(tenant)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "abiertos": len(self._abiertos),
+            "aperturas": self.aperturas,
+            "reutilizadas": self.reutilizadas,
+            "cierres": self.cierres,
+        }
+
+
+gestor_tenants = GestorTenants(
+    settings.TENANTS_DIR, settings.TENANTS_MAX_ABIERTOS, settings.TENANTS_INACTIVIDAD, settings.TENANTS_CREAR
+)
+
+
+def por_tenant(funcion: Callable[[], Awaitable[Optional[int]]]) -> Callable[[], Awaitable[Optional[int]]]:
+    """
+    Adapta una tarea periódica que trabaja sobre la base para ejecutarla en cada tenant.
+
+    Sin multi-tenant devuelve la misma función. Un error en un tenant se
+    registra y no impide ejecutarla en los demás.
+
+    Args:
+        funcion: Corrutina sin argumentos que devuelve los elementos procesados (o None)
+
+    Returns:
+        Callable: Corrutina que devuelve la suma de los elementos procesados en todos los tenants
+    """
+    if not settings.TENANTS_ENABLED:
+        return funcion
+
+    @functools.wraps(funcion)
+    async def en_cada_tenant() -> int:
+        total = 0
+        for nombre in gestor_tenants.listar():
+            try:
+                async with gestor_tenants.usar(nombre):
+                    total += await funcion() or 0
+            except Exception:
+                logger.exception("Error en %s (tenant %s)", getattr(funcion, "__qualname__", funcion), nombre)
+        return total
+
+    return en_cada_tenant
+
+
+if __name__ == "__main__":
+    import sys
+    from tortoise import Tortoise, run_async
+
+    async def _main(orden: str, nombres: List[str]):
+        await Tortoise.init(config=tortoise_config())
+        if orden == "listar":
+            for nombre in gestor_tenants.listar():
+                print(nombre)
+            return
+        if orden not in ("crear", "migrar") or (orden == "crear" and not nombres):
+            sys.exit(__doc__)
+        for nombre in nombres or gestor_tenants.listar():
+            if orden == "migrar" and not os.path.exists(gestor_tenants.ruta(nombre)):
+                sys.exit(f"No existe la biblioteca '{nombre}'")
+            aplicadas = await gestor_tenants.crear_tenant(nombre)
+            print(f"{nombre}: migraciones aplicadas {aplicadas}" if aplicadas else f"{nombre}: al día")
+
+    run_async(_main(sys.argv[1] if len(sys.argv) > 1 else "", sys.argv[2:]))
@@ -1,8 +1,35 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from tortoise.contrib.fastapi import register_tortoise
 
-from routes import libros, usuarios, prestamos, notificaciones, auth
+from app.api.routes import api_router
+from app.api.routes.libros import consultas_batch
+from app.core.catalogo import catalogos
+from app.core.config import settings
+from app.routes import admin, auth, cambios, usuario, prestamos, notificaciones, reportes
+from app.db.config import tortoise_config, verificar_configuracion
+from app.db.cambios import compactar_cambios
+from app.db.migraciones import migrar
+from app.db.recomendaciones import actualizar_recomendaciones
+from app.db.resumenes import reconciliar_resumenes
+from app.db.tenants import gestor_tenants, por_tenant
+from app.core.openapi import usar_openapi_cacheado
+from app.core.security import shutdown_password_pool
+from app.core.scheduler import PeriodicTask, scheduler
+from app.core.compartido import estado_compartido, lider
+from app.core.compresion import CompresionMiddleware
+from app.core.notificaciones import registrar_tareas
+from app.core.profiling import ProfilingMiddleware, instrumentar, metricas
+from app.core.response_cache import response_cache
+from app.core.sugerencias import indices_sugerencias
+from app.core.rate_limit import rate_limiter
+from app.core.tenant import TenantMiddleware
+from app.core.trabajos import cola_trabajos
+from app.auth.auth import auth_cache_stats
+from app.auth.revocacion import revocaciones
 
 app = FastAPI(
     title="Biblioteca API",
@@ -19,22 +46,182 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Comprimir las respuestas grandes (gzip o brotli) según Accept-Encoding
+if settings.COMPRESION_ENABLED:
+    app.add_middleware(CompresionMiddleware)
+
+# Multi-tenant: cada petición usa la base de su biblioteca (encabezado, subdominio o token)
+if settings.TENANTS_ENABLED:
+    app.add_middleware(TenantMiddleware, gestor=gestor_tenants)
+
+# Perfilado por petición (opcional): Server-Timing y métricas en /metrics
+if settings.PROFILING_ENABLED:
+    instrumentar()
+    app.add_middleware(ProfilingMiddleware)
+
+    def _metricas_de_caches():
+        valores = [
+            (f"response_cache_{nombre}", "counter", "Caché de respuestas de libros", {}, valor)
+            for nombre, valor in response_cache.stats().items()
+            if nombre in ("hits", "misses", "not_modified", "bytes_saved")
+        ]
+        for cache, stats in auth_cache_stats().items():
+            for nombre in ("hits", "misses"):
+                valores.append(
+                    (f"auth_cache_{nombre}", "counter", "Cachés de autenticación", {"cache": cache}, stats[nombre])
+                )
+        for nombre in ("ejecutadas", "compartidas"):
+            valores.append((
+                "libros_batch_consultas", "counter", "Consultas por lotes de libros", {"tipo": nombre},
+                consultas_batch.stats()[nombre],
+            ))
+        for nombre, valor in estado_compartido.stats().items():
+            valores.append((f"invalidaciones_{nombre}", "counter", "Invalidaciones entre workers", {}, valor))
+        valores.append(("rate_limit_rechazados", "counter", "Intentos rechazados con 429", {}, rate_limiter.rechazados))
+        trabajos = cola_trabajos.stats()
+        for nombre in ("completados", "fallidos"):
+            valores.append(("trabajos", "counter", "Trabajos terminados", {"estado": nombre}, trabajos[nombre]))
+        valores.append(("trabajos_en_curso", "gauge", "Trabajos en ejecución", {}, trabajos["en_curso"]))
+        for nombre, valor in revocaciones.stats().items():
+            tipo = "gauge" if nombre in ("tokens", "usuarios") else "counter"
+            valores.append((f"revocaciones_{nombre}", tipo, "Revocaciones de tokens en memoria", {}, valor))
+        if settings.CATALOGO_EN_MEMORIA:
+            for nombre, valor in catalogos.sumar_stats().items():
+                tipo = "gauge" if nombre == "libros" else "counter"
+                valores.append((f"catalogo_{nombre}", tipo, "Catálogo de libros en memoria", {}, valor))
+        for nombre, valor in indices_sugerencias.sumar_stats().items():
+            tipo = "counter" if nombre in ("consultas", "armados") else "gauge"
+            valores.append((f"sugerencias_{nombre}", tipo, "Índice de sugerencias de títulos y autores", {}, valor))
+        if settings.TENANTS_ENABLED:
+            for nombre, valor in gestor_tenants.stats().items():
+                tipo = "gauge" if nombre == "abiertos" else "counter"
+                valores.append((f"tenants_{nombre}", tipo, "Bases de tenants en este worker", {}, valor))
+        for tarea, stats in scheduler.metricas().items():
+            etiquetas = {"task": tarea}
+            valores.append(("background_task_runs", "counter", "Ejecuciones de tareas", etiquetas, stats["ejecuciones"]))
+            valores.append(("background_task_errors", "counter", "Errores de tareas", etiquetas, stats["errores"]))
+        return valores
+
+    metricas.agregar_colector(_metricas_de_caches)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def exportar_metricas():
+        return PlainTextResponse(metricas.render(), media_type="text/plain; version=0.0.4")
+
+# Leer el documento OpenAPI del disco en lugar de regenerarlo en cada proceso
+if settings.OPENAPI_CACHE:
+    usar_openapi_cacheado(app, settings.OPENAPI_CACHE)
+
 # Registrar las rutas
-app.include_router(auth.router)
-app.include_router(libros.router)
-app.include_router(usuarios.router)
+app.include_router(auth.router, prefix="/auth")
+app.include_router(api_router, prefix=settings.API_PREFIX)
+app.include_router(usuario.router)
 app.include_router(prestamos.router)
 app.include_router(notificaciones.router)
+app.include_router(reportes.router)
+app.include_router(admin.router)
+app.include_router(cambios.router)
 
-# Configurar Tortoise ORM
+# Configurar Tortoise ORM (conexiones y PRAGMAs según Settings)
+# El esquema no se genera en cada arranque: lo mantienen las migraciones
 register_tortoise(
     app,
-    db_url="sqlite://biblioteca.db",
-    modules={"models": ["models"]},
-    generate_schemas=True,
+    config=tortoise_config(),
+    generate_schemas=False,
     add_exception_handlers=True,
 )
 
+# Aplicar las migraciones pendientes (si la base está al día, es una sola consulta)
+# En modo multi-tenant se aplican al abrir la base de cada tenant
+@app.on_event("startup")
+async def aplicar_migraciones():
+    if settings.DB_MIGRAR_AL_INICIAR and not settings.TENANTS_ENABLED:
+        await migrar()
+
+# Informar la configuración efectiva de SQLite
+@app.on_event("startup")
+async def verificar_db():
+    await verificar_configuracion()
+
+# Cargar las revocaciones de tokens vigentes (las de cada tenant, al abrir su base)
+# y reconstruirlas periódicamente en cada worker para descartar las vencidas
+@app.on_event("startup")
+async def cargar_revocaciones():
+    if settings.TENANTS_ENABLED:
+        gestor_tenants.al_abrir(lambda: revocaciones.cargar(limpiar=False))
+    else:
+        await revocaciones.cargar()
+    revocaciones.iniciar(settings.JWT_REVOCACION_RECARGAR)
+
+# Cargar el catálogo en memoria antes de la primera consulta
+# (en modo multi-tenant, el de cada tenant se carga con su primera consulta)
+@app.on_event("startup")
+async def cargar_catalogo():
+    if settings.CATALOGO_EN_MEMORIA and not settings.TENANTS_ENABLED:
+        await catalogos.actual().sincronizar()
+
+# Cerrar periódicamente las bases de los tenants sin uso
+@app.on_event("startup")
+async def iniciar_tenants():
+    if settings.TENANTS_ENABLED:
+        gestor_tenants.iniciar()
+
+# Recibir las invalidaciones de cachés hechas por otros workers
+@app.on_event("startup")
+async def iniciar_estado_compartido():
+    await estado_compartido.iniciar()
+
+# Iniciar las tareas en segundo plano (préstamos vencidos, notificaciones y cola de trabajos)
+# Con varios workers sólo las ejecuta el líder; los demás reintentan tomar
+# el lugar periódicamente por si el líder termina
+@app.on_event("startup")
+async def iniciar_tareas():
+    registrar_tareas(scheduler)
+    scheduler.add(PeriodicTask("estado_compartido", estado_compartido.purgar, 600))
+    scheduler.add(PeriodicTask(
+        "reportes", por_tenant(reconciliar_resumenes), settings.REPORTES_RECONCILIAR_INTERVALO
+    ))
+    scheduler.add(PeriodicTask("revocaciones", por_tenant(revocaciones.purgar), 600))
+    scheduler.add(PeriodicTask("trabajos", cola_trabajos.despachar, settings.TRABAJOS_INTERVALO))
+    scheduler.add(PeriodicTask("trabajos_purgar", por_tenant(cola_trabajos.purgar), 3600))
+    scheduler.add(PeriodicTask("cambios", por_tenant(compactar_cambios), settings.CAMBIOS_COMPACTAR_INTERVALO))
+    scheduler.add(PeriodicTask(
+        "recomendaciones", por_tenant(actualizar_recomendaciones), settings.RECOMENDACIONES_INTERVALO
+    ))
+    if lider.intentar():
+        scheduler.start()
+    else:
+        app.state.esperar_lider = asyncio.create_task(
+            lider.esperar(scheduler.start, settings.COMPARTIDO_LIDER_INTERVALO)
+        )
+
+@app.on_event("shutdown")
+async def detener_tareas():
+    espera = getattr(app.state, "esperar_lider", None)
+    if espera is not None:
+        espera.cancel()
+    await scheduler.stop()
+    # Los trabajos interrumpidos los retoma el próximo líder
+    await cola_trabajos.detener()
+    lider.liberar()
+
+@app.on_event("shutdown")
+async def cerrar_revocaciones():
+    await revocaciones.cerrar()
+
+@app.on_event("shutdown")
+async def cerrar_tenants():
+    await gestor_tenants.cerrar()
+
+@app.on_event("shutdown")
+async def cerrar_estado_compartido():
+    await estado_compartido.cerrar()
+
+# Liberar los hilos dedicados a bcrypt
+@app.on_event("shutdown")
+async def cerrar_pool_hashing():
+    shutdown_password_pool()
+
 # Ruta de inicio
 @app.get("/", tags=["Inicio"])
 async def root():
@@ -44,11 +231,8 @@ async def root():
         "versión": "0.3.0"
     }
 
-# Ejecutar con: uvicorn main:app --reload
+# Ejecutar con: uvicorn app.main:app --reload
+# Con varios procesos: python -m app.servidor --workers 4
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
-
-from app.routes import auth
-app.include_router(auth.router, prefix="/auth")
-
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
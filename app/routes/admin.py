@@ -0,0 +1,150 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional
+
+from ..db.models.trabajo import Trabajo
+from ..schemas.trabajo import CAMPOS_TRABAJO, TrabajoCreate, TrabajoOut
+from ..schemas.usuario import Identidad
+from ..auth.auth import get_identidad
+from ..core.serialization import FastJSONResponse
+from ..core.trabajos import ConflictoIdempotencia, TipoTrabajoDesconocido, cola_trabajos
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"]
+)
+
+def verificar_admin(current_user: Identidad):
+    if current_user.rol != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para realizar esta acción"
+        )
+
+async def encolar_trabajo(
+    tipo: str,
+    parametros: BaseModel,
+    clave: Optional[str],
+    current_user: Identidad,
+    response: Response
+) -> Trabajo:
+    """
+    Encola un trabajo y prepara la respuesta: 202 con el encabezado `Location`
+    para consultar su estado, o 200 si la clave de idempotencia ya se había
+    usado para el mismo trabajo.
+    
+    Args:
+        tipo: Tipo de trabajo
+        parametros: Parámetros validados
+        clave: Clave de idempotencia (encabezado `Idempotency-Key`)
+        current_user: Usuario que encola el trabajo
+        response: Respuesta de la ruta
+        
+    Returns:
+        Trabajo: Trabajo encolado (o el existente con la misma clave)
+        
+    Raises:
+        HTTPException: 409 si la clave ya se usó para un trabajo distinto
+    """
+    try:
+        trabajo, creado = await cola_trabajos.encolar(tipo, parametros, clave=clave, usuario_id=current_user.id)
+    except ConflictoIdempotencia:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="La clave de idempotencia ya se usó para un trabajo distinto"
+        )
+    response.status_code = status.HTTP_202_ACCEPTED if creado else status.HTTP_200_OK
+    response.headers["Location"] = f"/admin/jobs/{trabajo.id}"
+    return trabajo
+
+@router.post("/jobs", response_model=TrabajoOut, status_code=status.HTTP_202_ACCEPTED)
+async def crear_trabajo(
+    trabajo: TrabajoCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    current_user: Identidad = Depends(get_identidad)
+):
+    """
+    Encola un trabajo para ejecutarlo en segundo plano (solo para administradores).
+    
+    Reenviar la petición con el mismo encabezado `Idempotency-Key` devuelve el
+    trabajo ya encolado en lugar de crear otro.
+    
+    Args:
+        trabajo: Tipo y parámetros del trabajo
+        idempotency_key: Clave de idempotencia (opcional)
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        TrabajoOut: Trabajo encolado, con su estado inicial
+        
+    Raises:
+        HTTPException: Si el usuario no es administrador, el tipo no existe o los parámetros no son válidos
+    """
+    verificar_admin(current_user)
+    try:
+        parametros = cola_trabajos.validar(trabajo.tipo, trabajo.parametros)
+    except TipoTrabajoDesconocido:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tipo de trabajo desconocido. Tipos disponibles: {', '.join(sorted(cola_trabajos.tipos))}"
+        )
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False, include_context=False)
+        )
+
+    return await encolar_trabajo(trabajo.tipo, parametros, idempotency_key, current_user, response)
+
+@router.get("/jobs", response_model=List[TrabajoOut])
+async def listar_trabajos(
+    estado: Optional[str] = None,
+    tipo: Optional[str] = None,
+    limite: int = Query(50, ge=1, le=500),
+    current_user: Identidad = Depends(get_identidad)
+):
+    """
+    Lista los trabajos, del más reciente al más antiguo (solo para administradores).
+    
+    Args:
+        estado: Filtrar por estado (pendiente, en_curso, completado, fallido)
+        tipo: Filtrar por tipo de trabajo
+        limite: Cantidad máxima de trabajos
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        List[TrabajoOut]: Trabajos
+    """
+    verificar_admin(current_user)
+    query = Trabajo.all()
+    if estado:
+        query = query.filter(estado=estado)
+    if tipo:
+        query = query.filter(tipo=tipo)
+    return FastJSONResponse(await query.order_by("-id").limit(limite).values(*CAMPOS_TRABAJO))
+
+@router.get("/jobs/{trabajo_id}", response_model=TrabajoOut)
+async def obtener_trabajo(trabajo_id: int, current_user: Identidad = Depends(get_identidad)):
+    """
+    Obtiene el estado y el progreso de un trabajo (solo para administradores).
+    
+    Args:
+        trabajo_id: ID del trabajo
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        TrabajoOut: Trabajo, con `progreso` y `total` mientras se ejecuta y
+        `resultado` o `error` cuando termina
+        
+    Raises:
+        HTTPException: Si el usuario no es administrador o el trabajo no existe
+    """
+    verificar_admin(current_user)
+    trabajo = await Trabajo.get_or_none(id=trabajo_id).values(*CAMPOS_TRABAJO)
+    if trabajo is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+    return FastJSONResponse(trabajo)
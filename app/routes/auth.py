@@ -1,25 +1,65 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from tortoise.exceptions import IntegrityError
 from app.schemas.usuario import UsuarioCreate, UsuarioLogin
-from db.models.usuario import Usuario
-from app.core.security import hash_password, verify_password
+from app.db.models.usuario import Usuario
+from app.auth.auth import (
+    create_user_token, get_password_hash_async, oauth2_scheme, revoke_token, verify_password_async,
+)
+from app.core.rate_limit import rate_limiter
 
 router = APIRouter()
 
+# Altas simultáneas pueden elegir el mismo nombre de usuario: se reintenta con el siguiente
+INTENTOS_ALTA = 5
+
+
+async def _username_disponible(email: str) -> str:
+    # El nombre de usuario debe ser alfanumérico (ver UsuarioBase): se deriva del email
+    base = "".join(c for c in email.split("@")[0] if c.isalnum())[:40] or "usuario"
+    username, n = base, 1
+    while await Usuario.filter(username=username).exists():
+        n += 1
+        username = f"{base}{n}"
+    return username
+
 @router.post("/register")
-async def register(user: UsuarioCreate):
+async def register(request: Request, user: UsuarioCreate):
+    await rate_limiter.verificar("register", request, user.email)
     existing_user = await Usuario.get_or_none(email=user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="El usuario ya existe")
 
-    hashed_pw = hash_password(user.password)
-    new_user = await Usuario.create(nombre=user.nombre, email=user.email, password=hashed_pw)
+    hashed_pw = await get_password_hash_async(user.password)
+    for _ in range(INTENTOS_ALTA):
+        try:
+            new_user = await Usuario.create(username=await _username_disponible(user.email), nombre=user.nombre, email=user.email, hashed_password=hashed_pw)
+            break
+        except IntegrityError:
+            # Otra alta con el mismo email ganó la carrera; si no, el nombre de usuario ya se ocupó
+            if await Usuario.filter(email=user.email).exists():
+                raise HTTPException(status_code=400, detail="El usuario ya existe")
+    else:
+        raise HTTPException(status_code=409, detail="No se pudo asignar un nombre de usuario, intente nuevamente")
     return {"message": "Usuario creado", "usuario": new_user.email}
 
 
 @router.post("/login")
-async def login(user: UsuarioLogin):
+async def login(request: Request, user: UsuarioLogin):
+    await rate_limiter.verificar("login", request, user.email)
     db_user = await Usuario.get_or_none(email=user.email)
-    if not db_user or not verify_password(user.password, db_user.password):
+    if not db_user or not await verify_password_async(user.password, db_user.hashed_password):
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
 
-    return {"message": f"Bienvenido, {db_user.nombre}"}
+    await rate_limiter.restablecer("login", user.email)
+
+    return {
+        "message": f"Bienvenido, {db_user.nombre}",
+        "access_token": create_user_token(db_user),
+        "token_type": "bearer",
+    }
+
+
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme)):
+    await revoke_token(token)
+    return {"message": "Sesión cerrada"}
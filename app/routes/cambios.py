@@ -0,0 +1,127 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import Optional
+
+from ..db.cambios import ENTIDADES, SecuenciaCompactada, leer_cambios
+from ..schemas.cambio import CambiosLibros, CambiosUsuarios
+from ..schemas.usuario import Identidad
+from ..auth.auth import get_identidad
+from ..core.config import settings
+from ..core.serialization import (
+    FORMATO_COLUMNAS, MEDIA_TYPE_MSGPACK, PATRON_FORMATO, FastJSONResponse, acepta_msgpack, en_columnas, msgpack_dumps,
+)
+from .admin import verificar_admin
+
+router = APIRouter(
+    prefix="/cambios",
+    tags=["cambios"]
+)
+
+async def responder_cambios(
+    entidad: str,
+    since: int,
+    generacion: Optional[int],
+    limite: Optional[int],
+    formato: Optional[str],
+    request: Request
+) -> Response:
+    """
+    Lee un lote del registro de cambios y arma la respuesta en el formato pedido.
+    
+    Args:
+        entidad: "libro" o "usuario"
+        since: Última secuencia recibida por el cliente
+        generacion: Generación recibida junto con `since`
+        limite: Entradas del registro a leer (por defecto `CAMBIOS_LIMITE`)
+        formato: `rows` (por defecto) o `columns` para la lista de cambios
+        request: Request actual (para elegir JSON o MessagePack)
+        
+    Returns:
+        Response: Lote de cambios
+        
+    Raises:
+        HTTPException: 410 si se compactaron bajas posteriores a `since`
+    """
+    try:
+        contenido = await leer_cambios(entidad, since, limite or settings.CAMBIOS_LIMITE, generacion)
+    except SecuenciaCompactada as e:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail=f"Los cambios anteriores a la secuencia {e.seq_minimo} ya no están disponibles: "
+                   "sincronizar de nuevo desde since=0"
+        )
+
+    if formato == FORMATO_COLUMNAS:
+        contenido["cambios"] = en_columnas(contenido["cambios"], ENTIDADES[entidad][1])
+    headers = {"Vary": "Accept"}
+    if acepta_msgpack(request):
+        return Response(msgpack_dumps(contenido), media_type=MEDIA_TYPE_MSGPACK, headers=headers)
+    return FastJSONResponse(contenido, headers=headers)
+
+@router.get("", response_model=CambiosLibros)
+async def cambios_libros(
+    request: Request,
+    since: int = Query(0, ge=0),
+    generacion: Optional[int] = Query(None, ge=0),
+    limite: Optional[int] = Query(None, ge=1, le=10000),
+    formato: Optional[str] = Query(None, alias="format", pattern=PATRON_FORMATO)
+):
+    """
+    Cambios del catálogo posteriores a la secuencia `since`.
+    
+    Para mantener una copia local del catálogo sin volver a descargarlo:
+    pedir primero con `since=0` (trae todos los libros), y después enviar
+    como `since` y `generacion` los valores `hasta` y `generacion` de la
+    última respuesta. Mientras `mas` sea verdadero hay más cambios para
+    pedir enseguida. Cada libro creado o modificado llega una sola vez con
+    su estado actual, y de los eliminados sólo su ID en `bajas`.
+    
+    Con `format=columns` los cambios se envían en columnas, y con
+    `Accept: application/msgpack`, en MessagePack.
+    
+    Args:
+        since: Última secuencia recibida (0 para sincronizar todo)
+        generacion: Generación recibida en la misma respuesta que `since`
+        limite: Entradas del registro a leer como máximo
+        formato: `rows` (por defecto) o `columns`
+        
+    Returns:
+        CambiosLibros: Libros creados o modificados, IDs eliminados y la
+        secuencia para continuar
+        
+    Raises:
+        HTTPException: 410 si las bajas posteriores a `since` ya se compactaron
+        (hay que sincronizar de nuevo desde 0)
+    """
+    return await responder_cambios("libro", since, generacion, limite, formato, request)
+
+@router.get("/usuarios", response_model=CambiosUsuarios)
+async def cambios_usuarios(
+    request: Request,
+    since: int = Query(0, ge=0),
+    generacion: Optional[int] = Query(None, ge=0),
+    limite: Optional[int] = Query(None, ge=1, le=10000),
+    formato: Optional[str] = Query(None, alias="format", pattern=PATRON_FORMATO),
+    current_user: Identidad = Depends(get_identidad)
+):
+    """
+    Cambios de usuarios posteriores a la secuencia `since` (solo para administradores).
+    
+    Funciona igual que `GET /cambios` para libros.
+    
+    Args:
+        since: Última secuencia recibida (0 para sincronizar todo)
+        generacion: Generación recibida en la misma respuesta que `since`
+        limite: Entradas del registro a leer como máximo
+        formato: `rows` (por defecto) o `columns`
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        CambiosUsuarios: Usuarios creados o modificados, IDs eliminados y la
+        secuencia para continuar
+        
+    Raises:
+        HTTPException: Si el usuario no es administrador, o 410 si hay que
+        sincronizar de nuevo desde 0
+    """
+    verificar_admin(current_user)
+    return await responder_cambios("usuario", since, generacion, limite, formato, request)
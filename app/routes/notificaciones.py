@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List
+
+from ..db.models.notificacion import Notificacion
+from ..db.models.usuario import Usuario
+from ..schemas.notificacion import CAMPOS_NOTIFICACION, NotificacionOut
+from ..auth.auth import get_current_user
+from ..core.scheduler import scheduler
+from ..core.serialization import FastJSONResponse
+
+router = APIRouter(
+    prefix="/notificaciones",
+    tags=["notificaciones"]
+)
+
+@router.get("/", response_model=List[NotificacionOut])
+async def read_notificaciones(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Lista las notificaciones del usuario actual, de la más reciente a la más antigua.
+    
+    Args:
+        skip: Número de registros a omitir (para paginación)
+        limit: Número máximo de registros a devolver
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        List[NotificacionOut]: Notificaciones del usuario
+    """
+    notificaciones = await Notificacion.filter(usuario_id=current_user.id).order_by(
+        "-fecha_creacion"
+    ).offset(skip).limit(limit).values(*CAMPOS_NOTIFICACION)
+    return FastJSONResponse(notificaciones)
+
+@router.get("/metricas")
+async def read_metricas(current_user: Usuario = Depends(get_current_user)):
+    """
+    Devuelve métricas de las tareas en segundo plano y del outbox (solo para administradores).
+    
+    Args:
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        dict: Duración y cantidad de elementos procesados por tarea, y notificaciones por estado
+        
+    Raises:
+        HTTPException: Si el usuario no es administrador
+    """
+    if current_user.rol != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para realizar esta acción"
+        )
+    
+    outbox = {
+        estado: await Notificacion.filter(estado=estado).count()
+        for estado in ("pendiente", "enviada", "fallida")
+    }
+    return {"tareas": scheduler.metricas(), "outbox": outbox}
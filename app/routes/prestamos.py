@@ -0,0 +1,222 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from datetime import timedelta
+from typing import List, Optional
+from tortoise import timezone
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from ..db.models.libro import Libro
+from ..db.models.prestamo import Prestamo
+from ..db.models.usuario import Usuario
+from ..schemas.prestamo import CAMPOS_PRESTAMO, PrestamoCreate, PrestamoOut
+from ..auth.auth import get_current_user
+from ..core.response_cache import response_cache
+from ..core.serialization import FastJSONResponse
+
+router = APIRouter(
+    prefix="/prestamos",
+    tags=["prestamos"]
+)
+
+# Roles que pueden gestionar préstamos de otros usuarios
+ROLES_PERSONAL = ("admin", "bibliotecario")
+
+def _verificar_personal(current_user: Usuario):
+    if current_user.rol not in ROLES_PERSONAL:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para realizar esta acción"
+        )
+
+@router.post("/", response_model=PrestamoOut, status_code=status.HTTP_201_CREATED)
+async def create_prestamo(
+    prestamo: PrestamoCreate,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Registra el préstamo de un libro.
+
+    El libro pasa a estado "prestado" en la misma transacción en que se crea
+    el préstamo. El cambio de estado es una actualización condicional
+    (sólo si el libro está "disponible"), por lo que dos pedidos simultáneos
+    del mismo libro no pueden prestarlo dos veces.
+
+    Args:
+        prestamo: Libro a prestar, plazo y (para bibliotecarios) usuario
+        current_user: Usuario autenticado (obtenido del token)
+
+    Returns:
+        PrestamoOut: Préstamo creado
+
+    Raises:
+        HTTPException: Si el libro o el usuario no existen, o si el libro no está disponible
+    """
+    usuario_id = current_user.id
+    if prestamo.usuario_id is not None and prestamo.usuario_id != current_user.id:
+        _verificar_personal(current_user)
+        if not await Usuario.filter(id=prestamo.usuario_id, activo=True).exists():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Usuario no encontrado"
+            )
+        usuario_id = prestamo.usuario_id
+
+    async with in_transaction("default") as conn:
+        actualizados = await Libro.filter(id=prestamo.libro_id, estado="disponible").using_db(conn).update(
+            estado="prestado"
+        )
+        if not actualizados:
+            if not await Libro.filter(id=prestamo.libro_id).using_db(conn).exists():
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Libro con ID {prestamo.libro_id} no encontrado"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="El libro no está disponible"
+            )
+
+        nuevo = await Prestamo.create(
+            libro_id=prestamo.libro_id,
+            usuario_id=usuario_id,
+            fecha_devolucion=timezone.now() + timedelta(days=prestamo.dias),
+            estado="activo",
+            using_db=conn
+        )
+
+    # El estado del libro cambió: las respuestas de libros guardadas ya no valen
+    await response_cache.invalidar("libros")
+    return nuevo
+
+@router.put("/{prestamo_id}", response_model=PrestamoOut)
+async def devolver_prestamo(
+    prestamo_id: int,
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Registra la devolución de un libro prestado.
+
+    El préstamo se marca como "devuelto" y el libro vuelve a estar
+    "disponible" en una sola transacción. Sólo el personal de la biblioteca
+    o el propio usuario pueden registrar la devolución.
+
+    Args:
+        prestamo_id: ID del préstamo
+        current_user: Usuario autenticado (obtenido del token)
+
+    Returns:
+        PrestamoOut: Préstamo actualizado
+
+    Raises:
+        HTTPException: Si el préstamo no existe, ya fue devuelto o el usuario no tiene permiso
+    """
+    prestamo = await Prestamo.get_or_none(id=prestamo_id)
+
+    if not prestamo:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Préstamo no encontrado"
+        )
+
+    if prestamo.usuario_id != current_user.id:
+        _verificar_personal(current_user)
+
+    ahora = timezone.now()
+    async with in_transaction("default") as conn:
+        # Actualización condicional: si dos devoluciones llegan juntas, sólo una la registra
+        actualizados = await Prestamo.filter(
+            id=prestamo_id, estado__in=("activo", "vencido")
+        ).using_db(conn).update(estado="devuelto", fecha_devuelto=ahora)
+        if not actualizados:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="El préstamo ya fue devuelto"
+            )
+        await Libro.filter(id=prestamo.libro_id).using_db(conn).update(estado="disponible")
+    await response_cache.invalidar("libros")
+
+    prestamo.estado = "devuelto"
+    prestamo.fecha_devuelto = ahora
+    return prestamo
+
+@router.get("/activos", response_model=List[PrestamoOut])
+async def read_prestamos_activos(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Lista los préstamos activos, ordenados por fecha límite (solo personal).
+
+    Args:
+        skip: Número de registros a omitir (para paginación)
+        limit: Número máximo de registros a devolver
+        current_user: Usuario autenticado (obtenido del token)
+
+    Returns:
+        List[PrestamoOut]: Préstamos activos
+    """
+    _verificar_personal(current_user)
+
+    # Recorre el índice (estado, fecha_devolucion) en orden
+    prestamos = await Prestamo.filter(estado="activo").order_by("fecha_devolucion").offset(skip).limit(limit).values(
+        *CAMPOS_PRESTAMO
+    )
+    return FastJSONResponse(prestamos)
+
+@router.get("/vencidos", response_model=List[PrestamoOut])
+async def read_prestamos_vencidos(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Lista los préstamos vencidos, del más atrasado al más reciente (solo personal).
+
+    Incluye los ya marcados como "vencido" y los activos cuya fecha límite pasó.
+
+    Args:
+        skip: Número de registros a omitir (para paginación)
+        limit: Número máximo de registros a devolver
+        current_user: Usuario autenticado (obtenido del token)
+
+    Returns:
+        List[PrestamoOut]: Préstamos vencidos
+    """
+    _verificar_personal(current_user)
+
+    # Dos rangos del índice (estado, fecha_devolucion)
+    prestamos = await Prestamo.filter(
+        Q(estado="vencido") | Q(estado="activo", fecha_devolucion__lt=timezone.now())
+    ).order_by("fecha_devolucion").offset(skip).limit(limit).values(*CAMPOS_PRESTAMO)
+    return FastJSONResponse(prestamos)
+
+@router.get("/historial", response_model=List[PrestamoOut])
+async def read_historial(
+    usuario_id: Optional[int] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Lista el historial de préstamos de un usuario, del más reciente al más antiguo.
+
+    Args:
+        usuario_id: Usuario a consultar (por defecto, el usuario actual; otros usuarios solo personal)
+        skip: Número de registros a omitir (para paginación)
+        limit: Número máximo de registros a devolver
+        current_user: Usuario autenticado (obtenido del token)
+
+    Returns:
+        List[PrestamoOut]: Préstamos del usuario
+    """
+    if usuario_id is None:
+        usuario_id = current_user.id
+    elif usuario_id != current_user.id:
+        _verificar_personal(current_user)
+
+    # Recorre el índice (usuario_id, fecha_prestamo) en orden inverso
+    prestamos = await Prestamo.filter(usuario_id=usuario_id).order_by("-fecha_prestamo").offset(skip).limit(limit).values(
+        *CAMPOS_PRESTAMO
+    )
+    return FastJSONResponse(prestamos)
@@ -0,0 +1,157 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List
+
+from ..db.models.libro import Libro
+from ..db.models.resumen import ResumenLibros, ResumenPrestamosLibro, ResumenPrestamosUsuario
+from ..db.models.usuario import Usuario
+from ..db.resumenes import reconciliar_resumenes
+from ..schemas.reporte import LibroMasPrestado, ReporteCategoria, ReporteEstado, UsuarioConPrestamos
+from ..auth.auth import get_current_user
+from ..core.serialization import FastJSONResponse
+
+router = APIRouter(
+    prefix="/reportes",
+    tags=["reportes"]
+)
+
+# Roles que pueden ver los reportes
+ROLES_PERSONAL = ("admin", "bibliotecario")
+
+def _verificar_personal(current_user: Usuario):
+    if current_user.rol not in ROLES_PERSONAL:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para realizar esta acción"
+        )
+
+@router.get("/libros/categorias", response_model=List[ReporteCategoria])
+async def reporte_categorias(current_user: Usuario = Depends(get_current_user)):
+    """
+    Cantidad de libros por categoría, en total y desglosada por estado.
+    
+    Se lee de la tabla de resumen (una fila por categoría y estado), sin
+    recorrer la tabla de libros.
+    
+    Args:
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        List[ReporteCategoria]: Categorías ordenadas de mayor a menor cantidad de libros
+    """
+    _verificar_personal(current_user)
+    categorias = {}
+    for fila in await ResumenLibros.filter(cantidad__gt=0).values("categoria", "estado", "cantidad"):
+        reporte = categorias.setdefault(
+            fila["categoria"], {"categoria": fila["categoria"], "total": 0, "por_estado": {}}
+        )
+        reporte["total"] += fila["cantidad"]
+        reporte["por_estado"][fila["estado"]] = fila["cantidad"]
+    return FastJSONResponse(sorted(categorias.values(), key=lambda r: (-r["total"], r["categoria"])))
+
+@router.get("/libros/estados", response_model=List[ReporteEstado])
+async def reporte_estados(current_user: Usuario = Depends(get_current_user)):
+    """
+    Cantidad de libros en cada estado (disponible, prestado, etc.).
+    
+    Args:
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        List[ReporteEstado]: Estados ordenados de mayor a menor cantidad de libros
+    """
+    _verificar_personal(current_user)
+    estados = {}
+    for fila in await ResumenLibros.filter(cantidad__gt=0).values("estado", "cantidad"):
+        estados[fila["estado"]] = estados.get(fila["estado"], 0) + fila["cantidad"]
+    reporte = [{"estado": estado, "total": total} for estado, total in estados.items()]
+    return FastJSONResponse(sorted(reporte, key=lambda r: (-r["total"], r["estado"])))
+
+@router.get("/prestamos/mas-prestados", response_model=List[LibroMasPrestado])
+async def reporte_mas_prestados(
+    limite: int = Query(10, ge=1, le=100),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Libros prestados más veces (incluye los préstamos ya devueltos).
+    
+    Args:
+        limite: Cantidad de libros a devolver
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        List[LibroMasPrestado]: Libros de más a menos prestado
+    """
+    _verificar_personal(current_user)
+    resumen = await ResumenPrestamosLibro.filter(prestamos__gt=0).order_by(
+        "-prestamos", "libro_id"
+    ).limit(limite).values("libro_id", "prestamos")
+    libros = {
+        fila["id"]: fila
+        for fila in await Libro.filter(id__in=[r["libro_id"] for r in resumen]).values("id", "titulo", "autor")
+    }
+    return FastJSONResponse([
+        {
+            "libro_id": r["libro_id"],
+            "titulo": libros[r["libro_id"]]["titulo"],
+            "autor": libros[r["libro_id"]]["autor"],
+            "prestamos": r["prestamos"],
+        }
+        for r in resumen if r["libro_id"] in libros
+    ])
+
+@router.get("/prestamos/usuarios", response_model=List[UsuarioConPrestamos])
+async def reporte_prestamos_por_usuario(
+    limite: int = Query(50, ge=1, le=500),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Usuarios con préstamos sin devolver (activos o vencidos).
+    
+    Args:
+        limite: Cantidad máxima de usuarios a devolver
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        List[UsuarioConPrestamos]: Usuarios de más a menos préstamos activos
+    """
+    _verificar_personal(current_user)
+    resumen = await ResumenPrestamosUsuario.filter(activos__gt=0).order_by(
+        "-activos", "usuario_id"
+    ).limit(limite).values("usuario_id", "activos", "vencidos")
+    # Los que sólo tienen préstamos vencidos van después
+    if len(resumen) < limite:
+        resumen += await ResumenPrestamosUsuario.filter(activos=0, vencidos__gt=0).order_by(
+            "-vencidos", "usuario_id"
+        ).limit(limite - len(resumen)).values("usuario_id", "activos", "vencidos")
+    usuarios = {
+        fila["id"]: fila
+        for fila in await Usuario.filter(id__in=[r["usuario_id"] for r in resumen]).values("id", "username", "nombre")
+    }
+    return FastJSONResponse([
+        dict(r, username=usuarios[r["usuario_id"]]["username"], nombre=usuarios[r["usuario_id"]]["nombre"])
+        for r in resumen if r["usuario_id"] in usuarios
+    ])
+
+@router.post("/reconciliar")
+async def reconciliar(current_user: Usuario = Depends(get_current_user)):
+    """
+    Recalcula las tablas de resumen desde cero (solo para administradores).
+    
+    Normalmente no hace falta: se mantienen al día con cada cambio y se
+    recalculan periódicamente en segundo plano.
+    
+    Args:
+        current_user: Usuario autenticado (obtenido del token)
+        
+    Returns:
+        dict: Filas de resumen que estaban desactualizadas
+        
+    Raises:
+        HTTPException: Si el usuario no es administrador
+    """
+    if current_user.rol != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permisos para realizar esta acción"
+        )
+    return {"corregidas": await reconciliar_resumenes()}
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from typing import List, Optional
+from tortoise.exceptions import IntegrityError
 
-from ..models.usuario import Usuario
-from ..schemas.usuario import UsuarioOut, UsuarioUpdate, UsuarioAdminUpdate
-from ..auth.auth import get_current_user
+from ..db.models.usuario import Usuario
+from ..core.serialization import (
+    FORMATO_COLUMNAS, PATRON_FORMATO, acepta_msgpack, iter_values, list_response, streaming_json_response,
+)
+from ..schemas.usuario import CAMPOS_USUARIO, Identidad, UsuarioOut, UsuarioUpdate, UsuarioAdminUpdate
+from ..auth.auth import get_current_user, get_identidad, invalidate_user_cache
+from ..auth.revocacion import revocaciones
 
 router = APIRouter(
     prefix="/usuarios",
@@ -54,19 +59,26 @@ async def update_user_me(
     
     # Actualizar contraseña si se proporciona
     if user_update.password:
-        from ..auth.auth import get_password_hash
-        current_user.hashed_password = get_password_hash(user_update.password)
+        from ..auth.auth import get_password_hash_async
+        current_user.hashed_password = await get_password_hash_async(user_update.password)
     
     # Guardar cambios
     await current_user.save()
+    await invalidate_user_cache(current_user.username)
+    
+    # Con la contraseña nueva dejan de valer los tokens emitidos (incluido el actual)
+    if user_update.password:
+        await revocaciones.revocar_usuario(current_user.username)
     
     return current_user
 
 @router.get("/", response_model=List[UsuarioOut])
 async def read_users(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
-    current_user: Usuario = Depends(get_current_user)
+    formato: Optional[str] = Query(None, alias="format", pattern=PATRON_FORMATO),
+    current_user: Identidad = Depends(get_identidad)
 ):
     """
     Obtiene lista de usuarios (solo para administradores).
@@ -74,10 +86,12 @@ async def read_users(
     Args:
         skip: Número de registros a omitir (para paginación)
         limit: Número máximo de registros a devolver
+        formato: "rows" (por defecto) o "columns" (un arreglo por campo)
         current_user: Usuario autenticado (obtenido del token)
         
     Returns:
-        List[UsuarioOut]: Lista de usuarios
+        List[UsuarioOut]: Lista de usuarios (en MessagePack si se pide con
+        `Accept: application/msgpack`)
         
     Raises:
         HTTPException: Si el usuario no es administrador
@@ -89,15 +103,19 @@ async def read_users(
             detail="No tienes permisos para realizar esta acción"
         )
     
-    # Obtener usuarios con paginación
-    users = await Usuario.all().offset(skip).limit(limit)
+    lotes = iter_values(Usuario.all(), CAMPOS_USUARIO, offset=skip, limite=limit)
+    binario = acepta_msgpack(request)
+    if formato == FORMATO_COLUMNAS or binario:
+        filas = [fila async for lote in lotes for fila in lote]
+        return list_response(filas, CAMPOS_USUARIO, formato, binario=binario)
     
-    return users
+    # Obtener usuarios con paginación, enviándolos por lotes a medida que se leen
+    return streaming_json_response(lotes, headers={"Vary": "Accept"})
 
 @router.get("/{user_id}", response_model=UsuarioOut)
 async def read_user(
     user_id: int,
-    current_user: Usuario = Depends(get_current_user)
+    current_user: Identidad = Depends(get_identidad)
 ):
     """
     Obtiene información de un usuario específico.
@@ -134,7 +152,7 @@ async def read_user(
 async def update_user(
     user_id: int,
     user_update: UsuarioAdminUpdate,
-    current_user: Usuario = Depends(get_current_user)
+    current_user: Identidad = Depends(get_identidad)
 ):
     """
     Actualiza información de un usuario (solo para administradores).
@@ -181,8 +199,8 @@ async def update_user(
         user.nombre = user_update.nombre
     
     if user_update.password:
-        from ..auth.auth import get_password_hash
-        user.hashed_password = get_password_hash(user_update.password)
+        from ..auth.auth import get_password_hash_async
+        user.hashed_password = await get_password_hash_async(user_update.password)
     
     if user_update.rol is not None:
         # Validar que el rol sea válido
@@ -198,13 +216,18 @@ async def update_user(
     
     # Guardar cambios
     await user.save()
+    await invalidate_user_cache(user.username)
+    
+    # Los tokens emitidos llevan el rol y el estado anteriores
+    if user_update.rol is not None or user_update.activo is not None or user_update.password:
+        await revocaciones.revocar_usuario(user.username)
     
     return user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     user_id: int,
-    current_user: Usuario = Depends(get_current_user)
+    current_user: Identidad = Depends(get_identidad)
 ):
     """
     Elimina un usuario (solo para administradores).
@@ -214,7 +237,8 @@ async def delete_user(
         current_user: Usuario autenticado (obtenido del token)
         
     Raises:
-        HTTPException: Si el usuario no tiene permiso o el usuario no existe
+        HTTPException: Si el usuario no tiene permiso, no existe o tiene
+            préstamos registrados
     """
     # Verificar si el usuario es administrador
     if current_user.rol != "admin":
@@ -239,5 +263,14 @@ async def delete_user(
             detail="Usuario no encontrado"
         )
     
-    # Eliminar usuario
-    await user.delete()
\ No newline at end of file
+    # Eliminar usuario (los préstamos no se borran en cascada: la base lo rechaza)
+    try:
+        await user.delete()
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="El usuario tiene préstamos registrados y no puede eliminarse"
+        )
+    await invalidate_user_cache(user.username)
+    # Los tokens emitidos llevan el rol y el estado del usuario eliminado
+    await revocaciones.revocar_usuario(user.username)
\ No newline at end of file
@@ -1,3 +1,3 @@
-from app.schemas.libro import Libro, LibroCreate, LibroUpdate, LibroInDB
+from app.schemas.libro import Libro, LibroCreate, LibroUpdate, LibroInDB, ErrorImportacion, ResultadoImportacion
 
-__all__ = ["Libro", "LibroCreate", "LibroUpdate", "LibroInDB"]
\ No newline at end of file
+__all__ = ["Libro", "LibroCreate", "LibroUpdate", "LibroInDB", "ErrorImportacion", "ResultadoImportacion"]
\ No newline at end of file
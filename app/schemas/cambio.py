@@ -0,0 +1,21 @@
+from pydantic import BaseModel
+from typing import List
+
+from .libro import Libro
+from .usuario import UsuarioOut
+
+class Cambios(BaseModel):
+    """Lote de cambios posteriores a una secuencia"""
+    desde: int
+    hasta: int  # Secuencia a enviar como `since` en la próxima petición
+    mas: bool  # Quedan más cambios después de `hasta`
+    generacion: int  # Generación de la compactación, a enviar junto con `since`
+    bajas: List[int]  # IDs eliminados
+
+class CambiosLibros(Cambios):
+    """Lote de cambios de libros: estado actual de los creados o modificados"""
+    cambios: List[Libro]
+
+class CambiosUsuarios(Cambios):
+    """Lote de cambios de usuarios: estado actual de los creados o modificados"""
+    cambios: List[UsuarioOut]
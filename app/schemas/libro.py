@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
 from datetime import datetime
 
 class LibroBase(BaseModel):
@@ -12,6 +12,13 @@ class LibroBase(BaseModel):
 class LibroCreate(LibroBase):
     pass
 
+class LibroUpsert(BaseModel):
+    """Datos de un libro que se crea o reemplaza por su ISBN (el ISBN va en la ruta)"""
+    titulo: str
+    autor: str
+    categoria: str
+    estado: str = "disponible"
+
 class LibroUpdate(BaseModel):
     titulo: Optional[str] = None
     autor: Optional[str] = None
@@ -27,4 +34,65 @@ class LibroInDB(LibroBase):
         from_attributes = True  # Equivalente a orm_mode en Pydantic v1
 
 class Libro(LibroInDB):
-    pass
\ No newline at end of file
+    pass
+
+# Campos que se leen de la base para responder con un `Libro`
+CAMPOS_LIBRO = tuple(Libro.model_fields)
+
+class Sugerencia(BaseModel):
+    texto: str
+    tipo: str = Field(..., description='"titulo" o "autor"')
+    libro_id: Optional[int] = Field(None, description="Libro sugerido (sólo para títulos)")
+    prestamos: int = Field(..., description="Préstamos del libro o de todos los libros del autor")
+
+class Recomendado(Libro):
+    puntaje: float = Field(..., description="Similitud con el libro consultado (0 a 1)")
+    coprestamos: int = Field(..., description="Usuarios que retiraron ambos libros")
+
+class ErrorImportacion(BaseModel):
+    fila: int
+    isbn: Optional[str] = None
+    detalle: str
+
+class ResultadoImportacion(BaseModel):
+    procesadas: int = 0
+    insertadas: int = 0
+    errores: List[ErrorImportacion] = []
+
+class ConsultaLibros(BaseModel):
+    ids: List[int] = []
+    isbns: List[str] = []
+
+class LibrosFaltantes(BaseModel):
+    ids: List[int] = []
+    isbns: List[str] = []
+
+class ResultadoConsultaLibros(BaseModel):
+    encontrados: List[Libro] = []
+    faltantes: LibrosFaltantes = LibrosFaltantes()
+
+class FiltroLibros(BaseModel):
+    """Libros a los que se aplica una actualización masiva (mismos criterios que el listado)"""
+    ids: Optional[List[int]] = None
+    titulo: Optional[str] = None
+    autor: Optional[str] = None
+    categoria: Optional[str] = None
+    estado: Optional[str] = None
+
+class CambiosLibros(BaseModel):
+    """Campos que se pueden modificar en masa (el ISBN es único por libro)"""
+    autor: Optional[str] = None
+    categoria: Optional[str] = None
+    estado: Optional[str] = None
+
+class ActualizacionLibros(BaseModel):
+    filtro: FiltroLibros
+    cambios: CambiosLibros
+    
+    @model_validator(mode="after")
+    def filtro_y_cambios(self):
+        if not self.filtro.model_dump(exclude_none=True):
+            raise ValueError("Debe indicar al menos un criterio de filtro")
+        if not self.cambios.model_dump(exclude_none=True):
+            raise ValueError("Debe indicar al menos un campo a modificar")
+        return self
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class NotificacionOut(BaseModel):
+    """Esquema para la salida de datos de una notificación"""
+    id: int
+    prestamo_id: Optional[int] = None
+    tipo: str
+    mensaje: str
+    estado: str
+    fecha_creacion: datetime
+    fecha_envio: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+# Campos que se leen de la base para responder con una `NotificacionOut`
+CAMPOS_NOTIFICACION = tuple(NotificacionOut.model_fields)
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+
+class PrestamoCreate(BaseModel):
+    """Esquema para registrar un préstamo"""
+    libro_id: int
+    dias: int = Field(14, ge=1, le=60, description="Días hasta la fecha límite de devolución")
+    usuario_id: Optional[int] = Field(None, description="Sólo para bibliotecarios: usuario que retira el libro")
+
+class PrestamoOut(BaseModel):
+    """Esquema para la salida de datos de un préstamo"""
+    id: int
+    libro_id: int
+    usuario_id: int
+    fecha_prestamo: datetime
+    fecha_devolucion: datetime
+    fecha_devuelto: Optional[datetime] = None
+    estado: str
+    
+    class Config:
+        from_attributes = True
+
+# Campos que se leen de la base para responder con un `PrestamoOut`
+CAMPOS_PRESTAMO = tuple(PrestamoOut.model_fields)
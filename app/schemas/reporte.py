@@ -0,0 +1,28 @@
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+class ReporteCategoria(BaseModel):
+    """Cantidad de libros de una categoría, en total y por estado"""
+    categoria: str
+    total: int
+    por_estado: Dict[str, int]
+
+class ReporteEstado(BaseModel):
+    """Cantidad de libros en un estado"""
+    estado: str
+    total: int
+
+class LibroMasPrestado(BaseModel):
+    """Libro y cantidad de veces que se prestó"""
+    libro_id: int
+    titulo: str
+    autor: str
+    prestamos: int
+
+class UsuarioConPrestamos(BaseModel):
+    """Usuario y sus préstamos sin devolver"""
+    usuario_id: int
+    username: str
+    nombre: Optional[str] = None
+    activos: int
+    vencidos: int
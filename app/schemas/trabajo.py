@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+from datetime import datetime
+
+class TrabajoCreate(BaseModel):
+    """Esquema para encolar un trabajo"""
+    tipo: str
+    parametros: Dict[str, Any] = {}
+
+class TrabajoOut(BaseModel):
+    """Esquema para la salida de datos de un trabajo, con su progreso"""
+    id: int
+    tipo: str
+    estado: str
+    parametros: Dict[str, Any]
+    usuario_id: Optional[int] = None
+    progreso: int
+    total: Optional[int] = None
+    resultado: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    intentos: int
+    fecha_creacion: datetime
+    fecha_inicio: Optional[datetime] = None
+    fecha_fin: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+# Campos que se leen de la base para responder con un `TrabajoOut`
+CAMPOS_TRABAJO = tuple(TrabajoOut.model_fields)
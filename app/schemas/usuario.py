@@ -49,6 +49,9 @@ class UsuarioOut(UsuarioBase):
     class Config:
         orm_mode = True
 
+# Campos que se leen de la base para responder con un `UsuarioOut`
+CAMPOS_USUARIO = tuple(UsuarioOut.model_fields)
+
 class UsuarioLogin(BaseModel):
     """Esquema para login de usuario"""
     username: str
@@ -62,6 +65,13 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     """Datos contenidos en el token"""
     username: Optional[str] = None
+
+class Identidad(BaseModel):
+    """Usuario autenticado según los claims del token, sin consultar la base"""
+    id: int
+    username: str
+    rol: str
+    activo: bool = True
     
 from pydantic import BaseModel, EmailStr
 
@@ -0,0 +1,58 @@
+"""
+Ejecución de la aplicación con varios procesos (workers).
+
+Aplica las migraciones una sola vez, en el proceso principal, y luego inicia
+uvicorn con la cantidad de workers indicada. Cada worker abre sus propias
+conexiones a SQLite (en modo WAL, con `busy_timeout`), y comparte con los
+demás, a través de `app.core.compartido`, los límites de intentos y las
+invalidaciones de cachés. Las tareas en segundo plano sólo corren en uno de
+ellos (el líder).
+
+Uso:
+    python -m app.servidor [--workers 4] [--host 0.0.0.0] [--port 8000]
+
+Con gunicorn se obtiene lo mismo aplicando antes las migraciones:
+    python -m app.db.migraciones
+    DB_MIGRAR_AL_INICIAR=false gunicorn app.main:app -w 4 -k uvicorn.workers.UvicornWorker
+"""
+import argparse
+import os
+
+from tortoise import Tortoise, run_async
+
+from app.core.config import settings
+from app.db.config import tortoise_config
+from app.db.migraciones import migrar
+
+
+async def _migrar():
+    await Tortoise.init(config=tortoise_config())
+    await migrar()
+    await Tortoise.close_connections()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    if settings.DB_MIGRAR_AL_INICIAR:
+        run_async(_migrar())
+    # Los workers no compiten por aplicar las migraciones
+    os.environ["DB_MIGRAR_AL_INICIAR"] = "false"
+
+    import uvicorn
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Mide el tiempo de arranque de un proceso de la aplicación.
+
+Cada medición corre en un proceso nuevo con `python -X importtime` sobre una
+base ya migrada, e informa:
+
+- importación de `app.main`, desglosada por módulo importado directamente;
+- arranque (eventos de startup: conexiones, migraciones, tareas);
+- primer `/openapi.json` (leído de `OPENAPI_CACHE` a partir de la segunda vez);
+- total desde que se lanza el proceso hasta que la aplicación está lista.
+
+Con `--base` compara la mediana del total contra una ejecución anterior
+guardada con `--json` y termina con código 1 si empeoró más que
+`--tolerancia`; con `--limite-ms` falla si supera un valor absoluto.
+
+Uso:
+    python -m benchmarks.bench_arranque [--ejecuciones 5] [--json arranque.json]
+        [--base arranque_anterior.json] [--tolerancia 0.25] [--limite-ms 3000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# Script que se ejecuta en cada proceso medido
+MEDICION = """
+import asyncio, json, time
+inicio = time.perf_counter()
+from app.main import app
+importado = time.perf_counter()
+
+async def main():
+    import httpx
+    async with app.router.lifespan_context(app):
+        listo = time.perf_counter()
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://arranque") as c:
+            (await c.get("/openapi.json")).raise_for_status()
+        openapi = time.perf_counter()
+    print(json.dumps({
+        "importacion_ms": (importado - inicio) * 1000,
+        "startup_ms": (listo - importado) * 1000,
+        "openapi_ms": (openapi - listo) * 1000,
+    }))
+
+asyncio.run(main())
+"""
+
+
+def desglose_importtime(salida: str, modulo: str = "app.main") -> Dict[str, float]:
+    """
+    Extrae de la salida de `-X importtime` el tiempo acumulado (ms) de cada
+    módulo importado directamente por `modulo`.
+    """
+    hijos: List[Tuple[str, float]] = []
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, nombre = linea.split("|")
+        if not acumulado.strip().isdigit():
+            continue
+        sangria = len(nombre) - len(nombre.lstrip()) - 1
+        nombre = nombre.strip()
+        if sangria == 2:
+            hijos.append((nombre, int(acumulado) / 1000))
+        elif sangria == 0:
+            if nombre == modulo:
+                return dict(hijos)
+            hijos = []
+    return {}
+
+
+def medir(env: Dict[str, str]) -> Dict:
+    inicio = time.perf_counter()
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", MEDICION],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    total = (time.perf_counter() - inicio) * 1000
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+    resultado["total_ms"] = total
+    resultado["modulos"] = desglose_importtime(proceso.stderr)
+    return resultado
+
+
+async def preparar_base(db_url: str):
+    from tortoise import Tortoise
+
+    from app.db.config import tortoise_config
+    from app.db.migraciones import migrar
+
+    await Tortoise.init(config=tortoise_config(db_url))
+    await migrar()
+    await Tortoise.close_connections()
+
+
+def main(args) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite://{os.path.join(tmp, 'arranque.db')}"
+        asyncio.run(preparar_base(db_url))
+        env = dict(
+            os.environ,
+            DB_URL=db_url,
+            OPENAPI_CACHE=os.path.join(tmp, "openapi.json"),
+            NOTIFICACIONES_INTERVALO="3600",
+        )
+        # La primera ejecución genera el documento OpenAPI; no se cuenta
+        medir(env)
+        mediciones = [medir(env) for _ in range(args.ejecuciones)]
+
+    campos = ("importacion_ms", "startup_ms", "openapi_ms", "total_ms")
+    resultado = {campo: round(statistics.median(m[campo] for m in mediciones), 1) for campo in campos}
+    modulos = defaultdict(list)
+    for m in mediciones:
+        for nombre, ms in m["modulos"].items():
+            modulos[nombre].append(ms)
+    resultado["modulos"] = {
+        nombre: round(statistics.median(valores), 1)
+        for nombre, valores in sorted(modulos.items(), key=lambda kv: -statistics.median(kv[1]))
+    }
+
+    print(f"{'fase':<16} {'mediana (ms)':>12}")
+    for campo in campos:
+        print(f"{campo[:-3]:<16} {resultado[campo]:>12.1f}")
+    print(f"\nImportación de app.main por módulo:")
+    for nombre, ms in list(resultado["modulos"].items())[:args.top]:
+        print(f"  {nombre:<40} {ms:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    ok = True
+    if args.limite_ms and resultado["total_ms"] > args.limite_ms:
+        print(f"\nEl arranque ({resultado['total_ms']:.0f} ms) supera el límite de {args.limite_ms:.0f} ms")
+        ok = False
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            anterior = json.load(f)
+        cambio = resultado["total_ms"] / anterior["total_ms"] - 1
+        print(f"\nTotal: {anterior['total_ms']:.1f} ms -> {resultado['total_ms']:.1f} ms ({cambio:+.0%})")
+        if cambio > args.tolerancia:
+            print(f"Regresión del arranque mayor al {args.tolerancia:.0%}")
+            ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ejecuciones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Módulos a mostrar en el desglose")
+    parser.add_argument("--json", help="Guardar el resultado en este archivo")
+    parser.add_argument("--base", help="Resultado JSON anterior contra el cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Aumento tolerado (0.25 = 25%%)")
+    parser.add_argument("--limite-ms", type=float, help="Tiempo total máximo permitido")
+    sys.exit(main(parser.parse_args()))
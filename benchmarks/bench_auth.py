@@ -0,0 +1,105 @@
+"""
+Mide el costo de autenticar una petición con un token JWT.
+
+Compara:
+- decodificar el token con python-jose y leer el usuario de la base en cada
+  petición (como hacía `get_current_user` originalmente);
+- `get_current_user` con las cachés de tokens y usuarios;
+- `get_identidad`, que autoriza sólo con los claims del token;
+- `verify_token` sin caché (firma verificada en cada llamada).
+
+En todos los casos con caché se consulta además la lista de revocación, que
+se llena con `--revocados` tokens revocados.
+
+Uso:
+    python -m benchmarks.bench_auth [--peticiones 5000] [--revocados 10000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from tortoise import Tortoise, timezone
+
+from app.auth import auth
+from app.auth.revocacion import revocaciones
+from app.core.config import settings
+from app.db.config import tortoise_config
+from app.db.migraciones import migrar
+from app.db.models.revocacion import Revocacion
+from app.db.models.usuario import Usuario
+
+
+async def medir(funcion, peticiones: int) -> dict:
+    tiempos = []
+    for _ in range(peticiones):
+        inicio = time.perf_counter()
+        await funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    return {
+        "p50": statistics.median(tiempos) * 1e6,
+        "p99": tiempos[int(len(tiempos) * 0.99)] * 1e6,
+    }
+
+
+async def main(args):
+    from jose import jwt
+
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(config=tortoise_config(f"sqlite://{os.path.join(tmp, 'auth.db')}"))
+        await migrar()
+
+        usuario = await Usuario.create(
+            username="admin", nombre="Admin", email="admin@example.com", hashed_password="x", rol="admin"
+        )
+        token = auth.create_user_token(usuario)
+
+        # Revocaciones de otros tokens, para que el filtro de Bloom no esté vacío
+        vencimiento = time.time() + 3600
+        await Revocacion.bulk_create([
+            Revocacion(tipo="token", valor=f"{i:032x}", desde=time.time(),
+                       expira=timezone.now() + timedelta(hours=1))
+            for i in range(args.revocados)
+        ], batch_size=1000)
+        await revocaciones.cargar()
+        await revocaciones.revocar_token("f" * 32, vencimiento)
+
+        clave = settings.JWT_CLAVES[settings.JWT_CLAVE_ACTUAL]
+
+        async def sin_cache():
+            payload = jwt.decode(token, clave, algorithms=[auth.ALGORITHM])
+            await Usuario.get(username=payload["sub"])
+
+        async def verificar_sin_cache():
+            auth._token_cache.clear()
+            await auth.verify_token(token)
+
+        casos = [
+            ("jose + base en cada petición (antes)", sin_cache),
+            ("get_current_user con cachés", lambda: auth.get_current_user(token)),
+            ("get_identidad (sólo claims)", lambda: auth.get_identidad(token)),
+            ("verify_token sin caché", verificar_sin_cache),
+        ]
+
+        print(f"{args.peticiones} peticiones, {revocaciones.stats()['tokens']} tokens revocados")
+        print(f"{'autenticación':<40} {'p50 (µs)':>10} {'p99 (µs)':>10}")
+        for nombre, funcion in casos:
+            await funcion()
+            r = await medir(funcion, args.peticiones)
+            print(f"{nombre:<40} {r['p50']:>10.1f} {r['p99']:>10.1f}")
+
+        stats = revocaciones.stats()
+        print(f"\nConsultas a la base por positivos del filtro: {stats['consultas']} "
+              f"({stats['falsos_positivos']} falsos positivos)")
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--peticiones", type=int, default=5000)
+    parser.add_argument("--revocados", type=int, default=10000)
+    asyncio.run(main(parser.parse_args()))
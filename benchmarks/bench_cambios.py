@@ -0,0 +1,153 @@
+"""
+Compara la sincronización incremental de `GET /cambios` con volver a
+descargar el catálogo completo, y comprueba que la copia del cliente quede
+igual a la base.
+
+Carga `--libros` libros y sincroniza un cliente desde 0. En cada ronda
+aplica `--cambios` escrituras al azar por distintos caminos (alta,
+modificación, baja, upsert por ISBN y actualización masiva con
+`filter().update()`), y mide los bytes y el tiempo de:
+
+- descargar el catálogo completo (lo que hacen hoy los clientes);
+- pedir sólo los cambios desde la última secuencia.
+
+Al final compacta el registro sin retención de bajas y comprueba que un
+cliente atrasado reciba `SecuenciaCompactada` (410) y que uno al día y uno
+que sincroniza desde 0 sigan coincidiendo con la base. Termina con código 1
+si alguna copia no coincide.
+
+Uso:
+    python -m benchmarks.bench_cambios [--libros 20000] [--cambios 10,100,1000] [--lote 1000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from fastapi import Response
+from tortoise import Tortoise
+
+from app.api.routes.libros import create_libro, delete_libro, update_libro, upsert_libro_por_isbn
+from app.core.serialization import json_dumps
+from app.db.cambios import SecuenciaCompactada, compactar_cambios, leer_cambios
+from app.db.config import tortoise_config
+from app.db.migraciones import migrar
+from app.db.models.libro import Libro as LibroModel
+from app.schemas.libro import CAMPOS_LIBRO, LibroCreate, LibroUpdate, LibroUpsert
+
+
+class Cliente:
+    """Copia local del catálogo que se mantiene con el registro de cambios."""
+
+    def __init__(self, lote: int):
+        self.lote = lote
+        self.libros = {}
+        self.since = 0
+        self.generacion = None
+
+    async def sincronizar(self) -> int:
+        """Aplica los cambios pendientes y devuelve los bytes recibidos."""
+        recibidos = 0
+        mas = True
+        while mas:
+            lote = await leer_cambios("libro", self.since, self.lote, self.generacion)
+            recibidos += len(json_dumps(lote))
+            for fila in lote["cambios"]:
+                self.libros[fila["id"]] = fila
+            for libro_id in lote["bajas"]:
+                self.libros.pop(libro_id, None)
+            self.since, self.generacion, mas = lote["hasta"], lote["generacion"], lote["mas"]
+        return recibidos
+
+
+async def catalogo():
+    return {fila["id"]: fila for fila in await LibroModel.all().values(*CAMPOS_LIBRO)}
+
+
+async def escribir(cantidad: int, rng: random.Random, isbns):
+    ids = await LibroModel.all().values_list("id", flat=True)
+    for _ in range(cantidad):
+        operacion = rng.random()
+        if operacion < 0.2:
+            isbn = str(next(isbns))
+            await create_libro(LibroCreate(titulo=f"Nuevo {isbn}", autor="Autor", isbn=isbn, categoria="Nueva"))
+        elif operacion < 0.3:
+            await delete_libro(ids.pop(rng.randrange(len(ids))))
+        elif operacion < 0.4:
+            isbn = (await LibroModel.get(id=rng.choice(ids))).isbn
+            await upsert_libro_por_isbn(LibroUpsert(titulo="Reemplazado", autor="Otro", categoria="C"), Response(), isbn)
+        else:
+            await update_libro(rng.choice(ids), LibroUpdate(estado=rng.choice(["disponible", "prestado"])))
+    # Una actualización masiva, como la de PATCH /libros
+    desde = rng.choice(ids)
+    await LibroModel.filter(id__gte=desde, id__lt=desde + cantidad // 10 + 1).update(categoria="Masiva")
+
+
+async def main(args) -> int:
+    rng = random.Random(1)
+    isbns = iter(range(10 ** 12, 10 ** 13))
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(config=tortoise_config(f"sqlite://{os.path.join(tmp, 'cambios.db')}"))
+        await migrar()
+        for inicio in range(0, args.libros, 5000):
+            await LibroModel.bulk_create([
+                LibroModel(titulo=f"Libro {i}", autor=f"Autor {i % 700}", isbn=f"{i:013d}", categoria=f"Categoria {i % 40}")
+                for i in range(inicio, min(inicio + 5000, args.libros))
+            ])
+
+        cliente = Cliente(args.lote)
+        inicio = time.perf_counter()
+        recibidos = await cliente.sincronizar()
+        print(f"Sincronización inicial de {len(cliente.libros)} libros: {recibidos} bytes, "
+              f"{(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+        print(f"\n{'cambios':>8} {'completo (bytes)':>17} {'ms':>7} {'incremental (bytes)':>20} {'ms':>7}")
+        for cantidad in args.cambios:
+            await escribir(cantidad, rng, isbns)
+
+            inicio = time.perf_counter()
+            completo = len(json_dumps(list((await catalogo()).values())))
+            ms_completo = (time.perf_counter() - inicio) * 1000
+
+            inicio = time.perf_counter()
+            incremental = await cliente.sincronizar()
+            ms_incremental = (time.perf_counter() - inicio) * 1000
+
+            print(f"{cantidad:>8} {completo:>17} {ms_completo:>7.1f} {incremental:>20} {ms_incremental:>7.1f}")
+            ok &= cliente.libros == await catalogo()
+
+        atrasado = Cliente(args.lote)
+        atrasado.since, atrasado.generacion = cliente.since, cliente.generacion
+        await escribir(args.cambios[0], rng, isbns)
+        await delete_libro(await LibroModel.first().values_list("id", flat=True))
+        await cliente.sincronizar()
+        print(f"\nCompactación: {await compactar_cambios(retencion_bajas=0)} entradas eliminadas")
+        try:
+            await atrasado.sincronizar()
+            print("ERROR: el cliente atrasado no recibió SecuenciaCompactada")
+            ok = False
+        except SecuenciaCompactada as e:
+            print(f"Cliente atrasado: debe sincronizar desde 0 (seq_minimo={e.seq_minimo})")
+
+        await escribir(args.cambios[0], rng, isbns)
+        await cliente.sincronizar()
+        nuevo = Cliente(args.lote)
+        await nuevo.sincronizar()
+        esperado = await catalogo()
+        ok &= cliente.libros == esperado and nuevo.libros == esperado
+        await Tortoise.close_connections()
+
+    print("Copias del cliente iguales a la base" if ok else "ERROR: una copia del cliente no coincide con la base")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--libros", type=int, default=20000)
+    parser.add_argument("--cambios", type=lambda v: [int(x) for x in v.split(",")], default=[10, 100, 1000])
+    parser.add_argument("--lote", type=int, default=1000)
+    sys.exit(asyncio.run(main(parser.parse_args())))
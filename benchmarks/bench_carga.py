@@ -0,0 +1,429 @@
+"""
+Prueba de carga de la API a partir de `requests.http` o de un escenario YAML.
+
+1. Lee las peticiones del escenario. En `requests.http` cada bloque `###` es
+   una petición; un comentario `# @peso N` dentro del bloque le da más peso
+   (por defecto 1). Sólo se usan los GET salvo que se pase `--escrituras`.
+   Las peticiones a `/auth/` (login, logout) no se usan: cerrar sesión
+   revocaría el token con el que se ejecuta la prueba.
+2. Crea una base SQLite temporal con un catálogo sintético de libros y usuarios.
+3. Envía peticiones con la concurrencia indicada, a la aplicación en el mismo
+   proceso (ASGI, por defecto) o a un uvicorn local que se lanza aparte.
+4. Informa RPS, p50/p95/p99 y consultas a la base por petición (sólo en modo
+   ASGI, medidas con `app.core.profiling`) para cada petición del escenario.
+   Con `--json` guarda el resultado y con `--comparar` lo compara contra uno
+   anterior: termina con código 1 si algún p95 empeoró más que `--tolerancia`.
+
+Variables disponibles en las peticiones, además de las `@variable = valor`
+del archivo: `{{token}}` (token de un administrador), `{{$libro_id}}` y
+`{{$usuario_id}}` (ID existente al azar), `{{$isbn}}` (ISBN nuevo) y
+`{{$pagina}}` (página al azar entre 1 y 10). Las peticiones con variables
+desconocidas se omiten.
+
+Formato YAML:
+    variables:
+      baseUrl: http://localhost:8000/api
+    peticiones:
+      - nombre: Listar libros
+        metodo: GET
+        url: "{{baseUrl}}/libros?pagina={{$pagina}}"
+        peso: 5
+        headers: {Authorization: "Bearer {{token}}"}
+
+Uso:
+    python -m benchmarks.bench_carga [--escenario requests.http] [--libros 10000] [--usuarios 200]
+        [--concurrencia 20] [--duracion 10 | --peticiones 5000] [--modo asgi|uvicorn]
+        [--json resultado.json] [--comparar anterior.json]
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.profiling import iniciar_perfil, instrumentar
+
+VARIABLE = re.compile(r"{{\s*([$\w]+)\s*}}")
+METODOS_HTTP = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+PASSWORD = "clave_de_prueba"
+
+class Peticion:
+    """Petición del escenario, con variables sin reemplazar."""
+
+    def __init__(self, nombre: str, metodo: str, url: str, headers: Dict[str, str] = None,
+                 body: Optional[str] = None, peso: float = 1):
+        self.nombre = nombre
+        self.metodo = metodo.upper()
+        self.url = url
+        self.headers = headers or {}
+        self.body = body
+        self.peso = peso
+
+
+def leer_http(ruta: str) -> List[Peticion]:
+    """
+    Lee las peticiones de un archivo `.http` (formato de REST Client).
+
+    Args:
+        ruta: Ruta del archivo
+
+    Returns:
+        List[Peticion]: Peticiones con las variables `@nombre = valor` del archivo ya reemplazadas
+    """
+    variables, bloques, actual = {}, [], None
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f.read().splitlines():
+            if linea.startswith("###"):
+                actual = {"nombre": linea.lstrip("#").strip(), "lineas": []}
+                bloques.append(actual)
+            elif actual is None:
+                m = re.match(r"@(\w+)\s*=\s*(.*)", linea.strip())
+                if m:
+                    variables[m.group(1)] = m.group(2).strip()
+            else:
+                actual["lineas"].append(linea)
+
+    peticiones = []
+    for bloque in bloques:
+        peso, inicio, metodo, url = 1, None, None, None
+        for i, linea in enumerate(bloque["lineas"]):
+            texto = linea.strip()
+            m = re.match(r"(?:#|//)\s*@peso\s+([\d.]+)", texto)
+            if m:
+                peso = float(m.group(1))
+            elif texto and not texto.startswith(("#", "//")):
+                partes = texto.split()
+                if partes[0].upper() in METODOS_HTTP and len(partes) >= 2:
+                    metodo, url, inicio = partes[0], partes[1], i + 1
+                break
+        if metodo is None:
+            continue
+
+        headers, resto = {}, bloque["lineas"][inicio:]
+        while resto and resto[0].strip():
+            nombre, _, valor = resto.pop(0).partition(":")
+            headers[nombre.strip()] = valor.strip()
+        body = "\n".join(resto).strip() or None
+        if body and "multipart/form-data" in headers.get("Content-Type", ""):
+            body = body.replace("\n", "\r\n") + "\r\n"
+        peticiones.append(Peticion(bloque["nombre"], metodo, url, headers, body, peso))
+    return [_con_variables(p, variables) for p in peticiones]
+
+
+def leer_yaml(ruta: str) -> List[Peticion]:
+    """
+    Lee las peticiones de un escenario YAML (requiere PyYAML).
+
+    Args:
+        ruta: Ruta del archivo
+
+    Returns:
+        List[Peticion]: Peticiones con las variables del escenario ya reemplazadas
+    """
+    try:
+        import yaml
+    except ImportError as e:
+        raise SystemExit("Los escenarios YAML requieren el paquete 'PyYAML'") from e
+    with open(ruta, encoding="utf-8") as f:
+        escenario = yaml.safe_load(f)
+    variables = {k: str(v) for k, v in (escenario.get("variables") or {}).items()}
+    return [
+        _con_variables(Peticion(
+            p.get("nombre") or f"{p['metodo']} {p['url']}", p["metodo"], p["url"],
+            {k: str(v) for k, v in (p.get("headers") or {}).items()},
+            p.get("body") if isinstance(p.get("body"), (str, type(None))) else json.dumps(p["body"]),
+            p.get("peso", 1),
+        ), variables)
+        for p in escenario["peticiones"]
+    ]
+
+
+def _con_variables(peticion: Peticion, variables: Dict[str, str]) -> Peticion:
+    reemplazar = functools.partial(_reemplazar, variables, estricto=False)
+    peticion.url = reemplazar(peticion.url)
+    peticion.headers = {k: reemplazar(v) for k, v in peticion.headers.items()}
+    peticion.body = reemplazar(peticion.body) if peticion.body else peticion.body
+    # El host del archivo se reemplaza por el del servidor bajo prueba
+    partes = urlsplit(peticion.url)
+    peticion.url = partes.path + (f"?{partes.query}" if partes.query else "")
+    return peticion
+
+
+def _reemplazar(variables: Dict[str, str], texto: str, estricto: bool = True) -> str:
+    def valor(m):
+        nombre = m.group(1)
+        if nombre in variables:
+            v = variables[nombre]
+            return v() if callable(v) else v
+        if estricto:
+            raise KeyError(nombre)
+        return m.group(0)
+    return VARIABLE.sub(valor, texto)
+
+
+async def sembrar(db_url: str, libros: int, usuarios: int) -> str:
+    """
+    Crea las tablas y carga libros y usuarios sintéticos.
+
+    Args:
+        db_url: Base de datos a poblar
+        libros: Cantidad de libros
+        usuarios: Cantidad de usuarios (el primero es administrador)
+
+    Returns:
+        str: Nombre de usuario del administrador
+    """
+    from tortoise import Tortoise
+
+    from app.core.security import hash_password
+    from app.db.config import tortoise_config
+    from app.db.models.libro import Libro
+    from app.db.migraciones import migrar
+    from app.db.models.usuario import Usuario
+
+    palabras = ["Python", "Historia", "Cocina", "Novela", "Datos", "Redes", "Arte", "Física", "Poesía", "Viajes"]
+    await Tortoise.init(config=tortoise_config(db_url))
+    await migrar()
+    for inicio in range(0, libros, 5000):
+        await Libro.bulk_create([
+            Libro(
+                titulo=f"{palabras[i % 10]} {palabras[(i // 10) % 10]} volumen {i}",
+                autor=f"Autor {i % 500}",
+                isbn=f"{i:013d}",
+                categoria=f"Categoria {i % 30}",
+                estado="prestado" if i % 7 == 0 else "disponible",
+            )
+            for i in range(inicio, min(inicio + 5000, libros))
+        ])
+    # Un único hash para todos: bcrypt es lento a propósito
+    hashed = hash_password(PASSWORD)
+    await Usuario.bulk_create([
+        Usuario(
+            username=f"usuario{i}", email=f"usuario{i}@example.com", hashed_password=hashed,
+            nombre=f"Usuario {i}", rol="admin" if i == 0 else "usuario",
+        )
+        for i in range(max(usuarios, 1))
+    ])
+    await Tortoise.close_connections()
+    return "usuario0"
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _esperar_servidor(cliente: httpx.AsyncClient, proceso: subprocess.Popen, espera: float = 30):
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise SystemExit("uvicorn terminó antes de aceptar conexiones")
+        try:
+            await cliente.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise SystemExit("uvicorn no respondió a tiempo")
+
+
+async def ejecutar(peticiones: List[Peticion], cliente: httpx.AsyncClient, variables: Dict,
+                   concurrencia: int, duracion: float, total: Optional[int]) -> Dict:
+    """
+    Envía peticiones elegidas al azar según su peso y mide cada una.
+
+    Returns:
+        Dict: Resultado global y por petición
+    """
+    pesos = [p.peso for p in peticiones]
+    medidas = {p.nombre: {"latencias": [], "consultas": [], "estados": {}} for p in peticiones}
+    enviadas = 0
+    fin = time.monotonic() + duracion
+
+    async def trabajador():
+        nonlocal enviadas
+        while (enviadas < total) if total else (time.monotonic() < fin):
+            enviadas += 1
+            peticion = random.choices(peticiones, pesos)[0]
+            perfil = iniciar_perfil()
+            inicio = time.perf_counter()
+            try:
+                respuesta = await cliente.request(
+                    peticion.metodo,
+                    _reemplazar(variables, peticion.url),
+                    headers={k: _reemplazar(variables, v) for k, v in peticion.headers.items()},
+                    content=_reemplazar(variables, peticion.body).encode() if peticion.body else None,
+                )
+                estado = str(respuesta.status_code)
+            except httpx.TransportError as e:
+                estado = type(e).__name__
+            medida = medidas[peticion.nombre]
+            medida["latencias"].append((time.perf_counter() - inicio) * 1000)
+            medida["consultas"].append(len(perfil.consultas))
+            medida["estados"][estado] = medida["estados"].get(estado, 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    transcurrido = time.perf_counter() - inicio
+
+    resultado = {"duracion_s": round(transcurrido, 3), "peticiones": 0, "rps": 0.0, "endpoints": {}}
+    for peticion in peticiones:
+        medida = medidas[peticion.nombre]
+        latencias = sorted(medida["latencias"])
+        if not latencias:
+            continue
+        resultado["endpoints"][peticion.nombre] = {
+            "metodo": peticion.metodo,
+            "url": peticion.url,
+            "peticiones": len(latencias),
+            "rps": round(len(latencias) / transcurrido, 1),
+            "p50_ms": round(_percentil(latencias, 0.50), 3),
+            "p95_ms": round(_percentil(latencias, 0.95), 3),
+            "p99_ms": round(_percentil(latencias, 0.99), 3),
+            "consultas_por_peticion": round(sum(medida["consultas"]) / len(latencias), 2),
+            "estados": dict(sorted(medida["estados"].items())),
+        }
+        resultado["peticiones"] += len(latencias)
+    resultado["rps"] = round(resultado["peticiones"] / transcurrido, 1)
+    return resultado
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+
+def imprimir(resultado: Dict, con_consultas: bool):
+    print(f"{'petición':<55} {'n':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'SQL':>5}  estados")
+    for nombre, r in resultado["endpoints"].items():
+        sql = f"{r['consultas_por_peticion']:>5.1f}" if con_consultas else f"{'-':>5}"
+        estados = " ".join(f"{k}:{v}" for k, v in r["estados"].items())
+        print(f"{nombre[:55]:<55} {r['peticiones']:>7} {r['rps']:>8.1f} {r['p50_ms']:>8.2f} "
+              f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {sql}  {estados}")
+    print(f"\nTotal: {resultado['peticiones']} peticiones en {resultado['duracion_s']} s ({resultado['rps']} rps)")
+
+
+def comparar(resultado: Dict, anterior: Dict, tolerancia: float) -> bool:
+    """
+    Compara el p95 de cada petición contra una ejecución anterior.
+
+    Returns:
+        bool: True si ninguna petición empeoró más que `tolerancia`
+    """
+    ok = True
+    print(f"\n{'petición':<55} {'p95 antes':>10} {'p95 ahora':>10} {'cambio':>8}")
+    for nombre, r in resultado["endpoints"].items():
+        previo = anterior.get("endpoints", {}).get(nombre)
+        if not previo or not previo["p95_ms"]:
+            continue
+        cambio = r["p95_ms"] / previo["p95_ms"] - 1
+        marca = ""
+        if cambio > tolerancia:
+            ok, marca = False, "  <- regresión"
+        print(f"{nombre[:55]:<55} {previo['p95_ms']:>10.2f} {r['p95_ms']:>10.2f} {cambio:>+8.0%}{marca}")
+    return ok
+
+
+async def main(args) -> int:
+    leer = leer_yaml if args.escenario.endswith((".yaml", ".yml")) else leer_http
+    peticiones = [
+        p for p in leer(args.escenario)
+        if (args.escrituras or p.metodo == "GET") and "/auth/" not in p.url
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite://{os.path.join(tmp, 'carga.db')}"
+        admin = await sembrar(db_url, args.libros, args.usuarios)
+        # Importar la aplicación después de elegir la base (la configuración se lee al importar)
+        os.environ["DB_URL"] = db_url
+        os.environ["RESPONSE_CACHE_ENABLED"] = "false" if args.sin_cache else "true"
+        from app.auth.auth import create_access_token
+        from app.core.config import settings
+        settings.DB_URL = db_url
+        settings.RESPONSE_CACHE_ENABLED = not args.sin_cache
+
+        contador_isbn = iter(range(10 ** 12, 10 ** 13))
+        variables = {
+            "token": create_access_token({"sub": admin}),
+            "$libro_id": lambda: str(random.randint(1, max(args.libros, 1))),
+            "$usuario_id": lambda: str(random.randint(1, max(args.usuarios, 1))),
+            "$isbn": lambda: str(next(contador_isbn)),
+            "$pagina": lambda: str(random.randint(1, 10)),
+        }
+        validas = []
+        for p in peticiones:
+            try:
+                for texto in [p.url, p.body or "", *p.headers.values()]:
+                    _reemplazar(variables, texto)
+                validas.append(p)
+            except KeyError as e:
+                print(f"Se omite '{p.nombre}': variable desconocida {e}", file=sys.stderr)
+        if not validas:
+            raise SystemExit("El escenario no tiene peticiones para ejecutar")
+
+        if args.modo == "asgi":
+            from app.main import app
+            instrumentar()
+            transporte = httpx.ASGITransport(app=app)
+            async with app.router.lifespan_context(app):
+                async with httpx.AsyncClient(transport=transporte, base_url="http://carga",
+                                             follow_redirects=True) as cliente:
+                    resultado = await ejecutar(validas, cliente, variables, args.concurrencia,
+                                               args.duracion, args.peticiones)
+        else:
+            puerto = _puerto_libre()
+            proceso = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(puerto), "--log-level", "warning"],
+                env=dict(os.environ),
+            )
+            try:
+                limites = httpx.Limits(max_connections=args.concurrencia)
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{puerto}", limits=limites,
+                                             follow_redirects=True) as cliente:
+                    await _esperar_servidor(cliente, proceso)
+                    resultado = await ejecutar(validas, cliente, variables, args.concurrencia,
+                                               args.duracion, args.peticiones)
+            finally:
+                proceso.terminate()
+                proceso.wait()
+
+    resultado["configuracion"] = {
+        "escenario": os.path.basename(args.escenario), "modo": args.modo, "libros": args.libros,
+        "usuarios": args.usuarios, "concurrencia": args.concurrencia, "cache": not args.sin_cache,
+    }
+    imprimir(resultado, con_consultas=args.modo == "asgi")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False, sort_keys=True)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            if not comparar(resultado, json.load(f), args.tolerancia):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escenario", default="requests.http", help="Archivo .http o .yaml")
+    parser.add_argument("--libros", type=int, default=10_000)
+    parser.add_argument("--usuarios", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=20)
+    parser.add_argument("--duracion", type=float, default=10, help="Segundos de carga")
+    parser.add_argument("--peticiones", type=int, help="Cantidad total de peticiones (en lugar de --duracion)")
+    parser.add_argument("--modo", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--escrituras", action="store_true", help="Incluir peticiones que no son GET")
+    parser.add_argument("--sin-cache", action="store_true", help="Desactivar la caché de respuestas")
+    parser.add_argument("--json", help="Guardar el resultado en este archivo")
+    parser.add_argument("--comparar", help="Resultado JSON anterior contra el cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Aumento de p95 tolerado (0.2 = 20%%)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
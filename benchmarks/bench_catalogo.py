@@ -0,0 +1,183 @@
+"""
+Compara `GET /libros` respondido con el catálogo en memoria
+(`CATALOGO_EN_MEMORIA`) contra la consulta SQL, y comprueba que ambos
+devuelvan exactamente el mismo cuerpo.
+
+Carga `--libros` libros y mide:
+
+- memoria por libro del catálogo en columnas (con `tracemalloc`), junto a la
+  de los mismos libros como lista de diccionarios;
+- latencia mediana de la ruta (sin la caché de respuestas) para filtros,
+  ordenamientos, páginas profundas y paginación por cursor, con cada modo.
+
+Después aplica escrituras al azar (alta, modificación, baja, actualización
+masiva) y vuelve a comparar los cuerpos. Termina con código 1 si alguna
+respuesta difiere.
+
+Uso:
+    python -m benchmarks.bench_catalogo [--libros 20000] [--repeticiones 50]
+"""
+import os
+
+os.environ.setdefault("CATALOGO_EN_MEMORIA", "true")
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from starlette.requests import Request
+from tortoise import Tortoise
+
+from app.api.routes.libros import create_libro, delete_libro, get_libros, update_libro
+from app.core.catalogo import catalogos
+from app.core.config import settings
+from app.core.response_cache import response_cache
+from app.db.config import tortoise_config
+from app.db.migraciones import migrar
+from app.db.models.libro import Libro as LibroModel
+from app.schemas.libro import CAMPOS_LIBRO, LibroCreate, LibroUpdate
+
+CONSULTAS = [
+    ("primera página", {}),
+    ("estado=prestado", {"estado": "prestado"}),
+    ("categoria (contiene)", {"categoria": "categoria 1"}),
+    ("orden por título desc", {"ordenar_por": "titulo", "orden": "desc"}),
+    ("orden por fecha", {"ordenar_por": "fecha_creacion"}),
+    ("categoría+estado por autor", {"categoria": "Categoria 3", "estado": "disponible", "ordenar_por": "autor"}),
+    ("página 150", {"pagina": 150}),
+    ("estado, página 80", {"estado": "disponible", "pagina": 80, "items_por_pagina": 50}),
+]
+
+ESTADOS = ["disponible", "prestado", "reservado", "en reparación"]
+
+
+def request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/api/libros/", "headers": [], "query_string": b""})
+
+
+async def listar(**parametros) -> bytes:
+    argumentos = {
+        "titulo": None, "autor": None, "categoria": None, "estado": None, "ordenar_por": "id", "orden": "asc",
+        "pagina": 1, "items_por_pagina": 100, "cursor": None, "formato": None,
+    }
+    argumentos.update(parametros)
+    respuesta = await get_libros(request(), **argumentos)
+    return respuesta.body, respuesta.headers.get("x-next-cursor")
+
+
+async def recorrer(paginas: int, **parametros) -> bytes:
+    """Sigue `X-Next-Cursor` durante varias páginas y concatena los cuerpos."""
+    cuerpos, cursor = [], None
+    for _ in range(paginas):
+        cuerpo, cursor = await listar(cursor=cursor, **parametros)
+        cuerpos.append(cuerpo)
+        if cursor is None:
+            break
+    return b"".join(cuerpos)
+
+
+async def medir(funcion, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        await funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+async def en_modo(memoria: bool, funcion):
+    settings.CATALOGO_EN_MEMORIA = memoria
+    return await funcion()
+
+
+async def comparar(consultas) -> bool:
+    iguales = True
+    for nombre, consulta in consultas:
+        sql = await en_modo(False, consulta)
+        memoria = await en_modo(True, consulta)
+        if sql != memoria:
+            print(f"ERROR: {nombre}: las respuestas difieren")
+            iguales = False
+    return iguales
+
+
+async def escribir(cantidad: int, rng: random.Random):
+    ids = await LibroModel.all().values_list("id", flat=True)
+    for i in range(cantidad):
+        operacion = rng.random()
+        if operacion < 0.3:
+            isbn = f"9{rng.randrange(10 ** 12):012d}"
+            await create_libro(LibroCreate(
+                titulo=f"Nuevo {i}", autor=f"Autor {rng.randrange(700)}", isbn=isbn, categoria="Categoria 3"
+            ))
+        elif operacion < 0.4:
+            await delete_libro(ids.pop(rng.randrange(len(ids))))
+        else:
+            await update_libro(rng.choice(ids), LibroUpdate(
+                estado=rng.choice(ESTADOS), titulo=rng.choice([None, f"Cambiado {i}"])
+            ))
+    desde = rng.choice(ids)
+    await LibroModel.filter(id__gte=desde, id__lt=desde + 50).update(categoria="Masiva")
+    await response_cache.invalidar("libros")
+
+
+async def main(args) -> int:
+    response_cache.habilitada = False
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(config=tortoise_config(f"sqlite://{os.path.join(tmp, 'catalogo.db')}"))
+        await migrar()
+        for inicio in range(0, args.libros, 5000):
+            await LibroModel.bulk_create([
+                LibroModel(
+                    titulo=f"Título {rng.randrange(args.libros)}", autor=f"Autor {i % 700}", isbn=f"{i:013d}",
+                    categoria=f"Categoria {i % 40}", estado=rng.choice(ESTADOS),
+                )
+                for i in range(inicio, min(inicio + 5000, args.libros))
+            ])
+
+        catalogo = catalogos.actual()
+        tracemalloc.start()
+        antes = tracemalloc.take_snapshot()
+        await catalogo.sincronizar()
+        memoria_catalogo = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(antes, "filename"))
+        antes = tracemalloc.take_snapshot()
+        filas = await LibroModel.all().values(*CAMPOS_LIBRO)
+        memoria_filas = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(antes, "filename"))
+        tracemalloc.stop()
+        del filas
+        print(f"{args.libros} libros")
+        print(f"Memoria por libro: catálogo en columnas {memoria_catalogo / args.libros:.0f} bytes, "
+              f"lista de diccionarios {memoria_filas / args.libros:.0f} bytes")
+
+        consultas = [(nombre, lambda c=consulta: listar(**c)) for nombre, consulta in CONSULTAS]
+        consultas.append(("cursor, 10 páginas", lambda: recorrer(10)))
+        consultas.append(("cursor por título desc", lambda: recorrer(10, ordenar_por="titulo", orden="desc")))
+        consultas.append(("cursor por fecha, estado", lambda: recorrer(10, ordenar_por="fecha_creacion",
+                                                                        estado="prestado")))
+        print(f"\n{'consulta':<28} {'SQL (ms)':>9} {'memoria (ms)':>13}")
+        for nombre, consulta in consultas:
+            sql = await en_modo(False, lambda: medir(consulta, args.repeticiones))
+            memoria = await en_modo(True, lambda: medir(consulta, args.repeticiones))
+            print(f"{nombre:<28} {sql:>9.3f} {memoria:>13.3f}")
+
+        iguales = await comparar(consultas)
+        await escribir(300, rng)
+        iguales &= await comparar(consultas)
+        print(f"\nCatálogo: {catalogo.stats()}")
+        await Tortoise.close_connections()
+
+    print("Respuestas iguales en ambos modos" if iguales else "ERROR: las respuestas difieren")
+    return 0 if iguales else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--libros", type=int, default=20000)
+    parser.add_argument("--repeticiones", type=int, default=50)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,131 @@
+"""
+Mide el rendimiento de las escrituras de libros.
+
+Compara las rutas actuales, que escriben con una sola sentencia y dejan que
+el índice único de ISBN rechace los duplicados, contra la versión anterior
+que consultaba primero si el ISBN existía:
+
+- alta: `POST /libros` contra `exists()` + `create()`;
+- modificación: `PUT /libros/{id}` (UPDATE ... RETURNING) contra
+  `get()` + `exists()` + `save()`;
+- `PUT /libros/isbn/{isbn}` (INSERT ... ON CONFLICT), creando y reemplazando.
+
+Que los escritores concurrentes no creen ISBN duplicados lo comprueba
+tests/test_escrituras.py.
+
+Uso:
+    python -m benchmarks.bench_escrituras [--escrituras 2000] [--concurrencia 8]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+from fastapi import HTTPException, Response
+from tortoise import Tortoise
+
+from app.api.routes.libros import CACHE_LIBROS, create_libro, update_libro, upsert_libro_por_isbn
+from app.core.response_cache import response_cache
+from app.db.config import tortoise_config
+from app.db.migraciones import migrar
+from app.db.models.libro import Libro as LibroModel
+from app.schemas.libro import LibroCreate, LibroUpdate, LibroUpsert
+
+isbns = itertools.count(10 ** 12)
+
+
+async def crear_con_comprobacion(libro: LibroCreate):
+    # Versión anterior de create_libro
+    if await LibroModel.filter(isbn=libro.isbn).exists():
+        raise HTTPException(status_code=400)
+    libro_obj = await LibroModel.create(**libro.dict())
+    await response_cache.invalidar(CACHE_LIBROS)
+    return libro_obj
+
+
+async def actualizar_con_comprobacion(libro_id: int, libro: LibroUpdate):
+    # Versión anterior de update_libro
+    libro_obj = await LibroModel.get(id=libro_id)
+    update_data = {k: v for k, v in libro.dict().items() if v is not None}
+    if "isbn" in update_data:
+        if await LibroModel.filter(isbn=update_data["isbn"]).exclude(id=libro_id).exists():
+            raise HTTPException(status_code=400)
+    await libro_obj.update_from_dict(update_data)
+    await libro_obj.save()
+    await response_cache.invalidar(CACHE_LIBROS)
+    return libro_obj
+
+
+def nuevo_libro(isbn: str = None) -> LibroCreate:
+    isbn = isbn or str(next(isbns))
+    return LibroCreate(titulo=f"Libro {isbn}", autor="Autor", isbn=isbn, categoria="Categoría")
+
+
+async def medir(escritura, cantidad: int, concurrencia: int) -> float:
+    """Devuelve escrituras por segundo con `concurrencia` escritores."""
+    pendientes = iter(range(cantidad))
+
+    async def escritor():
+        for i in pendientes:
+            await escritura(i)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(escritor() for _ in range(concurrencia)))
+    return cantidad / (time.perf_counter() - inicio)
+
+
+async def main(args) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(config=tortoise_config(f"sqlite://{os.path.join(tmp, 'escrituras.db')}"))
+        await migrar()
+        n, c = args.escrituras, args.concurrencia
+        ids = []
+
+        async def alta_nueva(_):
+            ids.append((await create_libro(nuevo_libro())).id)
+
+        async def alta_anterior(_):
+            await crear_con_comprobacion(nuevo_libro())
+
+        async def modificacion_nueva(i):
+            await update_libro(ids[i % len(ids)], LibroUpdate(isbn=str(next(isbns)), estado="prestado"))
+
+        async def modificacion_anterior(i):
+            await actualizar_con_comprobacion(ids[i % len(ids)], LibroUpdate(isbn=str(next(isbns)), estado="disponible"))
+
+        async def upsert_alta(_):
+            await upsert_libro_por_isbn(LibroUpsert(titulo="T", autor="A", categoria="C"), Response(), str(next(isbns)))
+
+        existentes = []
+
+        async def upsert_reemplazo(i):
+            if not existentes:
+                existentes.extend(await LibroModel.all().limit(n).values_list("isbn", flat=True))
+            isbn = existentes[i % len(existentes)]
+            await upsert_libro_por_isbn(LibroUpsert(titulo=f"T{i}", autor="A", categoria="C"), Response(), isbn)
+
+        casos = [
+            ("alta: exists() + create()", alta_anterior),
+            ("alta: INSERT (índice único)", alta_nueva),
+            ("modificación: get + exists + save", modificacion_anterior),
+            ("modificación: UPDATE ... RETURNING", modificacion_nueva),
+            ("upsert: alta", upsert_alta),
+            ("upsert: reemplazo", upsert_reemplazo),
+        ]
+        print(f"{n} escrituras con {c} escritores concurrentes")
+        print(f"{'escritura':<38} {'por segundo':>12}")
+        for nombre, escritura in casos:
+            print(f"{nombre:<38} {await medir(escritura, n, c):>12.0f}")
+        await Tortoise.close_connections()
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escrituras", type=int, default=2000)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,84 @@
+"""
+Compara los formatos de respuesta de los listados: bytes enviados y tiempo
+de CPU para codificarlos.
+
+Combina la forma del listado (filas u `?format=columns`), la codificación
+(JSON o MessagePack) y la compresión (ninguna, gzip o brotli), con los mismos
+niveles que `app.core.compresion`. Usa el catálogo sintético de
+`bench_serializacion` y mide páginas de distintos tamaños.
+
+MessagePack y brotli se omiten si los paquetes `msgpack` o `brotli` no están
+instalados.
+
+Uso:
+    python -m benchmarks.bench_formatos [--libros 10000] [--paginas 100,1000,10000] [--repeticiones 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from tortoise import Tortoise
+
+from app.core import compresion, serialization
+from app.core.compresion import _Compresor
+from app.core.config import settings
+from app.core.serialization import en_columnas, json_dumps, msgpack_dumps
+from app.db.models.libro import Libro as LibroModel
+from app.schemas.libro import CAMPOS_LIBRO
+from benchmarks.bench_serializacion import cargar_catalogo
+
+
+def medir(funcion, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def comprimir(cuerpo: bytes, codificacion: str) -> bytes:
+    if codificacion == "identity":
+        return cuerpo
+    return _Compresor(codificacion, settings.COMPRESION_NIVEL_GZIP, settings.COMPRESION_NIVEL_BROTLI).fin(cuerpo)
+
+
+async def main(args):
+    codificaciones = [("json", json_dumps)]
+    if serialization.msgpack is not None:
+        codificaciones.append(("msgpack", msgpack_dumps))
+    compresiones = ["identity", "gzip"] + (["br"] if compresion.brotli is not None else [])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite://{os.path.join(tmp, 'formatos.db')}"
+        await cargar_catalogo(db_url, args.libros)
+        await Tortoise.init(db_url=db_url, modules={"models": ["app.db.models"]})
+
+        for tamano in args.paginas:
+            filas = await LibroModel.all().order_by("id").limit(tamano).values(*CAMPOS_LIBRO)
+            print(f"\nPágina de {len(filas)} libros")
+            print(f"{'formato':<22} {'compresión':<10} {'bytes':>10} {'vs JSON':>8} {'codificar (ms)':>15}")
+            base = None
+            for forma in ("rows", "columns"):
+                for nombre, codificar in codificaciones:
+                    def cuerpo():
+                        return codificar(en_columnas(filas, CAMPOS_LIBRO) if forma == "columns" else filas)
+
+                    for codificacion in compresiones:
+                        tamano_bytes = len(comprimir(cuerpo(), codificacion))
+                        base = base or tamano_bytes
+                        ms = medir(lambda: comprimir(cuerpo(), codificacion), args.repeticiones)
+                        print(f"{nombre + ' ' + forma:<22} {codificacion:<10} {tamano_bytes:>10} "
+                              f"{tamano_bytes / base:>7.0%} {ms:>15.3f}")
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--libros", type=int, default=10000)
+    parser.add_argument("--paginas", type=lambda v: [int(x) for x in v.split(",")], default=[100, 1000, 10000])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
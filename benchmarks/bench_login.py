@@ -0,0 +1,104 @@
+"""
+Mide la latencia de lecturas baratas (`GET /libros`) durante una ráfaga de logins.
+
+Compara verificar bcrypt directamente en el event loop (como hacían antes los
+handlers) contra el pool de hashing de `app.core.security`. Informa p50/p99 de
+las lecturas y cuántos logins fueron rechazados con 503 por la cola llena.
+
+Uso:
+    python -m benchmarks.bench_login [--logins 20] [--lectores 4]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from fastapi import HTTPException
+from starlette.requests import Request
+from tortoise import Tortoise
+
+from app.api.routes.libros import get_libros
+from app.core.rate_limit import rate_limiter
+from app.core.response_cache import response_cache
+from app.core.security import hash_password, verify_password
+from app.db.models.libro import Libro
+from app.db.models.usuario import Usuario
+from app.routes.auth import login
+from app.schemas.usuario import UsuarioLogin
+
+EMAIL = "lector@example.com"
+PASSWORD = "una_clave_segura"
+
+# Se mide la consulta, no la caché de respuestas
+response_cache.habilitada = False
+# Todos los logins de la ráfaga son del mismo usuario y la misma IP
+rate_limiter.habilitado = False
+REQUEST = Request({"type": "http", "method": "GET", "path": "/libros/", "headers": []})
+
+
+async def login_pool(credenciales: UsuarioLogin):
+    await login(REQUEST, credenciales)
+
+
+async def login_sincronico(credenciales: UsuarioLogin):
+    db_user = await Usuario.get_or_none(email=credenciales.email)
+    if not db_user or not verify_password(credenciales.password, db_user.hashed_password):
+        raise HTTPException(status_code=401)
+
+
+async def lector(latencias: list, fin: asyncio.Event):
+    while not fin.is_set():
+        inicio = time.perf_counter()
+        await get_libros(
+            REQUEST,
+            titulo=None, autor=None, categoria=None, estado=None,
+            ordenar_por="id", orden="asc", pagina=1, items_por_pagina=10, cursor=None, formato=None
+        )
+        latencias.append(time.perf_counter() - inicio)
+        await asyncio.sleep(0.005)
+
+
+async def rafaga(handler, logins: int, lectores: int):
+    latencias, fin = [], asyncio.Event()
+    tareas_lectura = [asyncio.create_task(lector(latencias, fin)) for _ in range(lectores)]
+    credenciales = UsuarioLogin(email=EMAIL, password=PASSWORD)
+
+    resultados = await asyncio.gather(*(handler(credenciales) for _ in range(logins)), return_exceptions=True)
+    fin.set()
+    await asyncio.gather(*tareas_lectura)
+
+    rechazados = sum(1 for r in resultados if isinstance(r, HTTPException) and r.status_code == 503)
+    latencias.sort()
+    p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+    return statistics.median(latencias) * 1000, p99 * 1000, len(latencias), rechazados
+
+
+async def main(logins: int, lectores: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(
+            db_url=f"sqlite://{os.path.join(tmp, 'bench.db')}",
+            modules={"models": ["app.db.models"]}
+        )
+        await Tortoise.generate_schemas()
+        await Libro.bulk_create([
+            Libro(titulo=f"Libro {i}", autor="Autor", isbn=f"{i:013d}", categoria="General")
+            for i in range(100)
+        ])
+        await Usuario.create(username="lector", email=EMAIL, hashed_password=hash_password(PASSWORD))
+
+        print(f"{'modo':<12} {'lecturas':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'503':>5}")
+        for nombre, handler in (("event loop", login_sincronico), ("pool", login_pool)):
+            p50, p99, cantidad, rechazados = await rafaga(handler, logins, lectores)
+            print(f"{nombre:<12} {cantidad:>9} {p50:>9.2f} {p99:>9.2f} {rechazados:>5}")
+
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--lectores", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.lectores))
@@ -0,0 +1,113 @@
+"""
+Compara la paginación por número de página contra la paginación por cursor.
+
+Carga un catálogo sintético en una base SQLite temporal y mide cuánto tarda
+`get_libros` en devolver la página 1 y la página 10.000 en ambos modos.
+
+Uso:
+    python -m benchmarks.bench_paginacion [--libros 100000] [--repeticiones 20]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from starlette.requests import Request
+from tortoise import Tortoise
+
+from app.api.routes.libros import get_libros
+from app.core.response_cache import response_cache
+from app.db.models.libro import Libro
+
+ITEMS_POR_PAGINA = 10
+PAGINA_PROFUNDA = 10_000
+
+# Se mide la consulta, no la caché de respuestas
+response_cache.habilitada = False
+REQUEST = Request({"type": "http", "method": "GET", "path": "/libros/", "headers": []})
+
+
+async def cargar_catalogo(cantidad: int):
+    lote = []
+    for i in range(cantidad):
+        lote.append(Libro(
+            titulo=f"Titulo {i % 5000:05d}",
+            autor=f"Autor {i % 700:04d}",
+            isbn=f"{i:013d}",
+            categoria=f"Categoria {i % 40:02d}",
+            estado="disponible" if i % 3 else "prestado",
+        ))
+        if len(lote) == 5000:
+            await Libro.bulk_create(lote)
+            lote = []
+    if lote:
+        await Libro.bulk_create(lote)
+
+
+async def listar(ordenar_por: str, orden: str, pagina: int = 1, cursor: str = None):
+    return await get_libros(
+        REQUEST,
+        titulo=None,
+        autor=None,
+        categoria=None,
+        estado=None,
+        ordenar_por=ordenar_por,
+        orden=orden,
+        pagina=pagina,
+        items_por_pagina=ITEMS_POR_PAGINA,
+        cursor=cursor,
+        formato=None,
+    )
+
+
+async def medir(repeticiones: int, **kwargs) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        await listar(**kwargs)
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+async def main(cantidad: int, repeticiones: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(
+            db_url=f"sqlite://{os.path.join(tmp, 'bench.db')}",
+            modules={"models": ["app.db.models"]}
+        )
+        try:
+            await Tortoise.generate_schemas()
+            await cargar_catalogo(cantidad)
+
+            print(f"{'ordenar_por':<15} {'orden':<5} {'modo':<7} {'pág. 1 (ms)':>12} {'pág. 10000 (ms)':>16}")
+            for ordenar_por in ("id", "titulo", "fecha_creacion"):
+                for orden in ("asc", "desc"):
+                    # El cursor de la página 10.000 lo devuelve la página anterior
+                    anterior = await listar(ordenar_por, orden, pagina=PAGINA_PROFUNDA - 1)
+                    cursor = anterior.headers["X-Next-Cursor"]
+
+                    offset_1 = await medir(repeticiones, ordenar_por=ordenar_por, orden=orden, pagina=1)
+                    offset_n = await medir(
+                        repeticiones, ordenar_por=ordenar_por, orden=orden, pagina=PAGINA_PROFUNDA
+                    )
+                    cursor_1 = await medir(repeticiones, ordenar_por=ordenar_por, orden=orden)
+                    cursor_n = await medir(repeticiones, ordenar_por=ordenar_por, orden=orden, cursor=cursor)
+
+                    print(f"{ordenar_por:<15} {orden:<5} {'pagina':<7} {offset_1:>12.2f} {offset_n:>16.2f}")
+                    print(f"{ordenar_por:<15} {orden:<5} {'cursor':<7} {cursor_1:>12.2f} {cursor_n:>16.2f}")
+        finally:
+            # Sin cerrarlas, el hilo de aiosqlite impide terminar si algo falló
+            await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--libros", type=int, default=PAGINA_PROFUNDA * ITEMS_POR_PAGINA)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+    if args.libros <= (PAGINA_PROFUNDA - 1) * ITEMS_POR_PAGINA:
+        parser.error(f"--libros debe ser mayor que {(PAGINA_PROFUNDA - 1) * ITEMS_POR_PAGINA} "
+                     f"para llegar a la página {PAGINA_PROFUNDA}")
+    asyncio.run(main(args.libros, args.repeticiones))
@@ -0,0 +1,258 @@
+"""
+Mide el cálculo de los libros recomendados (`GET /libros/{id}/recomendados`)
+y comprueba sus resultados.
+
+1. Genera `--prestamos` préstamos al azar de `--usuarios` usuarios sobre
+   `--libros` libros (cada usuario prefiere algunos temas y la popularidad
+   de los libros sigue una distribución de Pareto) y mide el cálculo de
+   la matriz de coprestamos y de las recomendaciones de todos los libros
+   con numpy. Con los primeros `--verificar` préstamos compara el cálculo
+   con numpy y sin numpy; termina con código 1 si difieren.
+2. Agrega `--nuevos` préstamos y mide la actualización incremental como la
+   tarea periódica (la diferencia de la matriz a partir de los préstamos de
+   los usuarios con préstamos nuevos y las recomendaciones de los libros
+   afectados a partir de sus filas) contra el recálculo completo. Termina
+   con código 1 si la matriz actualizada o algún libro recalculado no
+   coincide con el recálculo completo, e informa cuántos de los demás
+   libros quedaron con puntajes (o con un orden) desactualizados hasta el
+   próximo recálculo completo.
+3. Carga los mismos préstamos en SQLite, ejecuta la tarea periódica
+   completa e incremental, compara las tablas con el cálculo en memoria y
+   mide la lectura de la tabla precalculada contra calcular los coprestamos
+   de un libro con SQL en cada petición (con un índice por libro).
+
+Uso:
+    python -m benchmarks.bench_recomendaciones [--usuarios 20000] [--libros 10000] [--prestamos 400000]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from tortoise import Tortoise, connections
+
+from app.core import recomendaciones
+from app.core.config import settings
+from app.db.config import tortoise_config
+from app.db.migraciones import migrar
+from app.db.models.libro import Libro
+from app.db.models.usuario import Usuario
+from app.db.recomendaciones import actualizar_recomendaciones, leer_recomendaciones
+
+TEMAS = 50
+
+_COPRESTAMOS_SQL = (
+    "SELECT p2.libro_id, COUNT(DISTINCT p2.usuario_id) AS c FROM prestamos p1 "
+    "JOIN prestamos p2 ON p2.usuario_id = p1.usuario_id AND p2.libro_id != p1.libro_id "
+    "WHERE p1.libro_id = ? GROUP BY p2.libro_id ORDER BY c DESC LIMIT ?"
+)
+
+
+def generar(usuarios: int, libros: int, cantidad: int, rng: random.Random):
+    """Préstamos como secuencia plana `usuario, libro, ...` (IDs desde 1)."""
+    por_tema = libros // TEMAS
+    temas = {u: rng.sample(range(TEMAS), rng.randint(1, 3)) for u in range(1, usuarios + 1)}
+    # Algunos usuarios retiran muchos más libros que otros
+    actividad = list(itertools.accumulate(rng.paretovariate(2) for _ in range(usuarios)))
+    pares = []
+    for usuario in rng.choices(range(1, usuarios + 1), cum_weights=actividad, k=cantidad):
+        if rng.random() < 0.8:
+            libro = rng.choice(temas[usuario]) * por_tema + min(int(rng.paretovariate(1.2)), por_tema)
+        else:
+            libro = min(int(rng.paretovariate(0.8)), libros)
+        pares += (usuario, libro)
+    return pares
+
+
+def historial(pares, nuevos):
+    """Préstamos previos de los usuarios con préstamos nuevos, y todos sus préstamos (lo que lee la tarea)."""
+    usuarios = set(nuevos[0::2])
+    antes = [x for i in range(0, len(pares), 2) if pares[i] in usuarios for x in (pares[i], pares[i + 1])]
+    return antes, antes + nuevos
+
+
+def actualizar(matriz, antes, despues, k: int, minimo: int):
+    """
+    Diferencia de la matriz y recomendaciones de los libros afectados, como
+    la tarea incremental; el tiempo no incluye buscar las filas guardadas
+    (que la tarea lee de la tabla).
+    """
+    cambios, segundos = cronometrar(recomendaciones.diferencia, antes, despues)
+    afectados = set(cambios[0])
+    filas = [(a, b, n) for a, b, n in zip(*matriz) if a in afectados]
+    guardadas = tuple(map(list, zip(*filas))) if filas else ([], [], [])
+    lectores = {a: n for a, b, n in zip(*matriz) if a == b}
+    for libro, otro, usuarios in zip(*cambios):
+        if libro == otro:
+            lectores[libro] = lectores.get(libro, 0) + usuarios
+    inicio = time.perf_counter()
+    resultado = recomendaciones.recomendar(recomendaciones.sumar(guardadas, cambios), k, minimo, lectores)
+    return cambios, resultado, segundos + time.perf_counter() - inicio, len(filas)
+
+
+def como_dict(matriz):
+    return {(a, b): n for a, b, n in zip(*matriz)}
+
+
+def cronometrar(funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+async def medir(funcion, ids, repeticiones: int):
+    tiempos = []
+    for libro_id in ids[:repeticiones]:
+        inicio = time.perf_counter()
+        await funcion(libro_id)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return statistics.median(tiempos), tiempos[int(len(tiempos) * 0.99)]
+
+
+async def cargar(pares, usuarios: int, libros: int):
+    await Usuario.bulk_create([
+        Usuario(username=f"usuario{i}", email=f"usuario{i}@example.com", hashed_password="x")
+        for i in range(1, usuarios + 1)
+    ], batch_size=1000)
+    await Libro.bulk_create([
+        Libro(titulo=f"Libro {i}", autor="Autor", isbn=f"{i:013d}", categoria="General")
+        for i in range(1, libros + 1)
+    ], batch_size=1000)
+    await insertar_prestamos(pares)
+
+
+async def insertar_prestamos(pares):
+    ahora = datetime.now(timezone.utc).isoformat()
+    await connections.get("default").execute_many(
+        "INSERT INTO prestamos (usuario_id, libro_id, fecha_prestamo, fecha_devolucion, estado) "
+        "VALUES (?, ?, ?, ?, 'devuelto')",
+        [[pares[i], pares[i + 1], ahora, ahora] for i in range(0, len(pares), 2)],
+    )
+
+
+async def leer_coprestamos():
+    _, filas = await connections.get("default").execute_query("SELECT libro_id, otro_id, usuarios FROM coprestamos")
+    return {(a, b): n for a, b, n in filas}
+
+
+async def leer_tabla():
+    _, filas = await connections.get("default").execute_query(
+        "SELECT libro_id, posicion, recomendado_id, puntaje, coprestamos FROM recomendaciones "
+        "ORDER BY libro_id, posicion"
+    )
+    tabla = {}
+    for fila in filas:
+        tabla.setdefault(fila[0], []).append(tuple(fila))
+    return tabla
+
+
+async def main(args) -> int:
+    rng = random.Random(args.semilla)
+    k, minimo = settings.RECOMENDACIONES_K, settings.RECOMENDACIONES_MIN_COPRESTAMOS
+    errores = 0
+
+    pares = generar(args.usuarios, args.libros, args.prestamos, rng)
+    print(f"{args.prestamos} préstamos, {args.usuarios} usuarios, {args.libros} libros (k={k}, mínimo={minimo})")
+
+    # 1. Cálculo completo
+    matriz, t_matriz = cronometrar(recomendaciones.coprestamos, pares)
+    completo, t_recomendar = cronometrar(recomendaciones.recomendar, matriz, k, minimo)
+    print(f"\nCálculo completo con numpy: matriz {t_matriz:.2f} s ({len(matriz[0])} entradas), "
+          f"recomendaciones {t_recomendar:.2f} s ({len(completo)} libros, "
+          f"{sum(len(filas) for filas in completo.values())} recomendaciones)")
+    muestra = pares[:2 * args.verificar]
+    con_numpy, t_numpy = cronometrar(recomendaciones.calcular, muestra, k, minimo, vectorizado=True)
+    sin_numpy, t_python = cronometrar(recomendaciones.calcular, muestra, k, minimo, vectorizado=False)
+    iguales = con_numpy == sin_numpy
+    errores += not iguales
+    print(f"Con {args.verificar} préstamos: numpy {t_numpy * 1000:.0f} ms, Python {t_python * 1000:.0f} ms "
+          f"({t_python / t_numpy:.1f}x) -> {'iguales' if iguales else 'DIFIEREN'}")
+
+    # 2. Actualización incremental
+    nuevos = generar(args.usuarios, args.libros, args.nuevos, rng)
+    antes, despues = historial(pares, nuevos)
+    cambios, incremental, t_incremental, leidas = actualizar(matriz, antes, despues, k, minimo)
+    afectados = set(cambios[0])
+    matriz_nueva, t_completo = cronometrar(recomendaciones.coprestamos, pares + nuevos)
+    recalculado, segundos = cronometrar(recomendaciones.recomendar, matriz_nueva, k, minimo)
+    t_completo += segundos
+    matriz_coincide = como_dict(recomendaciones.sumar(matriz, cambios)) == como_dict(matriz_nueva)
+    distintos = [libro for libro in afectados if incremental[libro] != recalculado.get(libro, [])]
+    errores += bool(distintos) + (not matriz_coincide)
+    no_recalculados = [libro for libro in recalculado if libro not in afectados]
+    desactualizados = sum(1 for libro in no_recalculados if completo.get(libro, []) != recalculado[libro])
+    reordenados = sum(
+        1 for libro in no_recalculados
+        if [fila[2] for fila in completo.get(libro, [])] != [fila[2] for fila in recalculado[libro]]
+    )
+    print(f"\n{args.nuevos} préstamos nuevos: {len(afectados)} libros afectados, "
+          f"{len(despues) // 2} de {(len(pares) + len(nuevos)) // 2} préstamos leídos, "
+          f"{len(cambios[0])} entradas de la matriz cambian, {leidas} de {len(matriz[0])} entradas leídas")
+    print(f"{'incremental':<12} {t_incremental * 1000:>8.0f} ms  "
+          f"(matriz {'coincide' if matriz_coincide else 'DIFIERE'}, "
+          f"{'libros coinciden' if not distintos else f'{len(distintos)} libros DIFIEREN'} con el recálculo completo)")
+    print(f"{'completo':<12} {t_completo * 1000:>8.0f} ms")
+    print(f"Libros no recalculados: {len(no_recalculados)}, {desactualizados} con puntajes desactualizados, "
+          f"{reordenados} con otro orden de recomendados")
+
+    # 3. Tarea periódica sobre SQLite y lectura de la tabla
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(config=tortoise_config(f"sqlite://{os.path.join(tmp, 'recomendaciones.db')}"))
+        await migrar()
+        await cargar(pares, args.usuarios, args.libros)
+
+        inicio = time.perf_counter()
+        await actualizar_recomendaciones(completo=True)
+        t_tarea = time.perf_counter() - inicio
+        tabla = await leer_tabla()
+        coincide = (tabla == {libro: filas for libro, filas in completo.items() if filas}
+                    and await leer_coprestamos() == como_dict(matriz))
+        errores += not coincide
+
+        await insertar_prestamos(nuevos)
+        inicio = time.perf_counter()
+        recalculados = await actualizar_recomendaciones()
+        t_tarea_incremental = time.perf_counter() - inicio
+        tabla = await leer_tabla()
+        coincide_incremental = (all(tabla.get(libro, []) == recalculado.get(libro, []) for libro in afectados)
+                                and await leer_coprestamos() == como_dict(matriz_nueva))
+        errores += not coincide_incremental
+        print(f"\nTarea en SQLite: completa {t_tarea:.2f} s ({'coincide' if coincide else 'DIFIERE'}), "
+              f"incremental {t_tarea_incremental:.2f} s para {recalculados} libros "
+              f"({'coincide' if coincide_incremental else 'DIFIERE'})")
+
+        conn = connections.get("default")
+        ids = rng.sample(sorted(tabla), min(args.repeticiones, len(tabla)))
+
+        async def precalculada(libro_id):
+            await leer_recomendaciones(libro_id, 10)
+
+        async def sql(libro_id):
+            await conn.execute_query(_COPRESTAMOS_SQL, [libro_id, 10])
+
+        print(f"\n{'lectura de un libro':<26} {'mediana (ms)':>12} {'p99 (ms)':>10}")
+        for nombre, funcion in (("tabla precalculada", precalculada), ("coprestamos con SQL", sql)):
+            mediana, p99 = await medir(funcion, ids, args.repeticiones)
+            print(f"{nombre:<26} {mediana:>12.3f} {p99:>10.3f}")
+        await Tortoise.close_connections()
+
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=20000)
+    parser.add_argument("--libros", type=int, default=10000)
+    parser.add_argument("--prestamos", type=int, default=400000)
+    parser.add_argument("--nuevos", type=int, default=200)
+    parser.add_argument("--verificar", type=int, default=50000)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--semilla", type=int, default=1)
+    sys.exit(asyncio.run(main(parser.parse_args())))
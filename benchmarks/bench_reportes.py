@@ -0,0 +1,81 @@
+"""
+Compara el reporte de libros por categoría calculado con `GROUP BY` sobre
+`libros` contra la lectura de la tabla de resumen, y mide cuánto agregan los
+triggers a las escrituras.
+
+Uso:
+    python -m benchmarks.bench_reportes [--libros 100000] [--categorias 50] [--repeticiones 20]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from tortoise import Tortoise, connections
+from tortoise.functions import Count
+
+from app.db.config import tortoise_config
+from app.db.migraciones import migrar
+from app.db.models.libro import Libro
+from app.db.models.resumen import ResumenLibros
+
+
+async def medir(funcion, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        await funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+async def insertar(cantidad: int, categorias: int, desde: int = 0) -> float:
+    inicio = time.perf_counter()
+    for i in range(desde, desde + cantidad, 1000):
+        await Libro.bulk_create([
+            Libro(titulo=f"Libro {j}", autor="Autor", isbn=f"{j:013d}",
+                  categoria=f"Categoría {random.randrange(categorias)}",
+                  estado=random.choice(("disponible", "prestado")))
+            for j in range(i, min(i + 1000, desde + cantidad))
+        ])
+    return (time.perf_counter() - inicio) * 1000
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(config=tortoise_config(f"sqlite://{os.path.join(tmp, 'reportes.db')}"))
+        await migrar()
+        conn = connections.get("default")
+
+        con_triggers = await insertar(args.libros, args.categorias)
+
+        async def group_by():
+            await Libro.annotate(cantidad=Count("id")).group_by("categoria", "estado").values(
+                "categoria", "estado", "cantidad"
+            )
+
+        async def resumen():
+            await ResumenLibros.filter(cantidad__gt=0).values("categoria", "estado", "cantidad")
+
+        print(f"{args.libros} libros, {args.categorias} categorías")
+        print(f"{'reporte por categoría':<28} {'mediana (ms)':>12}")
+        print(f"{'GROUP BY sobre libros':<28} {await medir(group_by, args.repeticiones):>12.2f}")
+        print(f"{'tabla de resumen':<28} {await medir(resumen, args.repeticiones):>12.2f}")
+
+        # Costo de los triggers: misma inserción sin ellos
+        await conn.execute_script("DROP TRIGGER resumen_libros_ai;")
+        sin_triggers = await insertar(args.libros, args.categorias, desde=args.libros)
+        print(f"\nInserción de {args.libros} libros: {con_triggers:.0f} ms con triggers, "
+              f"{sin_triggers:.0f} ms sin triggers")
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--libros", type=int, default=100000)
+    parser.add_argument("--categorias", type=int, default=50)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
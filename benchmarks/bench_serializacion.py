@@ -0,0 +1,94 @@
+"""
+Compara la serialización de un listado grande de libros.
+
+- modelos: instancias de Tortoise validadas como `Libro` de Pydantic y luego
+  codificadas a JSON (lo que hace FastAPI con `response_model`).
+- streaming: `.values()` por lotes codificados con `app.core.serialization`.
+
+Cada modo corre en un proceso aparte para medir su pico de memoria (RSS).
+
+Uso:
+    python -m benchmarks.bench_serializacion [--libros 100000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+from tortoise import Tortoise
+
+from app.core.serialization import iter_values, stream_json_array
+from app.db.models.libro import Libro as LibroModel
+from app.schemas.libro import CAMPOS_LIBRO, Libro
+
+MODOS = ("modelos", "streaming")
+
+
+async def cargar_catalogo(db_url: str, cantidad: int):
+    await Tortoise.init(db_url=db_url, modules={"models": ["app.db.models"]})
+    await Tortoise.generate_schemas()
+    for inicio in range(0, cantidad, 5000):
+        await LibroModel.bulk_create([
+            LibroModel(
+                titulo=f"Titulo del libro número {i}",
+                autor=f"Autor {i % 700}",
+                isbn=f"{i:013d}",
+                categoria=f"Categoria {i % 40}",
+            )
+            for i in range(inicio, min(inicio + 5000, cantidad))
+        ])
+    await Tortoise.close_connections()
+
+
+async def serializar(db_url: str, modo: str):
+    await Tortoise.init(db_url=db_url, modules={"models": ["app.db.models"]})
+    inicio = time.perf_counter()
+    if modo == "modelos":
+        adaptador = TypeAdapter(List[Libro])
+        libros = adaptador.validate_python(await LibroModel.all(), from_attributes=True)
+        cuerpo = json.dumps(adaptador.dump_python(libros, mode="json")).encode()
+        filas, total_bytes = len(libros), len(cuerpo)
+    else:
+        filas, total_bytes = 0, 0
+        async for fragmento in stream_json_array(iter_values(LibroModel.all(), CAMPOS_LIBRO)):
+            total_bytes += len(fragmento)
+        filas = await LibroModel.all().count()
+    duracion = time.perf_counter() - inicio
+    await Tortoise.close_connections()
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"modo": modo, "filas": filas, "bytes": total_bytes,
+                      "filas_por_seg": filas / duracion, "pico_rss_mb": pico_mb}))
+
+
+def main(cantidad: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite://{os.path.join(tmp, 'bench.db')}"
+        asyncio.run(cargar_catalogo(db_url, cantidad))
+
+        print(f"{'modo':<10} {'filas/seg':>12} {'pico RSS (MB)':>14} {'bytes':>12}")
+        for modo in MODOS:
+            salida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_serializacion", "--modo", modo, "--db-url", db_url],
+                check=True, capture_output=True, text=True
+            ).stdout
+            r = json.loads(salida.strip().splitlines()[-1])
+            print(f"{modo:<10} {r['filas_por_seg']:>12.0f} {r['pico_rss_mb']:>14.1f} {r['bytes']:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--libros", type=int, default=100_000)
+    parser.add_argument("--modo", choices=MODOS, help=argparse.SUPPRESS)
+    parser.add_argument("--db-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.modo:
+        asyncio.run(serializar(args.db_url, args.modo))
+    else:
+        main(args.libros)
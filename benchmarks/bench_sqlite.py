@@ -0,0 +1,104 @@
+"""
+Compara el rendimiento de SQLite con la configuración por defecto de Tortoise
+y con `app.db.config.tortoise_config` (PRAGMAs ajustados y conexión de lectura).
+
+La carga mezcla lecturas (listado por categoría y búsqueda por ISBN) con
+escrituras (cambios de estado de libros) concurrentes sobre una base en archivo.
+
+Uso:
+    python -m benchmarks.bench_sqlite [--libros 20000] [--clientes 20] [--operaciones 200] [--escrituras 0.2]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from tortoise import Tortoise
+
+from app.db.config import MODEL_MODULES, tortoise_config
+from app.db.models.libro import Libro
+
+MODOS = ("defecto", "ajustado")
+
+
+async def cargar_catalogo(cantidad: int):
+    await Tortoise.generate_schemas()
+    for inicio in range(0, cantidad, 5000):
+        await Libro.bulk_create([
+            Libro(
+                titulo=f"Titulo {i}",
+                autor=f"Autor {i % 500}",
+                isbn=f"{i:013d}",
+                categoria=f"Categoria {i % 30}",
+            )
+            for i in range(inicio, min(inicio + 5000, cantidad))
+        ])
+
+
+async def cliente(cantidad: int, operaciones: int, proporcion_escrituras: float, latencias: dict):
+    rnd = random.Random()
+    for _ in range(operaciones):
+        inicio = time.perf_counter()
+        if rnd.random() < proporcion_escrituras:
+            estado = rnd.choice(("disponible", "prestado"))
+            await Libro.filter(id=rnd.randint(1, cantidad)).update(estado=estado)
+            tipo = "escritura"
+        elif rnd.random() < 0.5:
+            await Libro.filter(categoria=f"Categoria {rnd.randrange(30)}").order_by("titulo").limit(50).values(
+                "id", "titulo", "autor"
+            )
+            tipo = "lectura"
+        else:
+            await Libro.get_or_none(isbn=f"{rnd.randrange(cantidad):013d}")
+            tipo = "lectura"
+        latencias[tipo].append((time.perf_counter() - inicio) * 1000)
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(len(valores) * p))] if valores else 0.0
+
+
+async def medir(modo: str, db_url: str, args) -> dict:
+    if modo == "defecto":
+        await Tortoise.init(db_url=db_url, modules={"models": MODEL_MODULES})
+    else:
+        await Tortoise.init(config=tortoise_config(db_url))
+    await cargar_catalogo(args.libros)
+
+    latencias = {"lectura": [], "escritura": []}
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        cliente(args.libros, args.operaciones, args.escrituras, latencias) for _ in range(args.clientes)
+    ))
+    duracion = time.perf_counter() - inicio
+    await Tortoise.close_connections()
+
+    total = sum(len(v) for v in latencias.values())
+    return {
+        "ops_por_seg": total / duracion,
+        "lectura_p50": percentil(latencias["lectura"], 0.50),
+        "lectura_p99": percentil(latencias["lectura"], 0.99),
+        "escritura_p50": percentil(latencias["escritura"], 0.50),
+        "escritura_p99": percentil(latencias["escritura"], 0.99),
+    }
+
+
+async def main(args):
+    print(f"{'modo':<10} {'ops/seg':>10} {'lect p50':>10} {'lect p99':>10} {'escr p50':>10} {'escr p99':>10}  (ms)")
+    for modo in MODOS:
+        with tempfile.TemporaryDirectory() as tmp:
+            r = await medir(modo, f"sqlite://{os.path.join(tmp, 'bench.db')}", args)
+        print(f"{modo:<10} {r['ops_por_seg']:>10.0f} {r['lectura_p50']:>10.2f} {r['lectura_p99']:>10.2f} "
+              f"{r['escritura_p50']:>10.2f} {r['escritura_p99']:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--libros", type=int, default=20_000)
+    parser.add_argument("--clientes", type=int, default=20)
+    parser.add_argument("--operaciones", type=int, default=200)
+    parser.add_argument("--escrituras", type=float, default=0.2, help="Proporción de escrituras (0-1)")
+    asyncio.run(main(parser.parse_args()))
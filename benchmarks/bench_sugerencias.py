@@ -0,0 +1,240 @@
+"""
+Mide el índice de sugerencias de `GET /libros/sugerencias` y comprueba sus
+resultados.
+
+1. Arma el índice con `--libros` libros generados al azar (títulos con
+   acentos, autores repetidos, préstamos con distribución de Pareto), sin
+   base de datos, y mide el tiempo de armado y la memoria por libro.
+2. Simula a `--usuarios` personas escribiendo un título o un autor letra por
+   letra y mide la latencia de cada sugerencia (mediana, p99 y máxima), con
+   el índice recién armado y con `--pendientes` cambios aplicados después.
+3. Con un catálogo de `--verificar` libros, aplica altas, modificaciones y
+   bajas y compara las sugerencias de cientos de prefijos con una búsqueda
+   exhaustiva. Termina con código 1 si alguna difiere.
+4. Como referencia, carga `--sql-libros` libros en SQLite y mide
+   `titulo__istartswith` (sin acentos ni popularidad) contra la ruta
+   completa con el índice.
+
+Uso:
+    python -m benchmarks.bench_sugerencias [--libros 1000000] [--usuarios 500] [--sql-libros 50000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from tortoise import Tortoise
+
+from app.core.sugerencias import _Sugerencias, indices_sugerencias, normalizar
+from app.db.config import tortoise_config
+from app.db.migraciones import migrar
+from app.db.models.libro import Libro as LibroModel
+from app.db.models.resumen import ResumenPrestamosLibro
+
+PALABRAS = (
+    "amor años árbol camino canción ciudad corazón crónica días historia jardín luz mar memoria montaña noche "
+    "niño olvido pájaro río sombra soledad sueño tiempo último viaje vida violín ciencia cielo ciento fuego "
+    "agua tierra silencio guerra paz invierno verano otoño primavera isla puerto tren estación café libro "
+    "palabra ventana puerta espejo reloj carta mapa desierto bosque lluvia nieve estrella luna sol volcán"
+).split()
+UNIONES = "de del en la el los las y sin con bajo sobre".split()
+NOMBRES = (
+    "Gabriel Julio Isabel Jorge Mario Octavio Pablo Rosario Elena Ángeles Begoña Íñigo Sofía José María Lucía "
+    "Martín Andrés Ramón Inés Óscar Néstor Adolfo Silvina Alfonsina Ernesto Horacio Leopoldo Clarice Ricardo"
+).split()
+APELLIDOS = (
+    "García Márquez Cortázar Allende Borges Vargas Llosa Paz Neruda Castellanos Bolaño Pérez Galdós Matute "
+    "Benedetti Mistral Quiroga Sábato Lugones Ocampo Storni Lispector Piglia Rulfo Fuentes Onetti Arlt Saer "
+    "Gómez Rodríguez Fernández López Martínez Sánchez Díaz Álvarez Muñoz Jiménez Gutiérrez Núñez"
+).split()
+
+
+def generar(cantidad: int, rng: random.Random, desde: int = 1):
+    """Libros (id, título, autor) y préstamos por libro."""
+    libros, prestamos = [], {}
+    for libro_id in range(desde, desde + cantidad):
+        palabras = [rng.choice(PALABRAS)]
+        for _ in range(rng.randrange(1, 6)):
+            palabras.append(rng.choice(UNIONES if rng.random() < 0.3 else PALABRAS))
+        titulo = " ".join(palabras)
+        titulo = titulo[0].upper() + titulo[1:]
+        autor = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+        libros.append((libro_id, titulo, autor))
+        if rng.random() < 0.5:
+            prestamos[libro_id] = int(rng.paretovariate(1.2))
+    return libros, prestamos
+
+
+def escrituras(sugerencias: _Sugerencias, libros: dict, prestamos: dict, cantidad: int, rng: random.Random):
+    """Aplica altas, modificaciones y bajas al índice y a `libros`."""
+    proximo = max(libros) + 1
+    for _ in range(cantidad):
+        operacion = rng.random()
+        if operacion < 0.3:
+            (_, titulo, autor), = generar(1, rng)[0]
+            if rng.random() < 0.2:
+                autor = f"Autora Nueva {rng.choice(APELLIDOS)}"
+            libros[proximo] = (titulo, autor)
+            sugerencias.guardar(proximo, titulo, autor, prestamos.get(proximo, 0))
+            proximo += 1
+        elif operacion < 0.5:
+            libro_id = rng.choice(list(libros))
+            del libros[libro_id]
+            sugerencias.eliminar(libro_id)
+        else:
+            libro_id = rng.choice(list(libros))
+            titulo, autor = libros[libro_id]
+            if rng.random() < 0.5:
+                titulo = generar(1, rng)[0][0][1]
+            else:
+                autor = rng.choice(list(libros.values()))[1]
+            libros[libro_id] = (titulo, autor)
+            sugerencias.guardar(libro_id, titulo, autor, prestamos.get(libro_id, 0))
+
+
+def esperadas(libros: dict, prestamos: dict, popularidad_autores: dict, prefijo: str) -> dict:
+    """Búsqueda exhaustiva: (tipo, texto) -> préstamos de todo lo que coincide con el prefijo."""
+    validas = {}
+    autores = set()
+    for libro_id, (titulo, autor) in libros.items():
+        if normalizar(titulo).startswith(prefijo):
+            clave = ("titulo", titulo)
+            validas[clave] = max(validas.get(clave, 0), prestamos.get(libro_id, 0))
+        autores.add(autor)
+    for autor in autores:
+        clave = normalizar(autor)
+        if clave.startswith(prefijo) or " " + prefijo in clave:
+            validas[("autor", autor)] = popularidad_autores.get(clave, 0)
+    return validas
+
+
+def verificar(cantidad: int, rng: random.Random) -> bool:
+    filas, prestamos = generar(cantidad, rng)
+    sugerencias = _Sugerencias()
+    sugerencias.armar(filas, prestamos)
+    popularidad_autores = {clave: datos[2] for clave, datos in sugerencias.autores.items()}
+    libros = {libro_id: (titulo, autor) for libro_id, titulo, autor in filas}
+    escrituras(sugerencias, libros, prestamos, cantidad // 10, rng)
+
+    textos = [t for t, _ in libros.values()] + [a for _, a in libros.values()]
+    errores = 0
+    for _ in range(500):
+        texto = normalizar(rng.choice(textos))
+        palabras = texto.split(" ")
+        texto = " ".join(palabras[rng.randrange(len(palabras)):]) if rng.random() < 0.3 else texto
+        prefijo = texto[:rng.randrange(1, min(len(texto), 8) + 1)]
+        resultado = sugerencias.sugerir(prefijo, 10)
+        validas = esperadas(libros, prestamos, popularidad_autores, prefijo)
+        ok = (
+            len(resultado) == min(10, len(validas))
+            and len({(s["tipo"], s["texto"]) for s in resultado}) == len(resultado)
+            and all(validas.get((s["tipo"], s["texto"])) == s["prestamos"] for s in resultado)
+            and [s["prestamos"] for s in resultado] == sorted(validas.values(), reverse=True)[:10]
+        )
+        if not ok:
+            errores += 1
+            if errores <= 3:
+                print(f"ERROR: {prefijo!r}: {resultado}")
+    print(f"Verificación: 500 prefijos con {cantidad} libros y {cantidad // 10} cambios, {errores} diferencias")
+    return errores == 0
+
+
+def escribir_letra_por_letra(textos, usuarios: int, rng: random.Random):
+    prefijos = []
+    for _ in range(usuarios):
+        texto = rng.choice(textos)
+        prefijos.extend(texto[:i] for i in range(1, min(len(texto), 12) + 1))
+    return prefijos
+
+
+def latencias(funcion, prefijos) -> str:
+    tiempos = []
+    for prefijo in prefijos:
+        inicio = time.perf_counter()
+        funcion(prefijo)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    return (f"mediana {statistics.median(tiempos) * 1e6:.0f} µs, p99 {tiempos[int(len(tiempos) * 0.99)] * 1e6:.0f} µs, "
+            f"máxima {tiempos[-1] * 1e6:.0f} µs ({len(tiempos)} consultas)")
+
+
+async def comparar_sql(cantidad: int, prefijos, rng: random.Random):
+    with tempfile.TemporaryDirectory() as tmp:
+        await Tortoise.init(config=tortoise_config(f"sqlite://{os.path.join(tmp, 'sugerencias.db')}"))
+        await migrar()
+        filas, prestamos = generar(cantidad, rng)
+        for inicio in range(0, cantidad, 5000):
+            await LibroModel.bulk_create([
+                LibroModel(id=libro_id, titulo=titulo, autor=autor, isbn=str(libro_id), categoria="C")
+                for libro_id, titulo, autor in filas[inicio:inicio + 5000]
+            ])
+        await ResumenPrestamosLibro.bulk_create([
+            ResumenPrestamosLibro(libro_id=libro_id, prestamos=cantidad) for libro_id, cantidad in prestamos.items()
+        ])
+
+        async def medir(funcion):
+            tiempos = []
+            for prefijo in prefijos:
+                inicio = time.perf_counter()
+                await funcion(prefijo)
+                tiempos.append(time.perf_counter() - inicio)
+            return statistics.median(tiempos) * 1e6
+
+        indice_sugerencias = indices_sugerencias.actual()
+        inicio = time.perf_counter()
+        await indice_sugerencias.sugerir("a")
+        print(f"\nSQLite con {cantidad} libros (primera sugerencia, arma el índice: "
+              f"{(time.perf_counter() - inicio) * 1000:.0f} ms)")
+        sql = await medir(lambda p: LibroModel.filter(titulo__istartswith=p).limit(10).values("id", "titulo"))
+        memoria = await medir(lambda p: indice_sugerencias.sugerir(p, 10))
+        print(f"titulo__istartswith: mediana {sql:.0f} µs; índice de sugerencias: mediana {memoria:.0f} µs")
+        await Tortoise.close_connections()
+
+
+def main(args) -> int:
+    rng = random.Random(1)
+    filas, prestamos = generar(args.libros, rng)
+
+    inicio = time.perf_counter()
+    sugerencias = _Sugerencias()
+    sugerencias.armar(filas, prestamos)
+    armado = time.perf_counter() - inicio
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    medida = _Sugerencias()
+    medida.armar(filas, prestamos)
+    memoria = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(antes, "filename"))
+    tracemalloc.stop()
+    del medida
+    print(f"{args.libros} libros, {len(sugerencias.autores)} autores, {len(sugerencias.indice)} entradas")
+    print(f"Armado: {armado:.1f} s, {memoria / args.libros:.0f} bytes por libro")
+
+    textos = [titulo for _, titulo, _ in filas[:50000]] + [autor.split(" ", 1)[1] for _, _, autor in filas[:5000]]
+    prefijos = escribir_letra_por_letra(textos, args.usuarios, rng)
+    print(f"\nÍndice recién armado: {latencias(lambda p: sugerencias.sugerir(normalizar(p), 10), prefijos)}")
+    libros = {libro_id: (titulo, autor) for libro_id, titulo, autor in filas}
+    escrituras(sugerencias, libros, prestamos, args.pendientes, rng)
+    print(f"Con {args.pendientes} cambios pendientes: "
+          f"{latencias(lambda p: sugerencias.sugerir(normalizar(p), 10), prefijos)}")
+    del sugerencias, libros, filas
+
+    ok = verificar(args.verificar, rng)
+    if args.sql_libros:
+        asyncio.run(comparar_sql(args.sql_libros, prefijos[:2000], rng))
+    print("Sugerencias iguales a la búsqueda exhaustiva" if ok else "ERROR: sugerencias distintas")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--libros", type=int, default=1000000)
+    parser.add_argument("--usuarios", type=int, default=500)
+    parser.add_argument("--pendientes", type=int, default=5000)
+    parser.add_argument("--verificar", type=int, default=20000)
+    parser.add_argument("--sql-libros", type=int, default=50000)
+    sys.exit(main(parser.parse_args()))
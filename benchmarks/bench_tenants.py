@@ -0,0 +1,281 @@
+"""
+Mide el modo multi-tenant (una base SQLite por biblioteca escolar) con
+`--tenants` bibliotecas y comprueba que cada petición use la base de su
+tenant.
+
+1. Crea las bases (todas las migraciones) y mide la primera apertura en un
+   worker (migraciones ya al día) contra usar una base ya abierta.
+2. Escrituras concurrentes: `--escritores` tareas dan de alta
+   `--escrituras` libros, todas en la misma biblioteca o repartidas entre
+   todas. Después, una biblioteca importa libros en lotes grandes mientras
+   otra da de alta libros de a uno: latencia de esas altas si las dos
+   bibliotecas compartieran la base y con bases separadas (las escrituras de
+   una escuela no esperan a las de otra).
+3. Con `--max-abiertos` bases abiertas como máximo, `--peticiones`
+   consultas con popularidad desigual entre bibliotecas (Zipf): proporción
+   de peticiones que encuentran la base abierta y latencia (mediana y p99)
+   de las que la encuentran abierta y de las que tienen que abrirla.
+4. Con la aplicación completa: tenant por encabezado, subdominio y claim del
+   token; un token de una biblioteca usado en otra recibe 401; cada
+   biblioteca ve sólo sus libros; un trabajo encolado en una biblioteca se
+   ejecuta en su base; las bases sin uso se cierran.
+
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python -m benchmarks.bench_tenants [--tenants 200] [--escritores 50] [--escrituras 4000] [--max-abiertos 32]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("TENANTS_ENABLED", "true")
+os.environ.setdefault("TENANTS_DOMINIO", "biblioteca.example.com")
+os.environ.setdefault("TENANTS_INACTIVIDAD", "2")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("TRABAJOS_INTERVALO", "0.1")
+
+from tortoise import Tortoise
+from tortoise.transactions import in_transaction
+
+from app.core.config import settings
+from app.db.config import tortoise_config
+from app.db.models.libro import Libro as LibroModel
+from app.db.tenants import GestorTenants, gestor_tenants
+
+isbns = itertools.count(10 ** 12)
+
+
+def nombres(cantidad: int):
+    return [f"escuela{n:03d}" for n in range(cantidad)]
+
+
+def resumen(tiempos) -> str:
+    tiempos = sorted(tiempos)
+    return (f"mediana {statistics.median(tiempos) * 1000:.2f} ms, "
+            f"p99 {tiempos[int(len(tiempos) * 0.99)] * 1000:.2f} ms")
+
+
+async def crear_y_abrir(gestor: GestorTenants, tenants):
+    inicio = time.perf_counter()
+    for tenant in tenants:
+        await gestor.crear_tenant(tenant)
+    creacion = (time.perf_counter() - inicio) / len(tenants)
+
+    aperturas, reutilizadas = [], []
+    for tiempos in (aperturas, reutilizadas):
+        for tenant in tenants:
+            inicio = time.perf_counter()
+            async with gestor.usar(tenant):
+                await LibroModel.filter(id=1).exists()
+            tiempos.append(time.perf_counter() - inicio)
+    print(f"{len(tenants)} bibliotecas: creación (migraciones) {creacion * 1000:.1f} ms por base")
+    print(f"Primera apertura en el worker: {resumen(aperturas)}")
+    print(f"Base ya abierta:               {resumen(reutilizadas)}")
+
+
+async def escribir(gestor: GestorTenants, tenants, escritores: int, escrituras: int, etiqueta: str):
+    proximo = iter(range(escrituras))
+    latencias = []
+
+    async def escritor():
+        for i in proximo:
+            tenant = tenants[i % len(tenants)]
+            inicio = time.perf_counter()
+            async with gestor.usar(tenant):
+                await LibroModel.create(
+                    titulo=f"{tenant} {etiqueta} {i}", autor="Autor", isbn=str(next(isbns)), categoria="C"
+                )
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(escritor() for _ in range(escritores)))
+    total = time.perf_counter() - inicio
+    return escrituras / total, latencias
+
+
+async def vecino_ruidoso(gestor: GestorTenants, ruidoso: str, tranquilo: str, segundos: float):
+    fin = time.monotonic() + segundos
+    latencias = []
+    lotes = 0
+
+    async def importar():
+        nonlocal lotes
+        while time.monotonic() < fin:
+            async with gestor.usar(ruidoso):
+                async with in_transaction("default") as conn:
+                    await LibroModel.bulk_create([
+                        LibroModel(titulo=f"{ruidoso} importado", autor="Autor", isbn=str(next(isbns)),
+                                   categoria="Importados")
+                        for _ in range(500)
+                    ], using_db=conn)
+            lotes += 1
+
+    async def dar_de_alta():
+        i = 0
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            async with gestor.usar(tranquilo):
+                await LibroModel.create(titulo=f"{tranquilo} alta {i}", autor="Autor", isbn=str(next(isbns)),
+                                        categoria="C")
+            latencias.append(time.perf_counter() - inicio)
+            i += 1
+            await asyncio.sleep(0.002)
+
+    await asyncio.gather(*(importar() for _ in range(4)), dar_de_alta())
+    return latencias, lotes
+
+
+async def lru(directorio: str, tenants, maximo: int, peticiones: int, concurrencia: int, rng: random.Random):
+    gestor = GestorTenants(directorio, maximo, inactividad=3600)
+    pesos = [1 / (rango + 1) ** 1.1 for rango in range(len(tenants))]
+    pedidos = iter(rng.choices(tenants, pesos, k=peticiones))
+    abiertas, a_abrir = [], []
+
+    async def cliente():
+        for tenant in pedidos:
+            abierta = tenant in gestor.abiertos()
+            inicio = time.perf_counter()
+            async with gestor.usar(tenant):
+                await LibroModel.filter(id__lte=10).values("id", "titulo")
+            (abiertas if abierta else a_abrir).append(time.perf_counter() - inicio)
+
+    await asyncio.gather(*(cliente() for _ in range(concurrencia)))
+    ok = len(gestor.abiertos()) <= maximo
+    print(f"\nMáximo {maximo} bases abiertas, {peticiones} consultas (Zipf, {concurrencia} a la vez): "
+          f"{len(abiertas) / peticiones:.1%} con la base abierta, {gestor.aperturas} aperturas, "
+          f"{gestor.cierres} cierres, {len(gestor.abiertos())} abiertas al final")
+    print(f"Base abierta:     {resumen(abiertas)}")
+    if a_abrir:
+        print(f"Abriendo la base: {resumen(a_abrir)}")
+    await gestor.cerrar()
+    if not ok:
+        print("ERROR: se superó el máximo de bases abiertas")
+    return ok
+
+
+async def aplicacion(directorio: str, tenants) -> bool:
+    import httpx
+
+    settings.DB_URL = f"sqlite://{os.path.join(directorio, 'principal.db')}"
+    gestor_tenants.directorio = os.path.join(directorio, "tenants")
+    from app.auth.auth import create_user_token
+    from app.db.models.usuario import Usuario
+    from app.main import app
+
+    errores = []
+
+    def comprobar(condicion: bool, mensaje: str):
+        if not condicion:
+            errores.append(mensaje)
+            print(f"ERROR: {mensaje}")
+
+    async with app.router.lifespan_context(app):
+        tokens = {}
+        for tenant in tenants[:2]:
+            async with gestor_tenants.usar(tenant):
+                usuario = await Usuario.create(
+                    username="admin", nombre=tenant, email=f"admin@{tenant}.example.com", hashed_password="x",
+                    rol="admin",
+                )
+                tokens[tenant] = create_user_token(usuario)
+        a, b = tenants[:2]
+        dominio = settings.TENANTS_DOMINIO
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://app") as c:
+            for tenant in tenants[:20]:
+                encabezados = {"X-Tenant": tenant} if tenant.endswith(("0", "2", "4", "6", "8")) else {
+                    "Host": f"{tenant}.{dominio}"
+                }
+                r = await c.get("/api/libros/", params={"items_por_pagina": 100}, headers=encabezados)
+                titulos = [libro["titulo"] for libro in r.json()]
+                comprobar(r.status_code == 200 and titulos and all(t.startswith(tenant) for t in titulos),
+                          f"{tenant}: el listado no corresponde a su base")
+
+            r = await c.get("/usuarios/me", headers={"Authorization": f"Bearer {tokens[a]}"})
+            comprobar(r.status_code == 200 and r.json()["nombre"] == a, "tenant por claim del token")
+            r = await c.get("/usuarios/me", headers={"Authorization": f"Bearer {tokens[a]}", "X-Tenant": b})
+            comprobar(r.status_code == 401, f"token de {a} usado en {b}: {r.status_code} (se esperaba 401)")
+            comprobar((await c.get("/api/libros/")).status_code == 400, "petición sin tenant")
+            comprobar((await c.get("/api/libros/", headers={"X-Tenant": "no-existe"})).status_code == 404,
+                      "tenant desconocido")
+
+            async with gestor_tenants.usar(b):
+                antes_b = await LibroModel.filter(categoria="Trabajo").count()
+            r = await c.patch(
+                "/api/libros/", json={"filtro": {"categoria": "C"}, "cambios": {"categoria": "Trabajo"}},
+                headers={"Authorization": f"Bearer {tokens[a]}"},
+            )
+            comprobar(r.status_code == 202, f"encolar un trabajo: {r.status_code}")
+            for _ in range(100):
+                trabajo = (await c.get(r.headers["location"], headers={"Authorization": f"Bearer {tokens[a]}"})).json()
+                if trabajo["estado"] in ("completado", "fallido"):
+                    break
+                await asyncio.sleep(0.1)
+            async with gestor_tenants.usar(a):
+                pendientes_a = await LibroModel.filter(categoria="C").count()
+            async with gestor_tenants.usar(b):
+                despues_b = await LibroModel.filter(categoria="Trabajo").count()
+            comprobar(trabajo["estado"] == "completado" and pendientes_a == 0 and antes_b == despues_b == 0,
+                      f"trabajo en {a}: {trabajo['estado']}, {pendientes_a} libros sin cambiar, "
+                      f"{despues_b} cambiados en {b}")
+
+        abiertas = len(gestor_tenants.abiertos())
+        espera = time.monotonic() + gestor_tenants.inactividad + 5
+        while gestor_tenants.abiertos() and time.monotonic() < espera:
+            await asyncio.sleep(0.2)
+        comprobar(not gestor_tenants.abiertos(), f"bases sin cerrar por inactividad: {gestor_tenants.abiertos()}")
+        print(f"\nAplicación: {abiertas} bases abiertas tras las peticiones, "
+              f"{len(gestor_tenants.abiertos())} tras {gestor_tenants.inactividad:.0f} s sin uso; "
+              f"{gestor_tenants.stats()}")
+    return not errores
+
+
+async def main(args) -> int:
+    rng = random.Random(1)
+    directorio = tempfile.mkdtemp(prefix="bench_tenants_")
+    try:
+        tenants = nombres(args.tenants)
+        await Tortoise.init(config=tortoise_config(f"sqlite://{os.path.join(directorio, 'principal.db')}"))
+        gestor = GestorTenants(os.path.join(directorio, "tenants"), args.tenants, inactividad=3600)
+        await crear_y_abrir(gestor, tenants)
+
+        print(f"\n{args.escritores} escritores, {args.escrituras} altas:")
+        for etiqueta, destino in (("una", tenants[:1]), ("todas", tenants)):
+            por_segundo, latencias = await escribir(gestor, destino, args.escritores, args.escrituras, etiqueta)
+            print(f"  en {len(destino):>3} biblioteca(s): {por_segundo:7.0f} altas/s, {resumen(latencias)}")
+        print(f"\nAltas de a una mientras otra biblioteca importa lotes de 500 libros ({args.segundos:.0f} s):")
+        for etiqueta, tranquilo in (("misma base", tenants[0]), ("bases separadas", tenants[1])):
+            latencias, lotes = await vecino_ruidoso(gestor, tenants[0], tranquilo, args.segundos)
+            print(f"  {etiqueta:<16} {resumen(latencias)}, máxima {max(latencias) * 1000:.1f} ms "
+                  f"({len(latencias)} altas, {lotes} lotes importados)")
+        await gestor.cerrar()
+
+        ok = await lru(os.path.join(directorio, "tenants"), tenants, args.max_abiertos, args.peticiones,
+                       args.concurrencia, rng)
+        await Tortoise.close_connections()
+
+        ok &= await aplicacion(directorio, tenants)
+        await Tortoise.close_connections()
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+    print("\nCada petición usó la base de su biblioteca" if ok else "\nERROR: fallaron comprobaciones")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=200)
+    parser.add_argument("--escritores", type=int, default=50)
+    parser.add_argument("--escrituras", type=int, default=4000)
+    parser.add_argument("--segundos", type=float, default=5)
+    parser.add_argument("--max-abiertos", type=int, default=32)
+    parser.add_argument("--peticiones", type=int, default=20000)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,222 @@
+"""
+Comprueba el modo de varios workers (`python -m app.servidor`).
+
+Inicia la aplicación con `--workers` procesos sobre una base temporal y,
+usando una conexión nueva por petición para que el kernel las reparta entre
+los workers, verifica:
+
+- caché de libros: tras calentar la caché en todos los workers y modificar
+  un libro, todas las lecturas devuelven el dato nuevo; mide cuánto tarda en
+  propagarse la invalidación;
+- caché de usuarios: tras desactivar un usuario, ningún worker lo sigue
+  aceptando con su token;
+- límite por usuario: de una ráfaga concurrente de logins fallidos contra la
+  misma cuenta (desde IPs distintas) pasan exactamente `RATE_LIMIT_USUARIO`;
+- límite por IP: de una ráfaga concurrente desde la misma IP pasan
+  exactamente `RATE_LIMIT_IP`.
+
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python -m benchmarks.bench_workers [--workers 4] [--rafaga 40] [--json workers.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+LIMITE_IP = 12
+LIMITE_USUARIO = 3
+LECTURAS = 24  # Lecturas (conexiones nuevas) por comprobación
+ESPERA_MAXIMA = 10.0  # Segundos para que una invalidación llegue a todos
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def sembrar(db_url: str) -> Dict[str, int]:
+    from tortoise import Tortoise
+
+    from app.core.security import hash_password
+    from app.db.config import tortoise_config
+    from app.db.migraciones import migrar
+    from app.db.models.libro import Libro
+    from app.db.models.usuario import Usuario
+
+    await Tortoise.init(config=tortoise_config(db_url))
+    await migrar()
+    admin = await Usuario.create(username="admin", email="admin@example.com",
+                                 hashed_password=hash_password("admin1234"), rol="admin")
+    lector = await Usuario.create(username="lector", email="lector@example.com",
+                                  hashed_password=hash_password("lector1234"))
+    libro = await Libro.create(titulo="Original", autor="Autor", isbn="9780000000001", categoria="General")
+    await Tortoise.close_connections()
+    return {"admin": admin.id, "lector": lector.id, "libro": libro.id}
+
+
+async def _get(base: str, ruta: str, headers: Dict[str, str] = None) -> httpx.Response:
+    # Un cliente por petición: cada una abre su propia conexión
+    async with httpx.AsyncClient(base_url=base) as cliente:
+        return await cliente.get(ruta, headers=headers)
+
+
+async def _esperar_servidor(base: str, proceso: subprocess.Popen, limite: float = 60):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if proceso.poll() is not None:
+            raise SystemExit("El servidor terminó antes de estar listo")
+        try:
+            if (await _get(base, "/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("El servidor no respondió a tiempo")
+
+
+async def _propagacion(comprobar, limite: float = ESPERA_MAXIMA) -> float:
+    """Segundos hasta que todas las lecturas cumplen `comprobar` (o -1 si no ocurre)."""
+    inicio = time.perf_counter()
+    while time.perf_counter() - inicio < limite:
+        respuestas = await asyncio.gather(*(comprobar() for _ in range(LECTURAS)))
+        if all(respuestas):
+            return time.perf_counter() - inicio
+        await asyncio.sleep(0.05)
+    return -1
+
+
+async def comprobar_libros(base: str, ids: Dict[str, int], admin: Dict[str, str]) -> Dict:
+    ruta = f"/api/libros/{ids['libro']}"
+    # En secuencia: cada worker genera la respuesta una sola vez, así los MISS
+    # cuentan los workers que respondieron
+    calentamiento = [await _get(base, ruta) for _ in range(LECTURAS * 2)]
+    workers = sum(1 for r in calentamiento if r.headers.get("x-cache") == "MISS")
+
+    async with httpx.AsyncClient(base_url=base) as cliente:
+        (await cliente.put(ruta, json={"titulo": "Modificado"}, headers=admin)).raise_for_status()
+
+    async def actualizado():
+        return (await _get(base, ruta)).json()["titulo"] == "Modificado"
+
+    segundos = await _propagacion(actualizado)
+    return {"workers_con_cache": workers, "propagacion_s": round(segundos, 3), "ok": segundos >= 0}
+
+
+async def comprobar_usuarios(base: str, ids: Dict[str, int], admin: Dict[str, str], lector: Dict[str, str]) -> Dict:
+    iniciales = await asyncio.gather(*(_get(base, "/usuarios/me", lector) for _ in range(LECTURAS * 2)))
+    if any(r.status_code != 200 for r in iniciales):
+        return {"propagacion_s": -1, "ok": False, "error": "El usuario no pudo autenticarse"}
+
+    async with httpx.AsyncClient(base_url=base) as cliente:
+        (await cliente.put(f"/usuarios/{ids['lector']}", json={"activo": False}, headers=admin)).raise_for_status()
+
+    # 401 si ya llegó la revocación de sus tokens, 403 si sólo la invalidación de la caché
+    async def rechazado():
+        return (await _get(base, "/usuarios/me", lector)).status_code in (401, 403)
+
+    segundos = await _propagacion(rechazado)
+    return {"propagacion_s": round(segundos, 3), "ok": segundos >= 0}
+
+
+async def _rafaga_login(base: str, cuerpos: List[Dict], ips: List[str]) -> Dict[int, int]:
+    async def intento(cuerpo, ip):
+        async with httpx.AsyncClient(base_url=base) as cliente:
+            return (await cliente.post("/auth/login", json=cuerpo, headers={"X-Forwarded-For": ip})).status_code
+
+    codigos = await asyncio.gather(*(intento(c, ip) for c, ip in zip(cuerpos, ips)))
+    conteo: Dict[int, int] = {}
+    for codigo in codigos:
+        conteo[codigo] = conteo.get(codigo, 0) + 1
+    return conteo
+
+
+async def comprobar_limites(base: str, rafaga: int) -> Dict:
+    # Misma cuenta, contraseña incorrecta, una IP distinta en cada intento
+    cuerpo = {"email": "lector@example.com", "password": "incorrecta"}
+    por_usuario = await _rafaga_login(base, [cuerpo] * rafaga, [f"10.1.{i // 250}.{i % 250 + 1}" for i in range(rafaga)])
+    # Misma IP, cuentas inexistentes
+    cuerpos = [{"email": f"nadie{i}@example.com", "password": "x"} for i in range(rafaga)]
+    por_ip = await _rafaga_login(base, cuerpos, ["10.2.0.1"] * rafaga)
+    return {
+        "usuario": {"aceptados": por_usuario.get(401, 0), "rechazados": por_usuario.get(429, 0),
+                    "limite": LIMITE_USUARIO, "ok": por_usuario.get(401, 0) == LIMITE_USUARIO},
+        "ip": {"aceptados": por_ip.get(401, 0), "rechazados": por_ip.get(429, 0),
+               "limite": LIMITE_IP, "ok": por_ip.get(401, 0) == LIMITE_IP},
+    }
+
+
+async def main(args) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = f"sqlite://{os.path.join(tmp, 'workers.db')}"
+        ids = await sembrar(db_url)
+        puerto = _puerto_libre()
+        base = f"http://127.0.0.1:{puerto}"
+        env = dict(
+            os.environ,
+            DB_URL=db_url,
+            OPENAPI_CACHE=os.path.join(tmp, "openapi.json"),
+            RESPONSE_CACHE_TTL="300",
+            AUTH_CACHE_TTL="300",
+            RATE_LIMIT_IP=str(LIMITE_IP),
+            RATE_LIMIT_USUARIO=str(LIMITE_USUARIO),
+            RATE_LIMIT_VENTANA="3600",
+            NOTIFICACIONES_INTERVALO="3600",
+        )
+        proceso = subprocess.Popen(
+            [sys.executable, "-m", "app.servidor", "--workers", str(args.workers),
+             "--host", "127.0.0.1", "--port", str(puerto), "--log-level", "warning"],
+            env=env,
+        )
+        try:
+            await _esperar_servidor(base, proceso)
+            from app.auth.auth import create_access_token
+
+            admin = {"Authorization": f"Bearer {create_access_token({'sub': 'admin'})}"}
+            lector = {"Authorization": f"Bearer {create_access_token({'sub': 'lector'})}"}
+            resultado = {
+                "workers": args.workers,
+                "libros": await comprobar_libros(base, ids, admin),
+                "usuarios": await comprobar_usuarios(base, ids, admin, lector),
+                "limites": await comprobar_limites(base, args.rafaga),
+            }
+        finally:
+            proceso.terminate()
+            proceso.wait(timeout=30)
+
+    libros, usuarios, limites = resultado["libros"], resultado["usuarios"], resultado["limites"]
+    print(f"Workers: {args.workers} (con la caché de libros calentada: {libros['workers_con_cache']})")
+    print(f"{'comprobación':<28} {'resultado':>12} {'ok':>4}")
+    print(f"{'invalidación de libros':<28} {libros['propagacion_s']:>10.3f} s {'sí' if libros['ok'] else 'NO':>4}")
+    print(f"{'invalidación de usuarios':<28} {usuarios['propagacion_s']:>10.3f} s {'sí' if usuarios['ok'] else 'NO':>4}")
+    for nombre in ("usuario", "ip"):
+        r = limites[nombre]
+        texto = f"{r['aceptados']}/{r['limite']}"
+        print(f"{'límite por ' + nombre:<28} {texto:>12} {'sí' if r['ok'] else 'NO':>4}")
+    if libros["workers_con_cache"] < 2:
+        print("Aviso: las lecturas no se repartieron entre varios workers")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    ok = libros["ok"] and usuarios["ok"] and limites["usuario"]["ok"] and limites["ip"]["ok"]
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rafaga", type=int, default=40, help="Intentos concurrentes en cada ráfaga de logins")
+    parser.add_argument("--json", help="Guardar el resultado en este archivo")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,114 @@
+"""
+Fixtures compartidas por las pruebas.
+
+Las pruebas de concurrencia usan procesos reales (el servidor con varios
+workers o procesos que escriben a la vez) sobre una base SQLite temporal.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict
+
+import httpx
+import pytest
+
+
+async def _preparar(db_url: str, sembrar=None):
+    from tortoise import Tortoise
+
+    from app.db.config import tortoise_config
+    from app.db.migraciones import migrar
+
+    await Tortoise.init(config=tortoise_config(db_url))
+    try:
+        await migrar()
+        return await sembrar() if sembrar else None
+    finally:
+        await Tortoise.close_connections()
+
+
+def _preparar_base(db_url: str, sembrar=None):
+    """
+    Aplica las migraciones en `db_url` y, si se indica, usa la base.
+
+    Args:
+        db_url: URL de la base
+        sembrar: Corrutina (sin argumentos) que carga o consulta datos con Tortoise
+
+    Returns:
+        Lo que devuelva `sembrar`
+    """
+    return asyncio.run(_preparar(db_url, sembrar))
+
+
+@pytest.fixture
+def preparar_base():
+    """Función que aplica las migraciones en una base y, si se indica, la usa (ver `_preparar_base`)."""
+    return _preparar_base
+
+
+@pytest.fixture
+def db_url(tmp_path) -> str:
+    """URL de una base SQLite vacía en un directorio temporal."""
+    return f"sqlite://{tmp_path / 'biblioteca.db'}"
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _esperar_servidor(base: str, proceso: subprocess.Popen, limite: float = 60):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        if proceso.poll() is not None:
+            pytest.fail("El servidor terminó antes de estar listo")
+        try:
+            if httpx.get(f"{base}/").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    pytest.fail("El servidor no respondió a tiempo")
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    """
+    Fábrica que inicia `python -m app.servidor` sobre una base temporal.
+
+    Se llama con la cantidad de workers, una corrutina para cargar datos y
+    variables de entorno adicionales; devuelve la URL base. El servidor se
+    detiene al terminar la prueba.
+    """
+    procesos = []
+
+    def iniciar(workers: int, sembrar=None, **entorno: str) -> str:
+        db_url = f"sqlite://{tmp_path / 'servidor.db'}"
+        _preparar_base(db_url, sembrar)
+        puerto = _puerto_libre()
+        env: Dict[str, str] = dict(
+            os.environ,
+            DB_URL=db_url,
+            OPENAPI_CACHE=str(tmp_path / "openapi.json"),
+            NOTIFICACIONES_INTERVALO="3600",
+            **entorno,
+        )
+        proceso = subprocess.Popen(
+            [sys.executable, "-m", "app.servidor", "--workers", str(workers),
+             "--host", "127.0.0.1", "--port", str(puerto), "--log-level", "warning"],
+            env=env,
+        )
+        procesos.append(proceso)
+        base = f"http://127.0.0.1:{puerto}"
+        _esperar_servidor(base, proceso)
+        return base
+
+    yield iniciar
+    for proceso in procesos:
+        proceso.terminate()
+        proceso.wait(timeout=30)
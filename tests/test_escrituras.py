@@ -0,0 +1,134 @@
+"""
+Escrituras simultáneas desde varios procesos: libros con el mismo ISBN y
+registros de usuarios con la misma parte local del email.
+
+Cada escritor es un proceso con su propia conexión a la base (como varios
+workers) y todos esperan en una barrera para escribir a la vez. El índice
+único de ISBN tiene que impedir los duplicados: un solo libro creado y el
+resto de las altas rechazadas con 400; con el upsert, un alta y el resto
+reemplazos. Los registros eligen el mismo nombre de usuario y todos tienen
+que terminar creados, con nombres distintos.
+"""
+import asyncio
+import multiprocessing
+import os
+from collections import Counter
+
+import pytest
+
+ESCRITORES = 10
+ISBN = "9780000000042"
+
+
+async def _escribir(db_url: str, accion: str, barrera) -> int:
+    from fastapi import HTTPException, Response
+    from tortoise import Tortoise
+
+    from app.api.routes.libros import create_libro, upsert_libro_por_isbn
+    from app.core.rate_limit import rate_limiter
+    from app.routes import auth
+    from app.db.config import tortoise_config
+    from app.db.models.libro import Libro
+    from app.schemas.libro import LibroCreate, LibroUpsert
+    from app.schemas.usuario import UsuarioCreate
+
+    await Tortoise.init(config=tortoise_config(db_url))
+    try:
+        try:
+            if accion == "alta":
+                await asyncio.to_thread(barrera.wait)
+                await create_libro(LibroCreate(titulo="Libro", autor="Autor", isbn=ISBN, categoria="General"))
+                return 201
+            if accion == "upsert":
+                await asyncio.to_thread(barrera.wait)
+                response = Response()
+                await upsert_libro_por_isbn(LibroUpsert(titulo="Libro", autor="Autor", categoria="General"),
+                                            response, ISBN)
+                return response.status_code
+            if accion == "registro":
+                # La barrera reemplaza al hash: todos eligen el nombre de usuario a la vez
+                async def sin_hash(password: str) -> str:
+                    await asyncio.to_thread(barrera.wait)
+                    return password
+
+                auth.get_password_hash_async = sin_hash
+                rate_limiter.habilitado = False
+                email = f"ana@dominio{os.getpid()}.com"
+                await auth.register(None, UsuarioCreate(nombre="Ana", email=email, password="ana12345"))
+                return 200
+            # Comprobar antes de insertar: todos comprueban antes de que ninguno inserte
+            existe = await Libro.filter(isbn=ISBN).exists()
+            await asyncio.to_thread(barrera.wait)
+            if existe:
+                return 400
+            await Libro.create(titulo="Libro", autor="Autor", isbn=ISBN, categoria="General")
+            return 201
+        except HTTPException as e:
+            return e.status_code
+        except Exception:
+            return 500
+    finally:
+        await Tortoise.close_connections()
+
+
+def _escritor(db_url: str, accion: str, barrera, resultados):
+    resultados.put(asyncio.run(_escribir(db_url, accion, barrera)))
+
+
+def _simultaneas(db_url: str, accion: str) -> Counter:
+    contexto = multiprocessing.get_context("spawn")
+    barrera, resultados = contexto.Barrier(ESCRITORES), contexto.Queue()
+    procesos = [
+        contexto.Process(target=_escritor, args=(db_url, accion, barrera, resultados))
+        for _ in range(ESCRITORES)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    codigos = Counter(resultados.get(timeout=120) for _ in procesos)
+    for proceso in procesos:
+        proceso.join(timeout=30)
+    return codigos
+
+
+async def _contar_libros() -> int:
+    from app.db.models.libro import Libro
+
+    return await Libro.filter(isbn=ISBN).count()
+
+
+async def _usernames():
+    from app.db.models.usuario import Usuario
+
+    return await Usuario.filter(email__startswith="ana@").values_list("username", flat=True)
+
+
+@pytest.fixture
+def base(db_url, preparar_base) -> str:
+    preparar_base(db_url)
+    return db_url
+
+
+def test_altas_simultaneas_crean_un_solo_libro(base, preparar_base):
+    assert _simultaneas(base, "alta") == {201: 1, 400: ESCRITORES - 1}
+    assert preparar_base(base, _contar_libros) == 1
+
+
+def test_upserts_simultaneos_crean_un_solo_libro(base, preparar_base):
+    assert _simultaneas(base, "upsert") == {201: 1, 200: ESCRITORES - 1}
+    assert preparar_base(base, _contar_libros) == 1
+
+
+def test_comprobar_antes_de_insertar_reproduce_la_carrera(base, preparar_base):
+    # Control de la prueba: con la comprobación previa (sin una sola
+    # sentencia) varios escritores pasan la comprobación y sólo el índice
+    # único evita el duplicado, así que los demás fallan
+    codigos = _simultaneas(base, "comprobacion")
+    assert codigos[201] == 1
+    assert codigos[500] > 0
+    assert preparar_base(base, _contar_libros) == 1
+
+
+def test_registros_simultaneos_con_el_mismo_username(base, preparar_base):
+    assert _simultaneas(base, "registro") == {200: ESCRITORES}
+    usernames = preparar_base(base, _usernames)
+    assert len(usernames) == len(set(usernames)) == ESCRITORES
@@ -0,0 +1,119 @@
+"""
+Modo de varios workers (`python -m app.servidor --workers 4`): los límites de
+intentos y la invalidación de cachés tienen que valer para todos los procesos.
+
+Cada petición abre su propia conexión, así el kernel las reparte entre los
+workers; las ráfagas son concurrentes para que varios workers las atiendan a
+la vez.
+"""
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+WORKERS = 4
+LIMITE_IP = 12
+LIMITE_USUARIO = 3
+RAFAGA = 40
+LECTURAS = 24  # Lecturas (conexiones nuevas) por comprobación
+ESPERA_MAXIMA = 10.0  # Segundos para que una invalidación llegue a todos los workers
+
+ENTORNO = {
+    "RESPONSE_CACHE_TTL": "300",
+    "AUTH_CACHE_TTL": "300",
+    "RATE_LIMIT_ENABLED": "true",
+    "RATE_LIMIT_IP": str(LIMITE_IP),
+    "RATE_LIMIT_USUARIO": str(LIMITE_USUARIO),
+    "RATE_LIMIT_VENTANA": "3600",
+}
+
+
+async def _sembrar():
+    # Base con IDs conocidos: admin (1), lector (2) y un libro (1)
+    from app.core.security import hash_password
+    from app.db.models.libro import Libro
+    from app.db.models.usuario import Usuario
+
+    await Usuario.create(username="admin", email="admin@example.com",
+                         hashed_password=hash_password("admin1234"), rol="admin")
+    await Usuario.create(username="lector", email="lector@example.com", hashed_password=hash_password("lector1234"))
+    await Libro.create(titulo="Original", autor="Autor", isbn="9780000000001", categoria="General")
+
+
+def _token(username: str) -> dict:
+    from app.auth.auth import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+def _pedir(base: str, metodo: str, ruta: str, **kwargs) -> httpx.Response:
+    # Un cliente por petición: cada una abre su propia conexión
+    with httpx.Client(base_url=base) as cliente:
+        return cliente.request(metodo, ruta, **kwargs)
+
+
+def _rafaga(base: str, ruta: str, cuerpos, ips) -> Counter:
+    def intento(cuerpo, ip):
+        return _pedir(base, "POST", ruta, json=cuerpo, headers={"X-Forwarded-For": ip}).status_code
+
+    with ThreadPoolExecutor(max_workers=RAFAGA) as ejecutor:
+        return Counter(ejecutor.map(intento, cuerpos, ips))
+
+
+def _todas_cumplen(base: str, ruta: str, headers, condicion) -> bool:
+    # True cuando todas las lecturas de una tanda (repartidas entre workers) cumplen la condición
+    fin = time.monotonic() + ESPERA_MAXIMA
+    while time.monotonic() < fin:
+        with ThreadPoolExecutor(max_workers=LECTURAS) as ejecutor:
+            respuestas = list(ejecutor.map(lambda _: _pedir(base, "GET", ruta, headers=headers), range(LECTURAS)))
+        if all(condicion(r) for r in respuestas):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_limite_de_login_por_usuario_compartido(servidor):
+    base = servidor(WORKERS, _sembrar, **ENTORNO)
+    # Misma cuenta, contraseña incorrecta, una IP distinta en cada intento
+    cuerpo = {"email": "lector@example.com", "password": "incorrecta"}
+    codigos = _rafaga(base, "/auth/login", [cuerpo] * RAFAGA, [f"10.1.0.{i + 1}" for i in range(RAFAGA)])
+    assert codigos == {401: LIMITE_USUARIO, 429: RAFAGA - LIMITE_USUARIO}
+
+
+def test_limite_de_login_por_ip_compartido(servidor):
+    base = servidor(WORKERS, _sembrar, **ENTORNO)
+    cuerpos = [{"email": f"nadie{i}@example.com", "password": "incorrecta"} for i in range(RAFAGA)]
+    codigos = _rafaga(base, "/auth/login", cuerpos, ["10.2.0.1"] * RAFAGA)
+    assert codigos == {401: LIMITE_IP, 429: RAFAGA - LIMITE_IP}
+
+
+def test_limite_de_registro_por_ip_compartido(servidor):
+    base = servidor(WORKERS, _sembrar, **ENTORNO)
+    cuerpos = [{"nombre": "Nuevo", "email": f"nuevo{i}@example.com", "password": "nuevo1234"} for i in range(RAFAGA)]
+    codigos = _rafaga(base, "/auth/register", cuerpos, ["10.3.0.1"] * RAFAGA)
+    assert codigos == {200: LIMITE_IP, 429: RAFAGA - LIMITE_IP}
+
+
+def test_invalidacion_de_libros_llega_a_todos_los_workers(servidor):
+    base = servidor(WORKERS, _sembrar, **ENTORNO)
+    ruta = "/api/libros/1"
+    # En secuencia: cada worker genera la respuesta una sola vez, así los MISS
+    # cuentan los workers que la tienen en caché
+    calentamiento = [_pedir(base, "GET", ruta) for _ in range(LECTURAS * 2)]
+    assert sum(r.headers.get("x-cache") == "MISS" for r in calentamiento) >= 2
+
+    respuesta = _pedir(base, "PUT", ruta, json={"titulo": "Modificado"}, headers=_token("admin"))
+    assert respuesta.status_code == 200
+    assert _todas_cumplen(base, ruta, None, lambda r: r.json()["titulo"] == "Modificado")
+
+
+def test_usuario_desactivado_rechazado_por_todos_los_workers(servidor):
+    base = servidor(WORKERS, _sembrar, **ENTORNO)
+    lector = _token("lector")
+    assert _todas_cumplen(base, "/usuarios/me", lector, lambda r: r.status_code == 200)
+
+    respuesta = _pedir(base, "PUT", "/usuarios/2", json={"activo": False}, headers=_token("admin"))
+    assert respuesta.status_code == 200
+    # 401 si ya llegó la revocación de sus tokens, 403 si sólo la invalidación de la caché
+    assert _todas_cumplen(base, "/usuarios/me", lector, lambda r: r.status_code in (401, 403))